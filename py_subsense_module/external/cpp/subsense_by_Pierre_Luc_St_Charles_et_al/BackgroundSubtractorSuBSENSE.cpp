@@ -5,6 +5,12 @@
 #include <opencv2/imgproc/imgproc.hpp>
 #include <opencv2/highgui/highgui.hpp>
 #include <iomanip>
+#include <algorithm>
+#include <random>
+#include <thread>
+#include <vector>
+#include <string>
+#include <utility>
 
 /*
  *
@@ -55,7 +61,8 @@ BackgroundSubtractorSuBSENSE::BackgroundSubtractorSuBSENSE(	 float fRelLBSPThres
 															,size_t nMinColorDistThreshold
 															,size_t nBGSamples
 															,size_t nRequiredBGSamples
-															,size_t nSamplesForMovingAvgs)
+															,size_t nSamplesForMovingAvgs
+															,size_t nThreads)
 	:	 BackgroundSubtractorLBSP(fRelLBSPThreshold)
 		,m_nMinColorDistThreshold(nMinColorDistThreshold)
 		,m_nDescDistThresholdOffset(nDescDistThresholdOffset)
@@ -67,7 +74,8 @@ BackgroundSubtractorSuBSENSE::BackgroundSubtractorSuBSENSE(	 float fRelLBSPThres
 		,m_fCurrLearningRateLowerCap(FEEDBACK_T_LOWER)
 		,m_fCurrLearningRateUpperCap(FEEDBACK_T_UPPER)
 		,m_nMedianBlurKernelSize(m_nDefaultMedianBlurKernelSize)
-		,m_bUse3x3Spread(true) {
+		,m_bUse3x3Spread(true)
+		,m_nThreads(std::max(nThreads,(size_t)1)) {
 	CV_Assert(m_nBGSamples>0 && m_nRequiredBGSamples<=m_nBGSamples);
 	CV_Assert(m_nMinColorDistThreshold>=STAB_COLOR_DIST_OFFSET);
 }
@@ -290,20 +298,11 @@ void BackgroundSubtractorSuBSENSE::refreshModel(float fSamplesRefreshFrac, bool
 	}
 }
 
-void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray _fgmask, double learningRateOverride) {
-	// == process
-	CV_Assert(m_bInitialized);
-	cv::Mat oInputImg = _image.getMat();
-	CV_Assert(oInputImg.type()==m_nImgType && oInputImg.size()==m_oImgSize);
-	CV_Assert(oInputImg.isContinuous());
-	_fgmask.create(m_oImgSize,CV_8UC1);
-	cv::Mat oCurrFGMask = _fgmask.getMat();
-	memset(oCurrFGMask.data,0,oCurrFGMask.cols*oCurrFGMask.rows);
+template<typename RandFunc>
+size_t BackgroundSubtractorSuBSENSE::applyToPixels(const cv::Mat& oInputImg, cv::Mat& oCurrFGMask, size_t nModelIterBegin, size_t nModelIterEnd, double learningRateOverride, float fRollAvgFactor_LT, float fRollAvgFactor_ST, RandFunc& oRand) {
 	size_t nNonZeroDescCount = 0;
-	const float fRollAvgFactor_LT = 1.0f/std::min(++m_nFrameIndex,m_nSamplesForMovingAvgs);
-	const float fRollAvgFactor_ST = 1.0f/std::min(m_nFrameIndex,m_nSamplesForMovingAvgs/4);
 	if(m_nImgChannels==1) {
-		for(size_t nModelIter=0; nModelIter<m_nTotRelevantPxCount; ++nModelIter) {
+		for(size_t nModelIter=nModelIterBegin; nModelIter<nModelIterEnd; ++nModelIter) {
 			const size_t nPxIter = m_aPxIdxLUT[nModelIter];
 			const size_t nDescIter = nPxIter*2;
 			const size_t nFloatIter = nPxIter*4;
@@ -365,8 +364,8 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 				*pfCurrMeanRawSegmRes_LT = (*pfCurrMeanRawSegmRes_LT)*(1.0f-fRollAvgFactor_LT) + fRollAvgFactor_LT;
 				*pfCurrMeanRawSegmRes_ST = (*pfCurrMeanRawSegmRes_ST)*(1.0f-fRollAvgFactor_ST) + fRollAvgFactor_ST;
 				oCurrFGMask.data[nPxIter] = UCHAR_MAX;
-				if(m_nModelResetCooldown && (rand()%(size_t)FEEDBACK_T_LOWER)==0) {
-					const size_t s_rand = rand()%m_nBGSamples;
+				if(m_nModelResetCooldown && (oRand()%(size_t)FEEDBACK_T_LOWER)==0) {
+					const size_t s_rand = oRand()%m_nBGSamples;
 					*((ushort*)(m_voBGDescSamples[s_rand].data+nDescIter)) = nCurrIntraDesc;
 					m_voBGColorSamples[s_rand].data[nPxIter] = nCurrColor;
 				}
@@ -379,18 +378,18 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 				*pfCurrMeanRawSegmRes_LT = (*pfCurrMeanRawSegmRes_LT)*(1.0f-fRollAvgFactor_LT);
 				*pfCurrMeanRawSegmRes_ST = (*pfCurrMeanRawSegmRes_ST)*(1.0f-fRollAvgFactor_ST);
 				const size_t nLearningRate = learningRateOverride>0?(size_t)ceil(learningRateOverride):(size_t)ceil(*pfCurrLearningRate);
-				if((rand()%nLearningRate)==0) {
-					const size_t s_rand = rand()%m_nBGSamples;
+				if((oRand()%nLearningRate)==0) {
+					const size_t s_rand = oRand()%m_nBGSamples;
 					*((ushort*)(m_voBGDescSamples[s_rand].data+nDescIter)) = nCurrIntraDesc;
 					m_voBGColorSamples[s_rand].data[nPxIter] = nCurrColor;
 				}
 				int nSampleImgCoord_Y, nSampleImgCoord_X;
 				const bool bCurrUsing3x3Spread = m_bUse3x3Spread && !m_oUnstableRegionMask.data[nPxIter];
 				if(bCurrUsing3x3Spread)
-					getRandNeighborPosition_3x3(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize);
+					getRandNeighborPosition_3x3(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize,oRand());
 				else
-					getRandNeighborPosition_5x5(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize);
-				const size_t n_rand = rand();
+					getRandNeighborPosition_5x5(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize,oRand());
+				const size_t n_rand = oRand();
 				const size_t idx_rand_uchar = m_oImgSize.width*nSampleImgCoord_Y + nSampleImgCoord_X;
 				const size_t idx_rand_flt32 = idx_rand_uchar*4;
 				const float fRandMeanLastDist = *((float*)(m_oMeanLastDistFrame.data+idx_rand_flt32));
@@ -398,7 +397,7 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 				if((n_rand%(bCurrUsing3x3Spread?nLearningRate:(nLearningRate/2+1)))==0
 					|| (fRandMeanRawSegmRes>GHOSTDET_S_MIN && fRandMeanLastDist<GHOSTDET_D_MAX && (n_rand%((size_t)m_fCurrLearningRateLowerCap))==0)) {
 					const size_t idx_rand_ushrt = idx_rand_uchar*2;
-					const size_t s_rand = rand()%m_nBGSamples;
+					const size_t s_rand = oRand()%m_nBGSamples;
 					*((ushort*)(m_voBGDescSamples[s_rand].data+idx_rand_ushrt)) = nCurrIntraDesc;
 					m_voBGColorSamples[s_rand].data[idx_rand_uchar] = nCurrColor;
 				}
@@ -434,7 +433,7 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 		}
 	}
 	else { //m_nImgChannels==3
-		for(size_t nModelIter=0; nModelIter<m_nTotRelevantPxCount; ++nModelIter) {
+		for(size_t nModelIter=nModelIterBegin; nModelIter<nModelIterEnd; ++nModelIter) {
 			const size_t nPxIter = m_aPxIdxLUT[nModelIter];
 			const int nCurrImgCoord_X = m_aPxInfoLUT[nPxIter].nImgCoord_X;
 			const int nCurrImgCoord_Y = m_aPxInfoLUT[nPxIter].nImgCoord_Y;
@@ -505,8 +504,8 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 				*pfCurrMeanRawSegmRes_LT = (*pfCurrMeanRawSegmRes_LT)*(1.0f-fRollAvgFactor_LT) + fRollAvgFactor_LT;
 				*pfCurrMeanRawSegmRes_ST = (*pfCurrMeanRawSegmRes_ST)*(1.0f-fRollAvgFactor_ST) + fRollAvgFactor_ST;
 				oCurrFGMask.data[nPxIter] = UCHAR_MAX;
-				if(m_nModelResetCooldown && (rand()%(size_t)FEEDBACK_T_LOWER)==0) {
-					const size_t s_rand = rand()%m_nBGSamples;
+				if(m_nModelResetCooldown && (oRand()%(size_t)FEEDBACK_T_LOWER)==0) {
+					const size_t s_rand = oRand()%m_nBGSamples;
 					for(size_t c=0; c<3; ++c) {
 						*((ushort*)(m_voBGDescSamples[s_rand].data+nDescIterRGB+2*c)) = anCurrIntraDesc[c];
 						*(m_voBGColorSamples[s_rand].data+nPxIterRGB+c) = anCurrColor[c];
@@ -521,8 +520,8 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 				*pfCurrMeanRawSegmRes_LT = (*pfCurrMeanRawSegmRes_LT)*(1.0f-fRollAvgFactor_LT);
 				*pfCurrMeanRawSegmRes_ST = (*pfCurrMeanRawSegmRes_ST)*(1.0f-fRollAvgFactor_ST);
 				const size_t nLearningRate = learningRateOverride>0?(size_t)ceil(learningRateOverride):(size_t)ceil(*pfCurrLearningRate);
-				if((rand()%nLearningRate)==0) {
-					const size_t s_rand = rand()%m_nBGSamples;
+				if((oRand()%nLearningRate)==0) {
+					const size_t s_rand = oRand()%m_nBGSamples;
 					for(size_t c=0; c<3; ++c) {
 						*((ushort*)(m_voBGDescSamples[s_rand].data+nDescIterRGB+2*c)) = anCurrIntraDesc[c];
 						*(m_voBGColorSamples[s_rand].data+nPxIterRGB+c) = anCurrColor[c];
@@ -531,10 +530,10 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 				int nSampleImgCoord_Y, nSampleImgCoord_X;
 				const bool bCurrUsing3x3Spread = m_bUse3x3Spread && !m_oUnstableRegionMask.data[nPxIter];
 				if(bCurrUsing3x3Spread)
-					getRandNeighborPosition_3x3(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize);
+					getRandNeighborPosition_3x3(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize,oRand());
 				else
-					getRandNeighborPosition_5x5(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize);
-				const size_t n_rand = rand();
+					getRandNeighborPosition_5x5(nSampleImgCoord_X,nSampleImgCoord_Y,nCurrImgCoord_X,nCurrImgCoord_Y,LBSP::PATCH_SIZE/2,m_oImgSize,oRand());
+				const size_t n_rand = oRand();
 				const size_t idx_rand_uchar = m_oImgSize.width*nSampleImgCoord_Y + nSampleImgCoord_X;
 				const size_t idx_rand_flt32 = idx_rand_uchar*4;
 				const float fRandMeanLastDist = *((float*)(m_oMeanLastDistFrame.data+idx_rand_flt32));
@@ -543,7 +542,7 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 					|| (fRandMeanRawSegmRes>GHOSTDET_S_MIN && fRandMeanLastDist<GHOSTDET_D_MAX && (n_rand%((size_t)m_fCurrLearningRateLowerCap))==0)) {
 					const size_t idx_rand_uchar_rgb = idx_rand_uchar*3;
 					const size_t idx_rand_ushrt_rgb = idx_rand_uchar_rgb*2;
-					const size_t s_rand = rand()%m_nBGSamples;
+					const size_t s_rand = oRand()%m_nBGSamples;
 					for(size_t c=0; c<3; ++c) {
 						*((ushort*)(m_voBGDescSamples[s_rand].data+idx_rand_ushrt_rgb+2*c)) = anCurrIntraDesc[c];
 						*(m_voBGColorSamples[s_rand].data+idx_rand_uchar_rgb+c) = anCurrColor[c];
@@ -582,6 +581,57 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 			}
 		}
 	}
+	return nNonZeroDescCount;
+}
+
+void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray _fgmask, double learningRateOverride) {
+	// == process
+	CV_Assert(m_bInitialized);
+	cv::Mat oInputImg = _image.getMat();
+	CV_Assert(oInputImg.type()==m_nImgType && oInputImg.size()==m_oImgSize);
+	CV_Assert(oInputImg.isContinuous());
+	_fgmask.create(m_oImgSize,CV_8UC1);
+	cv::Mat oCurrFGMask = _fgmask.getMat();
+	memset(oCurrFGMask.data,0,oCurrFGMask.cols*oCurrFGMask.rows);
+	size_t nNonZeroDescCount = 0;
+	const float fRollAvgFactor_LT = 1.0f/std::min(++m_nFrameIndex,m_nSamplesForMovingAvgs);
+	const float fRollAvgFactor_ST = 1.0f/std::min(m_nFrameIndex,m_nSamplesForMovingAvgs/4);
+	if(m_nThreads<=1 || oInputImg.rows/4<2) {
+		// single-threaded: all pixels in raster order, using the global rand() generator
+		auto oGlobalRand = []() { return rand(); };
+		nNonZeroDescCount = applyToPixels(oInputImg,oCurrFGMask,0,m_nTotRelevantPxCount,learningRateOverride,fRollAvgFactor_LT,fRollAvgFactor_ST,oGlobalRand);
+	}
+	else {
+		// multi-threaded: the image is split in horizontal bands of at least 4 rows, processed in two phases
+		// (even bands, then odd bands). A pixel only updates the model of neighbors up to 2 rows away, so the
+		// bands processed at the same time never touch the same model data. Each band has its own generator.
+		const size_t nBands = std::min(m_nThreads*2,(size_t)oInputImg.rows/4);
+		std::vector<size_t> vnBandModelIterBegin(nBands+1);
+		std::vector<unsigned int> vnBandSeeds(nBands);
+		for(size_t nBandIdx=0; nBandIdx<=nBands; ++nBandIdx) {
+			const size_t nBandStartPxIdx = (size_t)m_oImgSize.width*(oInputImg.rows*nBandIdx/nBands);
+			vnBandModelIterBegin[nBandIdx] = std::lower_bound(m_aPxIdxLUT,m_aPxIdxLUT+m_nTotRelevantPxCount,nBandStartPxIdx)-m_aPxIdxLUT;
+			if(nBandIdx<nBands)
+				vnBandSeeds[nBandIdx] = (unsigned int)rand();
+		}
+		std::vector<size_t> vnBandNonZeroDescCount(nBands,0);
+		auto lProcessBand = [&](size_t nBandIdx) {
+			std::mt19937 oGenerator(vnBandSeeds[nBandIdx]);
+			auto oBandRand = [&oGenerator]() { return (int)(oGenerator()>>1); };
+			vnBandNonZeroDescCount[nBandIdx] = applyToPixels(oInputImg,oCurrFGMask,vnBandModelIterBegin[nBandIdx],vnBandModelIterBegin[nBandIdx+1],learningRateOverride,fRollAvgFactor_LT,fRollAvgFactor_ST,oBandRand);
+		};
+		for(size_t nPhase=0; nPhase<2; ++nPhase) {
+			std::vector<std::thread> voWorkers;
+			for(size_t nBandIdx=nPhase+2; nBandIdx<nBands; nBandIdx+=2)
+				voWorkers.emplace_back(lProcessBand,nBandIdx);
+			// the calling thread processes the first band of the phase
+			lProcessBand(nPhase);
+			for(auto& oWorker : voWorkers)
+				oWorker.join();
+		}
+		for(size_t nBandIdx=0; nBandIdx<nBands; ++nBandIdx)
+			nNonZeroDescCount += vnBandNonZeroDescCount[nBandIdx];
+	}
 #if DISPLAY_SUBSENSE_DEBUG_INFO
 	std::cout << std::endl;
 	cv::Point dbgpt(nDebugCoordX,nDebugCoordY);
@@ -699,6 +749,14 @@ void BackgroundSubtractorSuBSENSE::apply(cv::InputArray _image, cv::OutputArray
 	}
 }
 
+void BackgroundSubtractorSuBSENSE::setThreadCount(size_t nThreads) {
+	m_nThreads = std::max(nThreads,(size_t)1);
+}
+
+size_t BackgroundSubtractorSuBSENSE::getThreadCount() const {
+	return m_nThreads;
+}
+
 void BackgroundSubtractorSuBSENSE::getBackgroundImage(cv::OutputArray backgroundImage) const {
 	CV_Assert(m_bInitialized);
 	cv::Mat oAvgBGImg = cv::Mat::zeros(m_oImgSize,CV_32FC((int)m_nImgChannels));
@@ -735,3 +793,109 @@ void BackgroundSubtractorSuBSENSE::getBackgroundDescriptorsImage(cv::OutputArray
 	}
 	oAvgBGDesc.convertTo(backgroundDescImage,CV_16U);
 }
+
+std::vector<std::pair<std::string,cv::Mat*>> BackgroundSubtractorSuBSENSE::getModelStateMatrices() {
+	return {
+		{"UpdateRateFrame",&m_oUpdateRateFrame},
+		{"DistThresholdFrame",&m_oDistThresholdFrame},
+		{"VariationModulatorFrame",&m_oVariationModulatorFrame},
+		{"MeanLastDistFrame",&m_oMeanLastDistFrame},
+		{"MeanMinDistFrame_LT",&m_oMeanMinDistFrame_LT},
+		{"MeanMinDistFrame_ST",&m_oMeanMinDistFrame_ST},
+		{"MeanDownSampledLastDistFrame_LT",&m_oMeanDownSampledLastDistFrame_LT},
+		{"MeanDownSampledLastDistFrame_ST",&m_oMeanDownSampledLastDistFrame_ST},
+		{"MeanRawSegmResFrame_LT",&m_oMeanRawSegmResFrame_LT},
+		{"MeanRawSegmResFrame_ST",&m_oMeanRawSegmResFrame_ST},
+		{"MeanFinalSegmResFrame_LT",&m_oMeanFinalSegmResFrame_LT},
+		{"MeanFinalSegmResFrame_ST",&m_oMeanFinalSegmResFrame_ST},
+		{"UnstableRegionMask",&m_oUnstableRegionMask},
+		{"BlinksFrame",&m_oBlinksFrame},
+		{"DownSampledFrame_MotionAnalysis",&m_oDownSampledFrame_MotionAnalysis},
+		{"LastColorFrame",&m_oLastColorFrame},
+		{"LastDescFrame",&m_oLastDescFrame},
+		{"LastRawFGMask",&m_oLastRawFGMask},
+		{"LastFGMask",&m_oLastFGMask},
+		{"LastFGMask_dilated",&m_oLastFGMask_dilated},
+		{"LastFGMask_dilated_inverted",&m_oLastFGMask_dilated_inverted},
+		{"LastRawFGBlinkMask",&m_oLastRawFGBlinkMask},
+	};
+}
+
+void BackgroundSubtractorSuBSENSE::saveModel(const std::string& sFilePath) const {
+	CV_Assert(m_bInitialized);
+	// binary matrices are written in base64, which the '.gz' extension compresses further
+	cv::FileStorage oFS(sFilePath,cv::FileStorage::WRITE|cv::FileStorage::BASE64);
+	if(!oFS.isOpened())
+		CV_Error(cv::Error::StsError,"Could not open "+sFilePath+" for writing");
+	oFS << "nImgWidth" << m_oImgSize.width << "nImgHeight" << m_oImgSize.height;
+	oFS << "nImgChannels" << (int)m_nImgChannels << "nBGSamples" << (int)m_nBGSamples;
+	oFS << "oROI" << m_oROI;
+	oFS << "nFrameIndex" << (int)m_nFrameIndex << "nFramesSinceLastReset" << (int)m_nFramesSinceLastReset;
+	oFS << "nModelResetCooldown" << (int)m_nModelResetCooldown << "bUsingMovingCamera" << (int)m_bUsingMovingCamera;
+	oFS << "fLastNonZeroDescRatio" << m_fLastNonZeroDescRatio;
+	oFS << "fCurrLearningRateLowerCap" << m_fCurrLearningRateLowerCap << "fCurrLearningRateUpperCap" << m_fCurrLearningRateUpperCap;
+	oFS << "nMedianBlurKernelSize" << m_nMedianBlurKernelSize;
+	// the LBSP thresholds are adapted by apply() to the scene's texture, the descriptor samples were computed with them
+	oFS << "anLBSPThreshold_8bitLUT" << std::vector<int>(m_anLBSPThreshold_8bitLUT,m_anLBSPThreshold_8bitLUT+UCHAR_MAX+1);
+	for(const auto& oState : const_cast<BackgroundSubtractorSuBSENSE*>(this)->getModelStateMatrices())
+		oFS << oState.first << *oState.second;
+	oFS << "BGColorSamples" << m_voBGColorSamples;
+	oFS << "BGDescSamples" << m_voBGDescSamples;
+}
+
+void BackgroundSubtractorSuBSENSE::loadModel(const std::string& sFilePath) {
+	// the pixel lookup tables are built by initialize(), the model only overwrites the learnt (and adapted) state
+	CV_Assert(m_bInitialized);
+	cv::FileStorage oFS(sFilePath,cv::FileStorage::READ);
+	if(!oFS.isOpened())
+		CV_Error(cv::Error::StsError,"Could not open "+sFilePath+" for reading");
+	if((int)oFS["nImgWidth"]!=m_oImgSize.width || (int)oFS["nImgHeight"]!=m_oImgSize.height ||
+	   (int)oFS["nImgChannels"]!=(int)m_nImgChannels || (int)oFS["nBGSamples"]!=(int)m_nBGSamples)
+		CV_Error(cv::Error::StsUnmatchedSizes,"The saved model does not match the frame size, channels or number of samples");
+	cv::Mat oROI;
+	oFS["oROI"] >> oROI;
+	if(oROI.size()!=m_oROI.size() || oROI.type()!=m_oROI.type() || cv::countNonZero(oROI!=m_oROI))
+		CV_Error(cv::Error::StsUnmatchedSizes,"The saved model was learnt with another ROI");
+	// everything is read and checked before the current model is touched, so a bad file leaves it as it was
+	const int nMedianBlurKernelSize = (int)oFS["nMedianBlurKernelSize"];
+	if(nMedianBlurKernelSize<3 || !(nMedianBlurKernelSize%2))
+		CV_Error(cv::Error::StsBadArg,"The saved model has an invalid median blur kernel size");
+	std::vector<int> vnLBSPThreshold_8bitLUT;
+	oFS["anLBSPThreshold_8bitLUT"] >> vnLBSPThreshold_8bitLUT;
+	if(vnLBSPThreshold_8bitLUT.size()!=UCHAR_MAX+1 ||
+	   std::any_of(vnLBSPThreshold_8bitLUT.begin(),vnLBSPThreshold_8bitLUT.end(),[](int nThreshold){return nThreshold<0 || nThreshold>UCHAR_MAX;}))
+		CV_Error(cv::Error::StsBadArg,"The saved model has an invalid LBSP threshold table");
+	std::vector<std::pair<std::string,cv::Mat*>> voStates = getModelStateMatrices();
+	std::vector<cv::Mat> voLoadedStates(voStates.size());
+	for(size_t n=0; n<voStates.size(); ++n) {
+		oFS[voStates[n].first] >> voLoadedStates[n];
+		if(voLoadedStates[n].size()!=voStates[n].second->size() || voLoadedStates[n].type()!=voStates[n].second->type())
+			CV_Error(cv::Error::StsUnmatchedSizes,"The saved model has an invalid '"+voStates[n].first+"' matrix");
+	}
+	std::vector<cv::Mat> voBGColorSamples, voBGDescSamples;
+	oFS["BGColorSamples"] >> voBGColorSamples;
+	oFS["BGDescSamples"] >> voBGDescSamples;
+	if(voBGColorSamples.size()!=m_nBGSamples || voBGDescSamples.size()!=m_nBGSamples)
+		CV_Error(cv::Error::StsUnmatchedSizes,"The saved model has an invalid number of samples");
+	for(size_t s=0; s<m_nBGSamples; ++s) {
+		if(voBGColorSamples[s].size()!=m_voBGColorSamples[s].size() || voBGColorSamples[s].type()!=m_voBGColorSamples[s].type() ||
+		   voBGDescSamples[s].size()!=m_voBGDescSamples[s].size() || voBGDescSamples[s].type()!=m_voBGDescSamples[s].type())
+			CV_Error(cv::Error::StsUnmatchedSizes,"The saved model has invalid samples");
+	}
+	// copied into the existing (continuous) matrices, which the per-pixel code indexes directly
+	for(size_t n=0; n<voStates.size(); ++n)
+		voLoadedStates[n].copyTo(*voStates[n].second);
+	for(size_t s=0; s<m_nBGSamples; ++s) {
+		voBGColorSamples[s].copyTo(m_voBGColorSamples[s]);
+		voBGDescSamples[s].copyTo(m_voBGDescSamples[s]);
+	}
+	m_nFrameIndex = (size_t)(int)oFS["nFrameIndex"];
+	m_nFramesSinceLastReset = (size_t)(int)oFS["nFramesSinceLastReset"];
+	m_nModelResetCooldown = (size_t)(int)oFS["nModelResetCooldown"];
+	m_bUsingMovingCamera = (int)oFS["bUsingMovingCamera"]!=0;
+	m_fLastNonZeroDescRatio = (float)oFS["fLastNonZeroDescRatio"];
+	m_fCurrLearningRateLowerCap = (float)oFS["fCurrLearningRateLowerCap"];
+	m_fCurrLearningRateUpperCap = (float)oFS["fCurrLearningRateUpperCap"];
+	m_nMedianBlurKernelSize = nMedianBlurKernelSize;
+	std::copy(vnLBSPThreshold_8bitLUT.begin(),vnLBSPThreshold_8bitLUT.end(),m_anLBSPThreshold_8bitLUT);
+}
@@ -14,6 +14,8 @@
 #define BGSSUBSENSE_DEFAULT_REQUIRED_NB_BG_SAMPLES (2)
 //! defines the default value for BackgroundSubtractorSuBSENSE::m_nSamplesForMovingAvgs
 #define BGSSUBSENSE_DEFAULT_N_SAMPLES_FOR_MV_AVGS (100)
+//! defines the default value for BackgroundSubtractorSuBSENSE::m_nThreads
+#define BGSSUBSENSE_DEFAULT_N_THREADS (1)
 
 /*!
 	Self-Balanced Sensitivity segmenTER (SuBSENSE) change detection algorithm.
@@ -24,7 +26,8 @@
 	For more details on the different parameters or on the algorithm itself, see P.-L. St-Charles et al.,
 	"Flexible Background Subtraction With Self-Balanced Local Sensitivity", in CVPRW 2014.
 
-	This algorithm is currently NOT thread-safe.
+	This algorithm is currently NOT thread-safe (an instance must be used by one thread at a time); the
+	per-pixel model update of apply() can however be split across several threads (see setThreadCount).
  */
 class BackgroundSubtractorSuBSENSE : public BackgroundSubtractorLBSP {
 public:
@@ -34,7 +37,8 @@ public:
 									size_t nMinColorDistThreshold=BGSSUBSENSE_DEFAULT_MIN_COLOR_DIST_THRESHOLD,
 									size_t nBGSamples=BGSSUBSENSE_DEFAULT_NB_BG_SAMPLES,
 									size_t nRequiredBGSamples=BGSSUBSENSE_DEFAULT_REQUIRED_NB_BG_SAMPLES,
-									size_t nSamplesForMovingAvgs=BGSSUBSENSE_DEFAULT_N_SAMPLES_FOR_MV_AVGS);
+									size_t nSamplesForMovingAvgs=BGSSUBSENSE_DEFAULT_N_SAMPLES_FOR_MV_AVGS,
+									size_t nThreads=BGSSUBSENSE_DEFAULT_N_THREADS);
 	//! default destructor
 	virtual ~BackgroundSubtractorSuBSENSE();
 	//! (re)initiaization method; needs to be called before starting background subtraction
@@ -43,10 +47,18 @@ public:
 	virtual void refreshModel(float fSamplesRefreshFrac, bool bForceFGUpdate=false);
 	//! primary model update function; the learning param is used to override the internal learning thresholds (ignored when <= 0)
 	virtual void apply(cv::InputArray image, cv::OutputArray fgmask, double learningRateOverride=0);
+	//! sets the number of threads the per-pixel model update of apply() is split across (1 = single-threaded)
+	void setThreadCount(size_t nThreads);
+	//! returns the number of threads the per-pixel model update of apply() is split across
+	size_t getThreadCount() const;
 	//! returns a copy of the latest reconstructed background image
 	void getBackgroundImage(cv::OutputArray backgroundImage) const;
 	//! returns a copy of the latest reconstructed background descriptors image
 	void getBackgroundDescriptorsImage(cv::OutputArray backgroundDescImage) const;
+	//! writes the background model (samples, per-pixel state and adapted LBSP thresholds) to a cv::FileStorage file (e.g. '.yml.gz')
+	void saveModel(const std::string& sFilePath) const;
+	//! reads a background model written by saveModel; must be called after initialize() with frames of the same size, type and ROI
+	void loadModel(const std::string& sFilePath);
 
 protected:
 	//! absolute minimal color distance threshold ('R' or 'radius' in the original ViBe paper, used as the default/initial 'R(x)' value here)
@@ -71,6 +83,8 @@ protected:
 	bool m_bUse3x3Spread;
 	//! specifies the downsampled frame size used for cam motion analysis
 	cv::Size m_oDownSampledFrameSize;
+	//! number of threads the per-pixel model update is split across
+	size_t m_nThreads;
 
 	//! background model pixel color intensity samples (equivalent to 'B(x)' in PBAS)
 	std::vector<cv::Mat> m_voBGColorSamples;
@@ -109,5 +123,11 @@ protected:
 	cv::Mat m_oLastFGMask_dilated_inverted;
 	cv::Mat m_oCurrRawFGBlinkMask;
 	cv::Mat m_oLastRawFGBlinkMask;
+
+	//! returns the per-pixel state matrices saved and loaded with the model, by name (the samples excepted)
+	std::vector<std::pair<std::string,cv::Mat*>> getModelStateMatrices();
+	//!  per-pixel model update of apply() for the model pixels in [nModelIterBegin,nModelIterEnd), drawing random numbers from oRand; returns the number of non-zero descriptors
+	template<typename RandFunc>
+	size_t applyToPixels(const cv::Mat& oInputImg, cv::Mat& oCurrFGMask, size_t nModelIterBegin, size_t nModelIterEnd, double learningRateOverride, float fRollAvgFactor_LT, float fRollAvgFactor_ST, RandFunc& oRand);
 };
 
@@ -55,9 +55,9 @@ static const int s_anNeighborPattern_3x3[8][2] = {
     {-1,-1},  { 0,-1},  { 1,-1},
 };
 
-//! returns a random neighbor position for the specified pixel position; also guards against out-of-bounds values via image/border size check.
-static inline void getRandNeighborPosition_3x3(int& x_neighbor, int& y_neighbor, const int x_orig, const int y_orig, const int border, const cv::Size& imgsize) {
-    int r = rand()%s_anNeighborPatternSize_3x3;
+//! returns a random neighbor position for the specified pixel position, from the random value nRand (>=0); also guards against out-of-bounds values via image/border size check.
+static inline void getRandNeighborPosition_3x3(int& x_neighbor, int& y_neighbor, const int x_orig, const int y_orig, const int border, const cv::Size& imgsize, const int nRand) {
+    int r = nRand%s_anNeighborPatternSize_3x3;
     x_neighbor = x_orig+s_anNeighborPattern_3x3[r][0];
     y_neighbor = y_orig+s_anNeighborPattern_3x3[r][1];
     if(x_neighbor<border)
@@ -70,6 +70,11 @@ static inline void getRandNeighborPosition_3x3(int& x_neighbor, int& y_neighbor,
         y_neighbor = imgsize.height-border-1;
 }
 
+//! same as above, drawing the random value from rand().
+static inline void getRandNeighborPosition_3x3(int& x_neighbor, int& y_neighbor, const int x_orig, const int y_orig, const int border, const cv::Size& imgsize) {
+    getRandNeighborPosition_3x3(x_neighbor,y_neighbor,x_orig,y_orig,border,imgsize,rand());
+}
+
 // 5x5 neighbors pattern
 static const int s_anNeighborPatternSize_5x5 = 24;
 static const int s_anNeighborPattern_5x5[24][2] = {
@@ -80,9 +85,9 @@ static const int s_anNeighborPattern_5x5[24][2] = {
     {-2,-2},  {-1,-2},  { 0,-2},  { 1,-2},  { 2,-2},
 };
 
-//! returns a random neighbor position for the specified pixel position; also guards against out-of-bounds values via image/border size check.
-static inline void getRandNeighborPosition_5x5(int& x_neighbor, int& y_neighbor, const int x_orig, const int y_orig, const int border, const cv::Size& imgsize) {
-    int r = rand()%s_anNeighborPatternSize_5x5;
+//! returns a random neighbor position for the specified pixel position, from the random value nRand (>=0); also guards against out-of-bounds values via image/border size check.
+static inline void getRandNeighborPosition_5x5(int& x_neighbor, int& y_neighbor, const int x_orig, const int y_orig, const int border, const cv::Size& imgsize, const int nRand) {
+    int r = nRand%s_anNeighborPatternSize_5x5;
     x_neighbor = x_orig+s_anNeighborPattern_5x5[r][0];
     y_neighbor = y_orig+s_anNeighborPattern_5x5[r][1];
     if(x_neighbor<border)
@@ -94,3 +99,8 @@ static inline void getRandNeighborPosition_5x5(int& x_neighbor, int& y_neighbor,
     else if(y_neighbor>=imgsize.height-border)
         y_neighbor = imgsize.height-border-1;
 }
+
+//! same as above, drawing the random value from rand().
+static inline void getRandNeighborPosition_5x5(int& x_neighbor, int& y_neighbor, const int x_orig, const int y_orig, const int border, const cv::Size& imgsize) {
+    getRandNeighborPosition_5x5(x_neighbor,y_neighbor,x_orig,y_orig,border,imgsize,rand());
+}
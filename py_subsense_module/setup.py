@@ -17,22 +17,11 @@ else:
     # Linux settings.
     opencv_include = str(Path("/usr/local/include/opencv4").resolve())
     opencv_lib = str(Path("/usr/local/lib").resolve())
+    # Only the modules the sources use, so a minimal OpenCV build (core, imgproc, features2d) is enough
     opencv_libs = [
         "opencv_imgproc",
-        "opencv_calib3d",
-        "opencv_ml",
         "opencv_core",
-        "opencv_objdetect",
-        "opencv_dnn",
-        "opencv_photo",
         "opencv_features2d",
-        "opencv_stitching",
-        "opencv_flann",
-        "opencv_videoio",
-        "opencv_gapi",
-        "opencv_video",
-        "opencv_highgui",
-        "opencv_imgcodecs",
     ]
     dll_filename = None  # Not used on Linux
 
@@ -1,12 +1,14 @@
 #include <stdexcept>
+#include <string>
 #include <vector>
 #include "BackgroundSubtractorSubsensePythonWrapper.h"
 #include "BackgroundSubtractorSuBSENSE.h" // this header is from subsense_by_Pierre_Luc_St_Charles_et_al available in cmake include path
 
 
-cv::Mat numpy_to_mat(py::array_t<unsigned char> &input)
+// Checks that a numpy buffer holds a grayscale or 3-channel image and wraps it in a cv::Mat header.
+// The returned cv::Mat shares the buffer's data (no copy): it is valid only while the buffer is alive.
+static cv::Mat wrap_buffer(const py::buffer_info &buf)
 {
-    py::buffer_info buf = input.request();
     if (buf.ndim != 2 && buf.ndim != 3)
     {
         throw std::runtime_error("Input numpy array must have 2 or 3 dimensions.");
@@ -21,9 +23,20 @@ cv::Mat numpy_to_mat(py::array_t<unsigned char> &input)
     int cols = static_cast<int>(buf.shape[1]);
     int channels = (buf.ndim == 3) ? static_cast<int>(buf.shape[2]) : 1;
 
-    // Create a cv::Mat that shares data with the numpy array, then clone it to ensure ownership.
-    cv::Mat mat(rows, cols, CV_8UC(channels), reinterpret_cast<unsigned char *>(buf.ptr));
-    return mat.clone();
+    // Create a cv::Mat that shares data with the numpy array.
+    return cv::Mat(rows, cols, CV_8UC(channels), reinterpret_cast<unsigned char *>(buf.ptr));
+}
+
+cv::Mat numpy_to_mat(py::array_t<unsigned char> &input)
+{
+    // Clone the shared data to ensure ownership.
+    return wrap_buffer(input.request()).clone();
+}
+
+cv::Mat numpy_to_mat_view(contiguous_array_t &input)
+{
+    // The array is C-contiguous (pybind11 converts it otherwise), so it can be wrapped as it is.
+    return wrap_buffer(input.request());
 }
 
 py::array_t<unsigned char> mat_to_numpy(const cv::Mat &mat)
@@ -73,39 +86,93 @@ PYBIND11_MODULE(subsense, m)
     // This defines the BackgroundSubtractorSuBSENSE class in Python. The class provides advanced background subtraction capabilities.
     // It is particularly useful in video analysis and processing tasks where detecting moving objects is critical.
     py::class_<BackgroundSubtractorSuBSENSE>(m, "BackgroundSubtractorSuBSENSE")
-        .def(py::init<float, size_t, size_t, size_t, size_t, size_t>(),
+        .def(py::init<float, size_t, size_t, size_t, size_t, size_t, size_t>(),
              py::arg("fRelLBSPThreshold") = BGSSUBSENSE_DEFAULT_LBSP_REL_SIMILARITY_THRESHOLD,
              py::arg("nDescDistThresholdOffset") = BGSSUBSENSE_DEFAULT_DESC_DIST_THRESHOLD_OFFSET,
              py::arg("nMinColorDistThreshold") = BGSSUBSENSE_DEFAULT_MIN_COLOR_DIST_THRESHOLD,
              py::arg("nBGSamples") = BGSSUBSENSE_DEFAULT_NB_BG_SAMPLES,
              py::arg("nRequiredBGSamples") = BGSSUBSENSE_DEFAULT_REQUIRED_NB_BG_SAMPLES,
-             py::arg("nSamplesForMovingAvgs") = BGSSUBSENSE_DEFAULT_N_SAMPLES_FOR_MV_AVGS)
-        .def("initialize", [](BackgroundSubtractorSuBSENSE &self, py::array_t<unsigned char> oInitImg, py::array_t<unsigned char> oROI)
+             py::arg("nSamplesForMovingAvgs") = BGSSUBSENSE_DEFAULT_N_SAMPLES_FOR_MV_AVGS,
+             py::arg("nThreads") = BGSSUBSENSE_DEFAULT_N_THREADS)
+        // Number of threads the per-pixel model update of apply() is split across (1 = single-threaded).
+        // The image is split in horizontal bands, so a few threads already pay off at low resolutions.
+        .def_property("nThreads", &BackgroundSubtractorSuBSENSE::getThreadCount, &BackgroundSubtractorSuBSENSE::setThreadCount,
+                      "Number of threads the per-pixel model update of apply() is split across.")
+        .def("initialize", [](BackgroundSubtractorSuBSENSE &self, contiguous_array_t oInitImg, contiguous_array_t oROI)
              {
-                // Convert the input numpy arrays to cv::Mat objects
-                cv::Mat initImg = numpy_to_mat(oInitImg);
-                cv::Mat roi = numpy_to_mat(oROI);
+                // Wrap the input numpy arrays in cv::Mat headers, without copying them
+                cv::Mat initImg = numpy_to_mat_view(oInitImg);
+                cv::Mat roi = numpy_to_mat_view(oROI);
                 
                 // Initialize the background subtractor with the provided initial image and region of interest (ROI)
                 // The initial image should be a grayscale or color image representing the background, and the ROI
                 // should be a binary mask indicating the region of interest for background subtraction.
                 // Ensure that the dimensions of the ROI match those of the initial image to avoid runtime errors.
+                // The GIL is released during the computation so other Python threads can run; the arrays are kept
+                // alive by this call's arguments.
+                py::gil_scoped_release release;
                 self.initialize(initImg, roi); }, 
                 py::arg("oInitImg"), 
                 py::arg("oROI"), 
                 "Initialize the background subtractor with an initial image and ROI.")
-        .def("apply", [](BackgroundSubtractorSuBSENSE &self, py::array_t<unsigned char> image, double learningRateOverride)
+        .def("apply", [](BackgroundSubtractorSuBSENSE &self, contiguous_array_t image, double learningRateOverride, py::object out)
              {
-                cv::Mat inputMat = numpy_to_mat(image);
-                cv::Mat fgmask;
-                // Apply the background subtraction algorithm on the input image.
-                // The learningRateOverride parameter determines the rate at which the background model is updated.
-                // A value of 0 keeps the model unchanged, while higher values update the model faster.
-                self.apply(inputMat, fgmask, learningRateOverride);
-                return mat_to_numpy(fgmask); }, 
+                cv::Mat inputMat = numpy_to_mat_view(image);
+                // The foreground mask is written straight into a numpy array: the preallocated one if given,
+                // otherwise a new one.
+                py::array_t<unsigned char> fgmaskArray;
+                if (out.is_none())
+                {
+                    fgmaskArray = py::array_t<unsigned char>({inputMat.rows, inputMat.cols});
+                }
+                else
+                {
+                    if (!py::isinstance<py::array_t<unsigned char, py::array::c_style>>(out))
+                    {
+                        throw std::runtime_error("out must be a C-contiguous uint8 numpy array.");
+                    }
+                    fgmaskArray = py::reinterpret_borrow<py::array_t<unsigned char>>(out);
+                    if (fgmaskArray.ndim() != 2 || fgmaskArray.shape(0) != inputMat.rows || fgmaskArray.shape(1) != inputMat.cols)
+                    {
+                        throw std::runtime_error("out must have the height and width of the image.");
+                    }
+                    if (!fgmaskArray.writeable())
+                    {
+                        throw std::runtime_error("out must be writeable.");
+                    }
+                }
+                // The mask has the image's size and type, so the algorithm writes into it without reallocating.
+                cv::Mat fgmask(inputMat.rows, inputMat.cols, CV_8UC1, fgmaskArray.mutable_data());
+                {
+                    // Apply the background subtraction algorithm on the input image.
+                    // The learningRateOverride parameter determines the rate at which the background model is updated.
+                    // A value of 0 keeps the model unchanged, while higher values update the model faster.
+                    // The GIL is released during the computation so other Python threads can run; the arrays must
+                    // not be modified by another thread meanwhile, and a subtractor must be used by one thread at a time.
+                    py::gil_scoped_release release;
+                    self.apply(inputMat, fgmask, learningRateOverride);
+                }
+                return fgmaskArray; }, 
                 py::arg("image"), 
                 py::arg("learningRateOverride") = 0.0, 
-                "Apply the background subtraction algorithm and return the foreground mask.")
+                py::arg("out") = py::none(),
+                "Apply the background subtraction algorithm and return the foreground mask (written into out if given).")
+        .def("saveModel", [](const BackgroundSubtractorSuBSENSE &self, const std::string &path)
+             {
+                // Snapshot of the learnt model (samples and per-pixel state), so a restart does not learn the scene again.
+                // The GIL is released while the file is written.
+                py::gil_scoped_release release;
+                self.saveModel(path); },
+                py::arg("path"),
+                "Save the background model (samples and per-pixel state) to a cv::FileStorage file (e.g. '.yml.gz').")
+        .def("loadModel", [](BackgroundSubtractorSuBSENSE &self, const std::string &path)
+             {
+                // Must follow initialize() with a frame of the saved size and the saved ROI, which builds the lookup
+                // tables the model is indexed with; the model is left as it was if the file does not match.
+                py::gil_scoped_release release;
+                self.loadModel(path); },
+                py::arg("path"),
+                "Load a background model saved by saveModel(); call initialize() first, with the same frame size and ROI.")
         .def("getBackgroundImage", [](BackgroundSubtractorSuBSENSE &self)
              {
                 cv::Mat backgroundImage;
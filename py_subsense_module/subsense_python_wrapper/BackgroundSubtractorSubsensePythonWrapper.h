@@ -7,10 +7,18 @@
 
 namespace py = pybind11;
 
+// numpy array of unsigned char guaranteed to be C-contiguous (pybind11 converts the argument otherwise).
+using contiguous_array_t = py::array_t<unsigned char, py::array::c_style | py::array::forcecast>;
+
 // Converts a numpy array to a cv::Mat.
 // Throws a runtime error if the input does not have 2 or 3 dimensions.
 cv::Mat numpy_to_mat(py::array_t<unsigned char>& input);
 
+// Wraps a C-contiguous numpy array in a cv::Mat sharing its data (no copy).
+// The cv::Mat is valid only while the array is alive.
+// Throws a runtime error if the input does not have 2 or 3 dimensions.
+cv::Mat numpy_to_mat_view(contiguous_array_t& input);
+
 // Converts a cv::Mat to a numpy array.
 // Throws a runtime error if the input cv::Mat is empty.
 py::array_t<unsigned char> mat_to_numpy(const cv::Mat &mat);
@@ -42,6 +42,11 @@ class MatToNumpyTest : public PythonInterpreterFixture
 {
 };
 
+// Fixture for numpy_to_mat_view tests
+class NumpyToMatViewTest : public PythonInterpreterFixture
+{
+};
+
 // Test normal condition: valid 2D (grayscale) array.
 TEST_F(NumpyToMatTest, Grayscale2DValidInput)
 {
@@ -152,6 +157,29 @@ TEST_F(NumpyToMatTest, ThreeDimWrongChannelsThrows)
     EXPECT_THROW({ numpy_to_mat(np_array); }, std::runtime_error);
 }
 
+// Test: numpy_to_mat_view wraps the numpy array's data without copying it.
+TEST_F(NumpyToMatViewTest, SharesDataWithArray)
+{
+    const int rows = 5, cols = 4;
+    contiguous_array_t np_array({rows, cols});
+    cv::Mat mat = numpy_to_mat_view(np_array);
+
+    EXPECT_EQ(mat.rows, rows);
+    EXPECT_EQ(mat.cols, cols);
+    EXPECT_EQ(mat.channels(), 1);
+    // The cv::Mat points to the array's buffer: a write through one is seen through the other.
+    EXPECT_EQ(mat.data, np_array.mutable_data());
+    mat.at<unsigned char>(2, 3) = 42;
+    EXPECT_EQ(np_array.at(2, 3), 42);
+}
+
+// Test boundary condition: numpy_to_mat_view rejects the same shapes as numpy_to_mat.
+TEST_F(NumpyToMatViewTest, ThreeDimWrongChannelsThrows)
+{
+    contiguous_array_t np_array({5, 5, 2});
+    EXPECT_THROW({ numpy_to_mat_view(np_array); }, std::runtime_error);
+}
+
 // Test: Valid 2D (grayscale) cv::Mat should convert to a 2D numpy array.
 TEST_F(MatToNumpyTest, Valid2DGrayscale)
 {
@@ -1 +1 @@
-from .capture_frame_main import capture_frames_main
\ No newline at end of file
+from .capture_frame_main import capture_frames_main, open_capture
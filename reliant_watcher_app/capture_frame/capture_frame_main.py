@@ -1,56 +1,97 @@
-
 import cv2
-import numpy as np
-from multiprocessing import shared_memory
+import time
 import logging
 import helper_functions as HF
+from frame_buffer import FrameRingBuffer
 
 logging.basicConfig(
     level=logging.WARNING,
     format="%(asctime)s - %(levelname)s - %(funcName)s - %(message)s",
 )
 
-def clean_up_resources_and_exit(cap, shm, shared_dict):
-    shared_dict["stop"] = True
+# The camera can still be held for a while by the main process, which probed its frame size and frame rate
+# before starting this process: opening it is retried for up to CAMERA_OPEN_ATTEMPTS * CAMERA_OPEN_RETRY_DELAY seconds
+CAMERA_OPEN_ATTEMPTS = 20
+CAMERA_OPEN_RETRY_DELAY = 1.0
+
+
+def open_capture(video_path, attempts=CAMERA_OPEN_ATTEMPTS, retry_delay=CAMERA_OPEN_RETRY_DELAY, stop=lambda: False):
+    """
+    Open the capture, retrying while the camera is not released yet.
+
+    Parameters:
+        video_path: Recorded video to read from, or None for the camera.
+        attempts (int): Maximum number of attempts to open the capture.
+        retry_delay (float): Time (in seconds) waited between two attempts.
+        stop (callable): Returns True when the app is stopping, which ends the retries.
+
+    Returns:
+        The opened capture, which has delivered a frame.
+
+    Raises:
+        RuntimeError: If the capture could not be opened within the attempts.
+    """
+    error = None
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(retry_delay)
+        if stop():
+            break
+        try:
+            cap = HF.assign_cap_base_on_os(video_path)
+        except Exception as e:
+            error = e
+            continue
+        # A camera still in use by another process can open without delivering frames
+        if cap.isOpened() and cap.grab():
+            return cap
+        cap.release()
+        error = "no frame delivered"
+    raise RuntimeError(f"Cannot open the capture after {attempts} attempt(s): {error}")
+
+def clean_up_resources_and_exit(cap, frame_ring, shared_state, event_dict, frame_notifier):
+    shared_state["stop"] = True
+    # Never leave the main process waiting for a first frame that will not come
+    event_dict["create_other_processes"].set()
+    # Wake up the consumers waiting for a frame so they notice the stop flag
+    frame_notifier.notify()
     cap.release()
-    shm.close()
-    # shm.unlink()
+    frame_ring.close()
     logging.warning("Capture process is done.")
     exit()
 
-def capture_frames_main(video_path, shm_name, frame_shape, shared_dict, event_dict):
+def capture_frames_main(video_path, shm_name, frame_shape, shared_state, event_dict, frame_notifier):
     try:
-        cap = HF.assign_cap_base_on_os(video_path)
+        cap = open_capture(video_path, stop=lambda: shared_state["stop"])
     except Exception as e:
         logging.error(f"Error: {e}")
-        shared_dict["stop"] = True
+        shared_state["stop"] = True
+        event_dict["create_other_processes"].set()
+        frame_notifier.notify()
         exit()
 
-    shm = shared_memory.SharedMemory(name=shm_name, create=False)
-    shared_frame = np.ndarray(frame_shape, dtype=np.uint8, buffer=shm.buf)
-
-    if not cap.isOpened():
-        logging.error("Error: Cannot open video.")
-        clean_up_resources_and_exit(cap, shm, shared_dict)
-        # shared_dict["stop"] = True
-        # exit()
+    frame_ring = FrameRingBuffer(shm_name, frame_shape, create=False)
 
-    event_dict["create_other_processes"].set() # Signal the main process that p1 has started
-
-    while cap.isOpened() and not shared_dict["stop"]:
+    while cap.isOpened() and not shared_state["stop"]:
         ret, frame = cap.read()
         if not ret:
             logging.error("Error: Cannot read the video.")
-            shared_dict["stop"] = True
+            shared_state["stop"] = True
             break
 
-        np.copyto(shared_frame, frame)
+        frame_ring.write(frame, time.monotonic())
+        # Wake up the consumers waiting for a new frame
+        frame_notifier.notify()
+
+        # Signal the main process that p1 has started once the first frame is available to readers
+        if not event_dict["create_other_processes"].is_set():
+            event_dict["create_other_processes"].set()
 
         if cv2.waitKey(5) & 0xFF == ord('q'):
-            shared_dict["stop"] = True
+            shared_state["stop"] = True
             break
 
     logging.warning("Capture process is done.")
     # exit()
-    clean_up_resources_and_exit(cap, shm, shared_dict)
+    clean_up_resources_and_exit(cap, frame_ring, shared_state, event_dict, frame_notifier)
     exit()
@@ -0,0 +1,36 @@
+import pytest
+import cv2
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+import helper_functions as HF
+from capture_frame.capture_frame_main import open_capture
+
+TEST_VIDEO = str(PROJECT_DIR / "test_videos" / "test_video_1_day.mp4")
+
+
+def test_capture_is_opened_once_the_camera_is_freed(monkeypatch):
+    attempts = []
+    def busy_then_free(video_path):
+        attempts.append(video_path)
+        if len(attempts) < 3:
+            raise RuntimeError("Failed to open video capture on Linux.")
+        return cv2.VideoCapture(video_path)
+    monkeypatch.setattr(HF, "assign_cap_base_on_os", busy_then_free)
+    cap = open_capture(TEST_VIDEO, attempts=5, retry_delay=0)
+    assert cap.isOpened() and len(attempts) == 3
+    cap.release()
+
+def test_capture_that_never_opens_raises_err():
+    with pytest.raises(RuntimeError):
+        open_capture(str(PROJECT_DIR / "test_videos" / "missing.mp4"), attempts=2, retry_delay=0)
+
+def test_retries_end_when_the_app_stops():
+    with pytest.raises(RuntimeError):
+        open_capture(str(PROJECT_DIR / "test_videos" / "missing.mp4"), attempts=100, retry_delay=10, stop=lambda: True)
@@ -1,3 +1,5 @@
 from .db_manager import insert_video_with_metadata, create_db, get_latest_intrusion_videos, \
-                        get_video_path, get_searched_intrusion_videos
+                        get_video_path, get_searched_intrusion_videos, migrate_db, \
+                        get_incident_video_paths, get_motion_zones, set_motion_zones, \
+                        validate_motion_zones, MOTION_ZONE_KINDS, DEFAULT_CAMERA
 from .db_manager_main import save_to_database
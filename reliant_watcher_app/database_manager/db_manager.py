@@ -1,4 +1,5 @@
 import sqlite3 as sql
+import json
 from pathlib import Path
 import sys
 from collections import Counter, defaultdict
@@ -10,6 +11,12 @@ sys.path.insert(0, str(parent_dir))
 
 from object_detection.yolox import YoloX
 
+# Kinds of motion zones: motion is only looked for inside the include zones (the whole frame if
+# there are none), and never inside the exclude zones.
+MOTION_ZONE_KINDS = ("include", "exclude")
+# Name of the camera the motion zones belong to when none is given (the system has one camera).
+DEFAULT_CAMERA = "camera_0"
+
 def create_schema(db_path: Path):
     # Connect to (or create) the SQLite database file
     connection = sql.connect(db_path)
@@ -26,12 +33,26 @@ def create_schema(db_path: Path):
     );
     ''')
 
+    # Table: incident (one intrusion event, recorded as one or more consecutive videos)
+    # - 'name' is the file name of the first video of the incident
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Incident (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        UNIQUE (name)
+    );
+    ''')
+
     # Table: video_recording
+    # - references 'incident_id' (ID)
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS Video (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         path TEXT NOT NULL,
-        UNIQUE (path)
+        incident_id INTEGER,
+        UNIQUE (path),
+        FOREIGN KEY (incident_id)
+            REFERENCES Incident(id)
     );
     ''')
 
@@ -51,6 +72,17 @@ def create_schema(db_path: Path):
     );
     ''')
 
+    # Table: Motion_Zone (polygon where motion is looked for, or ignored, on a camera)
+    # - 'points' is a JSON list of [x, y] vertices, normalized to 0..1 of the frame width/height
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS Motion_Zone (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        camera TEXT NOT NULL,
+        kind TEXT NOT NULL CHECK (kind IN ('include', 'exclude')),
+        points TEXT NOT NULL
+    );
+    ''')
+
     # Commit the changes and close the connection
     connection.commit()
     connection.close()
@@ -69,7 +101,35 @@ def create_db(db_path: Path):
     create_schema(db_path)
     populate_metadata_objects(db_path)
 
-def insert_video_with_metadata(db_path: Path, video_name: str, detected_objects: Counter):
+def migrate_db(db_path: Path):
+    """
+    Bring a database created by an earlier version up to the current schema.
+
+    Adds the Incident and Motion_Zone tables and the Video.incident_id column; existing videos are
+    not linked to any incident.
+    """
+    # Creates the tables that do not exist yet (Incident, Motion_Zone)
+    create_schema(db_path)
+    connection = sql.connect(db_path)
+    cursor = connection.cursor()
+    video_columns = [row[1] for row in cursor.execute("PRAGMA table_info(Video)")]
+    if "incident_id" not in video_columns:
+        cursor.execute("ALTER TABLE Video ADD COLUMN incident_id INTEGER REFERENCES Incident(id)")
+        print("Database migrated: videos can now be linked to incidents.")
+    connection.commit()
+    connection.close()
+
+def insert_video_with_metadata(db_path: Path, video_name: str, detected_objects: Counter, incident_name: str = None):
+    """
+    Insert a recorded video with its detected objects, linked to the incident it belongs to.
+
+    Parameters:
+        db_path (Path): Path of the database.
+        video_name (str): File name of the video in the video_recordings directory.
+        detected_objects (Counter): Objects detected during the video.
+        incident_name (str): File name of the first video of the incident (None: the video is an
+            incident of its own).
+    """
     if not isinstance(detected_objects, Counter):
         raise ValueError("Object info to database is not a Counter object.")
     if not isinstance(video_name, str):
@@ -80,9 +140,14 @@ def insert_video_with_metadata(db_path: Path, video_name: str, detected_objects:
         return
     connection = sql.connect(db_path)
     cursor = connection.cursor()
+
+    # Insert the incident into the 'Incident' table, unless an earlier video of the incident did
+    cursor.execute("INSERT OR IGNORE INTO Incident (name) VALUES (?)", (incident_name or video_name,))
+    cursor.execute("SELECT id FROM Incident WHERE name = ?", (incident_name or video_name,))
+    incident_id = cursor.fetchone()[0]
     
     # Insert the video file path into the 'Video' table
-    cursor.execute("INSERT INTO Video (path) VALUES (?)", (video_name,))
+    cursor.execute("INSERT INTO Video (path, incident_id) VALUES (?,?)", (video_name, incident_id))
     connection.commit()
     video_id = cursor.lastrowid
     
@@ -101,6 +166,30 @@ def insert_video_with_metadata(db_path: Path, video_name: str, detected_objects:
     connection.close()
     print(f"Video name '{video_name}' with metadata {detected_objects} inserted successfully.")
 
+def get_incident_video_paths(db_path: Path, video_name: str):
+    """
+    Return the file names of all the videos of the incident a video belongs to, in recording order.
+
+    Parameters:
+        db_path (Path): Path of the database.
+        video_name (str): File name of one video of the incident.
+
+    Returns:
+        list: The file names (only video_name if the video is not linked to an incident).
+    """
+    connection = sql.connect(db_path)
+    cursor = connection.cursor()
+    query = '''
+            SELECT V.path FROM Video V
+            JOIN Video VI ON V.incident_id = VI.incident_id
+            WHERE VI.path = ?
+            ORDER BY V.id;
+            '''
+    cursor.execute(query, (video_name,))
+    result = [row[0] for row in cursor.fetchall()]
+    connection.close()
+    return result or [video_name]
+
 
 db_path = Path(__file__).resolve().parent.parent / "database" / "video_with_metadata.db"
 
@@ -115,6 +204,83 @@ def get_video_path(filename):
     connection.close()
     return Path(__file__).resolve().parent.parent / "video_recordings" / result
 
+def validate_motion_zones(zones):
+    """
+    Check motion zones received from the UI and return them in their stored form.
+
+    Parameters:
+        zones (list): Zones, each a dict with a 'kind' ('include' or 'exclude') and 'points', a list
+            of at least 3 [x, y] vertices normalized to 0..1 of the frame width/height.
+
+    Returns:
+        list: The zones as dicts {'kind': str, 'points': [[float, float], ...]}.
+
+    Raises:
+        ValueError: If a zone is malformed.
+    """
+    if not isinstance(zones, list):
+        raise ValueError("Motion zones must be a list.")
+    validated = []
+    for zone in zones:
+        if not isinstance(zone, dict) or zone.get("kind") not in MOTION_ZONE_KINDS:
+            raise ValueError(f"A motion zone must have a kind among {MOTION_ZONE_KINDS}.")
+        points = zone.get("points")
+        if not isinstance(points, list) or len(points) < 3:
+            raise ValueError("A motion zone must have at least 3 points.")
+        validated_points = []
+        for point in points:
+            if not isinstance(point, (list, tuple)) or len(point) != 2 or \
+               not all(isinstance(c, (int, float)) and not isinstance(c, bool) and 0 <= c <= 1 for c in point):
+                raise ValueError("Motion zone points must be [x, y] pairs normalized to 0..1.")
+            validated_points.append([float(point[0]), float(point[1])])
+        validated.append({"kind": zone["kind"], "points": validated_points})
+    return validated
+
+def get_motion_zones(camera: str = DEFAULT_CAMERA):
+    """
+    Return the motion zones of a camera, in the order they were saved.
+
+    Parameters:
+        camera (str): Name of the camera.
+
+    Returns:
+        list: The zones as dicts {'kind': str, 'points': [[x, y], ...]} (empty: the whole frame).
+    """
+    connection = sql.connect(db_path)
+    cursor = connection.cursor()
+    query = '''
+            SELECT kind, points FROM Motion_Zone WHERE camera = ? ORDER BY id
+            '''
+    cursor.execute(query, (camera,))
+    result = [{"kind": kind, "points": json.loads(points)} for kind, points in cursor.fetchall()]
+    connection.close()
+    return result
+
+def set_motion_zones(zones, camera: str = DEFAULT_CAMERA):
+    """
+    Replace the motion zones of a camera.
+
+    Parameters:
+        zones (list): The zones (see validate_motion_zones); an empty list removes them all.
+        camera (str): Name of the camera.
+
+    Returns:
+        list: The zones as stored.
+
+    Raises:
+        ValueError: If a zone is malformed (nothing is changed then).
+    """
+    zones = validate_motion_zones(zones)
+    connection = sql.connect(db_path)
+    cursor = connection.cursor()
+    # Replace the zones in one transaction, so the motion detection process never loads half of them
+    cursor.execute("DELETE FROM Motion_Zone WHERE camera = ?", (camera,))
+    cursor.executemany("INSERT INTO Motion_Zone (camera, kind, points) VALUES (?,?,?)",
+                       [(camera, zone["kind"], json.dumps(zone["points"])) for zone in zones])
+    connection.commit()
+    connection.close()
+    return zones
+
 def get_latest_intrusion_videos(amount):
     connection = sql.connect(db_path)
     cursor = connection.cursor()
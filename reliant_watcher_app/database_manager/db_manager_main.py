@@ -1,18 +1,53 @@
-
+import time
 from pathlib import Path
 from collections import Counter
 import remote_monitoring as RM
 from .db_manager import insert_video_with_metadata
 
+# Maximum time (in seconds) a completed video waits for the objects detected during it before it is logged
+# without them (e.g. the object detection process did not notice its end).
+OBJECTS_WAIT_TIMEOUT = 30.0
+
+
+def save_to_database(db_path: Path, shared_state, videos: dict, objects: dict, final: bool = False):
+    """
+    Log the completed videos in the database, each with the objects detected during it.
 
+    The recording process shares each completed video (MTR_db_permission) and the object detection process
+    the objects detected during each video file (OD_db_permission), both with the video's file name and
+    independently of each other. Each share is taken as soon as it is published (its permission flag is
+    cleared, so the next one can be), and a video is logged once the objects of the same file name are in.
 
+    Parameters:
+        db_path (Path): Path of the database.
+        shared_state (SharedState): Shared memory block of flags and data shared across processes.
+        videos (dict): File name -> (incident name, time it was shared) of the completed videos not logged yet.
+        objects (dict): File name -> objects detected during the video file, for the videos not logged yet.
+        final (bool): Whether this is the last call, once the recording and object detection processes have
+            exited: the videos still waiting for their objects are logged without them.
+    """
+    if shared_state["MTR_db_permission"]:
+        videos[shared_state["MTR_video_name_to_db"]] = (shared_state["MTR_incident_to_db"] or None, time.monotonic())
+        shared_state["MTR_video_name_to_db"] = ""
+        shared_state["MTR_incident_to_db"] = ""
+        shared_state["MTR_db_permission"] = False
+    if shared_state["OD_db_permission"]:
+        objects[shared_state["OD_video_name_to_db"]] = shared_state["OD_detected_obj_to_db"]
+        shared_state["OD_detected_obj_to_db"] = Counter()
+        shared_state["OD_video_name_to_db"] = ""
+        shared_state["OD_db_permission"] = False
+    for video_name in [name for name in videos if name in objects]:
+        incident_name, _ = videos.pop(video_name)
+        log_video(db_path, video_name, objects.pop(video_name), incident_name)
+    # Videos whose objects will not come
+    for video_name in [name for name, (_, shared) in videos.items()
+                       if final or time.monotonic() - shared > OBJECTS_WAIT_TIMEOUT]:
+        incident_name, _ = videos.pop(video_name)
+        print(f"No objects shared for {video_name}: logged without objects.")
+        log_video(db_path, video_name, Counter(), incident_name)
 
-def save_to_database(db_path: Path, shared_dict: dict):
-    if shared_dict["OD_db_permission"] and shared_dict["MTR_db_permission"]:
-        video_path = Path(__file__).parent.parent / "video_recordings" / shared_dict['MTR_video_name_to_db']
-        if video_path.exists() and video_path.is_file():
-            insert_video_with_metadata(db_path, shared_dict['MTR_video_name_to_db'], 
-                                                shared_dict['OD_detected_obj_to_db'])
-        shared_dict["OD_db_permission"] = shared_dict["MTR_db_permission"] = False
-        shared_dict["OD_detected_obj_to_db"] = Counter()
-        shared_dict["MTR_video_name_to_db"] = ""
\ No newline at end of file
+def log_video(db_path: Path, video_name: str, detected_objects: Counter, incident_name: str = None):
+    """Insert a completed video, if its file exists, with the objects detected during it."""
+    video_path = Path(__file__).parent.parent / "video_recordings" / video_name
+    if video_path.exists() and video_path.is_file():
+        insert_video_with_metadata(db_path, video_name, detected_objects, incident_name)
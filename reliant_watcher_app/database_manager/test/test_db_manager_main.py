@@ -0,0 +1,65 @@
+import pytest
+from collections import Counter
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from database_manager import db_manager_main
+from database_manager.db_manager_main import save_to_database
+
+
+def empty_shared_state():
+    return {"MTR_db_permission": False, "MTR_video_name_to_db": "", "MTR_incident_to_db": "",
+            "OD_db_permission": False, "OD_video_name_to_db": "", "OD_detected_obj_to_db": Counter()}
+
+def share_video(shared_state, video_name, incident_name):
+    shared_state.update(MTR_db_permission=True, MTR_video_name_to_db=video_name, MTR_incident_to_db=incident_name)
+
+def share_objects(shared_state, video_name, objects):
+    shared_state.update(OD_db_permission=True, OD_video_name_to_db=video_name, OD_detected_obj_to_db=objects)
+
+@pytest.fixture
+def logged(monkeypatch):
+    videos = []
+    monkeypatch.setattr(db_manager_main, "log_video", lambda db_path, *video: videos.append(video))
+    return videos
+
+def test_videos_are_logged_with_the_objects_of_their_file_name(logged):
+    shared_state = empty_shared_state()
+    videos, objects = {}, {}
+    # The objects of both video files are shared before the first video is completed
+    share_objects(shared_state, "a.mp4", Counter({"person": 1}))
+    save_to_database("db", shared_state, videos, objects)
+    assert not shared_state["OD_db_permission"]
+    share_objects(shared_state, "b.mp4", Counter({"car": 2}))
+    save_to_database("db", shared_state, videos, objects)
+    share_video(shared_state, "b.mp4", "a.mp4")
+    save_to_database("db", shared_state, videos, objects)
+    share_video(shared_state, "a.mp4", "a.mp4")
+    save_to_database("db", shared_state, videos, objects)
+    assert logged == [("b.mp4", Counter({"car": 2}), "a.mp4"), ("a.mp4", Counter({"person": 1}), "a.mp4")]
+    assert not videos and not objects and not shared_state["MTR_db_permission"]
+
+def test_video_without_objects_is_logged_after_a_timeout(logged, monkeypatch):
+    shared_state = empty_shared_state()
+    videos, objects = {}, {}
+    share_video(shared_state, "a.mp4", "")
+    save_to_database("db", shared_state, videos, objects)
+    assert not logged
+    monkeypatch.setattr(db_manager_main, "OBJECTS_WAIT_TIMEOUT", 0)
+    save_to_database("db", shared_state, videos, objects)
+    assert logged == [("a.mp4", Counter(), None)]
+
+def test_waiting_videos_are_logged_at_shutdown(logged):
+    shared_state = empty_shared_state()
+    videos, objects = {}, {}
+    share_video(shared_state, "a.mp4", "")
+    save_to_database("db", shared_state, videos, objects)
+    # The object detection process exited without sharing the objects of the video
+    save_to_database("db", shared_state, videos, objects, final=True)
+    assert logged == [("a.mp4", Counter(), None)] and not videos
@@ -0,0 +1,73 @@
+import pytest
+import sqlite3
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from database_manager import db_manager
+from database_manager import get_motion_zones, set_motion_zones, migrate_db
+
+
+ZONES = [
+    {"kind": "include", "points": [[0, 0], [0.5, 0], [0.5, 1], [0, 1]]},
+    {"kind": "exclude", "points": [[0.1, 0.1], [0.2, 0.1], [0.2, 0.2]]},
+]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    db_path = tmp_path / "video_with_metadata.db"
+    db_manager.create_schema(db_path)
+    monkeypatch.setattr(db_manager, "db_path", db_path)
+    return db_path
+
+def test_no_zones_by_default(database):
+    assert get_motion_zones() == []
+
+def test_zones_round_trip(database):
+    stored = set_motion_zones(ZONES)
+    assert stored == get_motion_zones()
+    assert [zone["kind"] for zone in stored] == ["include", "exclude"]
+    assert stored[0]["points"] == [[0.0, 0.0], [0.5, 0.0], [0.5, 1.0], [0.0, 1.0]]
+
+def test_zones_are_replaced_per_camera(database):
+    set_motion_zones(ZONES)
+    set_motion_zones(ZONES[:1], camera="camera_1")
+    set_motion_zones(ZONES[1:])
+    assert get_motion_zones() == [{"kind": "exclude", "points": ZONES[1]["points"]}]
+    assert len(get_motion_zones("camera_1")) == 1
+    # An empty list removes the zones: motion is looked for in the whole frame
+    set_motion_zones([])
+    assert get_motion_zones() == []
+
+@pytest.mark.parametrize("zones", [
+    {"kind": "include"},
+    [{"kind": "ignore", "points": [[0, 0], [1, 0], [1, 1]]}],
+    [{"kind": "include", "points": [[0, 0], [1, 0]]}],
+    [{"kind": "include", "points": [[0, 0], [1, 0], [1, 1.5]]}],
+    [{"kind": "include", "points": [[0, 0], [1, 0], [1, "1"]]}],
+    [{"kind": "include", "points": [[0, 0], [1, 0], [1, 1, 1]]}],
+])
+def test_malformed_zones_are_rejected(database, zones):
+    set_motion_zones(ZONES)
+    with pytest.raises(ValueError):
+        set_motion_zones(zones)
+    # The stored zones are kept
+    assert len(get_motion_zones()) == 2
+
+def test_migration_adds_motion_zone_table(tmp_path, monkeypatch):
+    db_path = tmp_path / "old.db"
+    db_manager.create_schema(db_path)
+    connection = sqlite3.connect(db_path)
+    connection.execute("DROP TABLE Motion_Zone")
+    connection.commit()
+    connection.close()
+    migrate_db(db_path)
+    monkeypatch.setattr(db_manager, "db_path", db_path)
+    set_motion_zones(ZONES)
+    assert len(get_motion_zones()) == 2
@@ -0,0 +1,2 @@
+from .frame_ring_buffer import FrameRingBuffer, DEFAULT_NUM_SLOTS
+from .frame_notifier import FrameNotifier
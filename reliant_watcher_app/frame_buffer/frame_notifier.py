@@ -0,0 +1,50 @@
+from multiprocessing import Event
+
+
+class FrameNotifier:
+    """
+    Cross-process "new frame available" notification.
+
+    Each consumer process owns an Event. The capture process sets every consumer's Event after it
+    writes a frame into the frame ring buffer, so a consumer can block until a new frame exists
+    and wake up as soon as one does, instead of polling the ring buffer in a loop.
+
+    A consumer must clear its Event before reading the ring buffer (wait() does this), so a frame
+    written while the consumer is busy is never missed: the Event is simply set again.
+    """
+
+    def __init__(self, consumers: tuple):
+        """
+        Parameters:
+            consumers (tuple): Names of the consumer processes, one Event is created for each.
+        """
+        self._events = {consumer: Event() for consumer in consumers}
+
+    @property
+    def consumers(self):
+        return tuple(self._events)
+
+    def notify(self):
+        """Wake up every consumer. Called by the capture process after each frame (and on shutdown)."""
+        for event in self._events.values():
+            event.set()
+
+    def wait(self, consumer: str, timeout: float = None) -> bool:
+        """
+        Block until a new frame has been announced for the given consumer.
+
+        Parameters:
+            consumer (str): Name of the consumer waiting for a frame.
+            timeout (float): Maximum time to wait in seconds (None waits forever). A timeout lets
+                the caller periodically re-check its stop condition.
+
+        Returns:
+            bool: True if a frame was announced, False if the wait timed out.
+
+        Raises:
+            KeyError: If the consumer was not registered.
+        """
+        event = self._events[consumer]
+        notified = event.wait(timeout)
+        event.clear()
+        return notified
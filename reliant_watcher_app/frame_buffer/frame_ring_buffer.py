@@ -0,0 +1,241 @@
+import numpy as np
+from multiprocessing import shared_memory
+import time
+
+
+DEFAULT_NUM_SLOTS = 4
+# Size (in bytes) reserved at the start of the shared memory block for the global header.
+_GLOBAL_HEADER_SIZE = 64
+# Global header fields (uint64): latest frame number, number of slots, frame height, width, channels.
+_LATEST, _NUM_SLOTS, _HEIGHT, _WIDTH, _CHANNELS = range(5)
+
+
+def _align(size, alignment=64):
+    """Round size up to the next multiple of alignment."""
+    return (size + alignment - 1) // alignment * alignment
+
+
+class FrameRingBuffer:
+    """
+    A ring of frame slots stored in a single shared memory block.
+
+    One writer (the capture process) stores every captured frame in the next slot together
+    with its sequence number (frame number) and capture timestamp. Each slot is protected by a
+    seqlock: the lock counter is odd while the writer is copying a frame into the slot and even
+    otherwise, so readers can detect (and retry) a frame that changed under them instead of
+    returning a half-written frame. Readers never block the writer.
+
+    Frame numbers start at 1; 0 means that no frame has been written yet.
+    """
+
+    def __init__(self, name: str, frame_shape: tuple = None, num_slots: int = DEFAULT_NUM_SLOTS, create: bool = False):
+        """
+        Create or attach to a frame ring buffer.
+
+        Parameters:
+            name (str): Name of the shared memory block.
+            frame_shape (tuple): Shape (height, width, channels) of a frame. Required when creating;
+                when attaching it is validated against the shape stored in the buffer.
+            num_slots (int): Number of frame slots in the ring (only used when creating).
+            create (bool): Whether to create the shared memory block or attach to an existing one.
+
+        Raises:
+            ValueError: If the frame shape or number of slots is invalid.
+        """
+        if create:
+            if frame_shape is None:
+                raise ValueError("frame_shape is required to create a frame ring buffer.")
+            if num_slots < 2:
+                raise ValueError("A frame ring buffer needs at least 2 slots.")
+            self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                                  size=FrameRingBuffer.size_in_bytes(frame_shape, num_slots))
+            self._global = np.ndarray((_GLOBAL_HEADER_SIZE // 8,), dtype=np.uint64, buffer=self.shm.buf)
+            self._global[:] = 0
+            self._global[_NUM_SLOTS] = num_slots
+            self._global[_HEIGHT:_CHANNELS + 1] = FrameRingBuffer._normalize_shape(frame_shape)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name, create=False)
+            self._global = np.ndarray((_GLOBAL_HEADER_SIZE // 8,), dtype=np.uint64, buffer=self.shm.buf)
+            stored_shape = tuple(int(v) for v in self._global[_HEIGHT:_CHANNELS + 1])
+            if frame_shape is not None and FrameRingBuffer._normalize_shape(frame_shape) != stored_shape:
+                raise ValueError(f"Frame shape {frame_shape} does not match the buffer frame shape {stored_shape}.")
+
+        self.num_slots = int(self._global[_NUM_SLOTS])
+        height, width, channels = (int(v) for v in self._global[_HEIGHT:_CHANNELS + 1])
+        self.frame_shape = (height, width, channels) if channels > 1 else (height, width)
+
+        # Per-slot headers: seqlock counter, frame number and capture timestamp.
+        offset = _GLOBAL_HEADER_SIZE
+        self._seq = np.ndarray((self.num_slots,), dtype=np.uint64, buffer=self.shm.buf, offset=offset)
+        offset += _align(self.num_slots * 8)
+        self._frame_numbers = np.ndarray((self.num_slots,), dtype=np.uint64, buffer=self.shm.buf, offset=offset)
+        offset += _align(self.num_slots * 8)
+        self._timestamps = np.ndarray((self.num_slots,), dtype=np.float64, buffer=self.shm.buf, offset=offset)
+        offset += _align(self.num_slots * 8)
+        # Frame slots.
+        self._frames = np.ndarray((self.num_slots, *self.frame_shape), dtype=np.uint8,
+                                  buffer=self.shm.buf, offset=offset)
+
+    @staticmethod
+    def _normalize_shape(frame_shape):
+        """Return the frame shape as a (height, width, channels) tuple."""
+        if len(frame_shape) == 2:
+            return (int(frame_shape[0]), int(frame_shape[1]), 1)
+        if len(frame_shape) == 3:
+            return tuple(int(v) for v in frame_shape)
+        raise ValueError("Frame shape must have 2 or 3 dimensions.")
+
+    @staticmethod
+    def size_in_bytes(frame_shape: tuple, num_slots: int = DEFAULT_NUM_SLOTS) -> int:
+        """
+        Compute the size of the shared memory block needed for a ring buffer.
+
+        Parameters:
+            frame_shape (tuple): Shape of a frame.
+            num_slots (int): Number of frame slots.
+
+        Returns:
+            int: The size in bytes.
+        """
+        frame_bytes = int(np.prod(frame_shape)) * np.dtype(np.uint8).itemsize
+        return _GLOBAL_HEADER_SIZE + 3 * _align(num_slots * 8) + num_slots * frame_bytes
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def latest_frame_number(self) -> int:
+        """Return the frame number of the most recently written frame (0 if none)."""
+        return int(self._global[_LATEST])
+
+    def write(self, frame: np.ndarray, timestamp: float = None) -> int:
+        """
+        Write a frame into the next slot of the ring. Must only be called by a single writer.
+
+        Parameters:
+            frame (numpy.ndarray): The frame to store; must match the buffer frame shape.
+            timestamp (float): Capture time of the frame (time.monotonic() if None).
+
+        Returns:
+            int: The frame number assigned to the frame.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        frame_number = self.latest_frame_number() + 1
+        slot = frame_number % self.num_slots
+        # Odd lock value: the slot is being written.
+        self._seq[slot] += 1
+        np.copyto(self._frames[slot], frame)
+        self._frame_numbers[slot] = frame_number
+        self._timestamps[slot] = timestamp
+        # Even lock value: the slot is consistent again.
+        self._seq[slot] += 1
+        # Publish the frame only once its slot is complete.
+        self._global[_LATEST] = frame_number
+        return frame_number
+
+    def read(self, frame_number: int, out: np.ndarray = None):
+        """
+        Copy the frame with the given frame number out of the ring.
+
+        Parameters:
+            frame_number (int): The frame number to read.
+            out (numpy.ndarray): Optional preallocated array to copy the frame into.
+
+        Returns:
+            tuple: (frame_number, timestamp, frame), or None if that frame is not in the ring
+            (not written yet or already overwritten).
+        """
+        if frame_number <= 0:
+            return None
+        if out is None:
+            out = np.empty(self.frame_shape, dtype=np.uint8)
+        slot = frame_number % self.num_slots
+        while True:
+            seq = int(self._seq[slot])
+            if seq & 1:
+                # The writer is in the middle of updating this slot.
+                time.sleep(0)
+                continue
+            if int(self._frame_numbers[slot]) != frame_number:
+                return None
+            timestamp = float(self._timestamps[slot])
+            np.copyto(out, self._frames[slot])
+            # The copy is valid only if the writer did not touch the slot meanwhile.
+            if int(self._seq[slot]) == seq:
+                return frame_number, timestamp, out
+
+    def frame_view(self, frame_number: int):
+        """
+        Return a read-only view of a frame inside the ring, without copying it.
+
+        The writer may overwrite the slot while the caller uses the view, so the caller must copy
+        what it needs out of the view and then check is_unchanged() before trusting the copy.
+
+        Parameters:
+            frame_number (int): The frame number to access.
+
+        Returns:
+            tuple: (timestamp, frame view, lock value), or None if that frame is not in the ring
+            (not written yet or already overwritten).
+        """
+        if frame_number <= 0:
+            return None
+        slot = frame_number % self.num_slots
+        while True:
+            seq = int(self._seq[slot])
+            if seq & 1:
+                # The writer is in the middle of updating this slot.
+                time.sleep(0)
+                continue
+            if int(self._frame_numbers[slot]) != frame_number:
+                return None
+            timestamp = float(self._timestamps[slot])
+            if int(self._seq[slot]) == seq:
+                view = self._frames[slot]
+                view.flags.writeable = False
+                return timestamp, view, seq
+
+    def is_unchanged(self, frame_number: int, seq: int) -> bool:
+        """
+        Check that a slot accessed through frame_view() was not touched by the writer since.
+
+        Parameters:
+            frame_number (int): The frame number passed to frame_view().
+            seq (int): The lock value returned by frame_view().
+
+        Returns:
+            bool: True if the frame is still intact, so a copy made from the view is valid.
+        """
+        return int(self._seq[frame_number % self.num_slots]) == seq
+
+    def read_latest(self, newer_than: int = 0, out: np.ndarray = None):
+        """
+        Copy the most recent frame out of the ring if it is newer than a given frame number.
+
+        Parameters:
+            newer_than (int): Frame number of the last frame already processed by the caller.
+            out (numpy.ndarray): Optional preallocated array to copy the frame into.
+
+        Returns:
+            tuple: (frame_number, timestamp, frame), or None if no frame newer than
+            newer_than is available.
+        """
+        while True:
+            frame_number = self.latest_frame_number()
+            if frame_number <= newer_than:
+                return None
+            result = self.read(frame_number, out)
+            if result is not None:
+                return result
+            # The writer lapped the whole ring while we were reading; retry with the new latest frame.
+
+    def close(self):
+        """Close this process's access to the shared memory block."""
+        # Drop the views into the buffer first, otherwise the shared memory cannot be closed.
+        del self._global, self._seq, self._frame_numbers, self._timestamps, self._frames
+        self.shm.close()
+
+    def unlink(self):
+        """Destroy the shared memory block. Must be called once, by the process that created it."""
+        self.shm.unlink()
@@ -0,0 +1,47 @@
+import pytest
+from multiprocessing import Process
+from pathlib import Path
+import sys
+import time
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from frame_buffer.frame_notifier import FrameNotifier
+
+
+def notify_after_delay(frame_notifier, delay):
+    time.sleep(delay)
+    frame_notifier.notify()
+
+def test_wait_times_out_without_frame():
+    frame_notifier = FrameNotifier(("MD",))
+    assert frame_notifier.wait("MD", timeout=0.01) is False
+
+def test_notify_wakes_every_consumer():
+    frame_notifier = FrameNotifier(("MD", "OD"))
+    frame_notifier.notify()
+    assert frame_notifier.wait("MD", timeout=0) is True
+    assert frame_notifier.wait("OD", timeout=0) is True
+
+def test_wait_consumes_the_notification():
+    frame_notifier = FrameNotifier(("MD",))
+    frame_notifier.notify()
+    assert frame_notifier.wait("MD", timeout=0) is True
+    assert frame_notifier.wait("MD", timeout=0) is False, \
+        "A notification should only wake the consumer once."
+
+def test_unknown_consumer_raises_err():
+    frame_notifier = FrameNotifier(("MD",))
+    with pytest.raises(KeyError):
+        frame_notifier.wait("OD", timeout=0)
+
+def test_notify_from_another_process_wakes_consumer():
+    frame_notifier = FrameNotifier(("MD",))
+    p = Process(target=notify_after_delay, args=(frame_notifier, 0.1))
+    p.start()
+    assert frame_notifier.wait("MD", timeout=5) is True
+    p.join()
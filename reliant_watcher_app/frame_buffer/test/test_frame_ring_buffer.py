@@ -0,0 +1,128 @@
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+import uuid
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from frame_buffer import frame_ring_buffer
+from frame_buffer.frame_ring_buffer import FrameRingBuffer
+
+
+FRAME_SHAPE = (48, 64, 3)
+
+
+@pytest.fixture
+def frame_ring():
+    """
+    Creates a frame ring buffer with 3 slots and destroys it after the test.
+    """
+    ring = FrameRingBuffer(f"test_ring_{uuid.uuid4().hex[:8]}", FRAME_SHAPE, num_slots=3, create=True)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+def frame_filled_with(value):
+    return np.full(FRAME_SHAPE, value, dtype=np.uint8)
+
+def test_empty_ring_has_no_frame(frame_ring):
+    assert frame_ring.latest_frame_number() == 0
+    assert frame_ring.read_latest() is None
+    assert frame_ring.read(1) is None
+
+def test_write_assigns_increasing_frame_numbers(frame_ring):
+    assert frame_ring.write(frame_filled_with(1), 10.0) == 1
+    assert frame_ring.write(frame_filled_with(2), 10.1) == 2
+    assert frame_ring.latest_frame_number() == 2
+
+def test_read_latest_returns_newest_frame_with_timestamp(frame_ring):
+    frame_ring.write(frame_filled_with(1), 10.0)
+    frame_ring.write(frame_filled_with(2), 10.1)
+    frame_number, timestamp, frame = frame_ring.read_latest()
+    assert frame_number == 2
+    assert timestamp == pytest.approx(10.1)
+    assert np.all(frame == 2)
+
+def test_read_latest_only_returns_frames_newer_than_given_number(frame_ring):
+    frame_ring.write(frame_filled_with(1), 10.0)
+    frame_number = frame_ring.read_latest()[0]
+    assert frame_ring.read_latest(frame_number) is None, \
+        "A frame that was already processed should not be returned again."
+    frame_ring.write(frame_filled_with(2), 10.1)
+    assert frame_ring.read_latest(frame_number)[0] == 2
+
+def test_read_into_preallocated_array(frame_ring):
+    frame_ring.write(frame_filled_with(7), 10.0)
+    out = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    _, _, frame = frame_ring.read_latest(out=out)
+    assert frame is out
+    assert np.all(out == 7)
+
+def test_overwritten_frame_cannot_be_read(frame_ring):
+    for value in range(1, 5):  # 4 frames in a ring of 3 slots
+        frame_ring.write(frame_filled_with(value), float(value))
+    assert frame_ring.read(1) is None, "Frame 1 should have been overwritten by frame 4."
+    frame_number, timestamp, frame = frame_ring.read(2)
+    assert (frame_number, timestamp) == (2, 2.0)
+    assert np.all(frame == 2)
+
+def test_attach_reads_shape_and_slots_from_buffer(frame_ring):
+    frame_ring.write(frame_filled_with(3), 10.0)
+    reader = FrameRingBuffer(frame_ring.name, create=False)
+    try:
+        assert reader.frame_shape == FRAME_SHAPE
+        assert reader.num_slots == 3
+        assert np.all(reader.read_latest()[2] == 3)
+    finally:
+        reader.close()
+
+def test_attach_with_wrong_shape_raises_err(frame_ring):
+    with pytest.raises(ValueError):
+        FrameRingBuffer(frame_ring.name, (10, 10, 3), create=False)
+
+def test_torn_frame_is_not_returned(frame_ring, monkeypatch):
+    """
+    A slot whose seqlock is odd is being written; the reader must wait for the writer
+    instead of returning the half-written frame.
+    """
+    frame_ring.write(frame_filled_with(1), 10.0)
+    slot = 1 % frame_ring.num_slots
+    frame_ring._seq[slot] += 1  # simulate a writer in the middle of a copy
+    frame_ring._frames[slot][:10] = 9
+    waited = []
+
+    def finish_write(_):
+        # The writer completes the copy while the reader is waiting.
+        waited.append(True)
+        frame_ring._frames[slot][:] = 9
+        frame_ring._seq[slot] += 1
+
+    monkeypatch.setattr(frame_ring_buffer.time, "sleep", finish_write)
+    _, _, frame = frame_ring.read(1)
+    assert waited, "The reader should have waited for the writer."
+    assert np.all(frame == 9)
+
+def test_frame_view_does_not_copy(frame_ring):
+    frame_ring.write(frame_filled_with(4), 12.0)
+    timestamp, view, seq = frame_ring.frame_view(1)
+    assert timestamp == 12.0
+    assert np.shares_memory(view, frame_ring._frames)
+    assert not view.flags.writeable, "A frame view should be read-only."
+    assert frame_ring.is_unchanged(1, seq)
+    del view
+
+def test_frame_view_detects_overwritten_frame(frame_ring):
+    frame_ring.write(frame_filled_with(1), 10.0)
+    _, view, seq = frame_ring.frame_view(1)
+    copy = view.copy()
+    for value in range(2, frame_ring.num_slots + 2):
+        frame_ring.write(frame_filled_with(value), 10.0 + value)
+    assert not frame_ring.is_unchanged(1, seq), "The copy made from the view should be rejected."
+    assert frame_ring.frame_view(1) is None
+    assert np.all(copy == 1)
+    del view
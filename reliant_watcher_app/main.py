@@ -1,10 +1,7 @@
 import cv2
-import numpy as np
-from multiprocessing import Process, shared_memory, Barrier, Manager, Event
+from multiprocessing import Process, Barrier, Event
 import time
-from datetime import datetime
 from pathlib import Path
-from collections import Counter
 import json
 
 import capture_frame as CF
@@ -15,12 +12,15 @@ import motion_triggered_recording as MTR
 import database_manager as DBM
 import helper_functions as HF
 import send_notification as SN
+from frame_buffer import FrameRingBuffer, FrameNotifier, DEFAULT_NUM_SLOTS
+from shared_state import SharedState
     
 
 if __name__ == "__main__":
     db_path = Path(__file__).parent / "database" / "video_with_metadata.db"
     if db_path.exists():
         print("Database already exists.")
+        DBM.migrate_db(db_path)
     else:
         DBM.create_db(db_path)
         print("Database created.")
@@ -45,77 +45,101 @@ if __name__ == "__main__":
     print(f"Camera width: {resolution[0]}")
     print(f"Camera height: {resolution[1]}")
     cap.release()
-    time.sleep(20) # delay is necessary to free camera resources before starting capture_frames_main process
+    # The capture process retries opening the camera until it is freed (see CF.open_capture)
 
     shm_name = "cam_frame"
+    shared_state_name = "shared_state"
 
-    size_in_bytes = int(np.prod(frame_shape) * np.dtype(np.uint8).itemsize)
-    shm = shared_memory.SharedMemory(name=shm_name, create=True, size=size_in_bytes)
+    # Ring of frame slots shared by the capture process (writer) and all consumer processes (readers)
+    frame_ring = FrameRingBuffer(shm_name, frame_shape, num_slots=DEFAULT_NUM_SLOTS, create=True)
+    # Per-consumer wakeups set by the capture process after each frame written into the ring
+    frame_notifier = FrameNotifier(("MD", "OD", "MTR"))
 
     event_dict = {"create_other_processes": Event(), "recording": Event()}
-    barrier_dict = {"MD_OD": Barrier(2), "OD_MTR": Barrier(2)}
+    barrier_dict = {"MD_OD": Barrier(2)}
 
-    with Manager() as manager:
-        shared_dict = manager.dict()
-        shared_dict["stop"] = False
-        shared_dict["motion_detected"] = False
-        shared_dict["recording"] = False
-        shared_dict["permission_to_send_alert"] = False
-        shared_dict["OD_det_obj_info_for_alert"] = Counter()
-
-        shared_dict["OD_db_permission"] = False
-        shared_dict["OD_detected_obj_to_db"] = Counter()
-
-        shared_dict["MTR_db_permission"] = False
-        shared_dict["MTR_video_name_to_db"] = ""
-        shared_dict["time_stamp"] = datetime.now()
-
-
-        p1 = Process(target=CF.capture_frames_main, args=(camera_id, shm_name, frame_shape, shared_dict, event_dict))
-        p1.start()
-        
-        event_dict["create_other_processes"].wait() # Wait until the process p1 signals it's ready
-
-        p2 = Process(target=MD.motion_detection_main, args=(shm_name, frame_shape, shared_dict, barrier_dict))
-        p2.start()
-        
-        recording_length = 20
-        p3 = Process(target=MTR.motion_triggered_recording_main, args=(shm_name, frame_shape, shared_dict, event_dict, barrier_dict, recording_length, resolution))
-        p3.start()
-
-        p4 = Process(target=OD.object_detection_main, args=(shm_name, frame_shape, shared_dict, event_dict, barrier_dict))
-        p4.start()
-
-        p5 = Process(target=RM.remote_monitoring_main, args=(shm_name, frame_shape, shared_dict,))
-        p5.start()   
-
-        receiver_info = Path(__file__).parent / "auth" / "alert_receiver_info.json"
-        with open(receiver_info, "r") as f:
-            receiver = json.load(f)
-        phone = receiver["phone"]
-        email = receiver["email"]
-        while not shared_dict["stop"]:
-            try:
-                SN.send_notification_main(shared_dict, phone, email)
-            except Exception as e:
-                print(e)
-                shared_dict["permission_to_send_alert"] = False
-
-            DBM.save_to_database(db_path, shared_dict)
+    # Flags, object counts and timestamps shared by all processes (all fields start as False/empty)
+    shared_state = SharedState(shared_state_name, create=True)
 
+    p1 = Process(target=CF.capture_frames_main, args=(camera_id, shm_name, frame_shape, shared_state, event_dict, frame_notifier))
+    p1.start()
+    
+    event_dict["create_other_processes"].wait() # Wait until the process p1 signals the first frame is captured
+    if shared_state["stop"]:
         p1.join()
-        barrier_dict["MD_OD"].abort()
-        barrier_dict["OD_MTR"].abort()
-        p2.join()
-        p3.join()
-        p4.join() 
-        time.sleep(3)
-        p5.terminate()  # Forcefully kill p4
-        cv2.destroyAllWindows()
-        shm.close()
-        shm.unlink()
-        print("all processes finished")
-
-
-
-
+        frame_ring.close()
+        frame_ring.unlink()
+        shared_state.close()
+        shared_state.unlink()
+        raise RuntimeError("Capture process stopped before capturing a frame.")
+
+    motion_detection_threads = 2 # threads SuBSENSE is split across (its per-frame cost is the motion process' budget)
+    motion_analysis_size = 350 # width of the frames analyzed for motion
+    motion_detection_backend = "subsense" # background subtraction model: "subsense" (most accurate), or "knn", "mog2", "running_average" (cheaper, for low-end boards)
+    suppress_illumination_changes = True # light flickers and lights switched on/off re-adapt the model instead of triggering a recording
+    p2 = Process(target=MD.motion_detection_main, args=(shm_name, frame_shape, shared_state, barrier_dict, frame_notifier, motion_detection_threads, motion_analysis_size),
+                 kwargs={"backend": motion_detection_backend, "suppress_illumination_changes": suppress_illumination_changes})
+    p2.start()
+    
+    post_roll_seconds = 5 # seconds recorded after the last motion or detected object
+    max_segment_seconds = 60 # longer incidents are split into several videos
+    frame_rate = fps if fps > 0 else 20.0 # nominal capture frame rate (some cameras do not report it)
+    pre_roll_seconds = 3 # seconds of video kept from before motion is confirmed
+    p3 = Process(target=MTR.motion_triggered_recording_main, args=(shm_name, frame_shape, shared_state, event_dict, barrier_dict, frame_notifier, post_roll_seconds, max_segment_seconds, resolution, frame_rate, pre_roll_seconds))
+    p3.start()
+
+    object_detection_backend = "opencv" # YOLOX inference: "opencv" (cv2.dnn) or "onnxruntime" (faster on edge CPUs, needs onnxruntime)
+    object_detection_precision = "fp32" # "fp32", or "int8" / "int8_dynamic" once quantized and checked with object_detection/quantization.py
+    object_detection_threads = None # threads an inference is split across (None: the backend's default)
+    # objects worth an alert: the other detections are dropped early (None: the 80 COCO classes)
+    object_detection_classes = ["person", "bicycle", "car", "motorcycle", "bus", "truck", "bird", "cat", "dog", "horse"]
+    object_detection_interval = 3 # YOLOX runs on one frame in 3, the objects are tracked in between
+    object_detection_workers = 1 # frames detected at once, one YOLOX model each (workers x threads <= cores)
+    p4 = Process(target=OD.object_detection_main, args=(shm_name, frame_shape, shared_state, event_dict, barrier_dict, frame_notifier,
+                                                        object_detection_backend, object_detection_precision, object_detection_threads,
+                                                        object_detection_classes, object_detection_interval,
+                                                        object_detection_workers))
+    p4.start()
+
+    p5 = Process(target=RM.remote_monitoring_main, args=(shm_name, frame_shape, shared_state,))
+    p5.start()   
+
+    receiver_info = Path(__file__).parent / "auth" / "alert_receiver_info.json"
+    with open(receiver_info, "r") as f:
+        receiver = json.load(f)
+    phone = receiver["phone"]
+    email = receiver["email"]
+    # Completed videos and the objects detected during video files, waiting to be logged together
+    videos_to_db, objects_to_db = {}, {}
+    while not shared_state["stop"]:
+        try:
+            SN.send_notification_main(shared_state, phone, email)
+        except Exception as e:
+            print(e)
+            shared_state["permission_to_send_alert"] = False
+
+        DBM.save_to_database(db_path, shared_state, videos_to_db, objects_to_db)
+        # Reading the shared state is a plain memory access, so pace the loop explicitly
+        time.sleep(0.1)
+
+    p1.join()
+    barrier_dict["MD_OD"].abort()
+    # Keep logging the videos the recording process completes, and the objects the object detection process
+    # shares for them, while both shut down (one at a time).
+    for p in (p3, p4):
+        while p.is_alive():
+            DBM.save_to_database(db_path, shared_state, videos_to_db, objects_to_db)
+            p.join(timeout=0.1)
+    # The videos whose objects were never shared are logged without them
+    DBM.save_to_database(db_path, shared_state, videos_to_db, objects_to_db, final=True)
+    p2.join()
+    p3.join()
+    p4.join() 
+    time.sleep(3)
+    p5.terminate()  # Forcefully kill p4
+    cv2.destroyAllWindows()
+    frame_ring.close()
+    frame_ring.unlink()
+    shared_state.close()
+    shared_state.unlink()
+    print("all processes finished")
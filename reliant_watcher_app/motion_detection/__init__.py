@@ -1,3 +1,8 @@
 from .motion_detector import MotionDetector
+from .motion_zones import motion_zones_mask
+from .static_scene_gate import StaticSceneGate
+from .illumination_filter import IlluminationChangeFilter
+from .background_subtractors import create_subtractor, BACKENDS, MOG2Subtractor, KNNSubtractor, \
+                                    RunningAverageSubtractor, MODEL_FILE_SUFFIXES, save_model, load_model
 from .motion_detection_main import motion_detection_main
 import helper_functions
\ No newline at end of file
@@ -0,0 +1,246 @@
+import cv2
+import numpy as np
+
+
+class _CroppedSubtractor:
+    """
+    Base of the OpenCV background subtractors: the model only covers the bounding box of the region
+    of interest (ROI), so pixels outside the motion zones cost nothing. Subclasses create the model
+    (_create_model) and compute the foreground of the cropped frame (_apply_crop).
+
+    Same contract as pysubsense.BackgroundSubtractorSuBSENSE: initialize(gray_frame, roi) then
+    apply(gray_frame, out=None), which returns a uint8 mask, 255 for the foreground and 0 elsewhere.
+    """
+
+    def __init__(self):
+        self.roi_rect = None  # Bounding box (x, y, width, height) of the ROI
+
+    def initialize(self, gray_frame, roi):
+        """
+        Initializes the model from a first frame.
+
+        Parameters:
+            gray_frame (np.ndarray): uint8 grayscale frame.
+            roi (np.ndarray): uint8 mask of the same size, nonzero where the model is needed.
+
+        Raises:
+            ValueError: If the frame is not a grayscale image or the ROI is empty or of another size.
+        """
+        if gray_frame.ndim != 2 or gray_frame.dtype != np.uint8:
+            raise ValueError("Frame must be a uint8 grayscale image.")
+        if roi.shape != gray_frame.shape:
+            raise ValueError("ROI must have the size of the frame.")
+        x, y, w, h = cv2.boundingRect(roi)
+        if w == 0 or h == 0:
+            raise ValueError("ROI is empty.")
+        self.roi_rect = (x, y, w, h)
+        self._create_model(gray_frame[y:y + h, x:x + w])
+
+    def apply(self, gray_frame, out=None):
+        """
+        Computes the foreground mask of a frame and updates the model.
+
+        Parameters:
+            gray_frame (np.ndarray): uint8 grayscale frame, of the size of the first frame.
+            out (np.ndarray): uint8 mask buffer the result is written into (None: a new one).
+
+        Returns:
+            np.ndarray: The foreground mask (out if it was given).
+        """
+        if self.roi_rect is None:
+            raise RuntimeError("Error: Call `initialize()` before `apply()`.")
+        if out is None:
+            out = np.empty(gray_frame.shape, dtype=np.uint8)
+        x, y, w, h = self.roi_rect
+        # Outside the ROI bounding box there is never foreground
+        out[:y] = 0
+        out[y + h:] = 0
+        out[y:y + h, :x] = 0
+        out[y:y + h, x + w:] = 0
+        self._apply_crop(gray_frame[y:y + h, x:x + w], out[y:y + h, x:x + w])
+        return out
+
+
+class MOG2Subtractor(_CroppedSubtractor):
+    """OpenCV Gaussian mixture model (MOG2): much cheaper than SuBSENSE, but less robust to noise."""
+
+    def __init__(self, history=500, var_threshold=16.0):
+        """
+        Parameters:
+            history (int): Number of frames the model is learnt from.
+            var_threshold (float): Squared Mahalanobis distance above which a pixel is foreground.
+        """
+        super().__init__()
+        self.history = history
+        self.var_threshold = var_threshold
+        self.model = None
+
+    def _create_model(self, gray_crop):
+        # No shadow detection: the mask is only 0 or 255, like SuBSENSE's
+        self.model = cv2.createBackgroundSubtractorMOG2(history=self.history, varThreshold=self.var_threshold,
+                                                        detectShadows=False)
+        self.model.apply(gray_crop, learningRate=1)
+
+    def _apply_crop(self, gray_crop, out_crop):
+        self.model.apply(gray_crop, fgmask=out_crop)
+
+
+class KNNSubtractor(_CroppedSubtractor):
+    """OpenCV K-nearest neighbours model (KNN): cheaper than SuBSENSE, copes better than MOG2 with few moving pixels."""
+
+    # Number of times the first frame is learnt
+    SEED_FRAMES = 5
+
+    def __init__(self, history=500, dist2_threshold=400.0):
+        """
+        Parameters:
+            history (int): Number of frames the model is learnt from.
+            dist2_threshold (float): Squared distance to the samples above which a pixel is foreground.
+        """
+        super().__init__()
+        self.history = history
+        self.dist2_threshold = dist2_threshold
+        self.model = None
+
+    def _create_model(self, gray_crop):
+        self.model = cv2.createBackgroundSubtractorKNN(history=self.history, dist2Threshold=self.dist2_threshold,
+                                                       detectShadows=False)
+        # A pixel is background once it matches a few samples: learn the first frame as several samples,
+        # so the frames right after (re-)initialization are not all foreground
+        for _ in range(self.SEED_FRAMES):
+            self.model.apply(gray_crop)
+
+    def _apply_crop(self, gray_crop, out_crop):
+        self.model.apply(gray_crop, fgmask=out_crop)
+
+
+class RunningAverageSubtractor(_CroppedSubtractor):
+    """
+    Running average of the frames as the background: the cheapest model, for the slowest boards.
+    A pixel is foreground when it differs from the background by more than threshold gray levels.
+    """
+
+    def __init__(self, learning_rate=0.05, threshold=25):
+        """
+        Parameters:
+            learning_rate (float): Weight of each new frame in the background (0 to 1).
+            threshold (int): Difference (in gray levels) above which a pixel is foreground.
+
+        Raises:
+            ValueError: If learning_rate is not in (0, 1] or threshold is not in [0, 255).
+        """
+        if not 0 < learning_rate <= 1:
+            raise ValueError("Learning rate must be in (0, 1].")
+        if not 0 <= threshold < 255:
+            raise ValueError("Threshold must be in [0, 255).")
+        super().__init__()
+        self.learning_rate = learning_rate
+        self.threshold = threshold
+        self.background = None  # float32 background, updated in place
+        self._background_u8 = None  # Buffers reused for every frame
+        self._diff = None
+
+    def _create_model(self, gray_crop):
+        self.background = gray_crop.astype(np.float32)
+        self._background_u8 = np.empty_like(gray_crop)
+        self._diff = np.empty_like(gray_crop)
+
+    def _apply_crop(self, gray_crop, out_crop):
+        cv2.convertScaleAbs(self.background, dst=self._background_u8)
+        cv2.absdiff(gray_crop, self._background_u8, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY, dst=out_crop)
+        cv2.accumulateWeighted(gray_crop, self.background, self.learning_rate)
+
+    def save_model(self, path):
+        """Saves the background to a .npz file (see load_model)."""
+        if self.background is None:
+            raise RuntimeError("Error: Call `initialize()` before `save_model()`.")
+        # Written through a file object, so numpy does not append its own extension to the path
+        with open(path, "wb") as f:
+            np.savez(f, roi_rect=np.array(self.roi_rect), background=self.background)
+
+    def load_model(self, path):
+        """
+        Loads a background saved by save_model(). Must be called after initialize(), with frames of the
+        same size and the same ROI. Raises ValueError (leaving the model as it was) if the saved one does not match.
+        """
+        if self.background is None:
+            raise RuntimeError("Error: Call `initialize()` before `load_model()`.")
+        with np.load(path) as data:
+            if tuple(data["roi_rect"]) != self.roi_rect or data["background"].shape != self.background.shape:
+                raise ValueError("The saved model was learnt with another frame size or ROI.")
+            self.background[...] = data["background"]
+
+
+def _create_subsense(threads=1, **params):
+    # Imported here, so the OpenCV backends work on boards where pysubsense is not built
+    from pysubsense import BackgroundSubtractorSuBSENSE
+    return BackgroundSubtractorSuBSENSE(nThreads=threads, **params)
+
+
+# Background subtraction backends, from the most accurate (and most expensive) to the cheapest.
+BACKENDS = {
+    "subsense": _create_subsense,
+    "knn": lambda threads=1, **params: KNNSubtractor(**params),
+    "mog2": lambda threads=1, **params: MOG2Subtractor(**params),
+    "running_average": lambda threads=1, **params: RunningAverageSubtractor(**params),
+}
+
+
+# File suffix of the saved models of the backends whose model can be saved and loaded (SuBSENSE writes a
+# cv::FileStorage file, compressed by the .gz suffix)
+MODEL_FILE_SUFFIXES = {
+    "subsense": ".yml.gz",
+    "running_average": ".npz",
+}
+
+
+def save_model(subtractor, path):
+    """
+    Saves the learnt background model of a subtractor (see MODEL_FILE_SUFFIXES for the backends that can).
+
+    Raises:
+        NotImplementedError: If the backend cannot save its model.
+    """
+    if hasattr(subtractor, "saveModel"):  # pysubsense.BackgroundSubtractorSuBSENSE
+        subtractor.saveModel(str(path))
+    elif hasattr(subtractor, "save_model"):
+        subtractor.save_model(path)
+    else:
+        raise NotImplementedError(f"{type(subtractor).__name__} cannot save its model.")
+
+
+def load_model(subtractor, path):
+    """
+    Loads a background model saved by save_model() into a subtractor initialized with frames of the same
+    size and the same ROI. The subtractor raises an error (keeping its model) if the saved model does not match.
+
+    Raises:
+        NotImplementedError: If the backend cannot load a model.
+    """
+    if hasattr(subtractor, "loadModel"):  # pysubsense.BackgroundSubtractorSuBSENSE
+        subtractor.loadModel(str(path))
+    elif hasattr(subtractor, "load_model"):
+        subtractor.load_model(path)
+    else:
+        raise NotImplementedError(f"{type(subtractor).__name__} cannot load a model.")
+
+
+def create_subtractor(backend="subsense", threads=1, **params):
+    """
+    Creates the background subtractor of a backend.
+
+    Parameters:
+        backend (str): Name of the backend, among BACKENDS.
+        threads (int): Number of threads the model update is split across (SuBSENSE only).
+        **params: Parameters of the backend's model.
+
+    Returns:
+        The subtractor, with initialize(gray_frame, roi) and apply(gray_frame, out=None) methods.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown background subtraction backend '{backend}', expected one of {list(BACKENDS)}.")
+    return BACKENDS[backend](threads=threads, **params)
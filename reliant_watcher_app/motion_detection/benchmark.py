@@ -0,0 +1,325 @@
+"""
+Motion detection benchmark: replays the test videos through MotionDetector.detect_motion_with_threshold()
+and scores the confirmed motion against the ground truth files of test_videos/.
+
+Run from the reliant_watcher_app directory, e.g.:
+    python -m motion_detection.benchmark --sizes 250 350 --thresholds 0.5 1 --backends subsense mog2
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .motion_detector import MotionDetector
+from .static_scene_gate import StaticSceneGate
+from .background_subtractors import BACKENDS
+from .illumination_filter import IlluminationChangeFilter
+
+TEST_VIDEOS_DIR = Path(__file__).resolve().parent.parent / "test_videos"
+# Suffix of the ground truth file of a test video (test_video_1_day.mp4 -> test_video_1_day + suffix)
+GROUND_TRUTH_SUFFIX = "_motion_detection_timing_ground_truth.txt"
+# Time (in seconds) around a ground truth event within which confirmed motion is matched to it
+DEFAULT_TOLERANCE = 1.0
+# Frames used to set up and initialize the model before scoring starts
+SETUP_FRAMES = 2
+# Kinds of ground truth events: motion must be confirmed during motion events, and must not be during
+# illumination events (light flickers), which only change the lighting
+MOTION, ILLUMINATION = "motion", "illumination"
+
+
+def parse_ground_truth(path: Path):
+    """
+    Parse a ground truth file: blocks of an event name, then 'started at frame N' and 'ended at frame M' lines.
+    Light flickers are illumination events, the other events are motion events.
+
+    Parameters:
+        path (Path): Path of the ground truth file.
+
+    Returns:
+        list: Events as dicts {'name': str, 'kind': MOTION or ILLUMINATION, 'start_frame': int,
+        'end_frame': int}, in file order.
+
+    Raises:
+        ValueError: If an event has no start or end frame.
+    """
+    events = []
+    name = None
+    start_frame = None
+    for line in Path(path).read_text().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        started = re.match(r"started at frame (\d+)", line)
+        ended = re.match(r"ended at frame (\d+)", line)
+        if started:
+            start_frame = int(started.group(1))
+        elif ended:
+            if name is None or start_frame is None:
+                raise ValueError(f"Event without a name or start frame in {path}.")
+            kind = ILLUMINATION if "flicker" in name.lower() else MOTION
+            events.append({"name": name, "kind": kind, "start_frame": start_frame, "end_frame": int(ended.group(1))})
+            name = start_frame = None
+        elif not line.startswith("duration"):
+            name = line
+    if name is not None or start_frame is not None:
+        raise ValueError(f"Event '{name}' has no end frame in {path}.")
+    return events
+
+
+def find_test_videos(directory: Path = TEST_VIDEOS_DIR):
+    """Return the (video path, ground truth path) pairs of the test videos that have a ground truth file."""
+    pairs = []
+    for video_path in sorted(Path(directory).glob("*.mp4")):
+        ground_truth_path = video_path.with_name(video_path.stem + GROUND_TRUTH_SUFFIX)
+        if ground_truth_path.exists():
+            pairs.append((video_path, ground_truth_path))
+    return pairs
+
+
+def confirmed_episodes(confirmed):
+    """Return the (first frame, frame after the last) of each run of frames with confirmed motion."""
+    episodes = []
+    start = None
+    for frame_number, motion in enumerate(confirmed):
+        if motion and start is None:
+            start = frame_number
+        elif not motion and start is not None:
+            episodes.append((start, frame_number))
+            start = None
+    if start is not None:
+        episodes.append((start, len(confirmed)))
+    return episodes
+
+
+def score_detections(confirmed, events, fps: float, tolerance: float = DEFAULT_TOLERANCE):
+    """
+    Score confirmed motion against ground truth events.
+
+    A motion event is detected if motion is confirmed between tolerance seconds before it starts and
+    tolerance seconds after it ends; its latency is the time from its start to the first frame
+    with confirmed motion in that window (negative if motion was confirmed before the labelled start).
+    An illumination event triggers if motion is confirmed in its window. A run of confirmed motion
+    that overlaps no motion event window is a false trigger (including the illumination triggers).
+
+    Parameters:
+        confirmed (list): Whether motion is confirmed, for each frame of the video (index = frame number).
+        events (list): Ground truth events (see parse_ground_truth).
+        fps (float): Frame rate of the video.
+        tolerance (float): Tolerance (in seconds) around the events.
+
+    Returns:
+        dict: {'latencies': latency in seconds of each motion event (None if missed), 'missed': number of
+        motion events missed, 'illumination_events': number of illumination events, 'illumination_triggers':
+        number of them that triggered, 'false_triggers': number of false triggers, 'false_trigger_seconds':
+        their total duration}.
+    """
+    tolerance_frames = int(round(tolerance * fps))
+    latencies = []
+    motion_windows = []
+    illumination_triggers = 0
+    for event in events:
+        window_start, window_end = max(0, event["start_frame"] - tolerance_frames), event["end_frame"] + tolerance_frames
+        first = next((f for f in range(window_start, min(window_end, len(confirmed))) if confirmed[f]), None)
+        if event.get("kind", MOTION) == ILLUMINATION:
+            illumination_triggers += first is not None
+        else:
+            motion_windows.append((window_start, window_end))
+            latencies.append(None if first is None else (first - event["start_frame"]) / fps)
+    false_episodes = [(start, end) for start, end in confirmed_episodes(confirmed)
+                      if not any(start < window_end and end > window_start for window_start, window_end in motion_windows)]
+    return {
+        "latencies": latencies,
+        "missed": sum(latency is None for latency in latencies),
+        "illumination_events": sum(event.get("kind", MOTION) == ILLUMINATION for event in events),
+        "illumination_triggers": illumination_triggers,
+        "false_triggers": len(false_episodes),
+        "false_trigger_seconds": sum(end - start for start, end in false_episodes) / fps,
+    }
+
+
+def replay_video(video_path: Path, size: int, threshold: float, backend: str = "subsense", gate: bool = False,
+                 threads: int = 1, suppress_illumination: bool = False, release: float = 0.0):
+    """
+    Replay a video through detect_motion_with_threshold(), as the motion detection process does.
+    Each frame is timestamped with its position in the video, as the capture process timestamps frames.
+
+    Parameters:
+        video_path (Path): Path of the video.
+        size (int): Width of the frames analyzed.
+        threshold (float): Motion confirmation threshold (motion_detected_threshold).
+        backend (str): Background subtraction backend.
+        gate (bool): Whether the static scene gate is used.
+        threads (int): Number of threads of the SuBSENSE backend.
+        suppress_illumination (bool): Whether global lighting changes are suppressed (IlluminationChangeFilter).
+        release (float): Time without motion (in seconds) after which confirmed motion is released.
+
+    Returns:
+        dict: {'confirmed': whether motion is confirmed for each frame (the setup frames are False),
+        'frame_times': time (in seconds) of each detect_motion_with_threshold() call, 'cpu_time': process
+        CPU time (in seconds, all threads) spent in those calls, 'fps': video frame rate,
+        'suppression_rate': fraction of the frames analyzed whose motion was suppressed as a lighting change}.
+
+    Raises:
+        RuntimeError: If the video cannot be read.
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    setup_frames = [cap.read()[1] for _ in range(SETUP_FRAMES)]
+    if any(frame is None for frame in setup_frames):
+        cap.release()
+        raise RuntimeError(f"Video {video_path} is too short.")
+    illumination_filter = IlluminationChangeFilter() if suppress_illumination else None
+    motion_detector = MotionDetector(threads=threads, gate=StaticSceneGate() if gate else None, backend=backend,
+                                     illumination_filter=illumination_filter)
+    motion_detector.setup(setup_frames[0], size)
+    motion_detector.initialize_model(setup_frames[1])
+
+    confirmed = [False] * SETUP_FRAMES
+    frame_times = []
+    cpu_time = 0.0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timestamp = len(confirmed) / fps
+        # Only the detection is measured, not the decoding of the video
+        start, cpu_start = time.perf_counter(), time.process_time()
+        confirmed.append(motion_detector.detect_motion_with_threshold(frame, motion_detected_threshold=threshold,
+                                                                      timestamp=timestamp, release_threshold=release))
+        frame_times.append(time.perf_counter() - start)
+        cpu_time += time.process_time() - cpu_start
+    cap.release()
+    return {"confirmed": confirmed, "frame_times": frame_times, "cpu_time": cpu_time, "fps": fps,
+            "suppression_rate": illumination_filter.suppression_rate if illumination_filter else 0.0}
+
+
+def benchmark(videos, sizes, thresholds, backends, gate=False, threads=1, tolerance=DEFAULT_TOLERANCE,
+              suppress_illumination=False, release=0.0):
+    """
+    Replay every video with every combination of analysis size, confirmation threshold and backend.
+
+    Parameters:
+        videos (list): (video path, ground truth path) pairs.
+        sizes (list): Widths of the frames analyzed.
+        thresholds (list): Motion confirmation thresholds.
+        backends (list): Background subtraction backends.
+        gate (bool): Whether the static scene gate is used.
+        threads (int): Number of threads of the SuBSENSE backend.
+        tolerance (float): Tolerance (in seconds) around the ground truth events.
+        suppress_illumination (bool): Whether global lighting changes are suppressed.
+        release (float): Time without motion (in seconds) after which confirmed motion is released.
+
+    Returns:
+        list: One result dict per video and combination, with the scores (see score_detections), the
+        'suppression_rate' of the frames analyzed, the
+        per-frame time percentiles ('p50_ms', 'p90_ms', 'p99_ms', 'max_ms') and the CPU usage
+        ('cpu_ms_per_frame', and 'cpu_percent': the load on one core when frames come at the video frame rate).
+    """
+    results = []
+    for video_path, ground_truth_path in videos:
+        events = parse_ground_truth(ground_truth_path)
+        for backend in backends:
+            for size in sizes:
+                for threshold in thresholds:
+                    replay = replay_video(video_path, size, threshold, backend, gate, threads, suppress_illumination,
+                                          release)
+                    scores = score_detections(replay["confirmed"], events, replay["fps"], tolerance)
+                    frame_times_ms = np.array(replay["frame_times"]) * 1000
+                    p50, p90, p99 = np.percentile(frame_times_ms, [50, 90, 99])
+                    cpu_per_frame = replay["cpu_time"] / len(replay["frame_times"])
+                    results.append({
+                        "video": Path(video_path).name,
+                        "backend": backend,
+                        "size": size,
+                        "threshold": threshold,
+                        "release": release,
+                        "gate": gate,
+                        "suppress_illumination": suppress_illumination,
+                        "events": [event["name"] for event in events],
+                        **scores,
+                        "suppression_rate": replay["suppression_rate"],
+                        "p50_ms": p50,
+                        "p90_ms": p90,
+                        "p99_ms": p99,
+                        "max_ms": frame_times_ms.max(),
+                        "cpu_percent": 100 * cpu_per_frame * replay["fps"],
+                        "cpu_ms_per_frame": 1000 * cpu_per_frame,
+                    })
+    return results
+
+
+def format_results(results):
+    """Return the benchmark results as a text table, one row per video and combination."""
+    header = (f"{'video':<22} {'backend':<16} {'size':>5} {'thres':>5} {'rel':>4} {'missed':>6} {'mean lat':>8} "
+              f"{'max lat':>8} {'illum':>5} {'supp %':>6} {'false':>5} {'false s':>7} {'p50 ms':>7} {'p90 ms':>7} {'p99 ms':>7} "
+              f"{'max ms':>7} {'cpu %':>6} {'cpu ms':>7}")
+    lines = [header, "-" * len(header)]
+    for r in results:
+        detected = [latency for latency in r["latencies"] if latency is not None]
+        mean_latency = f"{np.mean(detected):8.2f}" if detected else f"{'-':>8}"
+        max_latency = f"{max(detected):8.2f}" if detected else f"{'-':>8}"
+        lines.append(f"{r['video']:<22} {r['backend']:<16} {r['size']:>5} {r['threshold']:>5} {r['release']:>4} "
+                     f"{r['missed']:>3}/{len(r['latencies']):<2} {mean_latency} {max_latency} "
+                     f"{r['illumination_triggers']:>3}/{r['illumination_events']:<1} {100 * r['suppression_rate']:>6.1f} "
+                     f"{r['false_triggers']:>5} {r['false_trigger_seconds']:>7.2f} {r['p50_ms']:>7.2f} "
+                     f"{r['p90_ms']:>7.2f} {r['p99_ms']:>7.2f} {r['max_ms']:>7.2f} {r['cpu_percent']:>6.1f} "
+                     f"{r['cpu_ms_per_frame']:>7.2f}")
+    lines.append("Latencies in seconds from the labelled start of each event (negative: confirmed before it).")
+    lines.append("illum: light flickers that triggered; supp %: frames suppressed as lighting changes.")
+    lines.append("cpu %: load on one core at the video frame rate; cpu ms: CPU time (all threads) per frame.")
+    return "\n".join(lines)
+
+
+def available_backends():
+    """Return the backends that can run here (SuBSENSE needs the pysubsense module)."""
+    try:
+        import pysubsense  # noqa: F401
+        return list(BACKENDS)
+    except ImportError:
+        return [backend for backend in BACKENDS if backend != "subsense"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score motion detection against the ground truth of the test videos.")
+    parser.add_argument("--videos", nargs="+", type=Path,
+                        help="Videos to replay, each with its ground truth file next to it (default: test_videos/).")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[350], help="Widths of the frames analyzed.")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[1.0],
+                        help="Motion confirmation thresholds (motion_detected_threshold).")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS),
+                        help="Background subtraction backends (default: all the available ones).")
+    parser.add_argument("--release", type=float, default=0.0,
+                        help="Time without motion (in seconds) after which confirmed motion is released.")
+    parser.add_argument("--gate", action="store_true", help="Use the static scene gate.")
+    parser.add_argument("--suppress-illumination", action="store_true",
+                        help="Suppress global lighting changes (light flickers) instead of confirming motion.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of threads of the SuBSENSE backend.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Tolerance (in seconds) around the ground truth events.")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    if args.videos:
+        videos = [(video, video.with_name(video.stem + GROUND_TRUTH_SUFFIX)) for video in args.videos]
+        missing = [str(ground_truth) for _, ground_truth in videos if not ground_truth.exists()]
+        if missing:
+            parser.error(f"Ground truth files not found: {', '.join(missing)}")
+    else:
+        videos = find_test_videos()
+    backends = args.backends or available_backends()
+    results = benchmark(videos, args.sizes, args.thresholds, backends, args.gate, args.threads, args.tolerance,
+                        args.suppress_illumination, args.release)
+    print(format_results(results))
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, default=float))
+    return results
+
+
+if __name__ == "__main__":
+    main()
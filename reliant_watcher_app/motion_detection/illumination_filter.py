@@ -0,0 +1,96 @@
+import cv2
+
+
+class IlluminationChangeFilter:
+    """
+    Tells global lighting changes (a light switched on or off, a flicker, the sun behind a cloud) apart
+    from motion, so they do not trigger a recording.
+
+    A frame is a lighting change when its mean luminance shifts by more than max_luminance_shift gray
+    levels from the previous frame, or when more than max_foreground_ratio of the analyzed pixels are
+    foreground: something moving covers a small part of the frame, a lighting change shifts it all.
+    The background model must then re-adapt to the new lighting at once (instead of reporting
+    foreground for seconds), and motion is suppressed until the luminance settles: settle_frames
+    consecutive frames shifting by at most settle_shift gray levels. The model re-adapts again then,
+    to the settled lighting.
+    """
+
+    def __init__(self, max_luminance_shift=8.0, max_foreground_ratio=0.35, settle_shift=1.0, settle_frames=3):
+        """
+        Parameters:
+            max_luminance_shift (float): Change (in gray levels) of the mean luminance from one frame to
+                the next above which the lighting changed.
+            max_foreground_ratio (float): Fraction of the analyzed pixels above which a foreground mask
+                is a lighting change.
+            settle_shift (float): Change (in gray levels) of the mean luminance below which it is steady.
+            settle_frames (int): Number of steady frames after which the lighting has settled.
+
+        Raises:
+            ValueError: If a parameter is out of range.
+        """
+        if max_luminance_shift <= 0 or settle_shift < 0 or settle_frames < 1:
+            raise ValueError("Luminance shifts and settle frames must be positive.")
+        if not 0 < max_foreground_ratio <= 1:
+            raise ValueError("Maximum foreground ratio must be in (0, 1].")
+        self.max_luminance_shift = max_luminance_shift
+        self.max_foreground_ratio = max_foreground_ratio
+        self.settle_shift = settle_shift
+        self.settle_frames = settle_frames
+        self.settling = False  # Whether motion is suppressed until the luminance settles
+        self._last_luminance = None
+        self._steady_frames = 0
+        self._roi_mask = None  # Mask the analyzed pixel count was computed for
+        self._roi_pixels = None
+        self.frames = 0  # Number of frames checked
+        self.frames_suppressed = 0  # Number of frames whose motion was suppressed
+        self.changes = 0  # Number of lighting changes found
+
+    @property
+    def suppression_rate(self):
+        """Fraction of the frames checked whose motion was suppressed."""
+        return self.frames_suppressed / self.frames if self.frames else 0.0
+
+    def reset(self):
+        """Forgets the last luminance, e.g. after the background model was re-initialized."""
+        self.settling = False
+        self._last_luminance = None
+        self._steady_frames = 0
+
+    def update(self, gray_frame, fg_mask, roi_mask=None):
+        """
+        Checks a frame for a lighting change.
+
+        Parameters:
+            gray_frame (np.ndarray): uint8 grayscale frame analyzed.
+            fg_mask (np.ndarray): Foreground mask the background model found for it (0 outside the ROI).
+            roi_mask (np.ndarray): Motion zones mask (None: the whole frame).
+
+        Returns:
+            tuple: (suppress, readapt): whether the motion found in the frame must be ignored, and whether
+            the background model must be re-initialized from this frame.
+        """
+        if roi_mask is not self._roi_mask or self._roi_pixels is None:
+            self._roi_mask = roi_mask
+            self._roi_pixels = gray_frame.size if roi_mask is None else max(cv2.countNonZero(roi_mask), 1)
+        luminance = cv2.mean(gray_frame, mask=roi_mask)[0]
+        shift = 0.0 if self._last_luminance is None else abs(luminance - self._last_luminance)
+        self._last_luminance = luminance
+        self.frames += 1
+
+        if shift > self.max_luminance_shift or cv2.countNonZero(fg_mask) > self.max_foreground_ratio * self._roi_pixels:
+            # The lighting changed: re-adapt to it now, and ignore the foreground until it settles
+            if not self.settling:
+                self.changes += 1
+            self.settling = True
+            self._steady_frames = 0
+            self.frames_suppressed += 1
+            return True, True
+        if not self.settling:
+            return False, False
+        self.frames_suppressed += 1
+        self._steady_frames = self._steady_frames + 1 if shift <= self.settle_shift else 0
+        if self._steady_frames >= self.settle_frames:
+            # Settled: model the lighting as it is now
+            self.settling = False
+            return True, True
+        return True, False
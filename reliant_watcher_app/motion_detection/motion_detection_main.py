@@ -1,31 +1,135 @@
 import cv2
 import numpy as np
-from multiprocessing import shared_memory
+from pathlib import Path
+from frame_buffer import FrameRingBuffer
+from shared_state import MAX_MOTION_BOXES
+import database_manager as DBM
 from .motion_detector import MotionDetector
+from .static_scene_gate import StaticSceneGate
+from .illumination_filter import IlluminationChangeFilter
+from .background_subtractors import MODEL_FILE_SUFFIXES
 
-def motion_detection_main(shm_name, frame_shape, shared_dict, barrier_dict):
+# Maximum time (in seconds) to block waiting for a frame before re-checking the stop flag
+FRAME_WAIT_TIMEOUT = 0.5
+# Directory the background model snapshots are saved in, to warm-start after a restart
+MODEL_SNAPSHOT_DIR = Path(__file__).resolve().parent.parent / "background_models"
+
+
+def load_motion_zones(motion_detector, camera):
+    """
+    Load the motion zones of the camera from the database into the motion detector.
+    On failure the detector keeps its current zones (the whole frame at start-up).
+
+    Returns True if the zones were loaded.
+    """
+    try:
+        zones = DBM.get_motion_zones(camera)
+        motion_detector.set_motion_zones(zones)
+        print(f"Motion zones loaded: {len(zones)} zone(s).")
+        return True
+    except Exception as e:
+        print(f"Motion zones not loaded, keeping the current ones: {e}")
+        return False
+
+def model_snapshot_path(camera, backend):
+    """Returns the path of the background model snapshot of a camera, or None if the backend cannot save its model."""
+    if backend not in MODEL_FILE_SUFFIXES:
+        return None
+    return MODEL_SNAPSHOT_DIR / f"{camera}_{backend}{MODEL_FILE_SUFFIXES[backend]}"
+
+def save_model_snapshot(motion_detector, path):
+    """Save the background model; a failure (full disk) only costs the warm start. Returns True if it was saved."""
     try:
-        shm = shared_memory.SharedMemory(name=shm_name, create=False)
-        shared_frame = np.ndarray(frame_shape, dtype=np.uint8, buffer=shm.buf)
-        motion_detector = MotionDetector()
-        motion_detector.setup(shared_frame, size=350)
-        motion_detector.initialize_model(shared_frame)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        motion_detector.save_model(path)
+        return True
+    except Exception as e:
+        print(f"Background model not saved: {e}")
+        return False
+
+def motion_detection_main(shm_name, frame_shape, shared_state, barrier_dict, frame_notifier, threads=1,
+                          analysis_size=350, camera=DBM.DEFAULT_CAMERA, gate_static_scenes=True,
+                          backend="subsense", backend_params=None, suppress_illumination_changes=True,
+                          confirm_seconds=0.5, release_seconds=1.0, snapshot_interval=300):
+    # threads: number of threads SuBSENSE runs on; analysis_size: width of the frames analyzed;
+    # camera: name of the camera whose motion zones are used;
+    # gate_static_scenes: SuBSENSE only maintains its model at a reduced rate while the scene is quiet;
+    # backend, backend_params: background subtraction model (see background_subtractors.BACKENDS) and its parameters;
+    # suppress_illumination_changes: global lighting changes (light flickers) re-adapt the model instead of confirming motion;
+    # confirm_seconds, release_seconds: motion is confirmed after confirm_seconds of motion and released after release_seconds
+    # without, both measured on the capture timestamps (so the alert latency does not depend on the CPU load);
+    # snapshot_interval: seconds between saves of the background model, which the next start warm-starts from (None: never)
+    try:
+        frame_ring = FrameRingBuffer(shm_name, frame_shape, create=False)
+        # Private copy of the latest frame, so the detector never sees a frame being overwritten
+        frame = np.empty(frame_ring.frame_shape, dtype=np.uint8)
+        last_frame_number, _, _ = frame_ring.read_latest(out=frame)
+        illumination_filter = IlluminationChangeFilter() if suppress_illumination_changes else None
+        motion_detector = MotionDetector(threads=threads, gate=StaticSceneGate() if gate_static_scenes else None,
+                                         backend=backend, backend_params=backend_params,
+                                         illumination_filter=illumination_filter)
+        print(f"Motion detection backend: {backend}.")
+        motion_detector.max_motion_boxes = MAX_MOTION_BOXES
+        motion_detector.setup(frame, size=analysis_size)
+        # Only the motion zones are modelled and searched for motion
+        load_motion_zones(motion_detector, camera)
+        snapshot_path = model_snapshot_path(camera, backend) if snapshot_interval else None
+        if snapshot_path is None:
+            motion_detector.initialize_model(frame)
+        elif motion_detector.warm_start(frame, snapshot_path):
+            # No relearning of the scene after a restart: motion is detected from the first frames
+            print("Motion detection warm-started from the saved background model.")
+        last_snapshot_time = None
+        # Number of motion zone edits already loaded
+        zones_changes_loaded = shared_state["MD_zones_changes"]
         barrier_dict["MD_OD"].wait()
-        while not shared_dict["stop"]:
-            shared_dict["motion_detected"] = motion_detector.detect_motion_with_threshold(shared_frame, 
-                                                                                          motion_detected_threshold=1, 
-                                                                                          visualize = True)
-            # Break the loop if 'q' is pressed
-            if cv2.waitKey(10) & 0xFF == ord('q'):
-                shared_dict["stop"] = True
+        while not shared_state["stop"]:
+            # Block until the capture process announces a new frame
+            frame_notifier.wait("MD", timeout=FRAME_WAIT_TIMEOUT)
+            # Only process frames that have not been processed yet
+            latest = frame_ring.read_latest(last_frame_number, out=frame)
+            if latest is not None:
+                last_frame_number, timestamp, _ = latest
+                # The zones were edited from the dashboard: model the new zones from this frame on
+                zones_changes = shared_state["MD_zones_changes"]
+                if zones_changes != zones_changes_loaded:
+                    zones_changes_loaded = zones_changes
+                    if load_motion_zones(motion_detector, camera):
+                        motion_detector.initialize_model(frame)
+                shared_state["motion_detected"] = motion_detector.detect_motion_with_threshold(frame, 
+                                                                                              motion_detected_threshold=confirm_seconds, 
+                                                                                              visualize = True,
+                                                                                              timestamp=timestamp,
+                                                                                              release_threshold=release_seconds)
+                # Share where the motion is, so object detection can run on those regions only
+                shared_state["MD_motion_boxes"] = motion_detector.motion_boxes
+                if snapshot_path is not None and not motion_detector.motion_confirmed:
+                    # Snapshot the model while the scene is quiet, so the saved model holds no moving object
+                    if last_snapshot_time is None:
+                        last_snapshot_time = timestamp
+                    elif timestamp - last_snapshot_time >= snapshot_interval:
+                        save_model_snapshot(motion_detector, snapshot_path)
+                        last_snapshot_time = timestamp
+                if illumination_filter is not None:
+                    shared_state["MD_suppressed_frames"] = illumination_filter.frames_suppressed
+                    shared_state["MD_illumination_changes"] = illumination_filter.changes
+            # Break the loop if 'q' is pressed (also lets the visualization windows refresh)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                shared_state["stop"] = True
                 break
-        shm.close()
+        frame_ring.close()
+        if snapshot_path is not None and not motion_detector.motion_confirmed:
+            save_model_snapshot(motion_detector, snapshot_path)
+        if motion_detector.gate is not None:
+            gate = motion_detector.gate
+            print(f"Motion detection: {gate.frames_gated} of {gate.frames_gated + gate.frames_passed} frames "
+                  f"skipped by the static scene gate.")
+        if illumination_filter is not None:
+            print(f"Motion detection: {illumination_filter.changes} lighting change(s), "
+                  f"{100 * illumination_filter.suppression_rate:.1f}% of the frames analyzed suppressed.")
         print("Motion detection process is done.")
         exit()
     except FileNotFoundError:
         print(f"Shared memory '{shm_name}' does not exist.")
-        shared_dict["stop"] = True
+        shared_state["stop"] = True
         exit()
-
-
-
@@ -1,7 +1,8 @@
 import cv2
 import numpy as np
-from pysubsense import BackgroundSubtractorSuBSENSE
 import math
+import os
+import time
 from pathlib import Path
 import sys
 
@@ -11,20 +12,46 @@ PROJECT_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(PROJECT_DIR))
 
 import helper_functions as HF
+from .motion_zones import motion_zones_mask
+from .static_scene_gate import StaticSceneGate
+from .background_subtractors import create_subtractor, save_model, load_model
+from .illumination_filter import IlluminationChangeFilter
 
 
 
 class MotionDetector:
-    def __init__(self):
-        self.subtractor = BackgroundSubtractorSuBSENSE()
-        self.fps = 0.0
-        self.consecutive_frames_with_motion = 0
+    def __init__(self, threads=1, gate=None, backend="subsense", backend_params=None, illumination_filter=None):
+        """
+        threads: number of threads the SuBSENSE per-pixel model update is split across.
+        gate: StaticSceneGate deciding which frames the subtractor processes in detect_motion_with_threshold()
+        (None: every frame).
+        backend: background subtraction backend (see background_subtractors.BACKENDS): "subsense" is the
+        most accurate, "knn", "mog2" and "running_average" are cheaper for low-end boards.
+        backend_params: parameters of the backend's model (None: its defaults).
+        illumination_filter: IlluminationChangeFilter suppressing the foreground of global lighting changes
+        in detect_motion() (None: lighting changes are reported as motion).
+        """
+        self.backend = backend
+        self.subtractor = create_subtractor(backend, threads=threads, **(backend_params or {}))
+        self.gate = gate
+        self.illumination_filter = illumination_filter
+        self.last_motion_detected = False  # Whether the subtractor found motion in the last frame it processed
+        self.fps = 0.0  # Processing rate of the subtractor (for display only: confirmation uses the frame timestamps)
+        self.motion_confirmed = False  # Whether motion is currently confirmed
+        self.motion_since = None  # Timestamp of the first frame of the current run of frames with motion
+        self.no_motion_since = None  # Timestamp of the first frame of the current run of frames without motion
         self.tm = cv2.TickMeter()
         self.tm.reset()
         self.dimension = None
         self.scale_factor = None
         self.model_initialized = False  # Flag to track if initialize_model() was called
         self.min_detectable_area = None
+        self.max_motion_boxes = 16  # Maximum number of motion boxes kept per frame
+        self.motion_boxes = []  # Bounding boxes (x0, y0, x1, y1) of the motion found in the last frame
+        self.fg_mask = None  # Foreground mask buffer, written in place by the subtractor for every frame
+        self.motion_zones = []  # Include/exclude zones motion is looked for in (none: the whole frame)
+        self.roi_mask = None  # Mask of the motion zones at the analyzed size (None: the whole frame)
+        self.roi_frame = None  # ROI the subtractor was initialized with
         # self.motion_detected_threshold = 1.5
 
     def set_dimension_and_scale_factor(self, frame, size=None):
@@ -44,58 +71,192 @@ class MotionDetector:
         self.set_min_detectable_area()
 
 
+    def set_motion_zones(self, zones):
+        """
+        Sets the include/exclude zones motion is looked for in (see motion_zones_mask). Must be called
+        after setup(); the zones are modelled by the subtractor from the next call to initialize_model().
+        Raises ValueError if the zones leave no pixel to detect motion in.
+        """
+        if self.dimension is None:
+            raise RuntimeError("Error: Call `setup()` before `set_motion_zones()`.")
+        roi_mask = motion_zones_mask(zones, self.dimension)
+        if not roi_mask.any():
+            raise ValueError("The motion zones leave no area to detect motion in.")
+        self.motion_zones = zones
+        # No mask when the whole frame is analyzed, which saves masking every foreground mask
+        self.roi_mask = None if roi_mask.all() else roi_mask
+        if self.gate is not None:
+            # Changes in the excluded zones do not wake the subtractor up either
+            self.gate.set_roi_mask(self.roi_mask)
+
     def initialize_model(self, frame):
-        """Initializes the motion detection model. Must be called after setting resize dimensions."""
+        """
+        Initializes the motion detection model. Must be called after setting resize dimensions.
+        Only the pixels inside the motion zones are modelled, so excluded pixels cost nothing.
+        """
         if self.dimension is None or self.scale_factor is None:
             raise RuntimeError("Error: Call `setup()` before `initialize_model()`.")
 
         try:
             resized_frame = cv2.resize(frame, self.dimension, interpolation=cv2.INTER_AREA)
             gray_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2GRAY)
-            roi_frame = np.full_like(gray_frame, 255)
-            self.subtractor.initialize(gray_frame, roi_frame)
+            self.roi_frame = np.full_like(gray_frame, 255) if self.roi_mask is None else self.roi_mask
+            self.subtractor.initialize(gray_frame, self.roi_frame)
+            # A new model starts without motion
+            self.motion_confirmed = False
+            self.motion_since = None
+            self.no_motion_since = None
+            self.fg_mask = np.empty_like(gray_frame)
+            if self.illumination_filter is not None:
+                self.illumination_filter.reset()
             self.model_initialized = True  # Mark as initialized
         except Exception as e:
             raise RuntimeError(f"Error during model initialization: {e}")
 
+    def save_model(self, path):
+        """
+        Saves the background model of the subtractor (see background_subtractors.save_model), so a restart can
+        warm_start() from it. The model is written to a temporary file first, so a crash never leaves half a model.
+        """
+        if not self.model_initialized:
+            raise RuntimeError("Error: Call `initialize_model()` before `save_model()`.")
+        path = Path(path)
+        # Same suffix as the model file: it sets the format SuBSENSE writes
+        temporary_path = path.with_name(".tmp_" + path.name)
+        save_model(self.subtractor, temporary_path)
+        os.replace(temporary_path, path)
+
+    def warm_start(self, frame, path, max_changed_ratio=0.3):
+        """
+        Initializes the model from a saved one (see save_model) instead of the single frame, so motion is detected
+        right after a restart instead of once the model has learnt the scene again. Falls back to initialize_model()
+        if there is no saved model, if it does not match (another analysis size, zones or backend), or if the
+        scene changed drastically meanwhile: more than max_changed_ratio of the analyzed pixels are foreground.
+        Returns True if the saved model is used.
+        """
+        self.initialize_model(frame)
+        if not Path(path).exists():
+            return False
+        try:
+            load_model(self.subtractor, path)
+        except Exception as e:
+            print(f"Saved background model not loaded: {e}")
+            self.initialize_model(frame)
+            return False
+        resized_frame = cv2.resize(frame, self.dimension, interpolation=cv2.INTER_AREA)
+        gray_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2GRAY)
+        fg_mask = self.subtractor.apply(gray_frame, out=self.fg_mask)
+        roi_pixels = fg_mask.size if self.roi_mask is None else cv2.countNonZero(self.roi_mask)
+        if self.roi_mask is not None:
+            cv2.bitwise_and(fg_mask, self.roi_mask, dst=fg_mask)
+        if cv2.countNonZero(fg_mask) > max_changed_ratio * roi_pixels:
+            # The camera moved or the lighting is not the same: the saved model would report foreground everywhere
+            print("Saved background model not used: the scene changed.")
+            self.initialize_model(frame)
+            return False
+        return True
+
+    def motion_boxes_from_contours(self, contours):
+        """
+        Returns the bounding boxes (x0, y0, x1, y1), in original frame coordinates, of the contours.
+        Beyond max_motion_boxes, the smallest boxes are replaced by the box enclosing all of them.
+        """
+        boxes = []
+        for c in contours:
+            x, y, w, h = cv2.boundingRect(c)
+            boxes.append((x, y, x + w, y + h))
+        # Largest boxes first
+        boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+        if len(boxes) > self.max_motion_boxes:
+            rest = boxes[self.max_motion_boxes - 1:]
+            boxes = boxes[:self.max_motion_boxes - 1] + [(min(b[0] for b in rest), min(b[1] for b in rest),
+                                                         max(b[2] for b in rest), max(b[3] for b in rest))]
+        # Scale the boxes back to the original frame size (rounding outwards)
+        return [(int(x0 / self.scale_factor), int(y0 / self.scale_factor),
+                 math.ceil(x1 / self.scale_factor), math.ceil(y1 / self.scale_factor)) for x0, y0, x1, y1 in boxes]
+
     def detect_motion(self, frame):
-        """Detects motion in a given frame and returns the contour if motion is found."""
+        """
+        Detects motion in a given frame and returns the contour if motion is found.
+        The bounding boxes of all the motion found are kept in motion_boxes.
+        """
         if not self.model_initialized:
             raise RuntimeError("Error: Call `initialize_model()` before `detect_motion()`.")
 
         try:
             resized_frame = cv2.resize(frame, self.dimension, interpolation=cv2.INTER_AREA)
             gray_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2GRAY)
-            fg_mask = self.subtractor.apply(gray_frame)
+            # The mask is written into the preallocated buffer (overwritten by the next frame)
+            fg_mask = self.subtractor.apply(gray_frame, out=self.fg_mask)
+            if self.roi_mask is not None:
+                # The subtractor's post-processing may spread foreground past the ROI border: excluded pixels never count
+                cv2.bitwise_and(fg_mask, self.roi_mask, dst=fg_mask)
+            if self.illumination_filter is not None:
+                suppress, readapt = self.illumination_filter.update(gray_frame, fg_mask, self.roi_mask)
+                if readapt:
+                    # Re-adapt to the new lighting at once, instead of reporting foreground until the model learns it
+                    self.subtractor.initialize(gray_frame, self.roi_frame)
+                if suppress:
+                    self.motion_boxes = []
+                    return False, None, fg_mask
             contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-            motion_detected = False
-            contour = None 
-            for c in contours:
-                if cv2.contourArea(c) >= self.min_detectable_area:
-                    contour = (c / self.scale_factor).astype(np.int32)
-                    motion_detected = True
-                    break # one contour detected is enough to break the loop to gain computational speed
+            # Every contour large enough is kept: object detection runs on the regions where motion is
+            moving_contours = [c for c in contours if cv2.contourArea(c) >= self.min_detectable_area]
+            motion_detected = len(moving_contours) > 0
+            contour = (moving_contours[0] / self.scale_factor).astype(np.int32) if motion_detected else None
+            self.motion_boxes = self.motion_boxes_from_contours(moving_contours)
             return motion_detected, contour, fg_mask
         except Exception as e:
             raise RuntimeError(f"Error in motion detection: {e}")
 
-    def detect_motion_with_threshold(self, frame:np.ndarray, motion_detected_threshold:float=2.0, visualize=False)->bool:
-        """Performs motion detection and confirms motion if it persists beyond a threshold."""
+    def update_confirmation(self, motion_detected, timestamp, motion_detected_threshold, release_threshold=0.0):
+        """
+        Confirms motion with hysteresis, from the capture timestamps of the frames: motion is confirmed once it
+        was found in every frame for motion_detected_threshold seconds, and released once no motion was found in
+        any frame for release_threshold seconds. The thresholds are seconds of video whatever the processing rate.
+        Returns whether motion is confirmed.
+        """
+        if motion_detected:
+            self.no_motion_since = None
+            if self.motion_since is None:
+                self.motion_since = timestamp
+            if not self.motion_confirmed and timestamp - self.motion_since >= motion_detected_threshold:
+                self.motion_confirmed = True
+        else:
+            self.motion_since = None
+            if self.no_motion_since is None:
+                self.no_motion_since = timestamp
+            if self.motion_confirmed and timestamp - self.no_motion_since >= release_threshold:
+                self.motion_confirmed = False
+        return self.motion_confirmed
+
+    def detect_motion_with_threshold(self, frame:np.ndarray, motion_detected_threshold:float=2.0, visualize=False,
+                                     timestamp:float=None, release_threshold:float=0.0)->bool:
+        """
+        Performs motion detection and confirms motion if it persists beyond a threshold (see update_confirmation).
+        timestamp is the capture time of the frame in seconds (None: now); release_threshold is the time without
+        motion (in seconds) after which confirmed motion is released (0: at the first frame without motion).
+        """
         if not self.model_initialized:
             raise RuntimeError("Error: Call `initialize_model()` before `motion_detection_with_threshold()`.")
         try:
-            self.tm.start()
-            motion_detected, contour, fg_mask = self.detect_motion(frame)
-            self.tm.stop()
-            self.fps = self.tm.getFPS()
-
-            if motion_detected:
-                self.consecutive_frames_with_motion += 1
+            if self.gate is not None and not self.gate.needs_update(frame, self.last_motion_detected):
+                # Quiet scene: nothing changed since the last frame the subtractor processed, which had no motion.
+                # The frame is not timed, so fps stays that of the subtractor.
+                motion_detected, contour, fg_mask = False, None, self.fg_mask
+                self.motion_boxes = []
             else:
-                self.consecutive_frames_with_motion = 0
+                self.tm.start()
+                motion_detected, contour, fg_mask = self.detect_motion(frame)
+                self.tm.stop()
+                self.fps = self.tm.getFPS()
+                self.last_motion_detected = motion_detected
 
-            motion_confirmed = self.consecutive_frames_with_motion >= math.ceil(motion_detected_threshold * self.fps)
+            if timestamp is None:
+                timestamp = time.monotonic()
+            motion_confirmed = self.update_confirmation(motion_detected, timestamp, motion_detected_threshold,
+                                                        release_threshold)
 
             if visualize:
                 frame_ = frame.copy()
@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+
+
+def motion_zones_mask(zones, dimension):
+    """
+    Rasterize motion zones into the region of interest (ROI) mask motion is detected in.
+
+    Motion is looked for inside the include zones (the whole frame if there are none), except inside
+    the exclude zones: an exclude zone overlapping an include zone wins.
+
+    Parameters:
+        zones (list): Zones, each a dict with a 'kind' ('include' or 'exclude') and 'points', a list
+            of [x, y] vertices normalized to 0..1 of the frame width/height.
+        dimension (tuple): Size (width, height) of the mask, i.e. of the frames analyzed.
+
+    Returns:
+        np.ndarray: uint8 mask of shape (height, width), 255 where motion is looked for and 0 elsewhere.
+
+    Raises:
+        ValueError: If a zone has an unknown kind or fewer than 3 points.
+    """
+    width, height = dimension
+    includes = [zone for zone in zones if zone["kind"] == "include"]
+    excludes = [zone for zone in zones if zone["kind"] == "exclude"]
+    if len(includes) + len(excludes) != len(zones):
+        raise ValueError("Motion zone kind must be 'include' or 'exclude'.")
+    mask = np.zeros((height, width), dtype=np.uint8) if includes else np.full((height, width), 255, dtype=np.uint8)
+    # Include zones first, so the exclude zones are cut out of them
+    for zone, value in [(zone, 255) for zone in includes] + [(zone, 0) for zone in excludes]:
+        if len(zone["points"]) < 3:
+            raise ValueError("A motion zone must have at least 3 points.")
+        # Normalized vertices -> pixel coordinates of the mask
+        points = np.asarray(zone["points"], dtype=np.float64) * (width, height)
+        points = np.clip(np.round(points), 0, (width - 1, height - 1)).astype(np.int32)
+        cv2.fillPoly(mask, [points], value)
+    return mask
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+
+
+class StaticSceneGate:
+    """
+    Cheap first stage of motion detection, deciding which frames the background subtractor must see.
+
+    Each frame is reduced to a small grid of block means (an INTER_AREA resize of the gray frame),
+    which is compared with the blocks of the last frame the subtractor saw. While no block changes
+    by more than threshold gray levels the scene is quiet, and the subtractor only gets a model
+    update every maintenance_interval frames. As soon as a block changes, the frame goes to the
+    subtractor, so motion is found on the same frame as without the gate. The subtractor also sees
+    every frame while it finds motion, and for hold_frames frames after it.
+    """
+
+    def __init__(self, grid_width=64, threshold=6, maintenance_interval=10, hold_frames=10):
+        """
+        Parameters:
+            grid_width (int): Number of blocks across the frame (the grid keeps the frame's aspect ratio).
+            threshold (int): Change (in gray levels) of a block mean above which the scene is active.
+            maintenance_interval (int): In a quiet scene, one frame in maintenance_interval goes to the
+                subtractor, so its model keeps up with slow changes (daylight).
+            hold_frames (int): Number of frames going to the subtractor after the scene was last active.
+
+        Raises:
+            ValueError: If a parameter is not positive (hold_frames can be 0).
+        """
+        if grid_width < 1 or threshold <= 0 or maintenance_interval < 1 or hold_frames < 0:
+            raise ValueError("Gate parameters must be positive.")
+        self.grid_width = grid_width
+        self.threshold = threshold
+        self.maintenance_interval = maintenance_interval
+        self.hold_frames = hold_frames
+        self.grid_size = None  # Size (width, height) of the block grid, set from the first frame
+        self._frame_size = None  # Size (height, width) of the frames the buffers are allocated for
+        self.roi_blocks = None  # Blocks overlapping the motion zones (None: all the blocks)
+        self.roi_mask = None  # Motion zones mask the blocks were computed for
+        self._reference = None  # Block means of the last frame the subtractor saw
+        self._gray = None  # Buffers reused for every frame
+        self._blocks = None
+        self._diff = None
+        self._frames_since_update = 0
+        self._active_frames_left = 0
+        self.frames_gated = 0  # Number of frames the subtractor did not have to see
+        self.frames_passed = 0  # Number of frames passed to the subtractor
+
+    def set_roi_mask(self, roi_mask):
+        """
+        Only watch the blocks overlapping the motion zones, so motion in excluded zones (a TV screen)
+        does not keep the subtractor at full rate. roi_mask is the motion zones mask (None: the whole frame).
+        """
+        self.roi_mask = roi_mask
+        self.roi_blocks = None
+        # The watched blocks are computed for the grid size, at the next frame
+        self._frame_size = None
+
+    def _setup(self, frame):
+        """Allocates the buffers for the size of the frames; the next frame goes to the subtractor."""
+        height, width = frame.shape[:2]
+        self._frame_size = (height, width)
+        self._reference = None
+        grid_height = max(1, round(self.grid_width * height / width))
+        self.grid_size = (min(self.grid_width, width), min(grid_height, height))
+        self._blocks = np.empty((self.grid_size[1], self.grid_size[0], 3), dtype=np.uint8)
+        self._gray = np.empty(self.grid_size[::-1], dtype=np.uint8)
+        self._diff = np.empty_like(self._gray)
+        if self.roi_mask is not None:
+            # A block is watched if any of its pixels is inside the motion zones
+            self.roi_blocks = cv2.resize(self.roi_mask, self.grid_size, interpolation=cv2.INTER_AREA) > 0
+
+    def needs_update(self, frame, motion_detected=False):
+        """
+        Decides whether the subtractor must process the frame.
+
+        Parameters:
+            frame (np.ndarray): BGR frame.
+            motion_detected (bool): Whether the subtractor found motion in the last frame it processed.
+
+        Returns:
+            bool: True if the frame must go to the subtractor, False if the scene is quiet.
+        """
+        if frame.shape[:2] != self._frame_size:
+            self._setup(frame)
+        # Block means: averaging whole blocks makes the gate insensitive to sensor noise
+        cv2.resize(frame, self.grid_size, dst=self._blocks, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._blocks, cv2.COLOR_BGR2GRAY, dst=self._gray)
+
+        if self._reference is None:
+            active = True
+        else:
+            cv2.absdiff(self._gray, self._reference, dst=self._diff)
+            changed = self._diff > self.threshold
+            if self.roi_blocks is not None:
+                changed &= self.roi_blocks
+            active = bool(changed.any())
+        if active or motion_detected:
+            active = True
+            self._active_frames_left = self.hold_frames
+        elif self._active_frames_left > 0:
+            self._active_frames_left -= 1
+            active = True
+
+        self._frames_since_update += 1
+        if active or self._frames_since_update >= self.maintenance_interval:
+            # The frame goes to the subtractor: it is the new reference
+            if self._reference is None:
+                self._reference = self._gray.copy()
+            else:
+                self._reference[...] = self._gray
+            self._frames_since_update = 0
+            self.frames_passed += 1
+            return True
+        self.frames_gated += 1
+        return False
@@ -0,0 +1,174 @@
+import pytest
+import numpy as np
+import cv2
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_detection.background_subtractors import create_subtractor, RunningAverageSubtractor, save_model, load_model
+from motion_detection.motion_detector import MotionDetector
+
+# Backends that only need OpenCV
+OPENCV_BACKENDS = ["knn", "mog2", "running_average"]
+
+
+def frame_with_square(x0, size=20, shape=(120, 160)):
+    frame = np.full(shape, 80, dtype=np.uint8)
+    frame[50:50 + size, x0:x0 + size] = 220
+    return frame
+
+def test_unknown_backend_raises_err():
+    with pytest.raises(ValueError):
+        create_subtractor("vibe")
+
+@pytest.mark.parametrize("kwargs", [{"learning_rate": 0}, {"learning_rate": 1.5}, {"threshold": 255}])
+def test_running_average_invalid_parameters_raise_err(kwargs):
+    with pytest.raises(ValueError):
+        RunningAverageSubtractor(**kwargs)
+
+@pytest.mark.parametrize("backend", OPENCV_BACKENDS)
+def test_apply_before_initialize_raises_err(backend):
+    with pytest.raises(RuntimeError):
+        create_subtractor(backend).apply(frame_with_square(0))
+
+@pytest.mark.parametrize("backend", OPENCV_BACKENDS)
+def test_invalid_roi_raises_err(backend):
+    subtractor = create_subtractor(backend)
+    background = np.full((120, 160), 80, dtype=np.uint8)
+    with pytest.raises(ValueError):
+        subtractor.initialize(background, np.zeros_like(background))
+    with pytest.raises(ValueError):
+        subtractor.initialize(background, np.full((60, 80), 255, dtype=np.uint8))
+
+@pytest.mark.parametrize("backend", OPENCV_BACKENDS)
+def test_backend_finds_moving_square_in_place(backend):
+    """Same contract as SuBSENSE: a 0/255 uint8 mask, written into the out buffer."""
+    subtractor = create_subtractor(backend)
+    background = np.full((120, 160), 80, dtype=np.uint8)
+    subtractor.initialize(background, np.full_like(background, 255))
+    for _ in range(20):
+        subtractor.apply(background)
+    out = np.full_like(background, 7)
+    fg_mask = subtractor.apply(frame_with_square(100), out=out)
+    assert fg_mask is out
+    assert set(np.unique(fg_mask)) <= {0, 255}
+    assert fg_mask[55:65, 105:115].all(), "The square must be foreground."
+    assert not fg_mask[:, :90].any(), "The background must not be foreground."
+
+@pytest.mark.parametrize("backend", OPENCV_BACKENDS)
+def test_backend_ignores_pixels_outside_roi(backend):
+    subtractor = create_subtractor(backend)
+    background = np.full((120, 160), 80, dtype=np.uint8)
+    roi = np.zeros_like(background)
+    roi[:, :80] = 255
+    subtractor.initialize(background, roi)
+    assert subtractor.roi_rect == (0, 0, 80, 120)
+    for _ in range(5):
+        subtractor.apply(background)
+    out = np.full_like(background, 255)
+    fg_mask = subtractor.apply(frame_with_square(100), out=out)
+    assert not fg_mask.any()
+
+@pytest.mark.parametrize("backend", OPENCV_BACKENDS)
+def test_motion_detector_with_backend_detects_person(backend):
+    """Each backend detects the person walking past the camera in the day video (frames 208 to 415)."""
+    motion_detector = MotionDetector(backend=backend)
+    cap = cv2.VideoCapture(str(PROJECT_DIR / "test_videos" / "test_video_1_day.mp4"))
+    motion_detector.setup(cap.read()[1], 350)
+    motion_detector.initialize_model(cap.read()[1])
+    detected = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        detected.append(motion_detector.detect_motion(frame)[0])
+    cap.release()
+    # Frame numbers start at 3: two frames were used for setup
+    assert sum(detected[220 - 3:400 - 3]) > 0.75 * (400 - 220)
+    assert not any(detected[20 - 3:95 - 3]), "No motion before the first light flicker."
+
+
+def learnt_running_average(frames=20):
+    """Returns a running average subtractor that has learnt a scene with a bright square, and that scene."""
+    background = frame_with_square(60)
+    subtractor = RunningAverageSubtractor()
+    subtractor.initialize(np.zeros_like(background), np.full_like(background, 255))
+    for _ in range(frames):
+        subtractor.apply(background)
+    return subtractor, background
+
+def test_saved_model_is_loaded(tmp_path):
+    subtractor, background = learnt_running_average(frames=100)
+    path = tmp_path / "model.npz"
+    save_model(subtractor, path)
+    # A fresh model of the same frames knows the scene once the saved one is loaded
+    restarted = RunningAverageSubtractor()
+    restarted.initialize(np.zeros_like(background), np.full_like(background, 255))
+    assert restarted.apply(background).any()
+    load_model(restarted, path)
+    np.testing.assert_array_equal(restarted.background, subtractor.background)
+    assert not restarted.apply(background).any()
+
+def test_model_of_another_roi_is_not_loaded(tmp_path):
+    subtractor, background = learnt_running_average()
+    path = tmp_path / "model.npz"
+    save_model(subtractor, path)
+    roi = np.zeros_like(background)
+    roi[:60] = 255
+    other = RunningAverageSubtractor()
+    other.initialize(background, roi)
+    with pytest.raises(ValueError):
+        load_model(other, path)
+
+@pytest.mark.parametrize("backend", ["knn", "mog2"])
+def test_backend_without_model_persistence_raises_err(backend, tmp_path):
+    subtractor = create_subtractor(backend)
+    with pytest.raises(NotImplementedError):
+        save_model(subtractor, tmp_path / "model")
+    with pytest.raises(NotImplementedError):
+        load_model(subtractor, tmp_path / "model")
+
+def video_frames(count):
+    """Returns the first frames of the day video, before anything moves in it."""
+    cap = cv2.VideoCapture(str(PROJECT_DIR / "test_videos" / "test_video_1_day.mp4"))
+    frames = [cap.read()[1] for _ in range(count)]
+    cap.release()
+    return frames
+
+def test_motion_detector_warm_starts_from_saved_model(tmp_path):
+    frames = video_frames(60)
+    path = tmp_path / "camera_0_running_average.npz"
+    motion_detector = MotionDetector(backend="running_average")
+    motion_detector.setup(frames[0], 200)
+    # No saved model yet: initialized from the frame
+    assert not motion_detector.warm_start(frames[0], path)
+    for frame in frames[1:]:
+        motion_detector.detect_motion(frame)
+    motion_detector.save_model(path)
+    assert path.exists() and not list(tmp_path.glob(".tmp_*"))
+
+    restarted = MotionDetector(backend="running_average")
+    restarted.setup(frames[0], 200)
+    assert restarted.warm_start(frames[-1], path)
+    np.testing.assert_allclose(restarted.subtractor.background, motion_detector.subtractor.background, atol=1)
+
+def test_motion_detector_falls_back_when_the_scene_changed(tmp_path):
+    frames = video_frames(2)
+    path = tmp_path / "camera_0_running_average.npz"
+    motion_detector = MotionDetector(backend="running_average")
+    motion_detector.setup(frames[0], 200)
+    motion_detector.initialize_model(frames[0])
+    motion_detector.save_model(path)
+    # The camera now sees something else entirely (inverted image)
+    changed = 255 - frames[1]
+    restarted = MotionDetector(backend="running_average")
+    restarted.setup(frames[0], 200)
+    assert not restarted.warm_start(changed, path)
+    assert restarted.model_initialized
+    assert not restarted.detect_motion(changed)[0]
+
@@ -0,0 +1,77 @@
+import pytest
+import json
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_detection.benchmark import (parse_ground_truth, find_test_videos, confirmed_episodes,
+                                        score_detections, main, MOTION, ILLUMINATION)
+
+
+def test_ground_truth_files_are_parsed():
+    videos = dict((video.name, ground_truth) for video, ground_truth in find_test_videos())
+    day = parse_ground_truth(videos["test_video_1_day.mp4"])
+    assert [(e["start_frame"], e["end_frame"]) for e in day] == [(102, 131), (141, 166), (208, 415), (469, 497)]
+    assert day[2]["name"] == "Person walk pass camera"
+    assert [e["kind"] for e in day] == [ILLUMINATION, ILLUMINATION, MOTION, ILLUMINATION]
+    night = parse_ground_truth(videos["test_video_2_night.mp4"])
+    assert [(e["start_frame"], e["end_frame"]) for e in night] == [(69, 361)]
+
+def test_ground_truth_without_end_raises_err(tmp_path):
+    path = tmp_path / "ground_truth.txt"
+    path.write_text("Person\nstarted at frame 10 (0.3 sec)\n")
+    with pytest.raises(ValueError):
+        parse_ground_truth(path)
+
+def test_confirmed_episodes():
+    assert confirmed_episodes([]) == []
+    assert confirmed_episodes([False, True, True, False, True]) == [(1, 3), (4, 5)]
+
+def test_score_detections():
+    events = [{"name": "a", "start_frame": 10, "end_frame": 20}, {"name": "b", "start_frame": 60, "end_frame": 70}]
+    confirmed = [False] * 100
+    # Event a confirmed 5 frames late, event b missed, one false trigger of 10 frames far from both
+    for f in range(15, 25):
+        confirmed[f] = True
+    for f in range(85, 95):
+        confirmed[f] = True
+    scores = score_detections(confirmed, events, fps=10, tolerance=1)
+    assert scores["latencies"] == [0.5, None]
+    assert scores["missed"] == 1
+    assert (scores["false_triggers"], scores["false_trigger_seconds"]) == (1, 1.0)
+
+def test_motion_confirmed_just_before_the_labelled_start_counts_as_detected():
+    events = [{"name": "a", "start_frame": 10, "end_frame": 20}]
+    confirmed = [False] * 8 + [True] * 10 + [False] * 10
+    scores = score_detections(confirmed, events, fps=10, tolerance=0.5)
+    assert scores["latencies"] == [-0.2]
+    assert scores["false_triggers"] == 0
+
+def test_illumination_triggers_are_false_triggers():
+    events = [{"name": "Light flicker", "kind": ILLUMINATION, "start_frame": 10, "end_frame": 20},
+              {"name": "Person", "kind": MOTION, "start_frame": 60, "end_frame": 70}]
+    confirmed = [False] * 100
+    for f in list(range(12, 18)) + list(range(61, 70)):
+        confirmed[f] = True
+    scores = score_detections(confirmed, events, fps=10, tolerance=0)
+    # Only motion events have a latency
+    assert scores["latencies"] == [0.1]
+    assert (scores["illumination_events"], scores["illumination_triggers"]) == (1, 1)
+    assert (scores["false_triggers"], scores["false_trigger_seconds"]) == (1, 0.6)
+
+def test_benchmark_command(tmp_path, capsys):
+    json_path = tmp_path / "results.json"
+    night_video = PROJECT_DIR / "test_videos" / "test_video_2_night.mp4"
+    results = main(["--videos", str(night_video), "--backends", "running_average", "--sizes", "200",
+                    "--thresholds", "0.1", "--json", str(json_path)])
+    assert len(results) == 1
+    assert results[0]["missed"] == 0
+    assert 0 < results[0]["p50_ms"] <= results[0]["p99_ms"] <= results[0]["max_ms"]
+    assert results[0]["cpu_ms_per_frame"] > 0
+    assert json.loads(json_path.read_text())[0]["backend"] == "running_average"
+    assert "test_video_2_night.mp4" in capsys.readouterr().out
@@ -0,0 +1,112 @@
+import pytest
+import numpy as np
+import cv2
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_detection.illumination_filter import IlluminationChangeFilter
+from motion_detection.motion_detector import MotionDetector
+from motion_detection.benchmark import parse_ground_truth, ILLUMINATION
+
+
+def gray_frame(level):
+    return np.full((240, 320), level, dtype=np.uint8)
+
+def foreground(ratio=0.0):
+    fg_mask = np.zeros((240, 320), dtype=np.uint8)
+    fg_mask[:int(240 * ratio)] = 255
+    return fg_mask
+
+@pytest.mark.parametrize("kwargs", [
+    {"max_luminance_shift": 0}, {"settle_shift": -1}, {"settle_frames": 0},
+    {"max_foreground_ratio": 0}, {"max_foreground_ratio": 1.5},
+])
+def test_invalid_parameters_raise_err(kwargs):
+    with pytest.raises(ValueError):
+        IlluminationChangeFilter(**kwargs)
+
+def test_small_motion_in_steady_lighting_is_not_suppressed():
+    illumination_filter = IlluminationChangeFilter()
+    for _ in range(5):
+        assert illumination_filter.update(gray_frame(100), foreground(0.1)) == (False, False)
+    assert (illumination_filter.changes, illumination_filter.suppression_rate) == (0, 0.0)
+
+def test_luminance_jump_is_suppressed_until_it_settles():
+    illumination_filter = IlluminationChangeFilter(settle_frames=3)
+    illumination_filter.update(gray_frame(100), foreground())
+    # The light is switched on: the model re-adapts at once
+    assert illumination_filter.update(gray_frame(160), foreground()) == (True, True)
+    # Suppressed while the luminance settles, then the model re-adapts to the settled lighting
+    assert illumination_filter.update(gray_frame(160), foreground()) == (True, False)
+    assert illumination_filter.update(gray_frame(160), foreground()) == (True, False)
+    assert illumination_filter.update(gray_frame(160), foreground()) == (True, True)
+    assert illumination_filter.update(gray_frame(160), foreground(0.1)) == (False, False)
+    assert illumination_filter.changes == 1
+    assert illumination_filter.suppression_rate == pytest.approx(4 / 6)
+
+def test_flickering_light_keeps_suppressing():
+    illumination_filter = IlluminationChangeFilter(settle_frames=2)
+    illumination_filter.update(gray_frame(100), foreground())
+    for level in (150, 90, 160, 100):
+        assert illumination_filter.update(gray_frame(level), foreground()) == (True, True)
+    # A single lighting change until the luminance settles
+    assert illumination_filter.changes == 1
+    assert illumination_filter.settling
+
+def test_frame_wide_foreground_is_a_lighting_change():
+    illumination_filter = IlluminationChangeFilter(max_foreground_ratio=0.35)
+    illumination_filter.update(gray_frame(100), foreground())
+    assert illumination_filter.update(gray_frame(102), foreground(0.5)) == (True, True)
+
+def test_foreground_ratio_is_relative_to_the_roi():
+    roi_mask = np.zeros((240, 320), dtype=np.uint8)
+    roi_mask[:48] = 255
+    illumination_filter = IlluminationChangeFilter(max_foreground_ratio=0.35)
+    # 10% of the frame is foreground, but half of the ROI
+    assert illumination_filter.update(gray_frame(100), foreground(0.1), roi_mask) == (True, True)
+
+def test_reset_forgets_the_last_luminance():
+    illumination_filter = IlluminationChangeFilter()
+    illumination_filter.update(gray_frame(100), foreground())
+    illumination_filter.reset()
+    assert illumination_filter.update(gray_frame(200), foreground()) == (False, False)
+
+
+@pytest.fixture(scope="module")
+def day_video_detections():
+    """Motion found by the KNN backend in each frame of the day video, with lighting changes suppressed."""
+    video_path = PROJECT_DIR / "test_videos" / "test_video_1_day.mp4"
+    cap = cv2.VideoCapture(str(video_path))
+    _, frame = cap.read()
+    motion_detector = MotionDetector(backend="knn", illumination_filter=IlluminationChangeFilter())
+    motion_detector.setup(frame, size=350)
+    motion_detector.initialize_model(frame)
+    detected = [False]
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        detected.append(motion_detector.detect_motion(frame)[0])
+    cap.release()
+    return detected, motion_detector.illumination_filter
+
+def test_light_flickers_are_not_motion(day_video_detections):
+    detected, illumination_filter = day_video_detections
+    events = parse_ground_truth(PROJECT_DIR / "test_videos" / "test_video_1_day_motion_detection_timing_ground_truth.txt")
+    flickers = [e for e in events if e["kind"] == ILLUMINATION]
+    assert len(flickers) == 3
+    for flicker in flickers:
+        assert not any(detected[flicker["start_frame"]:flicker["end_frame"] + 1]), flicker["name"]
+    assert illumination_filter.changes >= len(flickers)
+    assert 0 < illumination_filter.suppression_rate < 0.2
+
+def test_person_is_still_detected(day_video_detections):
+    detected, _ = day_video_detections
+    # The person walks past the camera from frame 208 to 415
+    assert sum(detected[208:416]) > 0.8 * (416 - 208)
@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_detection.motion_detector import MotionDetector
+
+
+@pytest.fixture
+def motion_detector():
+    """Returns a detector with the cheapest backend: confirmation does not depend on the backend."""
+    return MotionDetector(backend="running_average")
+
+def confirmations(motion_detector, detections, fps, confirm, release=0.0):
+    """Feeds per-frame motion (True/False) at fps frames per second, returns whether motion is confirmed at each frame."""
+    return [motion_detector.update_confirmation(detected, frame_number / fps, confirm, release)
+            for frame_number, detected in enumerate(detections)]
+
+def test_motion_is_confirmed_after_the_threshold_in_seconds(motion_detector):
+    confirmed = confirmations(motion_detector, [True] * 30, fps=10, confirm=1.0)
+    # Frame 10 is 1 second after the first frame with motion
+    assert confirmed.index(True) == 10
+    assert all(confirmed[10:])
+
+@pytest.mark.parametrize("fps", [5, 15, 30])
+def test_confirmation_delay_does_not_depend_on_the_frame_rate(fps):
+    confirmed = confirmations(MotionDetector(backend="running_average"), [True] * (3 * fps), fps=fps, confirm=2.0)
+    assert confirmed.index(True) / fps == pytest.approx(2.0)
+
+def test_interrupted_motion_is_not_confirmed(motion_detector):
+    detections = ([True] * 8 + [False]) * 4
+    assert not any(confirmations(motion_detector, detections, fps=10, confirm=1.0))
+
+def test_release_hysteresis_bridges_short_gaps(motion_detector):
+    detections = [True] * 10 + [False] * 4 + [True] * 5 + [False] * 20
+    confirmed = confirmations(motion_detector, detections, fps=10, confirm=0.5, release=1.0)
+    assert confirmed.index(True) == 5
+    # The 0.4 second gap does not release the motion
+    assert all(confirmed[5:19])
+    # Released 1 second after the last frame with motion
+    assert confirmed[19:29] == [True] * 10
+    assert not any(confirmed[29:])
+
+def test_motion_released_at_first_frame_without_motion_by_default(motion_detector):
+    confirmed = confirmations(motion_detector, [True] * 10 + [False] * 2, fps=10, confirm=0.5)
+    assert confirmed[9] and not confirmed[10]
+
+def test_detect_motion_with_threshold_uses_frame_timestamps(motion_detector):
+    """
+    Test that with the capture timestamps, motion in a synthetic scene is confirmed after the threshold
+    in video time, however long each frame takes to process.
+    """
+    background = np.full((240, 320, 3), 100, dtype=np.uint8)
+    moving = background.copy()
+    moving[80:160, 100:200] = 250
+    motion_detector.setup(background, 160)
+    motion_detector.initialize_model(background)
+    frames = [background] * 5 + [moving] * 20
+    confirmed = [motion_detector.detect_motion_with_threshold(frame, motion_detected_threshold=0.5,
+                                                              timestamp=frame_number / 10)
+                 for frame_number, frame in enumerate(frames)]
+    assert confirmed.index(True) == 10
+
+def test_initialize_model_resets_confirmation(motion_detector):
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    motion_detector.setup(frame, 160)
+    confirmations(motion_detector, [True] * 10, fps=10, confirm=0.5)
+    assert motion_detector.motion_confirmed
+    motion_detector.initialize_model(frame)
+    assert not motion_detector.motion_confirmed
+    assert motion_detector.motion_since is None
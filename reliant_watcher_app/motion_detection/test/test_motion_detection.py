@@ -4,6 +4,7 @@ import cv2
 from pathlib import Path
 import sys
 import math
+import ctypes
 
 # # Determine the parent directory
 PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
@@ -12,6 +13,9 @@ PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(PROJECT_DIR))
 
 from motion_detection.motion_detector import MotionDetector  # or wherever the class is defined
+from motion_detection.motion_zones import motion_zones_mask
+from motion_detection.static_scene_gate import StaticSceneGate
+from motion_detection.background_subtractors import save_model, load_model
 
 
 @pytest.fixture
@@ -90,6 +94,192 @@ def test_motion_det_with_thres_before_init_model_raises_err(motion_detector, vid
         pytest.fail(f"motion_detection_with_threshold() raised an exception unexpectedly: {e}")
     cap.release()
 
+@pytest.mark.parametrize("threads", [1, 4])
+def test_multithreaded_subtractor_detects_motion(video_capture, threads):
+    """
+    Test that SuBSENSE split across several threads finds the motion of the day video
+    and writes the foreground mask into the preallocated buffer.
+    """
+    motion_detector = MotionDetector(threads=threads)
+    assert motion_detector.subtractor.nThreads == threads
+    cap = video_capture()
+    motion_detector.setup(cap.read()[1], 350)
+    motion_detector.initialize_model(cap.read()[1])
+    frames_with_motion = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        motion_detected, _, fg_mask = motion_detector.detect_motion(frame)
+        assert fg_mask is motion_detector.fg_mask
+        frames_with_motion += motion_detected
+    cap.release()
+    assert frames_with_motion > 0
+
+@pytest.mark.parametrize("threads", [2, 4])
+def test_multithreaded_subtractor_matches_single_threaded(video_capture, threads):
+    """
+    Test that SuBSENSE split across several threads computes the same foreground masks as on one thread.
+    The bands of the image draw their random numbers from their own generators, so the masks are not
+    identical: they differ no more than two single-threaded runs, whose rand() sequences differ too.
+    """
+    cap = video_capture()
+    frames = []
+    for _ in range(100):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(cv2.resize(frame, (200, 150), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY))
+    cap.release()
+
+    def masks(threads):
+        subtractor = MotionDetector(threads=threads).subtractor
+        subtractor.initialize(frames[0], np.full_like(frames[0], 255))
+        return [subtractor.apply(frame).copy() for frame in frames[1:]]
+
+    single_threaded = masks(1)
+    noise = np.mean([np.mean(a != b) for a, b in zip(single_threaded, masks(1))])
+    difference = np.mean([np.mean(a != b) for a, b in zip(single_threaded, masks(threads))])
+    assert difference <= 2 * noise + 0.005, \
+        f"{threads} threads: {difference:.2%} of the mask pixels differ (single-threaded runs: {noise:.2%})."
+
+def test_subsense_model_round_trip(video_capture, tmp_path):
+    """
+    Test that a SuBSENSE model saved and loaded into a new subtractor (initialized with the same frame size
+    and ROI) computes the same foreground masks from then on as the model it was saved from.
+    rand() is seeded before each frame, as the model update draws random numbers from it.
+    """
+    libc = ctypes.CDLL(None)
+    cap = video_capture()
+    frames = [cv2.cvtColor(cv2.resize(cap.read()[1], (200, 150), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+              for _ in range(70)]
+    cap.release()
+    roi = np.full_like(frames[0], 255)
+    roi[:20] = 0
+    subtractor = MotionDetector().subtractor
+    subtractor.initialize(frames[0], roi)
+    for frame in frames[1:50]:
+        subtractor.apply(frame)
+    path = tmp_path / "camera_0_subsense.yml.gz"
+    save_model(subtractor, path)
+
+    restarted = MotionDetector().subtractor
+    restarted.initialize(frames[50], roi)
+    load_model(restarted, path)
+    np.testing.assert_array_equal(restarted.getBackgroundImage(), subtractor.getBackgroundImage())
+    for frame in frames[50:]:
+        libc.srand(7)
+        expected = subtractor.apply(frame)
+        libc.srand(7)
+        np.testing.assert_array_equal(restarted.apply(frame), expected)
+
+def test_subsense_model_keeps_its_adapted_lbsp_thresholds(video_capture, tmp_path):
+    """
+    Test that the LBSP thresholds SuBSENSE lowered on a textureless scene are restored with the model:
+    the restarted subtractor then describes a textured frame like the model it was saved from.
+    """
+    libc = ctypes.CDLL(None)
+    cap = video_capture()
+    textured = cv2.cvtColor(cv2.resize(cap.read()[1], (200, 150), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    cap.release()
+    flat = np.full_like(textured, 128)
+    roi = np.full_like(flat, 255)
+    subtractor = MotionDetector().subtractor
+    subtractor.initialize(flat, roi)
+    # No LBSP descriptor bit is set on a flat frame: the thresholds are lowered on every frame
+    for _ in range(30):
+        subtractor.apply(flat)
+    path = tmp_path / "camera_0_subsense.yml.gz"
+    save_model(subtractor, path)
+
+    restarted = MotionDetector().subtractor
+    restarted.initialize(flat, roi)
+    load_model(restarted, path)
+    libc.srand(7)
+    expected = subtractor.apply(textured)
+    libc.srand(7)
+    np.testing.assert_array_equal(restarted.apply(textured), expected)
+
+def test_subsense_model_of_another_roi_is_not_loaded(video_capture, tmp_path):
+    cap = video_capture()
+    frame = cv2.cvtColor(cv2.resize(cap.read()[1], (200, 150), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    cap.release()
+    subtractor = MotionDetector().subtractor
+    subtractor.initialize(frame, np.full_like(frame, 255))
+    path = tmp_path / "camera_0_subsense.yml.gz"
+    save_model(subtractor, path)
+    roi = np.zeros_like(frame)
+    roi[:75] = 255
+    other = MotionDetector().subtractor
+    other.initialize(frame, roi)
+    background = other.getBackgroundImage()
+    with pytest.raises(RuntimeError, match="another ROI"):
+        load_model(other, path)
+    # The model is left as it was
+    np.testing.assert_array_equal(other.getBackgroundImage(), background)
+
+def test_gated_detector_confirms_motion_and_skips_quiet_frames(video_capture):
+    """
+    Test that with the static scene gate, motion is still confirmed in the day video
+    while SuBSENSE skips frames of the quiet stretches.
+    """
+    gate = StaticSceneGate()
+    motion_detector = MotionDetector(gate=gate)
+    cap = video_capture()
+    motion_detector.setup(cap.read()[1], 350)
+    motion_detector.initialize_model(cap.read()[1])
+    confirmed = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        confirmed += motion_detector.detect_motion_with_threshold(frame, motion_detected_threshold=0.1)
+    cap.release()
+    assert confirmed > 0
+    assert gate.frames_gated > 0
+
+def test_excluded_zone_never_detects_motion(video_capture):
+    """
+    Test that including only a corner where nothing moves (the rest of the frame is excluded) stops
+    motion detection, and that the foreground mask is empty outside the zones.
+    """
+    motion_detector = MotionDetector()
+    cap = video_capture()
+    motion_detector.setup(cap.read()[1], 350)
+    motion_detector.set_motion_zones([{"kind": "include", "points": [[0, 0], [0.05, 0], [0.05, 0.05]]}])
+    motion_detector.initialize_model(cap.read()[1])
+    for _ in range(100):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        motion_detected, _, fg_mask = motion_detector.detect_motion(frame)
+        assert not motion_detected
+        assert not fg_mask[motion_detector.roi_mask == 0].any()
+    cap.release()
+
+def test_zones_leaving_no_area_raise_err(motion_detector):
+    motion_detector.setup(np.zeros((480, 640, 3), dtype=np.uint8), 350)
+    with pytest.raises(ValueError):
+        motion_detector.set_motion_zones([{"kind": "exclude", "points": [[0, 0], [1, 0], [1, 1], [0, 1]]}])
+    assert motion_detector.roi_mask is None
+
+def test_motion_zones_mask():
+    # No zone: the whole frame
+    assert motion_zones_mask([], (40, 30)).all()
+    mask = motion_zones_mask([{"kind": "include", "points": [[0, 0], [0.5, 0], [0.5, 1], [0, 1]]},
+                              {"kind": "exclude", "points": [[0, 0], [0.25, 0], [0.25, 0.5], [0, 0.5]]}],
+                             (40, 30))
+    assert mask.shape == (30, 40) and mask.dtype == np.uint8
+    assert mask[20, 15] == 255  # Included
+    assert mask[5, 5] == 0  # Excluded inside the include zone
+    assert mask[15, 35] == 0  # Outside the include zone
+
+def test_motion_zones_mask_rejects_bad_zones():
+    with pytest.raises(ValueError):
+        motion_zones_mask([{"kind": "ignore", "points": [[0, 0], [1, 0], [1, 1]]}], (40, 30))
+    with pytest.raises(ValueError):
+        motion_zones_mask([{"kind": "include", "points": [[0, 0], [1, 0]]}], (40, 30))
+
 # # -----------------------------------------------------------------------------
 # # TESTS FOR CLASS METHODS (low-level checks)
 # # -----------------------------------------------------------------------------
@@ -312,7 +502,10 @@ def test_detect_motion_with_threshold_ok(motion_detector, video_capture, video_p
         if not ret:
             break 
         # detect_motion_with_threshold returns a boolean.
-        motion_detected = motion_detector.detect_motion_with_threshold(frame, motion_detected_threshold)
+        # Frames are timestamped with their position in the video, as the capture process timestamps them
+        timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        motion_detected = motion_detector.detect_motion_with_threshold(frame, motion_detected_threshold,
+                                                                       timestamp=timestamp)
         if motion_detected and step == 0:
             start_frame_cnt = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
             step = 1
@@ -0,0 +1,86 @@
+import pytest
+import numpy as np
+import cv2
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_detection.static_scene_gate import StaticSceneGate
+
+
+def quiet_frame():
+    return np.full((480, 640, 3), 100, dtype=np.uint8)
+
+def frame_with_object(x0=300, y0=200, size=40):
+    frame = quiet_frame()
+    frame[y0:y0 + size, x0:x0 + size] = 200
+    return frame
+
+@pytest.mark.parametrize("kwargs", [
+    {"grid_width": 0}, {"threshold": 0}, {"maintenance_interval": 0}, {"hold_frames": -1},
+])
+def test_invalid_parameters_raise_err(kwargs):
+    with pytest.raises(ValueError):
+        StaticSceneGate(**kwargs)
+
+def test_quiet_scene_gets_reduced_rate_maintenance():
+    gate = StaticSceneGate(maintenance_interval=5, hold_frames=0)
+    # The first frame always goes to the subtractor
+    assert gate.needs_update(quiet_frame())
+    passed = [gate.needs_update(quiet_frame()) for _ in range(20)]
+    assert passed == [False, False, False, False, True] * 4
+    assert (gate.frames_passed, gate.frames_gated) == (5, 16)
+
+def test_change_passes_on_the_same_frame():
+    gate = StaticSceneGate(maintenance_interval=100, hold_frames=3)
+    # The first frame goes to the subtractor, and the hold_frames frames after it
+    assert [gate.needs_update(quiet_frame()) for _ in range(5)] == [True, True, True, True, False]
+    # No latency: the first frame with a change goes to the subtractor
+    assert gate.needs_update(frame_with_object())
+    # Then the scene is held active for hold_frames frames, before being gated again
+    assert [gate.needs_update(frame_with_object()) for _ in range(5)] == [True, True, True, False, False]
+
+def test_motion_found_by_subtractor_keeps_the_gate_open():
+    gate = StaticSceneGate(maintenance_interval=100, hold_frames=0)
+    gate.needs_update(quiet_frame())
+    assert all(gate.needs_update(quiet_frame(), motion_detected=True) for _ in range(5))
+    assert not gate.needs_update(quiet_frame())
+
+def test_slow_change_is_caught_against_the_last_frame_passed():
+    gate = StaticSceneGate(threshold=6, maintenance_interval=100, hold_frames=0)
+    gate.needs_update(quiet_frame())
+    # Each frame differs from the previous one by 2 gray levels only, but the change accumulates
+    passed = [gate.needs_update(np.full((480, 640, 3), 100 + 2 * i, dtype=np.uint8)) for i in range(1, 6)]
+    assert passed == [False, False, False, True, False]
+
+def test_changes_outside_the_motion_zones_are_ignored():
+    gate = StaticSceneGate(maintenance_interval=100, hold_frames=0)
+    # Motion zones mask at the analyzed size: only the left half of the frame is watched
+    roi_mask = np.zeros((262, 350), dtype=np.uint8)
+    roi_mask[:, :175] = 255
+    gate.set_roi_mask(roi_mask)
+    gate.needs_update(quiet_frame())
+    assert not gate.needs_update(frame_with_object(x0=500))
+    assert gate.needs_update(frame_with_object(x0=100))
+
+def test_gate_passes_the_motion_of_the_day_video():
+    """Every motion of the day video starts on a frame the gate passes to the subtractor."""
+    cap = cv2.VideoCapture(str(PROJECT_DIR / "test_videos" / "test_video_1_day.mp4"))
+    gate = StaticSceneGate()
+    passed = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        passed.append(gate.needs_update(frame))
+    cap.release()
+    # Frames at which the motions start, see the ground truth file
+    for start_frame in (102, 141, 208, 469):
+        assert passed[start_frame], f"Motion starting at frame {start_frame} was gated."
+    # The quiet stretches are mostly skipped
+    assert sum(passed) < 0.8 * len(passed)
@@ -1 +1,5 @@
-from .motion_triggered_recording import motion_triggered_recording_main
\ No newline at end of file
+from .motion_triggered_recording import motion_triggered_recording_main
+from .pre_roll_buffer import PreRollBuffer, pre_roll_memory_cap
+from .recording_engine import RecordingEngine, select_preset, measure_encode_fps
+from .recording_writer import RecordingWriter, DROP_POLICIES, DROP_OLDEST, DROP_NEWEST, DROP_KEYFRAME_PRESERVING
+from .recording_schedule import RecordingSchedule
@@ -1,118 +1,240 @@
-import numpy as np 
-from multiprocessing import shared_memory 
 import time
+from collections import deque
 from datetime import datetime
-import subprocess 
 from pathlib import Path 
+from frame_buffer import FrameRingBuffer
+from .pre_roll_buffer import pre_roll_memory_cap
+from .recording_engine import RecordingEngine, select_preset
+from .recording_writer import RecordingWriter, DROP_KEYFRAME_PRESERVING
+from .recording_schedule import RecordingSchedule, START, SPLIT, END
 
+# Maximum time (in seconds) to block waiting for a frame before re-checking the shared flags.
+FRAME_WAIT_TIMEOUT = 0.5
+# Duration (in seconds) of capture the recording writer's frame queue can hold.
+FRAME_QUEUE_SECONDS = 1.0
+# Maximum time (in seconds) spent at shutdown handing the last completed videos to the database process.
+DB_HANDOFF_TIMEOUT = 5.0
+# Directory the videos are recorded in.
+VIDEO_DIR = Path(__file__).parent.parent / "video_recordings"
 
-def ffmpeg_parameters(resolution: tuple, file_path: Path, target_fps: float):
+
+def video_file_name(directory: Path, now: datetime = None):
     """
-    Construct the FFmpeg command parameters for video recording.
+    Return the file name of a new video, based on the time it starts (format: YYYY-MM-DD_HH-MM-SS_mmm.mp4).
+
+    The milliseconds keep the names of videos started within the same second apart, and a counter suffix
+    the name of a video started at the time of an existing file (e.g. after the clock was set back). The
+    names still sort like the start times, which the database's date search relies on.
 
     Parameters:
-        resolution (tuple): Desired video resolution (width, height).
-        file_path (Path): The path where the output video will be saved.
-        target_fps (float): The frame rate of the output video.
+        directory (Path): Directory the video is recorded in.
+        now (datetime): Start time of the video (None: the current time).
 
     Returns:
-        list: A list of FFmpeg command line arguments.
+        str: The file name, of no existing file of directory.
     """
-    return [
-        "ffmpeg",
-        "-loglevel", "error",         # Suppress all log messages except errors
-        "-f", "rawvideo",              # Specify raw video format input
-        "-vcodec", "rawvideo",         # Use raw video codec for input
-        "-pix_fmt", "bgr24",           # Pixel format used by OpenCV (BGR format)
-        "-s", f"{resolution[0]}x{resolution[1]}",  # Set video resolution (width x height)
-        "-r", str(target_fps),         # Set the output frame rate
-        "-i", "-",                   # Read input from standard input (pipe)
-        "-c:v", "libx264",             # Use H.264 codec for video compression
-        "-preset", "slow",             # Use a slower preset for a better quality/speed trade-off
-        "-crf", "23",                  # Set the Constant Rate Factor (lower means better quality)
-        "-y", file_path,               # Overwrite the output file if it exists
-    ]
-    
+    stem = (now or datetime.now()).strftime("%Y-%m-%d_%H-%M-%S_%f")[:-3]
+    file_name = f"{stem}.mp4"
+    suffix = 1
+    while (directory / file_name).exists():
+        file_name = f"{stem}_{suffix}.mp4"
+        suffix += 1
+    return file_name
+
+
+def publish_completed_recordings(shared_state, completed: list, incidents: dict, pending: deque):
+    """
+    Share the file names of completed recordings, and of their incidents, for database logging.
 
-def motion_triggered_recording_main(shm_name: str, frame_shape: tuple, shared_dict: dict, event_dict: dict, 
-                                      barrier_dict: dict, recording_length: int, resolution: tuple):
+    The database process logs one video at a time: a video is shared only once the previous one has been
+    logged (MTR_db_permission cleared). Until then, the completed videos wait in pending, so none is lost
+    when several are completed at once (e.g. the closing and the current video at shutdown).
+
+    Parameters:
+        shared_state (SharedState): Shared memory block of flags and data shared across processes.
+        completed (list): Paths of the completed video files.
+        incidents (dict): File name of each video not completed yet -> file name of the first video
+            of its incident. The entries of the completed videos are removed.
+        pending (deque): (file name, incident name) of the completed videos not shared yet, oldest first.
+    """
+    for file_path in completed:
+        file_name = Path(file_path).name
+        pending.append((file_name, incidents.pop(file_name, file_name)))
+        print(f"Recording {file_name} completed.")
+    if pending and not shared_state["MTR_db_permission"]:
+        file_name, incident_name = pending.popleft()
+        # Set permission flags and share the recorded video's file name for database logging.
+        shared_state["MTR_video_name_to_db"] = file_name
+        shared_state["MTR_incident_to_db"] = incident_name
+        shared_state["MTR_db_permission"] = True
+
+
+def encode_captured_frames(frame_ring, encoder, last_frame_number: int):
+    """
+    Encode every frame captured since the last encoded frame, exactly once and in capture order.
+
+    Each frame is copied once, straight from its slot of the frame ring buffer into the encoder's
+    frame, and is encoded with its capture timestamp. A frame overwritten by the capture process
+    before it could be copied is skipped.
+
+    Parameters:
+        frame_ring (FrameRingBuffer): The shared memory frame ring buffer.
+        encoder (RecordingWriter or RecordingEngine): The encoder.
+        last_frame_number (int): Frame number of the last frame already encoded.
+
+    Returns:
+        tuple: (frame number of the last frame encoded, its capture timestamp or None if no frame
+        was encoded, paths of the video files completed, number of frames skipped).
+    """
+    last_timestamp = None
+    completed = []
+    skipped = 0
+    for frame_number in range(last_frame_number + 1, frame_ring.latest_frame_number() + 1):
+        last_frame_number = frame_number
+        frame_view = frame_ring.frame_view(frame_number)
+        if frame_view is None:
+            # The frame was overwritten before this process could encode it.
+            skipped += 1
+            continue
+        timestamp, view, seq = frame_view
+        video_frame = encoder.to_video_frame(view)
+        # The copy is valid only if the capture process did not touch the slot meanwhile.
+        if not frame_ring.is_unchanged(frame_number, seq):
+            skipped += 1
+            continue
+        completed += encoder.encode(video_frame, timestamp)
+        last_timestamp = timestamp
+    return last_frame_number, last_timestamp, completed, skipped
+
+
+def motion_triggered_recording_main(shm_name: str, frame_shape: tuple, shared_state, event_dict: dict, 
+                                      barrier_dict: dict, frame_notifier, post_roll_seconds: float,
+                                      max_segment_seconds: float, resolution: tuple, frame_rate: float = 20.0,
+                                      pre_roll_seconds: float = 3.0, pre_roll_max_bytes: int = None,
+                                      drop_policy: str = DROP_KEYFRAME_PRESERVING, fragmented_mp4: bool = True):
     """
     Main function for motion-triggered video recording.
 
-    This function reads frames from a shared memory buffer, waits for a motion detection
-    signal, and when motion is detected, it records a video segment using FFmpeg.
+    This function encodes every frame captured into the shared memory frame ring buffer exactly once,
+    with its capture timestamp, using a long-lived in-process encoder (RecordingEngine). When motion
+    is detected, an incident starts and the encoded stream is recorded, starting with the encoded
+    pre-roll so the recording includes the seconds before motion was confirmed. The recording goes on
+    while motion is detected or objects are in the scene, plus a post-roll, and is split into segments
+    of at most max_segment_seconds (see RecordingSchedule). Each segment is logged in the database as a
+    video of the incident. The encoder preset is chosen at start-up from the measured encode
+    throughput, so encoding keeps up with real time.
+
+    Frames are encoded by a writer thread fed through a bounded queue (RecordingWriter), so a slow
+    encoder never stalls this process: frames are dropped instead, and the numbers of dropped and
+    late frames are shared as "MTR_dropped_frames" and "MTR_late_frames".
     
     Parameters:
-        shm_name (str): Name of the shared memory block containing video frames.
+        shm_name (str): Name of the shared memory frame ring buffer containing video frames.
         frame_shape (tuple): Shape (dimensions) of the video frame.
-        shared_dict (dict): Dictionary for shared flags and data across processes.
+        shared_state (SharedState): Shared memory block of flags and data shared across processes.
         event_dict (dict): Dictionary for events used to synchronize processes.
         barrier_dict (dict): Dictionary for Barrier objects used for process synchronization.
-        recording_length (int): Duration (in seconds) of the recording.
+        frame_notifier (FrameNotifier): Wakes this process up when a new frame has been captured.
+        post_roll_seconds (float): Duration (in seconds) recorded after the last motion or detected object.
+        max_segment_seconds (float): Maximum duration (in seconds) of one video file.
         resolution (tuple): Resolution (width, height) for the output video.
+        frame_rate (float): Nominal capture frame rate, used to tune the encoder.
+        pre_roll_seconds (float): Duration (in seconds) of video kept from before motion is confirmed.
+        pre_roll_max_bytes (int): Memory cap of the pre-roll buffer (defaults to the cap for the resolution and
+            the pre-roll duration).
+        drop_policy (str): Which frame to drop when the encoder falls behind (see recording_writer.DROP_POLICIES).
+        fragmented_mp4 (bool): Whether to record fragmented MP4 files, which the dashboard can play while
+            they are downloaded and which stay playable if recording is interrupted.
     """
-    # Access the existing shared memory block by its name.
-    shm = shared_memory.SharedMemory(name=shm_name, create=False)
-    # Create a NumPy array that maps to the shared memory buffer to get the current video frame.
-    shared_frame = np.ndarray(frame_shape, dtype=np.uint8, buffer=shm.buf)
+    # Access the existing frame ring buffer by its name.
+    frame_ring = FrameRingBuffer(shm_name, frame_shape, create=False)
+
+    # Choose the encoder preset by measuring the encode throughput on a captured frame.
+    sample = frame_ring.read_latest()
+    preset = select_preset(resolution, frame_rate, sample_frame=sample[2] if sample is not None else None)
+    print(f"Recording with encoder preset '{preset}'.")
+    # Long-lived encoder, which also keeps the encoded frames captured before motion is confirmed.
+    if pre_roll_max_bytes is None:
+        pre_roll_max_bytes = pre_roll_memory_cap(resolution, pre_roll_seconds)
+    engine = RecordingEngine(resolution, frame_rate, preset=preset,
+                             pre_roll_seconds=pre_roll_seconds, pre_roll_max_bytes=pre_roll_max_bytes,
+                             fragmented=fragmented_mp4)
+    # Writer thread feeding the encoder, so encoding never blocks this loop.
+    writer = RecordingWriter(engine, max_queued_frames=max(1, int(frame_rate * FRAME_QUEUE_SECONDS)),
+                             drop_policy=drop_policy)
+    schedule = RecordingSchedule(post_roll_seconds, max_segment_seconds)
+    # Frames overwritten in the ring buffer before they could be queued.
+    skipped_frames = 0
+    last_frame_number = frame_ring.latest_frame_number()
+    # File name of the first video of the current incident, and the incident of each video not completed yet.
+    incident_name = None
+    incidents = {}
+    # Completed videos waiting for the database process to log the previous ones.
+    pending_videos = deque()
+
+    def start_segment():
+        """Start recording the next video file of the incident and return its file name."""
+        file_name = video_file_name(VIDEO_DIR)
+        # Construct the file path where the video will be saved.
+        file_path = VIDEO_DIR / file_name
+        writer.start_segment(file_path)
+        incidents[file_name] = incident_name or file_name
+        # The object detection process aggregates the objects it detects for this file from now on.
+        shared_state["MTR_segment_name"] = file_name
+        return file_name
     
-    # Loop continuously until a stop flag is set in the shared dictionary.
-    while not shared_dict["stop"]:
-        # Check if motion has been detected to trigger recording.
-        if shared_dict["motion_detected"]:
-            # Wait at the "OD_MTR" barrier to synchronize with the object detection process.
-            barrier_dict["OD_MTR"].wait()
-            
-            # Generate a timestamp to be used in the file name.
-            shared_dict["time_stamp"] = datetime.now()
-            # Create a file name based on the current timestamp (format: YYYY-MM-DD_HH-MM-SS.mp4)
-            file_name = f"{shared_dict['time_stamp'].strftime('%Y-%m-%d_%H-%M-%S')}.mp4"
-            # Construct the file path where the video will be saved.
-            file_path = Path(__file__).parent.parent / "video_recordings" / file_name
-            # Define the target frame rate for recording.
-            target_fps = 20.0
-
-            # Build the FFmpeg command using the defined parameters.
-            ffmpeg_cmd = ffmpeg_parameters(resolution, file_path, target_fps)
-
-            # Start the FFmpeg process, with its standard input piped so that frames can be sent.
-            ffmpeg_process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE)
-
-            # Initialize recording variables.
-            frames_recorded = 0
-            total_frames_expected = int(target_fps * recording_length)
-            
-            # Record frames until the expected number of frames is reached or a stop signal is given.
-            while frames_recorded < total_frames_expected and not shared_dict["stop"]:
-                # Set flags to indicate that recording is in progress.
-                shared_dict["recording"] = True
-                event_dict["recording"].set()
-                start_time = time.time()
-                # Write the current frame from shared memory to FFmpeg for encoding.
-                ffmpeg_process.stdin.write(shared_frame.tobytes())
-                frames_recorded += 1
-
-                # Calculate delay to maintain a consistent frame rate.
-                frame_delay = 1 / target_fps  # Expected delay between frames in seconds
-                elapsed_time = time.time() - start_time
-                if elapsed_time < frame_delay:
-                    time.sleep(frame_delay - elapsed_time)
+    # Loop continuously until a stop flag is set in the shared state.
+    while not shared_state["stop"]:
+        # Block until a new frame is captured.
+        frame_notifier.wait("MTR", timeout=FRAME_WAIT_TIMEOUT)
+        last_frame_number, last_timestamp, completed, skipped = encode_captured_frames(frame_ring, writer,
+                                                                                      last_frame_number)
+        publish_completed_recordings(shared_state, completed, incidents, pending_videos)
+        # Share the frame accounting with the other processes.
+        skipped_frames += skipped
+        shared_state["MTR_dropped_frames"] = skipped_frames + writer.dropped_frames
+        shared_state["MTR_late_frames"] = writer.late_frames
+        if last_timestamp is None:
+            continue
 
+        action = schedule.update(last_timestamp, shared_state["motion_detected"], shared_state["objects_in_scene"])
+        if action == START:
+            # Time of the incident, used in the alert message.
+            shared_state["time_stamp"] = datetime.now()
+            # Start recording the encoded stream, beginning with the pre-roll.
+            incident_name = start_segment()
+            # Set flags to indicate that recording is in progress. The event wakes the object detection
+            # process up for the new incident; the frames keep being encoded meanwhile, without waiting for
+            # it to be done with the previous one.
+            shared_state["MTR_incidents"] += 1
+            shared_state["recording"] = True
+            event_dict["recording"].set()
+        elif action == SPLIT:
+            # The incident goes on in a new video file (completed once the encoder has output its last frames).
+            writer.end_segment()
+            start_segment()
+        elif action == END:
+            writer.end_segment()
+            # No video file is recorded until the next incident: the objects detected during this one can be logged.
+            shared_state["MTR_segment_name"] = ""
             # After recording, clear the recording event and reset the recording flag.
             event_dict["recording"].clear()
-            shared_dict["recording"] = False
+            shared_state["recording"] = False
+            incident_name = None
             print("recording ended.")
-            
-            # Close the FFmpeg process's input and wait for the process to complete.
-            ffmpeg_process.stdin.close()
-            ffmpeg_process.wait()
-            # Set permission flags and share the recorded video's file name for database logging.
-            shared_dict["MTR_db_permission"] = True
-            shared_dict["MTR_video_name_to_db"] = file_name
-            # Optionally, you could also share the full path:
-            # shared_dict["MTR_video_path_to_db"] = file_path
-            print("20 sec Recording completed.")
     
-    # Once the loop ends, release resources and close the shared memory connection.
+    # Once the loop ends, complete the last recording, release resources and close the shared memory connection.
+    if schedule.recording:
+        shared_state["MTR_segment_name"] = ""
+        event_dict["recording"].clear()
+        shared_state["recording"] = False
+    publish_completed_recordings(shared_state, writer.close(), incidents, pending_videos)
+    # Hand the last videos to the database process, which keeps logging until this process exits.
+    deadline = time.monotonic() + DB_HANDOFF_TIMEOUT
+    while pending_videos and time.monotonic() < deadline:
+        time.sleep(0.1)
+        publish_completed_recordings(shared_state, [], incidents, pending_videos)
+    if pending_videos:
+        print(f"Recordings not logged in the database: {[file_name for file_name, _ in pending_videos]}")
     print("Recording process exited.")
-    shm.close()
+    frame_ring.close()
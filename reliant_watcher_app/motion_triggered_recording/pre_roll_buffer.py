@@ -0,0 +1,107 @@
+from collections import deque
+
+
+# Bitrate (in bits per second) assumed for the encoded video of each recording resolution (width, height):
+# libx264 at CRF 23 and 20 fps peaked at 0.6, 1.4 and 3 Mbit/s over one second on the test videos, and a
+# real sensor adds noise (at night especially), so about twice that.
+ENCODED_BITRATES = {
+    (640, 480): 1_000_000,
+    (1280, 720): 2_500_000,
+    (1920, 1080): 5_000_000,
+}
+# The pre-roll cap is this many times the size of the pre-roll at the assumed bitrate, so that bursts
+# (a scene full of motion, keyframes) do not evict frames younger than the pre-roll duration.
+PRE_ROLL_BITRATE_HEADROOM = 4
+
+
+def pre_roll_memory_cap(resolution: tuple, pre_roll_seconds: float) -> int:
+    """
+    Return the memory cap of the encoded pre-roll for a resolution and a pre-roll duration:
+    PRE_ROLL_BITRATE_HEADROOM x the assumed bitrate x the duration kept (the pre-roll plus the second
+    the recording engine keeps to start from a keyframe), e.g. 10 MB for 3 s at 1080p.
+
+    Resolutions missing from ENCODED_BITRATES use the bitrate of the smallest listed resolution
+    with at least as many pixels; larger resolutions scale the largest one by their number of pixels.
+
+    Parameters:
+        resolution (tuple): Recording resolution (width, height).
+        pre_roll_seconds (float): Pre-roll duration, in seconds.
+
+    Returns:
+        int: The memory cap in bytes.
+    """
+    pixels = resolution[0] * resolution[1]
+    if resolution in ENCODED_BITRATES:
+        bitrate = ENCODED_BITRATES[resolution]
+    else:
+        by_pixels = sorted(ENCODED_BITRATES.items(), key=lambda item: item[0][0] * item[0][1])
+        (width, height), bitrate = by_pixels[-1]
+        bitrate = bitrate * pixels / (width * height)
+        for (width, height), listed_bitrate in by_pixels:
+            if width * height >= pixels:
+                bitrate = listed_bitrate
+                break
+    return int(PRE_ROLL_BITRATE_HEADROOM * bitrate / 8 * (pre_roll_seconds + 1))
+
+
+class PreRollBuffer:
+    """
+    Bounded buffer of the most recent items (frames) captured before a recording starts.
+
+    Items older than the pre-roll duration are discarded, and the oldest items are also
+    discarded whenever the total size of the buffer would exceed the memory cap.
+    """
+
+    def __init__(self, seconds: float, max_bytes: int):
+        """
+        Parameters:
+            seconds (float): Pre-roll duration to keep, in seconds.
+            max_bytes (int): Memory cap of the buffer, in bytes.
+
+        Raises:
+            ValueError: If seconds is negative or max_bytes is not positive.
+        """
+        if seconds < 0:
+            raise ValueError("Pre-roll duration cannot be negative.")
+        if max_bytes <= 0:
+            raise ValueError("Pre-roll memory cap must be positive.")
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.size_in_bytes = 0
+        self._items = deque()  # (timestamp, item, nbytes), oldest first
+
+    def __len__(self):
+        return len(self._items)
+
+    def append(self, timestamp: float, item, nbytes: int) -> list:
+        """
+        Add an item to the buffer and discard the items that no longer fit.
+
+        Parameters:
+            timestamp (float): Capture time of the item, in seconds.
+            item: The item to store (e.g. a frame).
+            nbytes (int): Size of the item in bytes.
+
+        Returns:
+            list: The discarded items, oldest first, so their memory can be reused.
+        """
+        self._items.append((timestamp, item, nbytes))
+        self.size_in_bytes += nbytes
+        discarded = []
+        while self._items and (self._items[0][0] < timestamp - self.seconds or self.size_in_bytes > self.max_bytes):
+            _, old_item, old_nbytes = self._items.popleft()
+            self.size_in_bytes -= old_nbytes
+            discarded.append(old_item)
+        return discarded
+
+    def drain(self) -> list:
+        """
+        Remove and return all buffered items.
+
+        Returns:
+            list: (timestamp, item) tuples, oldest first.
+        """
+        items = [(timestamp, item) for timestamp, item, _ in self._items]
+        self._items.clear()
+        self.size_in_bytes = 0
+        return items
@@ -0,0 +1,381 @@
+import av
+import io
+from collections import deque
+import numpy as np
+import time
+from fractions import Fraction
+from pathlib import Path
+from .pre_roll_buffer import PreRollBuffer, pre_roll_memory_cap
+
+
+# libx264 presets from the best compression to the fastest encoding.
+PRESET_CANDIDATES = ("slow", "medium", "fast", "faster", "veryfast", "superfast", "ultrafast")
+# A preset is only used if it encodes at least this many times faster than real time, leaving
+# CPU time for the other processes (object detection runs during the same seconds).
+THROUGHPUT_HEADROOM = 1.5
+# Time base of the encoded stream: presentation timestamps are in milliseconds.
+TIME_BASE = Fraction(1, 1000)
+# Number of frames averaged when measuring the encode throughput during operation.
+THROUGHPUT_WINDOW = 50
+# MP4 muxer flags of a fragmented MP4 file: the header (moov) is written first and every keyframe
+# starts a new fragment (moof + mdat), so the file can be played while it is downloaded and stays
+# playable up to its last complete fragment if recording is interrupted.
+FRAGMENTED_MP4_FLAGS = "frag_keyframe+empty_moov+default_base_moof"
+
+
+def _create_encoder(resolution: tuple, target_fps: float, preset: str, crf: int):
+    """
+    Create and open a libx264 encoder.
+
+    The encoder belongs to a stream of an in-memory container that is never written: the stream is
+    only used as the template of the stream of every segment file, so that all segments share the
+    encoder's parameters (SPS/PPS).
+    """
+    holder = av.open(io.BytesIO(), "w", format="mp4")
+    stream = holder.add_stream("libx264", rate=Fraction(target_fps).limit_denominator(1000),
+                               options={"preset": preset, "crf": str(crf)})
+    stream.width, stream.height = resolution
+    stream.pix_fmt = "yuv420p"
+    stream.time_base = TIME_BASE
+    codec_context = stream.codec_context
+    codec_context.time_base = TIME_BASE
+    # One keyframe per second, so a recording can start from the pre-roll at most one second early.
+    codec_context.gop_size = max(1, int(round(target_fps)))
+    # SPS/PPS in the extradata (MP4 "avcC" box) rather than in the stream.
+    codec_context.flags |= av.codec.context.Flags.global_header
+    codec_context.open()
+    return holder, stream
+
+
+def measure_encode_fps(resolution: tuple, preset: str, sample_frame: np.ndarray = None,
+                       num_frames: int = 20, target_fps: float = 20.0, crf: int = 23) -> float:
+    """
+    Measure how many frames per second libx264 encodes with a preset.
+
+    The frames encoded are the sample frame shifted by a few pixels per frame, which simulates
+    motion in a real scene (a static image would be unrealistically cheap to encode).
+
+    Parameters:
+        resolution (tuple): Video resolution (width, height).
+        preset (str): libx264 preset to measure.
+        sample_frame (numpy.ndarray): A captured BGR frame (a synthetic gradient is used if None).
+        num_frames (int): Number of frames to encode.
+        target_fps (float): The frame rate of the video.
+        crf (int): Constant Rate Factor of the encoder.
+
+    Returns:
+        float: The measured encode throughput in frames per second.
+    """
+    width, height = resolution
+    if sample_frame is None:
+        gradient = np.add.outer(np.arange(height), np.arange(width)) % 256
+        sample_frame = np.dstack([gradient, gradient[::-1], gradient[:, ::-1]]).astype(np.uint8)
+    holder, stream = _create_encoder(resolution, target_fps, preset, crf)
+    codec_context = stream.codec_context
+    start_time = time.perf_counter()
+    for i in range(num_frames):
+        video_frame = av.VideoFrame.from_ndarray(np.roll(sample_frame, 4 * i, axis=1), format="bgr24")
+        video_frame.pts = int(i * 1000 / target_fps)
+        video_frame.time_base = TIME_BASE
+        codec_context.encode(video_frame)
+    # Frames held in the encoder's lookahead are part of the cost.
+    codec_context.encode(None)
+    elapsed_time = time.perf_counter() - start_time
+    holder.close()
+    return num_frames / elapsed_time
+
+
+def select_preset(resolution: tuple, target_fps: float, sample_frame: np.ndarray = None,
+                  candidates: tuple = PRESET_CANDIDATES, headroom: float = THROUGHPUT_HEADROOM) -> str:
+    """
+    Choose the libx264 preset with the best compression that still encodes faster than real time.
+
+    The candidates are measured from the slowest to the fastest and the first one whose measured
+    throughput is at least target_fps * headroom is returned. If none is fast enough, the fastest
+    candidate is returned.
+
+    Parameters:
+        resolution (tuple): Video resolution (width, height).
+        target_fps (float): The frame rate of the video.
+        sample_frame (numpy.ndarray): A captured BGR frame used for the measurement.
+        candidates (tuple): Presets to try, from the slowest to the fastest.
+        headroom (float): Required ratio between the encode throughput and the frame rate.
+
+    Returns:
+        str: The selected preset.
+    """
+    for preset in candidates:
+        encode_fps = measure_encode_fps(resolution, preset, sample_frame,
+                                        num_frames=max(10, int(target_fps)), target_fps=target_fps)
+        print(f"Encoder preset '{preset}': {encode_fps:.1f} fps")
+        if encode_fps >= target_fps * headroom:
+            return preset
+    return candidates[-1]
+
+
+class _Segment:
+    """An open segment file and the encoded stream it receives."""
+
+    def __init__(self, file_path: Path, template_stream, base_pts: int, frame_duration: int, fragmented: bool):
+        self.file_path = Path(file_path)
+        options = {"movflags": FRAGMENTED_MP4_FLAGS} if fragmented else {}
+        self.container = av.open(str(self.file_path), "w", format="mp4", options=options)
+        self.stream = self.container.add_stream_from_template(template_stream)
+        # The template copies the codec parameters but not the SPS/PPS of the opened encoder.
+        self.stream.codec_context.extradata = template_stream.codec_context.extradata
+        self.stream.time_base = TIME_BASE
+        # Timestamps of the segment start at 0.
+        self.base_pts = base_pts
+        # Presentation timestamp of the first frame that no longer belongs to the segment.
+        self.end_pts = None
+        # Nominal duration of a frame, otherwise the muxer gives the last frame a zero duration.
+        self.frame_duration = frame_duration
+
+    def mux(self, packet):
+        packet.stream = self.stream
+        if not packet.duration:
+            packet.duration = self.frame_duration
+        packet.pts -= self.base_pts
+        packet.dts -= self.base_pts
+        packet.time_base = TIME_BASE
+        self.container.mux(packet)
+
+    def close(self):
+        self.container.close()
+
+
+class RecordingEngine:
+    """
+    Long-lived in-process H.264 encoder that cuts the encoded stream into segment files.
+
+    Every frame is encoded once, as it arrives, whether or not a recording is in progress, so
+    starting a recording costs neither an FFmpeg process start nor an encoder start-up. While no
+    recording is in progress, the encoded packets of the last seconds are kept in a pre-roll
+    buffer (a few hundred KB instead of a few hundred MB of raw frames); a recording starts at the
+    oldest keyframe in the pre-roll buffer. Ending a recording forces a keyframe on the next frame,
+    so the next recording can start exactly there.
+
+    Because the encoder delays its output by a few frames (lookahead), a segment is only closed
+    once its last packet is out; encode() and close() return the segment files that were
+    completed.
+
+    The encode throughput is measured continuously. If it falls below real time, the encoder is
+    recreated with the next faster preset as soon as no recording is in progress.
+    """
+
+    def __init__(self, resolution: tuple, target_fps: float, preset: str = None, crf: int = 23,
+                 pre_roll_seconds: float = 3.0, pre_roll_max_bytes: int = None,
+                 presets: tuple = PRESET_CANDIDATES, fragmented: bool = False):
+        """
+        Parameters:
+            resolution (tuple): Video resolution (width, height).
+            target_fps (float): Nominal frame rate of the video.
+            preset (str): libx264 preset (selected with select_preset() if None).
+            crf (int): Constant Rate Factor of the encoder (lower means better quality).
+            pre_roll_seconds (float): Duration (in seconds) of video kept from before a recording starts.
+            pre_roll_max_bytes (int): Memory cap of the encoded pre-roll buffer (None: pre_roll_memory_cap()).
+            presets (tuple): Presets the engine can fall back to, from the slowest to the fastest.
+            fragmented (bool): Whether to write fragmented MP4 files (one fragment per keyframe, i.e.
+                per second), which can be played progressively and survive an interrupted recording.
+
+        Raises:
+            ValueError: If the preset is not one of the presets.
+        """
+        self.resolution = tuple(resolution)
+        self.target_fps = target_fps
+        self.crf = crf
+        self.fragmented = fragmented
+        self._frame_duration = int(round(1000 / target_fps))
+        self.presets = presets
+        self.preset = preset if preset is not None else select_preset(self.resolution, target_fps, candidates=presets)
+        if self.preset not in presets:
+            raise ValueError(f"Unknown encoder preset '{self.preset}'.")
+        if pre_roll_max_bytes is None:
+            pre_roll_max_bytes = pre_roll_memory_cap(self.resolution, pre_roll_seconds)
+        # Keep one extra second so that the pre-roll buffer always starts with a keyframe.
+        self._pre_roll = PreRollBuffer(pre_roll_seconds + 1, pre_roll_max_bytes)
+        self._pre_roll_seconds = pre_roll_seconds
+        self._segment = None          # Segment receiving the new packets.
+        self._closing_segments = deque()  # Ended segments still waiting for their last packets, oldest first.
+        self._force_keyframe = False
+        self._origin = None           # Timestamp of the first frame, mapped to pts 0.
+        self._last_pts = -1
+        self._encode_times = []
+        self._open_encoder()
+
+    def _open_encoder(self):
+        self._holder, self._stream = _create_encoder(self.resolution, self.target_fps, self.preset, self.crf)
+        self._codec_context = self._stream.codec_context
+
+    @property
+    def recording(self) -> bool:
+        """Whether a segment is currently being recorded."""
+        return self._segment is not None
+
+    def measured_fps(self) -> float:
+        """Return the encode throughput (frames per second) measured over the last frames (0 if unknown)."""
+        if not self._encode_times:
+            return 0.0
+        return len(self._encode_times) / sum(self._encode_times)
+
+    def start_segment(self, file_path: Path):
+        """
+        Start recording a segment file, beginning with the buffered pre-roll.
+
+        Parameters:
+            file_path (Path): The path where the segment will be saved.
+
+        Raises:
+            RuntimeError: If a segment is already being recorded.
+        """
+        if self._segment is not None:
+            raise RuntimeError("A segment is already being recorded.")
+        packets = [packet for _, packet in self._pre_roll.drain()]
+        # A segment must start with a keyframe: skip the packets before the first one.
+        first_keyframe = next((i for i, packet in enumerate(packets) if packet.is_keyframe), None)
+        if first_keyframe is None:
+            # No usable pre-roll: start the segment with a keyframe on the next frame.
+            self._segment = _Segment(file_path, self._stream, base_pts=None, frame_duration=self._frame_duration,
+                                     fragmented=self.fragmented)
+            self._force_keyframe = True
+            return
+        packets = packets[first_keyframe:]
+        self._segment = _Segment(file_path, self._stream, base_pts=packets[0].pts,
+                                 frame_duration=self._frame_duration, fragmented=self.fragmented)
+        for packet in packets:
+            self._segment.mux(packet)
+
+    def end_segment(self):
+        """
+        Stop recording the current segment after the last frame encoded.
+
+        The segment file is completed (and returned by encode() or close()) once the encoder has
+        output all of its packets.
+        """
+        if self._segment is None:
+            return
+        self._segment.end_pts = self._last_pts + 1
+        # An earlier segment may still be waiting for its last packets (a segment ending soon after the
+        # previous one, with a long lookahead): each one is completed in turn.
+        self._closing_segments.append(self._segment)
+        self._segment = None
+        # The next frame becomes a keyframe, so no frame of the segment references a later frame.
+        self._force_keyframe = True
+
+    @staticmethod
+    def to_video_frame(frame: np.ndarray):
+        """
+        Copy a BGR frame into an encoder frame.
+
+        This is the only copy of the pixels made before encoding, so it can be made straight from a
+        view into shared memory (the view can be released, or checked for changes, right after).
+
+        Parameters:
+            frame (numpy.ndarray): The BGR frame.
+
+        Returns:
+            av.VideoFrame: The encoder frame.
+        """
+        return av.VideoFrame.from_ndarray(frame, format="bgr24")
+
+    def encode(self, frame, timestamp: float) -> list:
+        """
+        Encode a BGR frame.
+
+        The presentation timestamp of the frame is its capture time, so the video has the timing of
+        the capture (with a variable frame rate if the capture rate varies).
+
+        Parameters:
+            frame (numpy.ndarray or av.VideoFrame): The frame to encode (see to_video_frame());
+                must match the engine resolution.
+            timestamp (float): Capture time of the frame in seconds (monotonic clock).
+
+        Returns:
+            list: Paths of the segment files completed while encoding this frame.
+        """
+        if self._origin is None:
+            self._origin = timestamp
+        # Presentation timestamps must increase strictly.
+        pts = max(int(round((timestamp - self._origin) * 1000)), self._last_pts + 1)
+        self._last_pts = pts
+        video_frame = frame if isinstance(frame, av.VideoFrame) else self.to_video_frame(frame)
+        video_frame.pts = pts
+        video_frame.time_base = TIME_BASE
+        if self._force_keyframe:
+            video_frame.pict_type = av.video.frame.PictureType.I
+            self._force_keyframe = False
+            if self._segment is not None and self._segment.base_pts is None:
+                self._segment.base_pts = pts
+
+        start_time = time.perf_counter()
+        packets = self._codec_context.encode(video_frame)
+        self._encode_times.append(time.perf_counter() - start_time)
+        if len(self._encode_times) > THROUGHPUT_WINDOW:
+            del self._encode_times[0]
+
+        completed = self._route(packets)
+        self._adapt_preset()
+        return completed
+
+    def _route(self, packets) -> list:
+        """Send encoded packets to the ending segment, the current segment or the pre-roll buffer."""
+        completed = []
+        for packet in packets:
+            # The first frame after the end of a segment is out: the segment is complete.
+            while self._closing_segments and packet.pts >= self._closing_segments[0].end_pts:
+                completed.append(self._complete_closing_segment())
+            if self._closing_segments:
+                self._mux_to_closing_segment(packet)
+                continue
+            if self._segment is not None and self._segment.base_pts is not None and packet.pts >= self._segment.base_pts:
+                self._segment.mux(packet)
+            else:
+                self._pre_roll.append(packet.pts / 1000, packet, packet.size)
+        return completed
+
+    def _mux_to_closing_segment(self, packet):
+        """Mux a packet of an ended segment into it (the segments end in order, the oldest first)."""
+        segment = self._closing_segments[0]
+        # A segment ended before its first frame was encoded holds no frame
+        if segment.base_pts is not None and packet.pts >= segment.base_pts:
+            segment.mux(packet)
+
+    def _complete_closing_segment(self) -> Path:
+        """Close the oldest ended segment and return its path."""
+        segment = self._closing_segments.popleft()
+        segment.close()
+        return segment.file_path
+
+    def _adapt_preset(self):
+        """Switch to the next faster preset if encoding is slower than real time (only between recordings)."""
+        if len(self._encode_times) < THROUGHPUT_WINDOW or self._segment is not None or self._closing_segments:
+            return
+        if self.measured_fps() >= self.target_fps or self.preset == self.presets[-1]:
+            return
+        self.preset = self.presets[self.presets.index(self.preset) + 1]
+        print(f"Encoding slower than real time, switching to encoder preset '{self.preset}'.")
+        # The packets of the previous encoder cannot be mixed with the new encoder's packets.
+        self._holder.close()
+        self._pre_roll.drain()
+        self._encode_times = []
+        self._open_encoder()
+
+    def close(self) -> list:
+        """
+        Flush the encoder and complete every open segment.
+
+        Returns:
+            list: Paths of the segment files completed.
+        """
+        self.end_segment()
+        completed = []
+        for packet in self._codec_context.encode(None):
+            while self._closing_segments and packet.pts >= self._closing_segments[0].end_pts:
+                completed.append(self._complete_closing_segment())
+            if self._closing_segments:
+                self._mux_to_closing_segment(packet)
+        while self._closing_segments:
+            completed.append(self._complete_closing_segment())
+        self._pre_roll.drain()
+        self._holder.close()
+        return completed
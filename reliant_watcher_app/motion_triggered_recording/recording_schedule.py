@@ -0,0 +1,62 @@
+# Actions returned by RecordingSchedule.update().
+START, SPLIT, END = "start", "split", "end"
+
+
+class RecordingSchedule:
+    """
+    Decides, from capture timestamps, when the recording of an incident starts, rolls over to a new
+    segment and ends.
+
+    An incident starts when motion is detected. It lasts while motion is detected or objects are
+    in the scene, plus post_roll_seconds after the last of them. A long incident is split into
+    consecutive segments of at most max_segment_seconds, so a video file never grows unbounded and
+    the first part of an incident is saved (and logged) while the incident is still going on.
+    """
+
+    def __init__(self, post_roll_seconds: float, max_segment_seconds: float):
+        """
+        Parameters:
+            post_roll_seconds (float): Duration (in seconds) recorded after the last activity.
+            max_segment_seconds (float): Maximum duration (in seconds) of one segment.
+
+        Raises:
+            ValueError: If post_roll_seconds is negative or max_segment_seconds is not positive.
+        """
+        if post_roll_seconds < 0:
+            raise ValueError("Post-roll duration cannot be negative.")
+        if max_segment_seconds <= 0:
+            raise ValueError("Maximum segment duration must be positive.")
+        self.post_roll_seconds = post_roll_seconds
+        self.max_segment_seconds = max_segment_seconds
+        self.recording = False
+        self._segment_start_time = None
+        self._last_activity_time = None
+
+    def update(self, timestamp: float, motion_detected: bool, objects_in_scene: bool = False):
+        """
+        Update the schedule with the state of the scene at a capture time.
+
+        Parameters:
+            timestamp (float): Capture time (in seconds) of the latest frame.
+            motion_detected (bool): Whether motion is detected in the latest frame.
+            objects_in_scene (bool): Whether objects (other than the background objects) are detected.
+
+        Returns:
+            str: START (start the first segment of an incident), SPLIT (end the current segment and
+            start the next one), END (end the last segment of the incident) or None (nothing to do).
+        """
+        if not self.recording:
+            if not motion_detected:
+                return None
+            self.recording = True
+            self._segment_start_time = self._last_activity_time = timestamp
+            return START
+        if motion_detected or objects_in_scene:
+            self._last_activity_time = timestamp
+        if timestamp - self._last_activity_time >= self.post_roll_seconds:
+            self.recording = False
+            return END
+        if timestamp - self._segment_start_time >= self.max_segment_seconds:
+            self._segment_start_time = timestamp
+            return SPLIT
+        return None
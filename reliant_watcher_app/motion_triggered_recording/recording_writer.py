@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+
+# Drop policies applied when a frame arrives while the queue is full:
+#   "oldest"   -> drop the oldest queued frame (the video keeps up with the capture)
+#   "newest"   -> drop the arriving frame (the video keeps the frames already queued)
+#   "keyframe" -> drop the oldest queued frame that is not the first frame of a segment or the first
+#                 frame after a segment ended (those frames become keyframes at the segment cuts),
+#                 so recordings always start and end exactly where they were requested
+DROP_OLDEST, DROP_NEWEST, DROP_KEYFRAME_PRESERVING = "oldest", "newest", "keyframe"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, DROP_KEYFRAME_PRESERVING)
+
+# Queue item kinds.
+_FRAME, _START_SEGMENT, _END_SEGMENT, _CLOSE = range(4)
+
+
+class RecordingWriter:
+    """
+    Feeds a RecordingEngine from a writer thread through a bounded frame queue.
+
+    encode(), start_segment() and end_segment() only queue their work and return immediately, so
+    a slow encoder never blocks the recording process (nor the processes synchronized with it).
+    Segment commands are kept in order with the frames and are never dropped. When the queue
+    already holds max_queued_frames frames, a frame is dropped according to the drop policy.
+
+    Frames dropped from the queue are counted in dropped_frames. Frames the encoder received more
+    than late_after seconds after their capture are counted in late_frames (they are still encoded).
+    """
+
+    def __init__(self, engine, max_queued_frames: int, drop_policy: str = DROP_OLDEST, late_after: float = 1.0):
+        """
+        Parameters:
+            engine (RecordingEngine): The encoder; only used by the writer thread from now on.
+            max_queued_frames (int): Maximum number of frames waiting to be encoded.
+            drop_policy (str): One of DROP_POLICIES.
+            late_after (float): Delay (in seconds) after capture past which an encoded frame is late.
+
+        Raises:
+            ValueError: If max_queued_frames is not positive or the drop policy is unknown.
+        """
+        if max_queued_frames <= 0:
+            raise ValueError("The frame queue must hold at least one frame.")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}'.")
+        self.engine = engine
+        self.max_queued_frames = max_queued_frames
+        self.drop_policy = drop_policy
+        self.late_after = late_after
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self._queue = deque()  # (kind, frame, timestamp, protected) or (kind, file path)
+        self._queued_frames = 0
+        self._protect_next_frame = False
+        self._condition = threading.Condition()
+        self._completed = []
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="recording_writer", daemon=True)
+        self._thread.start()
+
+    def to_video_frame(self, frame):
+        """Copy a BGR frame into an encoder frame (see RecordingEngine.to_video_frame())."""
+        return self.engine.to_video_frame(frame)
+
+    def encode(self, frame, timestamp: float) -> list:
+        """
+        Queue a frame to be encoded, dropping a frame if the queue is full.
+
+        Parameters:
+            frame (numpy.ndarray or av.VideoFrame): The frame to encode. A numpy array must not be
+                modified afterwards (use to_video_frame() to pass a copy).
+            timestamp (float): Capture time of the frame in seconds (monotonic clock).
+
+        Returns:
+            list: Paths of the segment files completed by the writer thread since the last call.
+
+        Raises:
+            RuntimeError: If the writer thread stopped because of an encoder error.
+        """
+        with self._condition:
+            self._check_error()
+            protected = self._protect_next_frame
+            self._protect_next_frame = False
+            if self._queued_frames >= self.max_queued_frames and not self._drop_queued_frame():
+                # Nothing could be dropped from the queue: drop the arriving frame instead.
+                self.dropped_frames += 1
+                if protected:
+                    self._protect_next_frame = True
+            else:
+                self._queue.append((_FRAME, frame, timestamp, protected))
+                self._queued_frames += 1
+                self._condition.notify()
+            return self._take_completed()
+
+    def _drop_queued_frame(self) -> bool:
+        """Drop a queued frame according to the drop policy. Returns False if none may be dropped."""
+        if self.drop_policy == DROP_NEWEST:
+            return False
+        for i, item in enumerate(self._queue):
+            if item[0] == _FRAME and not (self.drop_policy == DROP_KEYFRAME_PRESERVING and item[3]):
+                del self._queue[i]
+                self._queued_frames -= 1
+                self.dropped_frames += 1
+                return True
+        return False
+
+    def start_segment(self, file_path: Path):
+        """Queue the start of a segment file (see RecordingEngine.start_segment())."""
+        self._put_command((_START_SEGMENT, file_path))
+
+    def end_segment(self):
+        """Queue the end of the current segment (see RecordingEngine.end_segment())."""
+        self._put_command((_END_SEGMENT, None))
+
+    def _put_command(self, command):
+        with self._condition:
+            self._check_error()
+            self._queue.append(command)
+            self._protect_next_frame = True
+            self._condition.notify()
+
+    def queued_frames(self) -> int:
+        """Return the number of frames waiting to be encoded."""
+        with self._condition:
+            return self._queued_frames
+
+    def close(self) -> list:
+        """
+        Encode the queued frames, stop the writer thread and close the engine.
+
+        Returns:
+            list: Paths of the segment files completed since the last call to encode().
+
+        Raises:
+            RuntimeError: If the writer thread stopped because of an encoder error.
+        """
+        with self._condition:
+            self._queue.append((_CLOSE, None))
+            self._condition.notify()
+        self._thread.join()
+        with self._condition:
+            self._check_error()
+            return self._take_completed()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise RuntimeError("The recording writer thread stopped.") from self._error
+
+    def _take_completed(self) -> list:
+        completed, self._completed = self._completed, []
+        return completed
+
+    def _run(self):
+        """Writer thread: encode the queued frames and apply the segment commands in order."""
+        try:
+            while True:
+                with self._condition:
+                    while not self._queue:
+                        self._condition.wait()
+                    item = self._queue.popleft()
+                    if item[0] == _FRAME:
+                        self._queued_frames -= 1
+                kind = item[0]
+                if kind == _FRAME:
+                    _, frame, timestamp, _ = item
+                    if time.monotonic() - timestamp > self.late_after:
+                        self.late_frames += 1
+                    completed = self.engine.encode(frame, timestamp)
+                elif kind == _START_SEGMENT:
+                    self.engine.start_segment(item[1])
+                    completed = []
+                elif kind == _END_SEGMENT:
+                    self.engine.end_segment()
+                    completed = []
+                else:
+                    completed = self.engine.close()
+                with self._condition:
+                    self._completed += completed
+                if kind == _CLOSE:
+                    return
+        except Exception as error:
+            with self._condition:
+                self._error = error
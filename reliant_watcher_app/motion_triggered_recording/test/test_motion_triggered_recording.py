@@ -0,0 +1,100 @@
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+import uuid
+from datetime import datetime
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from frame_buffer import FrameRingBuffer
+from collections import deque
+from motion_triggered_recording.motion_triggered_recording import encode_captured_frames, publish_completed_recordings, \
+                                                                 video_file_name
+from motion_triggered_recording.recording_engine import RecordingEngine
+
+FRAME_SHAPE = (48, 64, 3)
+
+
+class EncodedFrames:
+    """Records the frames passed to encode() instead of encoding them."""
+
+    def __init__(self):
+        self.frames = []
+
+    to_video_frame = staticmethod(lambda view: view.copy())
+
+    def encode(self, frame, timestamp):
+        self.frames.append((int(frame[0, 0, 0]), timestamp))
+        return []
+
+
+@pytest.fixture
+def frame_ring():
+    ring = FrameRingBuffer(f"test_mtr_{uuid.uuid4().hex[:8]}", FRAME_SHAPE, num_slots=3, create=True)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+def write_frames(frame_ring, values):
+    for value in values:
+        frame_ring.write(np.full(FRAME_SHAPE, value, dtype=np.uint8), 100.0 + value / 10)
+
+def test_each_frame_is_encoded_once_with_its_timestamp(frame_ring):
+    engine = EncodedFrames()
+    write_frames(frame_ring, [1, 2])
+    last_frame_number, last_timestamp, _, skipped = encode_captured_frames(frame_ring, engine, 0)
+    assert (last_frame_number, last_timestamp, skipped) == (2, 100.2, 0)
+    # No new frame: nothing is encoded again.
+    assert encode_captured_frames(frame_ring, engine, last_frame_number) == (2, None, [], 0)
+    write_frames(frame_ring, [3])
+    encode_captured_frames(frame_ring, engine, last_frame_number)
+    assert engine.frames == [(1, 100.1), (2, 100.2), (3, 100.3)]
+
+def test_overwritten_frames_are_skipped(frame_ring):
+    engine = EncodedFrames()
+    write_frames(frame_ring, [1, 2, 3, 4, 5])
+    last_frame_number, _, _, skipped = encode_captured_frames(frame_ring, engine, 0)
+    assert (last_frame_number, skipped) == (5, 2)
+    assert [value for value, _ in engine.frames] == [3, 4, 5], "Only the frames still in the ring can be encoded."
+
+def test_recording_engine_encodes_from_the_ring(frame_ring, tmp_path):
+    engine = RecordingEngine((FRAME_SHAPE[1], FRAME_SHAPE[0]), 10.0, preset="ultrafast")
+    engine.start_segment(tmp_path / "ring.mp4")
+    last_frame_number = 0
+    for value in range(1, 11):
+        write_frames(frame_ring, [value])
+        last_frame_number, _, _, _ = encode_captured_frames(frame_ring, engine, last_frame_number)
+    assert engine.close() == [tmp_path / "ring.mp4"]
+    assert (tmp_path / "ring.mp4").stat().st_size > 0
+
+def test_completed_videos_are_shared_one_at_a_time():
+    shared_state = {"MTR_db_permission": False, "MTR_video_name_to_db": "", "MTR_incident_to_db": ""}
+    incidents = {"a.mp4": "a.mp4", "b.mp4": "a.mp4"}
+    pending = deque()
+    # Two videos completed at once (e.g. at shutdown): the second waits for the first to be logged
+    publish_completed_recordings(shared_state, [Path("/videos/a.mp4"), Path("/videos/b.mp4")], incidents, pending)
+    assert (shared_state["MTR_video_name_to_db"], shared_state["MTR_db_permission"]) == ("a.mp4", True)
+    publish_completed_recordings(shared_state, [], incidents, pending)
+    assert shared_state["MTR_video_name_to_db"] == "a.mp4"
+    # The database process logged the first video
+    shared_state["MTR_db_permission"] = False
+    publish_completed_recordings(shared_state, [], incidents, pending)
+    assert (shared_state["MTR_video_name_to_db"], shared_state["MTR_incident_to_db"]) == ("b.mp4", "a.mp4")
+    assert shared_state["MTR_db_permission"] and not pending and not incidents
+
+def test_videos_started_within_a_second_have_distinct_file_names(tmp_path):
+    first = video_file_name(tmp_path, datetime(2025, 3, 17, 1, 28, 5, 120000))
+    second = video_file_name(tmp_path, datetime(2025, 3, 17, 1, 28, 5, 870000))
+    assert (first, second) == ("2025-03-17_01-28-05_120.mp4", "2025-03-17_01-28-05_870.mp4")
+    # The file names sort like the start times
+    assert first < second < video_file_name(tmp_path, datetime(2025, 3, 17, 1, 28, 6))
+
+def test_existing_video_is_not_overwritten(tmp_path):
+    start = datetime(2025, 3, 17, 1, 28, 5)
+    (tmp_path / video_file_name(tmp_path, start)).touch()
+    assert video_file_name(tmp_path, start) == "2025-03-17_01-28-05_000_1.mp4"
@@ -0,0 +1,53 @@
+import pytest
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_triggered_recording.pre_roll_buffer import PreRollBuffer, pre_roll_memory_cap
+
+
+def test_items_older_than_pre_roll_are_discarded():
+    pre_roll = PreRollBuffer(seconds=2, max_bytes=1000)
+    for t in range(5):
+        pre_roll.append(float(t), f"frame_{t}", 10)
+    assert [item for _, item in pre_roll.drain()] == ["frame_2", "frame_3", "frame_4"]
+
+def test_memory_cap_discards_oldest_items():
+    pre_roll = PreRollBuffer(seconds=10, max_bytes=25)
+    assert pre_roll.append(0.0, "a", 10) == []
+    assert pre_roll.append(0.1, "b", 10) == []
+    assert pre_roll.append(0.2, "c", 10) == ["a"], "The discarded items should be returned for reuse."
+    assert pre_roll.size_in_bytes == 20
+    assert len(pre_roll) == 2
+
+def test_drain_empties_the_buffer():
+    pre_roll = PreRollBuffer(seconds=1, max_bytes=100)
+    pre_roll.append(1.0, "a", 10)
+    assert pre_roll.drain() == [(1.0, "a")]
+    assert len(pre_roll) == 0
+    assert pre_roll.size_in_bytes == 0
+
+@pytest.mark.parametrize("seconds, max_bytes", [(-1, 100), (1, 0)])
+def test_invalid_parameters_raise_err(seconds, max_bytes):
+    with pytest.raises(ValueError):
+        PreRollBuffer(seconds, max_bytes)
+
+@pytest.mark.parametrize("resolution, expected_cap", [
+    # 4 x 5 Mbit/s x (3 + 1) s of encoded video
+    ((1920, 1080), 10_000_000),
+    ((640, 480), 2_000_000),
+    ((320, 240), 2_000_000),
+    ((1024, 768), 5_000_000),
+    # Beyond the largest listed resolution, the bitrate grows with the number of pixels
+    ((3840, 2160), 40_000_000),
+])
+def test_pre_roll_memory_cap_per_resolution(resolution, expected_cap):
+    assert pre_roll_memory_cap(resolution, pre_roll_seconds=3) == expected_cap
+
+def test_pre_roll_memory_cap_grows_with_the_pre_roll_duration():
+    assert pre_roll_memory_cap((1280, 720), 8) == 3 * pre_roll_memory_cap((1280, 720), 2)
@@ -0,0 +1,142 @@
+import pytest
+import numpy as np
+import av
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_triggered_recording.recording_engine import RecordingEngine, select_preset, measure_encode_fps
+
+RESOLUTION = (160, 120)
+FPS = 20.0
+
+
+def frames(count):
+    """Yield (frame, timestamp) pairs of a moving gradient at FPS."""
+    gradient = (np.add.outer(np.arange(RESOLUTION[1]), np.arange(RESOLUTION[0])) % 256).astype(np.uint8)
+    image = np.dstack([gradient] * 3)
+    for i in range(count):
+        yield np.roll(image, 2 * i, axis=1), 100.0 + i / FPS
+
+def decode(file_path):
+    """Return the presentation times (seconds) of every frame of a video file."""
+    with av.open(str(file_path)) as container:
+        stream = container.streams.video[0]
+        return [float(frame.pts * stream.time_base) for frame in container.decode(stream)]
+
+
+@pytest.fixture
+def engine():
+    return RecordingEngine(RESOLUTION, FPS, preset="ultrafast", pre_roll_seconds=1.0)
+
+def test_segment_starts_with_pre_roll_and_decodes(engine, tmp_path):
+    completed = []
+    for i, (frame, timestamp) in enumerate(frames(120)):
+        if i == 60:
+            engine.start_segment(tmp_path / "event.mp4")
+        if i == 100:
+            engine.end_segment()
+        completed += engine.encode(frame, timestamp)
+    completed += engine.close()
+    assert completed == [tmp_path / "event.mp4"]
+    times = decode(completed[0])
+    # Frames 60 to 99 plus at least one second of pre-roll.
+    assert len(times) >= 40 + FPS
+    assert times[0] == 0, "A segment should start at time 0."
+    assert times == sorted(times)
+
+def test_back_to_back_segments(engine, tmp_path):
+    completed = []
+    for i, (frame, timestamp) in enumerate(frames(100)):
+        if i == 30:
+            engine.start_segment(tmp_path / "first.mp4")
+        if i == 50:
+            engine.end_segment()
+            engine.start_segment(tmp_path / "second.mp4")
+        if i == 70:
+            engine.end_segment()
+        completed += engine.encode(frame, timestamp)
+    completed += engine.close()
+    assert completed == [tmp_path / "first.mp4", tmp_path / "second.mp4"]
+    assert len(decode(completed[0])) >= 20
+    assert len(decode(completed[1])) == 20, "The second segment should hold exactly frames 50 to 69."
+
+def test_close_completes_open_segment(engine, tmp_path):
+    completed = []
+    for i, (frame, timestamp) in enumerate(frames(30)):
+        if i == 5:
+            engine.start_segment(tmp_path / "open.mp4")
+        completed += engine.encode(frame, timestamp)
+    assert not completed
+    assert engine.recording
+    assert engine.close() == [tmp_path / "open.mp4"]
+    assert len(decode(tmp_path / "open.mp4")) == 30
+
+def test_segments_ending_while_an_earlier_one_is_closing(tmp_path):
+    # With a lookahead, the encoder outputs the last packets of a segment several frames after it ended:
+    # the next segments may end before that, and must all be completed in order
+    engine = RecordingEngine(RESOLUTION, FPS, preset="medium", pre_roll_seconds=1.0)
+    names = ["first.mp4", "second.mp4", "third.mp4"]
+    completed = []
+    for i, (frame, timestamp) in enumerate(frames(80)):
+        if i in (30, 32, 34):
+            if engine.recording:
+                engine.end_segment()
+            engine.start_segment(tmp_path / names[(i - 30) // 2])
+        if i == 36:
+            engine.end_segment()
+            # The first segment has not been completed yet: the three are closing at once
+            assert len(engine._closing_segments) == 3
+        completed += engine.encode(frame, timestamp)
+    completed += engine.close()
+    assert completed == [tmp_path / name for name in names]
+    assert [len(decode(path)) for path in completed[1:]] == [2, 2]
+    assert len(decode(completed[0])) >= 2
+
+def test_close_completes_every_closing_segment(tmp_path):
+    engine = RecordingEngine(RESOLUTION, FPS, preset="medium", pre_roll_seconds=1.0)
+    completed = []
+    for i, (frame, timestamp) in enumerate(frames(34)):
+        if i == 30:
+            engine.start_segment(tmp_path / "first.mp4")
+        if i == 32:
+            engine.end_segment()
+            engine.start_segment(tmp_path / "second.mp4")
+        completed += engine.encode(frame, timestamp)
+    assert not completed
+    assert engine.close() == [tmp_path / "first.mp4", tmp_path / "second.mp4"]
+    assert len(decode(tmp_path / "second.mp4")) == 2
+
+def test_start_segment_twice_raises(engine, tmp_path):
+    engine.start_segment(tmp_path / "a.mp4")
+    with pytest.raises(RuntimeError):
+        engine.start_segment(tmp_path / "b.mp4")
+    for frame, timestamp in frames(3):
+        engine.encode(frame, timestamp)
+    engine.close()
+
+def test_unknown_preset_raises():
+    with pytest.raises(ValueError):
+        RecordingEngine(RESOLUTION, FPS, preset="fastest")
+
+def test_measure_encode_fps_is_positive():
+    assert measure_encode_fps(RESOLUTION, "ultrafast", num_frames=5) > 0
+
+def test_select_preset_falls_back_to_fastest_candidate():
+    # No preset can encode a billion times faster than real time.
+    assert select_preset(RESOLUTION, FPS, candidates=("medium", "ultrafast"), headroom=1e9) == "ultrafast"
+    assert select_preset(RESOLUTION, FPS, candidates=("medium", "ultrafast"), headroom=0) == "medium"
+
+def test_presentation_times_follow_capture_timestamps(engine, tmp_path):
+    # Irregular capture: the video must keep the capture timing (variable frame rate).
+    timestamps = [50.0, 50.05, 50.1, 50.3, 50.35, 50.8, 50.85, 50.9]
+    engine.start_segment(tmp_path / "vfr.mp4")
+    for (frame, _), timestamp in zip(frames(len(timestamps)), timestamps):
+        engine.encode(frame, timestamp)
+    engine.close()
+    assert decode(tmp_path / "vfr.mp4") == pytest.approx([t - timestamps[0] for t in timestamps], abs=1e-3)
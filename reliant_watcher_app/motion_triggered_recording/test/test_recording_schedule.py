@@ -0,0 +1,52 @@
+import pytest
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_triggered_recording.recording_schedule import RecordingSchedule, START, SPLIT, END
+
+
+def run(schedule, events):
+    """Feed (timestamp, motion, objects) events and return the (timestamp, action) pairs."""
+    actions = []
+    for timestamp, motion, objects in events:
+        action = schedule.update(timestamp, motion, objects)
+        if action is not None:
+            actions.append((timestamp, action))
+    return actions
+
+def test_no_recording_without_motion():
+    schedule = RecordingSchedule(post_roll_seconds=2, max_segment_seconds=10)
+    assert run(schedule, [(t, False, True) for t in range(5)]) == []
+    assert not schedule.recording
+
+def test_recording_lasts_while_motion_plus_post_roll():
+    schedule = RecordingSchedule(post_roll_seconds=2, max_segment_seconds=100)
+    events = [(t, t <= 5, False) for t in range(12)]
+    assert run(schedule, events) == [(0, START), (7, END)]
+    assert not schedule.recording
+
+def test_objects_in_scene_extend_the_recording():
+    schedule = RecordingSchedule(post_roll_seconds=2, max_segment_seconds=100)
+    events = [(0, True, False)] + [(t, False, t <= 6) for t in range(1, 12)]
+    assert run(schedule, events) == [(0, START), (8, END)]
+
+def test_long_incident_is_split_into_segments():
+    schedule = RecordingSchedule(post_roll_seconds=1, max_segment_seconds=4)
+    events = [(t, t <= 9, False) for t in range(13)]
+    assert run(schedule, events) == [(0, START), (4, SPLIT), (8, SPLIT), (10, END)]
+
+def test_new_incident_after_end():
+    schedule = RecordingSchedule(post_roll_seconds=1, max_segment_seconds=10)
+    events = [(0, True, False), (1, False, False), (2, False, False), (3, True, False)]
+    assert run(schedule, events) == [(0, START), (1, END), (3, START)]
+
+@pytest.mark.parametrize("post_roll_seconds, max_segment_seconds", [(-1, 10), (1, 0)])
+def test_invalid_parameters_raise_err(post_roll_seconds, max_segment_seconds):
+    with pytest.raises(ValueError):
+        RecordingSchedule(post_roll_seconds, max_segment_seconds)
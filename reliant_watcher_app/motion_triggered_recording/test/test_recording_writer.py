@@ -0,0 +1,112 @@
+import pytest
+import threading
+import time
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from motion_triggered_recording.recording_writer import (RecordingWriter, DROP_OLDEST, DROP_NEWEST,
+                                                         DROP_KEYFRAME_PRESERVING)
+
+
+class BlockedEngine:
+    """Engine recording the calls it receives, which only starts encoding once released."""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.calls = []
+
+    def encode(self, frame, timestamp):
+        self.released.wait()
+        self.calls.append(frame)
+        return []
+
+    def start_segment(self, file_path):
+        self.released.wait()
+        self.calls.append(("start", file_path))
+
+    def end_segment(self):
+        self.calls.append("end")
+
+    def close(self):
+        self.calls.append("close")
+        return ["segment.mp4"]
+
+
+def fill(writer, frames):
+    for frame in frames:
+        writer.encode(frame, time.monotonic())
+
+def wait_until_queue_has(writer, count):
+    # The writer thread takes the first item off the queue and blocks on it.
+    deadline = time.monotonic() + 2
+    while writer.queued_frames() != count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+@pytest.mark.parametrize("policy, encoded", [
+    (DROP_OLDEST, [0, 3, 4]),
+    (DROP_NEWEST, [0, 1, 2]),
+])
+def test_drop_policies(policy, encoded):
+    engine = BlockedEngine()
+    writer = RecordingWriter(engine, max_queued_frames=2, drop_policy=policy)
+    fill(writer, [0])
+    wait_until_queue_has(writer, 0)
+    fill(writer, [1, 2, 3, 4])
+    assert writer.dropped_frames == 2
+    engine.released.set()
+    assert writer.close() == ["segment.mp4"]
+    assert engine.calls == encoded + ["close"]
+
+def test_keyframe_preserving_policy_keeps_segment_boundaries():
+    engine = BlockedEngine()
+    writer = RecordingWriter(engine, max_queued_frames=2, drop_policy=DROP_KEYFRAME_PRESERVING)
+    writer.start_segment("a.mp4")
+    wait_until_queue_has(writer, 0)
+    # Frame 1 is the first frame of the segment: it is never dropped.
+    fill(writer, [1, 2, 3, 4])
+    assert writer.dropped_frames == 2
+    engine.released.set()
+    writer.close()
+    assert engine.calls == [("start", "a.mp4"), 1, 4, "close"]
+
+def test_commands_are_kept_in_order_and_never_dropped():
+    engine = BlockedEngine()
+    engine.released.set()
+    writer = RecordingWriter(engine, max_queued_frames=4)
+    fill(writer, [1])
+    writer.start_segment("a.mp4")
+    fill(writer, [2])
+    writer.end_segment()
+    writer.close()
+    assert engine.calls == [1, ("start", "a.mp4"), 2, "end", "close"]
+
+def test_late_frames_are_counted():
+    engine = BlockedEngine()
+    engine.released.set()
+    writer = RecordingWriter(engine, max_queued_frames=4, late_after=1.0)
+    writer.encode("late", time.monotonic() - 5)
+    writer.encode("on time", time.monotonic())
+    writer.close()
+    assert writer.late_frames == 1
+    assert writer.dropped_frames == 0
+
+def test_encoder_error_is_raised_to_the_caller():
+    class FailingEngine(BlockedEngine):
+        def encode(self, frame, timestamp):
+            raise ValueError("encoder failure")
+
+    writer = RecordingWriter(FailingEngine(), max_queued_frames=4)
+    writer.encode("frame", time.monotonic())
+    with pytest.raises(RuntimeError):
+        writer.close()
+
+@pytest.mark.parametrize("max_queued_frames, policy", [(0, DROP_OLDEST), (2, "random")])
+def test_invalid_parameters_raise_err(max_queued_frames, policy):
+    with pytest.raises(ValueError):
+        RecordingWriter(BlockedEngine(), max_queued_frames=max_queued_frames, drop_policy=policy)
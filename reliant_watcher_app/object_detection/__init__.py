@@ -1,3 +1,7 @@
-from .object_detection import ObjectDetection, counter_greater_than_comparison
+from .object_detection import ObjectDetection, counter_greater_than_comparison, MODEL_FILES, model_path
+from .motion_regions import merge_motion_regions
+from .detection_pool import DetectionPool
 from .object_detection_main import object_detection_main
 from .yolox import YoloX
+from .inference_backends import create_inference_backend, INFERENCE_BACKENDS
+from .tracker import ObjectTracker
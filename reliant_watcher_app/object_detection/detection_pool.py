@@ -0,0 +1,167 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class _PendingFrame:
+    """A frame submitted to the pool, with the result of its detection once done."""
+
+    def __init__(self, frame, regions, detect):
+        self.frame = frame
+        self.regions = regions
+        self.detect = detect
+        self.predictions = None
+        self.scale = 1.0
+        self.error = None
+        self.done = threading.Event()
+        if not detect:
+            self.done.set()
+
+
+class DetectionPool:
+    """
+    Runs object detection on several frames at once, one worker thread per detector, and hands the results
+    back in the order the frames were submitted, so the tracker and the object counts are updated in order.
+
+    Threads are enough to use several cores: the inference (OpenCV DNN or ONNX Runtime), the resize and
+    most of the copies release the GIL. Each worker owns its detector (its model and its input blob), as a
+    model must not run two inferences at once.
+
+    The frames are read straight into buffers of the pool (see free_buffer), which stay untouched until
+    their result has been collected. When all of them are in use, the workers are behind the camera: the
+    caller skips frames until one is free.
+    """
+
+    def __init__(self, detectors, frame_shape, detect_interval=1, max_pending=None):
+        """
+        Parameters:
+            detectors (list): One detector per worker, with a prediction(frame, regions) method returning
+                (predictions, scale) (ObjectDetection).
+            frame_shape (tuple): Shape of the frames.
+            detect_interval (int): The detectors run on one submitted frame in detect_interval (keyframes);
+                the other frames are handed back without predictions, for the tracker.
+            max_pending (int): Number of frames submitted and not collected yet (None: enough to keep all
+                the workers busy).
+
+        Raises:
+            ValueError: If there is no detector or detect_interval < 1.
+        """
+        if not detectors:
+            raise ValueError("The pool needs at least one detector.")
+        if detect_interval < 1:
+            raise ValueError("detect_interval must be at least 1.")
+        self.detect_interval = detect_interval
+        if max_pending is None:
+            max_pending = len(detectors) * detect_interval + 1
+        self._free_buffers = [np.empty(frame_shape, dtype=np.uint8) for _ in range(max_pending)]
+        # Buffers of the frames handed back by the last collect(): the caller may still be using them
+        self._collected_buffers = []
+        self._pending = deque()         # Frames submitted and not collected, in order
+        self._jobs = deque()            # Keyframes waiting for a worker
+        self._jobs_available = threading.Condition()
+        self._closed = False
+        self.submitted = 0              # Number of frames submitted
+        self._workers = [threading.Thread(target=self._work, args=(detector,), name=f"OD-worker-{index}", daemon=True)
+                         for index, detector in enumerate(detectors)]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def workers(self):
+        return len(self._workers)
+
+    def _work(self, detector):
+        """Worker thread: runs its detector on the keyframes, in the order they were submitted."""
+        while True:
+            with self._jobs_available:
+                while not self._jobs and not self._closed:
+                    self._jobs_available.wait()
+                if self._closed:
+                    return
+                pending = self._jobs.popleft()
+            try:
+                pending.predictions, pending.scale = detector.prediction(pending.frame, pending.regions)
+            except Exception as error:
+                # Raised to the caller when the frame is collected
+                pending.error = error
+            pending.done.set()
+
+    def free_buffer(self):
+        """
+        Returns the buffer the next frame must be read into, or None if all of them are in use (the frame
+        should be skipped).
+        """
+        self._release_collected()
+        return self._free_buffers[-1] if self._free_buffers else None
+
+    def submit(self, frame, regions=None):
+        """
+        Submits a frame, read into the buffer returned by free_buffer().
+
+        Parameters:
+            frame (np.ndarray): The frame, in the buffer returned by free_buffer().
+            regions (list): Regions (x0, y0, x1, y1) to run the detector on, or None for the whole frame.
+
+        Returns:
+            bool: Whether the detector runs on the frame (keyframe).
+
+        Raises:
+            ValueError: If the frame is not in the free buffer.
+        """
+        if not self._free_buffers or frame is not self._free_buffers[-1]:
+            raise ValueError("The frame must be read into the buffer returned by free_buffer().")
+        self._free_buffers.pop()
+        detect = self.submitted % self.detect_interval == 0
+        self.submitted += 1
+        pending = _PendingFrame(frame, regions, detect)
+        self._pending.append(pending)
+        if detect:
+            with self._jobs_available:
+                self._jobs.append(pending)
+                self._jobs_available.notify()
+        return detect
+
+    def collect(self, wait=False):
+        """
+        Hands back the frames whose detection is done, in the order they were submitted: a frame is handed
+        back only once all those submitted before it have been. The frames stay valid until the next call
+        to collect() or free_buffer().
+
+        Parameters:
+            wait (bool): Whether to wait until all the frames submitted have been processed.
+
+        Returns:
+            list: (frame, predictions, scale) of each frame, predictions being None on the frames the
+            detector did not run on.
+
+        Raises:
+            Exception: The error raised by a detector on one of the frames.
+        """
+        self._release_collected()
+        results = []
+        while self._pending:
+            pending = self._pending[0]
+            if wait:
+                pending.done.wait()
+            elif not pending.done.is_set():
+                break
+            self._pending.popleft()
+            self._collected_buffers.append(pending.frame)
+            if pending.error is not None:
+                raise pending.error
+            results.append((pending.frame, pending.predictions, pending.scale))
+        return results
+
+    def _release_collected(self):
+        self._free_buffers += self._collected_buffers
+        self._collected_buffers = []
+
+    def close(self):
+        """Stops the workers once their current inference is done; the frames not collected are dropped."""
+        with self._jobs_available:
+            self._closed = True
+            self._jobs.clear()
+            self._jobs_available.notify_all()
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,96 @@
+import numpy as np
+import cv2
+
+
+class OpenCVDnnBackend:
+    """
+    Runs an ONNX model with OpenCV's DNN module: no dependency besides OpenCV, but the slowest on ARM CPUs.
+    Both the fp32 and the statically quantized int8 (QDQ) YOLOX models can be loaded.
+    """
+
+    def __init__(self, model_path, threads=None, backend_id=cv2.dnn.DNN_BACKEND_OPENCV, target_id=cv2.dnn.DNN_TARGET_CPU):
+        """
+        Parameters:
+            model_path (Path): Path of the ONNX model.
+            threads (int): Number of threads OpenCV runs the model on (None: OpenCV's default). The setting is
+                process-wide, as cv2.setNumThreads is.
+            backend_id (int): OpenCV DNN backend.
+            target_id (int): OpenCV DNN target.
+        """
+        self.net = cv2.dnn.readNet(str(model_path))
+        if threads is not None:
+            cv2.setNumThreads(threads)
+        self.set_backend_and_target(backend_id, target_id)
+
+    def set_backend_and_target(self, backend_id, target_id):
+        self.backend_id = backend_id
+        self.target_id = target_id
+        self.net.setPreferableBackend(backend_id)
+        self.net.setPreferableTarget(target_id)
+
+    def forward(self, blob):
+        """Runs the model on an NCHW float32 blob and returns its first output."""
+        self.net.setInput(blob)
+        return self.net.forward(self.net.getUnconnectedOutLayersNames())[0]
+
+
+class OnnxRuntimeBackend:
+    """
+    Runs an ONNX model with ONNX Runtime, with all its graph optimizations: faster than OpenCV's DNN module on
+    x86 and ARM CPUs, and it runs the dynamically quantized int8 model (ConvInteger) as well as the static one.
+    """
+
+    def __init__(self, model_path, threads=None):
+        """
+        Parameters:
+            model_path (Path): Path of the ONNX model.
+            threads (int): Number of threads an inference is split across (intra-op threads; None: one per
+                physical core). The other processes need CPU too, so fewer threads than cores often run faster.
+
+        Raises:
+            ImportError: If onnxruntime is not installed.
+        """
+        # Imported here, so the OpenCV backend works on boards where onnxruntime is not installed
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # One inference at a time: the operators run in sequence, each split across the intra-op threads
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads is not None:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_path), sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def forward(self, blob):
+        """Runs the model on an NCHW float32 blob and returns its first output."""
+        # ONNX Runtime reads the input buffer as it is: it must be C-contiguous
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(blob, dtype=np.float32)})[0]
+
+
+# Inference backends of the object detection model, from the most portable to the fastest.
+INFERENCE_BACKENDS = {
+    "opencv": OpenCVDnnBackend,
+    "onnxruntime": OnnxRuntimeBackend,
+}
+
+
+def create_inference_backend(backend, model_path, threads=None):
+    """
+    Creates the inference backend running a model.
+
+    Parameters:
+        backend (str): Name of the backend, among INFERENCE_BACKENDS.
+        model_path (Path): Path of the ONNX model.
+        threads (int): Number of threads an inference is split across (None: the backend's default).
+
+    Returns:
+        The backend, with a forward(blob) method returning the model's first output.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {list(INFERENCE_BACKENDS)}.")
+    return INFERENCE_BACKENDS[backend](model_path, threads=threads)
@@ -0,0 +1,85 @@
+def _overlap(box1, box2):
+    """Return True if two (x0, y0, x1, y1) boxes overlap or touch."""
+    return box1[0] <= box2[2] and box2[0] <= box1[2] and box1[1] <= box2[3] and box2[1] <= box1[3]
+
+
+def _union(boxes):
+    """Return the box enclosing all the (x0, y0, x1, y1) boxes."""
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def _grow(box, min_size, frame_width, frame_height):
+    """Grow a box around its center to at least min_size (width, height), keeping it inside the frame."""
+    x0, y0, x1, y1 = box
+    grown = []
+    for start, end, size, limit in ((x0, x1, min_size[0], frame_width), (y0, y1, min_size[1], frame_height)):
+        size = min(max(end - start, size), limit)
+        start = min(max((start + end - size) // 2, 0), limit - size)
+        grown += [start, start + size]
+    return grown[0], grown[2], grown[1], grown[3]
+
+
+def merge_motion_regions(motion_boxes, frame_shape, padding=0.25, min_padding=16, min_size=(320, 320),
+                         max_regions=1, max_area_ratio=0.5):
+    """
+    Turn the motion boxes found by motion detection into the regions object detection runs on.
+
+    Each box is padded (a moving object is rarely fully inside the foreground mask, and the frame
+    analyzed may be a little newer than the one the boxes come from), overlapping boxes are merged, and
+    each region is grown to at least min_size so the model sees some context and small, distant
+    objects are enlarged rather than shrunk. Running on the whole frame is better when there is no
+    motion box, or when the regions would cover most of the frame anyway.
+
+    Parameters:
+        motion_boxes (list): Motion boxes (x0, y0, x1, y1) in frame coordinates.
+        frame_shape (tuple): Shape (height, width, ...) of the frame.
+        padding (float): Padding added on each side of a box, as a fraction of its width/height.
+        min_padding (int): Minimum padding (in pixels) added on each side of a box.
+        min_size (tuple): Minimum (width, height) of a region, e.g. the model input size.
+        max_regions (int): Maximum number of regions (i.e. of inferences per frame); beyond it the
+            regions are merged into the one enclosing them all.
+        max_area_ratio (float): Fraction of the frame area above which the whole frame is used instead.
+
+    Returns:
+        list: Regions (x0, y0, x1, y1) to run object detection on, or None to run it on the whole frame.
+
+    Raises:
+        ValueError: If max_regions is not positive.
+    """
+    if max_regions < 1:
+        raise ValueError("max_regions must be positive.")
+    frame_height, frame_width = frame_shape[:2]
+    if not motion_boxes:
+        return None
+
+    # Pad the boxes and clip them to the frame.
+    regions = []
+    for x0, y0, x1, y1 in motion_boxes:
+        pad_x = max(int((x1 - x0) * padding), min_padding)
+        pad_y = max(int((y1 - y0) * padding), min_padding)
+        regions.append((max(x0 - pad_x, 0), max(y0 - pad_y, 0),
+                        min(x1 + pad_x, frame_width), min(y1 + pad_y, frame_height)))
+
+    # Merge overlapping regions (and the regions grown into each other) until none overlap.
+    merged = True
+    while merged:
+        merged = False
+        if len(regions) > max_regions:
+            regions = [_union(regions)]
+        regions = [_grow(region, min_size, frame_width, frame_height) for region in regions]
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                if _overlap(regions[i], regions[j]):
+                    regions[i] = _union([regions[i], regions[j]])
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    # Fall back to the whole frame if the regions cover most of it.
+    area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if area > max_area_ratio * frame_width * frame_height:
+        return None
+    return regions
@@ -5,6 +5,29 @@ from pathlib import Path
 from collections import Counter
 import math
 from .yolox import YoloX  
+from .preprocessing import LetterboxPreprocessor
+from .tracker import ObjectTracker
+
+# Model files of the YOLOX precisions: the int8 models are quantized from the fp32 one (see quantization.py),
+# statically (calibrated on camera frames, runs on both inference backends) or dynamically (ONNX Runtime only)
+MODEL_FILES = {
+    "fp32": "object_detection_yolox_2022nov.onnx",
+    "int8": "object_detection_yolox_2022nov_int8.onnx",
+    "int8_dynamic": "object_detection_yolox_2022nov_int8_dynamic.onnx",
+}
+MODEL_DIR = Path(__file__).parent
+
+
+def model_path(precision="fp32"):
+    """
+    Returns the path of the YOLOX model file of a precision.
+
+    Raises:
+        ValueError: If the precision is unknown.
+    """
+    if precision not in MODEL_FILES:
+        raise ValueError(f"Unknown model precision '{precision}', expected one of {list(MODEL_FILES)}.")
+    return MODEL_DIR / MODEL_FILES[precision]
 
 
 def counter_greater_than_comparison(counter1, counter2):
@@ -44,82 +67,84 @@ class ObjectDetection():
     visualizing detections, and computing background objects.
     """
     
-    def __init__(self):
+    def __init__(self, inference_backend="opencv", precision="fp32", threads=None, classes=None, detect_interval=1):
+        """
+        Parameters:
+            inference_backend (str): Backend running the model: "opencv" (cv2.dnn) or "onnxruntime" (faster on
+                edge CPUs, see inference_backends).
+            precision (str): Model precision, among MODEL_FILES: "fp32", or "int8" / "int8_dynamic" (quantized:
+                faster, check their accuracy with quantization.py first).
+            threads (int): Number of threads an inference is split across (None: the backend's default).
+            classes (list): Names of the only objects detected, e.g. ["person", "car", "dog"] (None: the 80
+                COCO classes). The other detections are dropped before NMS, which also speeds it up.
+            detect_interval (int): Run the model on one frame in detect_interval (keyframes); the objects are
+                tracked on the frames in between (see ObjectTracker).
+
+        Raises:
+            ValueError: If the precision, the inference backend or a class is unknown, or detect_interval < 1.
+            FileNotFoundError: If the model file of the precision does not exist.
+        """
+        if detect_interval < 1:
+            raise ValueError("detect_interval must be at least 1.")
         # Define the target input size for the model
         self.target_size = (320, 320)
+        path = model_path(precision)
+        if not path.exists():
+            raise FileNotFoundError(f"YOLOX model not found: {path}")
         # Initialize the YOLOX model with specified parameters
         self.model = YoloX(
-            modelPath=Path(__file__).parent.joinpath("object_detection_yolox_2022nov.onnx"),
+            modelPath=path,
             input_size=self.target_size,
             confThreshold=0.3,
             nmsThreshold=0.3,
             objThreshold=0.3,
             backendId=cv2.dnn.DNN_BACKEND_OPENCV,
-            targetId=cv2.dnn.DNN_TARGET_CPU
+            targetId=cv2.dnn.DNN_TARGET_CPU,
+            inference_backend=inference_backend,
+            threads=threads,
+            classes=classes
         )
+        # Letterboxes the frames into a preallocated model input blob
+        self.preprocessor = LetterboxPreprocessor(self.target_size)
+        # Follows the detected objects across frames, so the model runs on keyframes only
+        self.tracker = ObjectTracker()
+        self.detect_interval = detect_interval
         # Initialize various attributes to track detected objects and performance
-        self.prev_objs = None           # Holds objects detected in the previous frame
         self.curr_objs = None           # Holds objects detected in the current frame
+        self.tracked_objects = np.empty((0, 7))  # Objects tracked in the current frame, with their track ids
         self.cnt = 0                    # Frame counter
-        self.aggregated_objects = Counter()  # Aggregated detection results over multiple frames
+        self.aggregated_objects = Counter()  # Distinct objects (tracks) seen over multiple frames
         self.background_objects = None  # Background objects computed over a time period
+        self.background_tracks = set()  # Ids of the tracks following background objects
         self.max_fps_obtained = None    # Maximum frames per second recorded
         self.sensitivity = 1            # Sensitivity factor for updating detection results
         self.tm = cv2.TickMeter()       # Timer for measuring processing time
         self.tm.reset()
  
-    def scale_frame_to_match_model_target_size(self, frame):
-        """
-        Resizes and pads the input frame to match the model's target input size.
-        
-        The function creates a padded frame with a constant value (114.0) and resizes the
-        input frame while maintaining its aspect ratio.
-        
-        Parameters:
-            frame (numpy.ndarray): The original frame to be processed.
-            
-        Returns:
-            tuple: The padded and resized frame along with the scaling ratio.
-        """
-        # Create a padded frame with a constant value (114.0) for all pixels
-        padded_frame = np.ones((self.target_size[0], self.target_size[1], 3), dtype=np.float32) * 114.0
-        
-        # Calculate the scaling ratio to maintain aspect ratio
-        ratio = min(self.target_size[0] / frame.shape[0], self.target_size[1] / frame.shape[1])
-        
-        # Resize the frame using the computed ratio
-        resized_img = cv2.resize(
-            frame, 
-            (int(frame.shape[1] * ratio), int(frame.shape[0] * ratio)), 
-            interpolation=cv2.INTER_AREA
-        ).astype(np.float32)
-        
-        # Insert the resized image into the top-left portion of the padded frame
-        padded_frame[: int(frame.shape[0] * ratio), : int(frame.shape[1] * ratio)] = resized_img
-        return padded_frame, ratio
-
-    def prediction(self, frame):
+    def prediction(self, frame, regions=None):
         """
         Processes the frame, performs object detection, and computes FPS.
         
-        This method converts the frame to RGB, scales it to the target size, and then
+        This method letterboxes the frame into the model input blob (RGB, target size), and then
         performs inference using the YOLOX model. It also calculates the FPS based on
         the inference time.
         
         Parameters:
-            frame (numpy.ndarray): The original frame to be analyzed.
+            frame (numpy.ndarray): The original BGR frame to be analyzed.
+            regions (list): Regions (x0, y0, x1, y1) of the frame to run the model on (e.g. the
+                regions where motion is, see merge_motion_regions), or None for the whole frame.
             
         Returns:
             tuple: A tuple containing the predictions and the scaling factor used.
         """
-        # Convert BGR to RGB format
-        input = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # Scale the frame to match the model's input size
-        scaled_input, scale = self.scale_frame_to_match_model_target_size(input)
+        if regions is not None:
+            return self.prediction_in_regions(frame, regions), 1.0
+        # Scale the frame to match the model's input size (converted to RGB once scaled down)
+        input_blob, scale = self.preprocessor(frame)
         # Start the timer before inference
         self.tm.start()
-        # Run the model inference on the scaled input
-        predictions = self.model.infer(scaled_input)
+        # Run the model inference on the input blob
+        predictions = self.model.infer(input_blob)
         # Stop the timer after inference
         self.tm.stop()
         # Calculate the frames per second (FPS)
@@ -128,6 +153,42 @@ class ObjectDetection():
         # Reset the timer for the next prediction
         self.tm.reset()
         return predictions, scale
+
+    def prediction_in_regions(self, frame, regions):
+        """
+        Performs object detection on regions of the frame and computes FPS.
+        
+        Each region is cropped and scaled to the model's input size on its own, so an object in a
+        small region is seen at a higher resolution than in the whole frame. The predictions are
+        mapped back to frame coordinates, and duplicates found in several regions are suppressed.
+        
+        Parameters:
+            frame (numpy.ndarray): The BGR frame to be analyzed.
+            regions (list): Regions (x0, y0, x1, y1) of the frame to run the model on.
+            
+        Returns:
+            numpy.ndarray: The predictions [x0, y0, x1, y1, score, class_id] in frame coordinates.
+        """
+        region_predictions = []
+        # Time the inferences on all the regions as the processing time of one frame
+        self.tm.start()
+        for x0, y0, x1, y1 in regions:
+            input_blob, scale = self.preprocessor(frame[y0:y1, x0:x1])
+            predictions = np.array(self.model.infer(input_blob), dtype=np.float32).reshape(-1, 6)
+            # Map the boxes back from the model input to the frame
+            predictions[:, :4] = predictions[:, :4] / scale + (x0, y0, x0, y0)
+            region_predictions.append(predictions)
+        self.tm.stop()
+        self.max_fps_obtained = math.ceil(self.tm.getFPS())
+        self.tm.reset()
+        predictions = np.concatenate(region_predictions) if region_predictions else np.empty((0, 6), np.float32)
+        if len(region_predictions) > 1 and len(predictions) > 0:
+            # An object cut by the border of two regions may have been detected in both
+            keep = cv2.dnn.NMSBoxesBatched(predictions[:, :4].tolist(), predictions[:, 4].tolist(),
+                                           predictions[:, 5].astype(np.int32).tolist(),
+                                           self.model.confThreshold, self.model.nmsThreshold)
+            predictions = predictions[np.asarray(keep, dtype=np.int64).reshape(-1)]
+        return predictions
     
     def predicted_objects_per_frame(self, predictions):
         """
@@ -150,41 +211,81 @@ class ObjectDetection():
             detected_classes.update([self.model.objects[cls_id]])
         return detected_classes
     
-    def detecting_objects(self, frame, visualize=True):
+    def detecting_objects(self, frame, visualize=True, regions=None):
         """
-        Detect objects in the frame and update internal aggregated object counts.
+        Detect objects in the frame and update the distinct objects seen so far.
         
-        This method processes a frame to generate predictions, updates the current and previous
-        detection counters, and aggregates objects based on certain time intervals. Optionally,
-        it visualizes the detections.
+        The model runs on one frame in detect_interval (keyframes); the tracker matches its detections to
+        the objects followed so far, and predicts where they are on the frames in between. The objects
+        followed long enough to be confirmed are counted once each, however many frames they stay in.
+        Optionally, it visualizes the tracked objects.
         
         Parameters:
             frame (numpy.ndarray): The input frame for object detection.
             visualize (bool): Whether to display the detection visualization (default is True).
+            regions (list): Regions (x0, y0, x1, y1) of the frame to detect objects in, or None
+                for the whole frame.
         """
-        # Get predictions and scaling factor for the input frame
-        predictions, scale = self.prediction(frame)
-        # Update the current objects detected in this frame
-        self.curr_objs = self.predicted_objects_per_frame(predictions)
+        if self.cnt % self.detect_interval == 0:
+            # Get predictions and scaling factor for the input frame
+            predictions, scale = self.prediction(frame, regions)
+        else:
+            predictions, scale = None, 1.0
+        self.track_objects(predictions, scale)
         
-        # For the first frame, simply initialize the previous objects counter
-        if self.cnt == 0:
-            self.prev_objs = self.curr_objs  
-        # Every (max_fps_obtained * sensitivity) frames, aggregate objects using union/intersection logic
-        elif self.cnt % (self.max_fps_obtained * self.sensitivity) == 0:
-            # Aggregate using union of previous aggregated objects with intersection of prev and current
-            self.aggregated_objects = self.aggregated_objects | (self.prev_objs & self.curr_objs)
-            self.prev_objs = self.curr_objs
+        # Optionally visualize the detections on the frame
+        if visualize:
+            self.visualize(self.tracked_objects, frame, 1.0)
+
+    def track_objects(self, predictions=None, scale=1.0):
+        """
+        Update the tracked objects and the distinct objects seen so far with the predictions of the next
+        frame. The frames must be given in order, the model having run on them or not.
+        
+        Parameters:
+            predictions (list): The predictions of the model on the frame, or None if it did not run on it
+                (the tracked objects are then predicted).
+            scale (float): The scaling factor of the predictions (see prediction).
+        """
+        if predictions is not None:
+            # Track the objects in frame coordinates
+            detections = np.array(predictions, dtype=np.float64).reshape(-1, 6)
+            detections[:, :4] /= scale
+            self.tracked_objects = self.tracker.update(detections)
         else:
-            # Update previous objects as the intersection of previous and current detections
-            self.prev_objs = self.prev_objs & self.curr_objs
+            self.tracked_objects = self.tracker.predict()
+        # Update the current objects detected in this frame
+        self.curr_objs = self.predicted_objects_per_frame(self.tracked_objects[:, :6])
+        # Distinct objects seen since the aggregated objects were last cleared
+        self.aggregated_objects = Counter({self.model.objects[class_id]: count
+                                           for class_id, count in self.tracker.counted_objects().items()})
+        self.assign_background_tracks()
         
         # Increment the frame counter
         self.cnt += 1
+
+    def assign_background_tracks(self):
+        """
+        Take the tracks of the current frame for the background objects, up to their number in each class.
         
-        # Optionally visualize the detections on the frame
-        if visualize:
-            self.visualize(predictions, frame, scale)
+        A background object is given a new track whenever its track is lost (e.g. a parked car missed by a
+        few detections in a row): the new track takes the place of the lost one, so the object is never
+        counted as a new one. The oldest tracks are taken first.
+        """
+        if not self.background_objects:
+            return
+        alive = {}
+        for track_id, class_id in sorted((int(row[6]), int(row[5])) for row in self.tracked_objects):
+            alive.setdefault(self.model.objects[class_id], []).append(track_id)
+        for name, track_ids in alive.items():
+            # Places left for the background objects of the class, once its background tracks are counted
+            free = self.background_objects[name] - sum(track_id in self.background_tracks for track_id in track_ids)
+            for track_id in track_ids:
+                if free <= 0:
+                    break
+                if track_id not in self.background_tracks:
+                    self.background_tracks.add(track_id)
+                    free -= 1
 
     def visualize(self, predictions, frame, scale):
         """
@@ -194,7 +295,8 @@ class ObjectDetection():
         onto a copy of the input frame, displays the FPS, and then shows the resulting frame.
         
         Parameters:
-            predictions (list): A list of predictions from the model.
+            predictions (list): A list of predictions from the model, or of tracked objects (with their
+                track id as a 7th column).
             frame (numpy.ndarray): The original frame to annotate.
             scale (float): The scaling factor used to resize the frame.
         """
@@ -209,11 +311,12 @@ class ObjectDetection():
         for p in predictions:
             # Extract and scale the bounding box coordinates back to the original frame size
             box = (p[:4] / scale).astype(np.int32)
-            score = p[-2]       # Confidence score
-            cls_id = int(p[-1]) # Class ID of the detected object
+            score = p[4]        # Confidence score
+            cls_id = int(p[5])  # Class ID of the detected object
             x0, y0, x1, y1 = box
-            # Prepare label text with object name and confidence percentage
-            text = f"{self.model.objects[cls_id]} : {score*100}%"
+            # Prepare label text with object name, track id and confidence percentage
+            track = f" #{int(p[6])}" if len(p) > 6 else ""
+            text = f"{self.model.objects[cls_id]}{track} : {score*100}%"
             font = cv2.FONT_HERSHEY_SIMPLEX
             txt_size = cv2.getTextSize(text, font, 0.4, 1)[0]
             # Draw the bounding box for the detected object
@@ -241,10 +344,14 @@ class ObjectDetection():
         
         This method runs the detection continuously for a specified number of seconds
         (which must be greater than the sensitivity setting) and aggregates detected objects
-        to compute the background objects.
+        to compute the background objects: the objects detected in every frame of a period of
+        (max_fps_obtained * sensitivity) frames, in the largest number seen over the periods.
+        These are counts per frame, not distinct tracks: a background object whose track is lost
+        and picked up again is still one object.
         
         Parameters:
-            frame_obj (numpy.ndarray): The frame used repeatedly for background computation.
+            frame_obj (numpy.ndarray or callable): The frame used repeatedly for background computation,
+                or a callable returning the frame to use for each detection (e.g. the latest camera frame).
             seconds (int): The duration over which to compute background objects.
             visualize (bool): Whether to visualize detections during computation.
             
@@ -255,14 +362,25 @@ class ObjectDetection():
         if seconds <= self.sensitivity:
             raise ValueError("Seconds should be greater than sensitivity.")
         
+        # Use the same frame for every detection unless a frame source is given
+        get_frame = frame_obj if callable(frame_obj) else (lambda: frame_obj)
+
         # Initialize FPS computation with the first frame
-        self.set_1st_fps(frame_obj)
+        self.set_1st_fps(get_frame())
         
+        background = Counter()
+        steady_objs = None              # Objects detected in every frame of the current period
         # Run detections until the frame count reaches a multiple of (max_fps * seconds)
         while self.cnt == 0 or (self.cnt % (self.max_fps_obtained * seconds) != 0):
-            self.detecting_objects(frame_obj, visualize)
+            self.detecting_objects(get_frame(), visualize)
+            steady_objs = self.curr_objs if steady_objs is None else steady_objs & self.curr_objs
+            # Every (max_fps_obtained * sensitivity) frames, keep the union of the objects of each period
+            if self.cnt % (self.max_fps_obtained * self.sensitivity) == 0:
+                background = background | steady_objs
+                steady_objs = None
         # After the loop, set the background objects based on aggregated detections
-        self.background_objects = self.aggregated_objects
+        self.background_objects = background
+        self.background_tracks = set()
 
     def get_background_objects(self):
         """
@@ -282,21 +400,51 @@ class ObjectDetection():
         """
         Print and return the difference between aggregated objects and background objects.
         
-        This represents the objects detected so far that are not part of the background.
+        This represents the objects detected so far that are not part of the background: the distinct
+        objects whose tracks were not taken for background objects (see assign_background_tracks).
         
         Returns:
             Counter: The difference between aggregated objects and background objects.
         """
+        detected = Counter(self.model.objects[class_id] for track_id, class_id in self.tracker.counted.items()
+                           if track_id not in self.background_tracks)
         # Debug prints for aggregated vs background objects
         print(f"{self.aggregated_objects} - {self.background_objects}")
-        print(f"{self.aggregated_objects - self.background_objects}")
-        return self.aggregated_objects - self.background_objects
+        print(f"{detected}")
+        return detected
+
+    def objects_in_frame(self):
+        """
+        Return the objects detected in the last frame that are not part of the background.
+        
+        Returns:
+            Counter: The objects of the last frame minus the background objects (all of them if the
+            background objects have not been computed yet).
+        """
+        if self.curr_objs is None:
+            return Counter()
+        if self.background_objects is None:
+            return self.curr_objs
+        return self.curr_objs - self.background_objects
 
-    def clear_aggregated_objects(self):
+    def clear_aggregated_objects(self, reset_tracks=False):
         """
         Reset the aggregated objects counter and frame counter.
         
-        This is useful for restarting object detection without previous state interference.
+        This is useful for restarting object detection without previous state interference. The
+        objects still tracked are counted again from the next frame on.
+        
+        Parameters:
+            reset_tracks (bool): Whether to forget the tracked objects too, e.g. when frames have not been
+                analyzed for a while.
         """
+        if reset_tracks:
+            self.tracker.reset()
+            self.background_tracks = set()
+        else:
+            self.tracker.clear_counted_objects()
+            # Only the background tracks still followed matter from now on
+            alive = {int(row[6]) for row in self.tracked_objects}
+            self.background_tracks &= alive
         self.aggregated_objects = Counter()
         self.cnt = 0
@@ -1,80 +1,192 @@
 
 import cv2
 import numpy as np
-from multiprocessing import shared_memory, Barrier
 import time
-from collections import Counter
-from object_detection import ObjectDetection, counter_greater_than_comparison
+from collections import Counter, deque
+from frame_buffer import FrameRingBuffer
+from object_detection import ObjectDetection, DetectionPool, counter_greater_than_comparison, merge_motion_regions, \
+                             model_path
 
+# Maximum time (in seconds) to block waiting for a frame before re-checking the shared flags.
+FRAME_WAIT_TIMEOUT = 0.5
+# Maximum time (in seconds) spent at shutdown handing the objects of the last video files to the database process.
+DB_HANDOFF_TIMEOUT = 5.0
 
-def object_detection_main(shm_name: str, frame_shape: tuple, shared_dict: dict, event_dict: dict, barrier_dict: dict):
+def queue_ended_segment(object_detection, shared_state, segment_name, pending: deque):
+    """
+    When the recording process has moved on from the video file whose objects are being aggregated, queue
+    the objects detected during it for database logging, and start aggregating the objects of the video
+    file being recorded now.
+
+    The recording process shares the file name of the video file it records ("MTR_segment_name", empty
+    between incidents): the file ended when the name changed.
+
+    Parameters:
+        object_detection (ObjectDetection): The object detector.
+        shared_state (SharedState): Shared memory block of flags and data shared across processes.
+        segment_name (str): File name of the video file whose objects are being aggregated (None: none).
+        pending (deque): (file name, detected objects) of the ended video files not shared yet, oldest first.
+
+    Returns:
+        str: File name of the video file whose objects are aggregated from now on (None: none).
+    """
+    current = shared_state["MTR_segment_name"] or None
+    if current == segment_name:
+        return segment_name
+    if segment_name is not None:
+        pending.append((segment_name, object_detection.detected_objects_so_far()))
+    object_detection.clear_aggregated_objects()
+    return current
+
+def publish_segment_objects(shared_state, pending: deque):
+    """
+    Share the objects detected during an ended video file, with its file name, for database logging.
+
+    The database process takes one share at a time: the next one is shared only once the previous one
+    has been taken (OD_db_permission cleared), the others wait in pending.
+
+    Parameters:
+        shared_state (SharedState): Shared memory block of flags and data shared across processes.
+        pending (deque): (file name, detected objects) of the ended video files not shared yet, oldest first.
+    """
+    if pending and not shared_state["OD_db_permission"]:
+        file_name, detected_objects = pending.popleft()
+        shared_state["OD_video_name_to_db"] = file_name
+        shared_state["OD_detected_obj_to_db"] = detected_objects
+        # Set flag in shared state to allow database saving.
+        shared_state["OD_db_permission"] = True
+
+def object_detection_main(shm_name: str, frame_shape: tuple, shared_state, event_dict: dict, barrier_dict: dict,
+                          frame_notifier, inference_backend: str = "opencv", precision: str = "fp32", threads: int = None,
+                          classes: list = None, detect_interval: int = 1, workers: int = 1):
     """
     Main function for object detection that uses shared memory for accessing video frames,
-    inter-process events for synchronization, and shared dictionaries for communication
+    inter-process events for synchronization, and a shared state block for communication
     with other processes.
 
     Parameters:
-        shm_name (str): Name of the shared memory block.
+        shm_name (str): Name of the shared memory frame ring buffer.
         frame_shape (tuple): The shape (dimensions) of the video frame.
-        shared_dict (dict): Dictionary for shared flags and data across processes.
+        shared_state (SharedState): Shared memory block of flags and data shared across processes.
         event_dict (dict): Dictionary for shared events to synchronize actions.
         barrier_dict (dict): Dictionary for Barrier objects to synchronize multiple processes.
+        frame_notifier (FrameNotifier): Wakes this process up when a new frame has been captured.
+        inference_backend (str): Backend running the YOLOX model: "opencv" or "onnxruntime".
+        precision (str): Precision of the YOLOX model: "fp32", "int8" or "int8_dynamic" (see MODEL_FILES).
+        threads (int): Number of threads an inference is split across (None: the backend's default).
+        classes (list): Names of the only objects detected (None: all of them).
+        detect_interval (int): Run the model on one frame in detect_interval, the objects being tracked in between.
+        workers (int): Number of frames detected at once, each worker thread running its own model (workers x
+            threads should not exceed the number of cores).
     """
+    # Checked before connecting to the shared memory, whose absence is reported by the FileNotFoundError below.
+    if not model_path(precision).exists():
+        print(f"Object detection model not found: {model_path(precision)}")
+        shared_state["stop"] = True
+        exit()
     try:
-        # Connect to the existing shared memory block using the provided name.
-        shm = shared_memory.SharedMemory(name=shm_name, create=False)
-        # Create a NumPy array that maps to the shared memory buffer with the specified frame shape.
-        shared_frame = np.ndarray(frame_shape, dtype=np.uint8, buffer=shm.buf)
+        # Connect to the existing frame ring buffer using the provided name.
+        frame_ring = FrameRingBuffer(shm_name, frame_shape, create=False)
+        # Private copy of the latest frame, so detection never runs on a frame being overwritten.
+        frame = np.empty(frame_ring.frame_shape, dtype=np.uint8)
+        last_frame_number = 0
+
+        def latest_frame():
+            """Wait for a new frame, copy it into the private frame buffer and return it."""
+            nonlocal last_frame_number
+            frame_notifier.wait("OD", timeout=FRAME_WAIT_TIMEOUT)
+            latest = frame_ring.read_latest(last_frame_number, out=frame)
+            if latest is not None:
+                last_frame_number = latest[0]
+            return frame
         
         # Initialize the object detection model.
-        object_detection = ObjectDetection()
-        # Compute background objects using the current shared frame without visualization.
-        object_detection.compute_background_objects(shared_frame, visualize=False)
+        object_detection = ObjectDetection(inference_backend, precision, threads, classes, detect_interval)
+        print(f"Object detection: YOLOX {precision} on {inference_backend}.")
+        # Compute background objects using the latest camera frames without visualization.
+        object_detection.compute_background_objects(latest_frame, visualize=False)
+        # Pool of detection workers: the first one runs the model of object_detection (which only tracks and
+        # counts the objects from now on), the others load their own.
+        detectors = [object_detection] + [ObjectDetection(inference_backend, precision, threads, classes)
+                                          for _ in range(workers - 1)]
+        pool = DetectionPool(detectors, frame_ring.frame_shape, detect_interval)
         
         # Wait until the "MD_OD" barrier is released (synchronization point with motion detection process).
         barrier_dict["MD_OD"].wait()
         
         # Initialize the variable to store the last set of detected objects.
         last_objects_detected = None
+        # File name of the video file whose objects are being aggregated, and the objects of the ended video
+        # files waiting for the database process to take the previous ones.
+        segment_name = None
+        pending_objects = deque()
         
         # Main loop that runs until the shared "stop" flag is set.
-        while not shared_dict["stop"]:
+        while not shared_state["stop"]:
             # Reset last_objects_detected if no motion is detected.
-            if not shared_dict["motion_detected"]:
+            if not shared_state["motion_detected"]:
                 last_objects_detected = None
 
-            # Wait at the "OD_MTR" barrier for synchronization with Motion Triggered Recording processes.
-            barrier_dict["OD_MTR"].wait()
+            publish_segment_objects(shared_state, pending_objects)
+            # Wait until the "recording" event is set by the recording process for a new incident (the
+            # recording process never waits for this one: it keeps encoding frames meanwhile).
+            if not event_dict["recording"].wait(timeout=FRAME_WAIT_TIMEOUT):
+                continue
+            # Incident being analyzed: a new one may start before this process notices the end of this one.
+            incident = shared_state["MTR_incidents"]
+            # Video file the objects of the incident are aggregated for, from now on.
+            segment_name = queue_ended_segment(object_detection, shared_state, segment_name, pending_objects)
             
-            # Initialize flags to ensure specific actions are executed only once during recording.
+            # Initialize flag to ensure the alert is sent only once during recording.
             executed1 = False
-            executed2 = False
-            # Preset times for sending alert and saving to database (in seconds).
+            # Preset time for sending alert (in seconds).
             send_alert_msg_preset_time = 4
-            save_to_database_preset_time = 19
             
-            # Clear previous aggregated detection results before starting a new recording cycle.
-            object_detection.clear_aggregated_objects()
+            # Clear previous aggregated detection results before starting a new recording cycle (the objects
+            # tracked during the last one are stale: frames are not analyzed between recordings).
+            object_detection.clear_aggregated_objects(reset_tracks=True)
             
-            # Wait until the "recording" event is set.
-            event_dict["recording"].wait()
             # Record the start time for the current recording cycle.
             start_time = time.time()
             
-            # Inner loop runs while the "recording" flag in the shared dictionary is True.
-            while shared_dict["recording"]:
-                # Perform object detection on the current shared frame and visualize the results.
-                object_detection.detecting_objects(shared_frame, visualize=True)
+            # Inner loop runs while the "recording" flag in the shared state is True, for the same incident.
+            while shared_state["recording"] and shared_state["MTR_incidents"] == incident:
+                # Block until the capture process announces a new frame.
+                frame_notifier.wait("OD", timeout=FRAME_WAIT_TIMEOUT)
+                # Submit a frame that has not been processed yet to the workers, read into a free buffer of
+                # the pool (frames are skipped while the workers are behind the camera).
+                buffer = pool.free_buffer()
+                latest = None if buffer is None else frame_ring.read_latest(last_frame_number, out=buffer)
+                if latest is not None:
+                    last_frame_number = latest[0]
+                    # Detect objects on the regions of the new frame where motion is (on the whole frame if
+                    # there is no motion or it covers most of the frame).
+                    regions = merge_motion_regions(shared_state["MD_motion_boxes"], buffer.shape,
+                                                   min_size=object_detection.target_size)
+                    pool.submit(buffer, regions)
+                # Track and count the objects of the frames the workers are done with, in order, and
+                # visualize the results.
+                processed = pool.collect()
+                if not processed:
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        shared_state["stop"] = True
+                        break
+                    continue
+                for processed_frame, predictions, scale in processed:
+                    object_detection.track_objects(predictions, scale)
+                object_detection.visualize(object_detection.tracked_objects, processed_frame, 1.0)
+                # Objects in the scene keep the incident (and its recording) going.
+                shared_state["objects_in_scene"] = bool(object_detection.objects_in_frame())
                 
                 # Check if the preset time for sending an alert message has been reached and hasn't been executed.
                 if time.time() - start_time > send_alert_msg_preset_time and not executed1:
                     # If this is the first alert cycle, get the detected objects.
                     if last_objects_detected is None:
                         detected_objects = object_detection.detected_objects_so_far()
-                        # Set flag in shared dictionary to allow sending an alert.
-                        shared_dict["permission_to_send_alert"] = True
+                        # Set flag in shared state to allow sending an alert.
+                        shared_state["permission_to_send_alert"] = True
                         # Share the detected object information for the alert.
-                        shared_dict["OD_det_obj_info_for_alert"] = detected_objects
+                        shared_state["OD_det_obj_info_for_alert"] = detected_objects
                         # Update last_objects_detected with current detections.
                         last_objects_detected = detected_objects
                         executed1 = True
@@ -83,31 +195,50 @@ def object_detection_main(shm_name: str, frame_shape: tuple, shared_dict: dict,
                         # If current detections exceed the last ones, update and send alert.
                         if counter_greater_than_comparison(detected_objects, last_objects_detected):
                             detected_objects = object_detection.detected_objects_so_far()
-                            shared_dict["permission_to_send_alert"] = True
-                            shared_dict["OD_det_obj_info_for_alert"] = detected_objects
+                            shared_state["permission_to_send_alert"] = True
+                            shared_state["OD_det_obj_info_for_alert"] = detected_objects
                             # Merge current detections with previous ones.
                             last_objects_detected = last_objects_detected | detected_objects
                             executed1 = True
 
-                # Check if the preset time for saving to the database has been reached and hasn't been executed.
-                if time.time() - start_time > save_to_database_preset_time and not executed2:
-                    detected_objects = object_detection.detected_objects_so_far()
-                    # Set flag in shared dictionary to allow database saving.
-                    shared_dict["OD_db_permission"] = True
-                    # Share the detected object information for the database.
-                    shared_dict["OD_detected_obj_to_db"] = detected_objects
-                    executed2 = True
+                # When the recording process ends a video file, share the objects detected during it
+                # for the database.
+                segment_name = queue_ended_segment(object_detection, shared_state, segment_name, pending_objects)
+                publish_segment_objects(shared_state, pending_objects)
                     
                 # Check if the 'q' key has been pressed to break the recording loop.
                 if cv2.waitKey(1) & 0xFF == ord('q'):
-                    shared_dict["stop"] = True
+                    shared_state["stop"] = True
                     break
+
+            # The incident is over: the frames still being processed are counted, there are no more objects
+            # in the scene, and the objects of the last video file are shared for the database (the file may
+            # have ended just before the recording flag was reset).
+            for processed_frame, predictions, scale in pool.collect(wait=True):
+                object_detection.track_objects(predictions, scale)
+            shared_state["objects_in_scene"] = False
+            segment_name = queue_ended_segment(object_detection, shared_state, segment_name, pending_objects)
+            publish_segment_objects(shared_state, pending_objects)
+        
+        # The recording process completes the video file being recorded at shutdown, possibly after this loop
+        # exited: its objects are shared too.
+        if segment_name is not None:
+            pending_objects.append((segment_name, object_detection.detected_objects_so_far()))
+        # Hand the last objects to the database process, which keeps logging until this process exits.
+        deadline = time.monotonic() + DB_HANDOFF_TIMEOUT
+        publish_segment_objects(shared_state, pending_objects)
+        while pending_objects and time.monotonic() < deadline:
+            time.sleep(0.1)
+            publish_segment_objects(shared_state, pending_objects)
+        if pending_objects:
+            print(f"Objects not logged in the database: {[file_name for file_name, _ in pending_objects]}")
         
-        # After exiting the main loop, close the shared memory connection.
-        shm.close()
+        # After exiting the main loop, stop the workers and close the shared memory connection.
+        pool.close()
+        frame_ring.close()
         exit()
     except FileNotFoundError:
         # Handle the error if the shared memory block does not exist.
         print(f"Shared memory '{shm_name}' does not exist.")
-        shared_dict["stop"] = True
+        shared_state["stop"] = True
         exit()
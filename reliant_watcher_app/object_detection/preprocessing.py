@@ -0,0 +1,76 @@
+import numpy as np
+import cv2
+
+# Value the model input is padded with, outside the letterboxed frame (as YOLOX was trained)
+PAD_VALUE = 114.0
+# Number of input shapes whose letterbox geometry and resize buffer are kept: the whole frame and a few
+# motion region sizes (see merge_motion_regions)
+MAX_CACHED_SHAPES = 8
+
+
+class LetterboxPreprocessor:
+    """
+    Turns BGR frames into the YOLOX input blob: resized keeping the aspect ratio into the top-left corner of
+    the model input, padded with PAD_VALUE, RGB, NCHW float32.
+
+    Nothing is allocated per frame: the frame is resized into a preallocated uint8 buffer, and the colour
+    conversion, the float conversion and the NCHW transposition are done in one pass, on the resized image
+    only, while it is copied into the preallocated blob. The geometry of the letterbox is computed once per
+    input shape.
+
+    The blob returned is overwritten by the next call: it must be consumed (inferred) first.
+    """
+
+    def __init__(self, target_size):
+        """
+        Parameters:
+            target_size (tuple): Model input size (height, width).
+        """
+        self.target_size = target_size
+        self.blob = np.full((1, 3, target_size[0], target_size[1]), PAD_VALUE, dtype=np.float32)
+        # Input shape (height, width) -> (ratio, resized width, resized height, resize buffer)
+        self._geometry = {}
+        # Resized size written into the blob by the last call: the padding only needs restoring when it changes
+        self._content_size = None
+
+    def letterbox_geometry(self, shape):
+        """
+        Returns the letterbox geometry of an input shape, computed on its first use.
+
+        Parameters:
+            shape (tuple): Height and width of the input frame.
+
+        Returns:
+            tuple: (ratio, resized width, resized height, uint8 resize buffer).
+        """
+        geometry = self._geometry.get(shape)
+        if geometry is None:
+            if len(self._geometry) >= MAX_CACHED_SHAPES:
+                # Forget the oldest shape (dicts keep the insertion order)
+                del self._geometry[next(iter(self._geometry))]
+            ratio = min(self.target_size[0] / shape[0], self.target_size[1] / shape[1])
+            width, height = int(shape[1] * ratio), int(shape[0] * ratio)
+            geometry = (ratio, width, height, np.empty((height, width, 3), dtype=np.uint8))
+            self._geometry[shape] = geometry
+        return geometry
+
+    def __call__(self, frame):
+        """
+        Letterboxes a BGR frame into the model input blob.
+
+        Parameters:
+            frame (np.ndarray): BGR uint8 frame, or a region of one (a view is fine).
+
+        Returns:
+            tuple: The (1, 3, height, width) RGB float32 blob and the scaling ratio from the frame to the blob.
+        """
+        ratio, width, height, resized = self.letterbox_geometry(frame.shape[:2])
+        if (width, height) != self._content_size:
+            # A smaller image than the last one leaves some of it behind: pad the blob again
+            self.blob.fill(PAD_VALUE)
+            self._content_size = (width, height)
+        cv2.resize(frame, (width, height), dst=resized, interpolation=cv2.INTER_AREA)
+        # BGR -> RGB, uint8 -> float32 and HWC -> CHW in one copy per channel
+        for channel in range(3):
+            np.copyto(self.blob[0, channel, :height, :width], resized[:, :, 2 - channel])
+        return self.blob, ratio
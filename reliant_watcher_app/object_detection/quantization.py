@@ -0,0 +1,236 @@
+"""
+int8 quantization of the YOLOX model, and the accuracy check of a quantized model against the fp32 one.
+
+Run from the reliant_watcher_app directory (needs onnxruntime), e.g.:
+    python -m object_detection.quantization quantize --mode static
+    python -m object_detection.quantization check --precision int8 --backend onnxruntime
+
+The check replays frames of the test videos through both models and fails (exit status 1) when the
+quantized model does not find the objects the fp32 model finds.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .object_detection import model_path
+from .preprocessing import LetterboxPreprocessor
+from .yolox import YoloX
+
+TEST_VIDEOS_DIR = Path(__file__).resolve().parent.parent / "test_videos"
+# Model input size (height, width), as ObjectDetection runs the model
+INPUT_SIZE = (320, 320)
+# One frame in FRAME_STEP of the test videos is used for calibration and for the check
+FRAME_STEP = 10
+# A detection of the quantized model matches one of the fp32 model of the same class overlapping it by at least this IoU
+MATCH_IOU = 0.5
+# Minimum recall and precision of the quantized model against the fp32 model for the check to pass
+MIN_AGREEMENT = 0.9
+
+
+def sample_frames(videos=None, step=FRAME_STEP):
+    """
+    Read one frame in step of videos.
+
+    Parameters:
+        videos (list): Paths of the videos (None: the videos of test_videos/).
+        step (int): Keep one frame in step.
+
+    Returns:
+        list: The BGR frames.
+    """
+    if videos is None:
+        videos = sorted(TEST_VIDEOS_DIR.glob("*.mp4"))
+    frames = []
+    for video in videos:
+        cap = cv2.VideoCapture(str(video))
+        frame_number = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_number % step == 0:
+                frames.append(frame)
+            frame_number += 1
+        cap.release()
+    return frames
+
+
+def model_input(frame):
+    """Preprocess a BGR frame as ObjectDetection does: RGB, letterboxed to the model input size, NCHW float32."""
+    return LetterboxPreprocessor(INPUT_SIZE)(frame)[0]
+
+
+def quantize_model(source, destination, mode="static", frames=None):
+    """
+    Quantize the fp32 YOLOX model to int8 with ONNX Runtime.
+
+    Parameters:
+        source (Path): Path of the fp32 model.
+        destination (Path): Path of the int8 model written.
+        mode (str): "static": weights and activations quantized, the activation ranges calibrated on frames
+            (QDQ format, which OpenCV's DNN module runs too); "dynamic": weights quantized, the activation ranges
+            computed at each inference (no calibration, ONNX Runtime only).
+        frames (list): BGR calibration frames for the static mode (None: frames of the test videos). They should
+            look like the camera's: same place, day and night.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic,
+                                          quantize_static)
+
+    if mode == "dynamic":
+        quantize_dynamic(str(source), str(destination), weight_type=QuantType.QUInt8)
+        return
+    if mode != "static":
+        raise ValueError(f"Unknown quantization mode '{mode}', expected 'static' or 'dynamic'.")
+
+    class FrameReader(CalibrationDataReader):
+        """Feeds the calibration frames to the model, one at a time."""
+
+        def __init__(self, input_name, frames):
+            self.input_name = input_name
+            self.frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self.frames, None)
+            return None if frame is None else {self.input_name: model_input(frame)}
+
+    import onnxruntime as ort
+    input_name = ort.InferenceSession(str(source), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(str(source), str(destination), FrameReader(input_name, sample_frames() if frames is None else frames),
+                    quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    per_channel=True)
+
+
+def box_iou(box, boxes):
+    """IoU of a box (x0, y0, x1, y1) with each row of boxes."""
+    x0 = np.maximum(box[0], boxes[:, 0])
+    y0 = np.maximum(box[1], boxes[:, 1])
+    x1 = np.minimum(box[2], boxes[:, 2])
+    y1 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    areas = (box[2] - box[0]) * (box[3] - box[1]) + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(areas - intersection, 1e-9)
+
+
+def match_detections(reference, candidate, iou_threshold=MATCH_IOU):
+    """
+    Match the detections of a model to those of a reference model on the same frame, greedily from the
+    highest scores: a detection matches the unmatched reference detection of its class it overlaps the most.
+
+    Parameters:
+        reference (np.ndarray): Reference detections [x0, y0, x1, y1, score, class_id], one per row.
+        candidate (np.ndarray): Detections of the model checked.
+        iou_threshold (float): Minimum IoU of a match.
+
+    Returns:
+        list: The IoU of each match.
+    """
+    reference = np.asarray(reference, dtype=np.float32).reshape(-1, 6)
+    candidate = np.asarray(candidate, dtype=np.float32).reshape(-1, 6)
+    unmatched = np.ones(len(reference), dtype=bool)
+    ious = []
+    for detection in candidate[np.argsort(-candidate[:, 4])]:
+        same_class = unmatched & (reference[:, 5] == detection[5])
+        if not same_class.any():
+            continue
+        overlaps = np.where(same_class, box_iou(detection, reference), 0.0)
+        best = int(np.argmax(overlaps))
+        if overlaps[best] >= iou_threshold:
+            unmatched[best] = False
+            ious.append(float(overlaps[best]))
+    return ious
+
+
+def accuracy_check(reference_model, candidate_model, frames, iou_threshold=MATCH_IOU):
+    """
+    Compare the detections of a model (e.g. quantized) with those of a reference model (fp32) on frames.
+
+    Parameters:
+        reference_model: Reference model, with an infer(input) method (YoloX).
+        candidate_model: Model checked.
+        frames (list): BGR frames.
+        iou_threshold (float): Minimum IoU of a match (see match_detections).
+
+    Returns:
+        dict: {'reference_detections', 'candidate_detections', 'matches': numbers of detections and matches,
+        'recall': fraction of the reference detections found, 'precision': fraction of the candidate detections
+        matching one of the reference, 'mean_iou': mean IoU of the matches, 'reference_ms', 'candidate_ms':
+        mean inference time per frame}.
+    """
+    reference_count = candidate_count = 0
+    ious = []
+    reference_time = candidate_time = 0.0
+    preprocessor = LetterboxPreprocessor(INPUT_SIZE)
+    for frame in frames:
+        input_blob = preprocessor(frame)[0]
+        start = time.perf_counter()
+        reference = np.asarray(reference_model.infer(input_blob), dtype=np.float32).reshape(-1, 6)
+        reference_time += time.perf_counter() - start
+        start = time.perf_counter()
+        candidate = np.asarray(candidate_model.infer(input_blob), dtype=np.float32).reshape(-1, 6)
+        candidate_time += time.perf_counter() - start
+        reference_count += len(reference)
+        candidate_count += len(candidate)
+        ious += match_detections(reference, candidate, iou_threshold)
+    frame_count = max(len(frames), 1)
+    return {
+        "reference_detections": reference_count,
+        "candidate_detections": candidate_count,
+        "matches": len(ious),
+        # No detection at all on either side is a perfect agreement
+        "recall": len(ious) / reference_count if reference_count else 1.0,
+        "precision": len(ious) / candidate_count if candidate_count else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "reference_ms": 1000 * reference_time / frame_count,
+        "candidate_ms": 1000 * candidate_time / frame_count,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantize the YOLOX model to int8 and check its accuracy.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    quantize_parser = subparsers.add_parser("quantize", help="Write an int8 model quantized from the fp32 one.")
+    quantize_parser.add_argument("--mode", choices=["static", "dynamic"], default="static",
+                                 help="static: calibrated on the test video frames; dynamic: no calibration.")
+    check_parser = subparsers.add_parser("check", help="Compare the detections of a model with the fp32 model's.")
+    check_parser.add_argument("--precision", default="int8", help="Precision of the model checked (see MODEL_FILES).")
+    check_parser.add_argument("--backend", choices=["opencv", "onnxruntime"], default="onnxruntime",
+                              help="Inference backend of the model checked (the fp32 model runs on OpenCV).")
+    check_parser.add_argument("--threads", type=int, help="Number of threads of the model checked.")
+    check_parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT,
+                              help="Minimum recall and precision against the fp32 model.")
+    for subparser in (quantize_parser, check_parser):
+        subparser.add_argument("--videos", nargs="+", type=Path, help="Videos the frames are read from (default: test_videos/).")
+    args = parser.parse_args(argv)
+
+    frames = sample_frames(args.videos)
+    if args.command == "quantize":
+        destination = model_path("int8" if args.mode == "static" else "int8_dynamic")
+        quantize_model(model_path("fp32"), destination, args.mode, frames)
+        print(f"Wrote {destination}")
+        return None
+
+    reference_model = YoloX(model_path("fp32"), input_size=INPUT_SIZE)
+    candidate_model = YoloX(model_path(args.precision), input_size=INPUT_SIZE, inference_backend=args.backend,
+                            threads=args.threads)
+    result = accuracy_check(reference_model, candidate_model, frames)
+    print(f"{len(frames)} frames: {result['matches']} of {result['reference_detections']} fp32 detections found "
+          f"(recall {result['recall']:.3f}), {result['candidate_detections']} detections "
+          f"(precision {result['precision']:.3f}), mean IoU {result['mean_iou']:.3f}")
+    print(f"Inference: fp32 (opencv) {result['reference_ms']:.1f} ms, {args.precision} ({args.backend}) "
+          f"{result['candidate_ms']:.1f} ms per frame")
+    if min(result["recall"], result["precision"]) < args.min_agreement:
+        print(f"FAILED: the {args.precision} model disagrees with the fp32 model (minimum {args.min_agreement}).")
+        sys.exit(1)
+    print("PASSED")
+    return result
+
+
+if __name__ == "__main__":
+    main()
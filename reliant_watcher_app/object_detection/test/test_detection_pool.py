@@ -0,0 +1,105 @@
+import threading
+import time
+import numpy as np
+import pytest
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from object_detection.detection_pool import DetectionPool
+
+FRAME_SHAPE = (48, 64, 3)
+
+
+class FakeDetector:
+    """Returns the value of the frame's first pixel as its prediction, after a delay."""
+
+    def __init__(self, delay=0.0, barrier=None):
+        self.delay = delay
+        self.barrier = barrier
+        self.frames = []
+
+    def prediction(self, frame, regions=None):
+        if self.barrier is not None:
+            # Only passes when all the workers are inferring at the same time
+            self.barrier.wait()
+        time.sleep(self.delay)
+        self.frames.append(int(frame[0, 0, 0]))
+        return [int(frame[0, 0, 0])], 1.0
+
+
+def submit(pool, value):
+    buffer = pool.free_buffer()
+    if buffer is None:
+        return None
+    buffer[...] = value
+    return pool.submit(buffer)
+
+@pytest.fixture
+def make_pool():
+    pools = []
+    def make(*args, **kwargs):
+        pools.append(DetectionPool(*args, **kwargs))
+        return pools[-1]
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_results_are_handed_back_in_order(make_pool):
+    # The first worker is slow: the frames of the fast one wait for its results
+    pool = make_pool([FakeDetector(delay=0.05), FakeDetector()], FRAME_SHAPE, max_pending=8)
+    for value in range(6):
+        submit(pool, value)
+    results = pool.collect(wait=True)
+    assert [predictions[0] for _, predictions, _ in results] == list(range(6))
+    assert [int(frame[0, 0, 0]) for frame, _, _ in results] == list(range(6))
+
+def test_workers_infer_at_the_same_time(make_pool):
+    barrier = threading.Barrier(3, timeout=5)
+    pool = make_pool([FakeDetector(barrier=barrier) for _ in range(3)], FRAME_SHAPE)
+    for value in range(3):
+        submit(pool, value)
+    assert len(pool.collect(wait=True)) == 3
+
+def test_detector_runs_on_keyframes_only(make_pool):
+    detector = FakeDetector()
+    pool = make_pool([detector], FRAME_SHAPE, detect_interval=3, max_pending=10)
+    assert [submit(pool, value) for value in range(7)] == [True, False, False, True, False, False, True]
+    results = pool.collect(wait=True)
+    assert [predictions for _, predictions, _ in results] == [[0], None, None, [3], None, None, [6]]
+    assert detector.frames == [0, 3, 6]
+
+def test_frames_are_skipped_while_all_buffers_are_in_use(make_pool):
+    pool = make_pool([FakeDetector(delay=0.05)], FRAME_SHAPE, max_pending=2)
+    assert submit(pool, 1) and submit(pool, 2)
+    assert pool.free_buffer() is None
+    first = pool.collect(wait=True)
+    # The collected frames stay valid until the next call
+    assert [int(frame[0, 0, 0]) for frame, _, _ in first] == [1, 2]
+    assert pool.free_buffer() is not None
+
+def test_frame_must_be_read_into_the_free_buffer(make_pool):
+    pool = make_pool([FakeDetector()], FRAME_SHAPE)
+    with pytest.raises(ValueError):
+        pool.submit(np.zeros(FRAME_SHAPE, dtype=np.uint8))
+
+def test_detector_errors_are_raised_on_collect(make_pool):
+    class FailingDetector:
+        def prediction(self, frame, regions=None):
+            raise RuntimeError("inference failed")
+    pool = make_pool([FailingDetector()], FRAME_SHAPE)
+    submit(pool, 1)
+    with pytest.raises(RuntimeError):
+        pool.collect(wait=True)
+
+def test_invalid_pools_raise():
+    with pytest.raises(ValueError):
+        DetectionPool([], FRAME_SHAPE)
+    with pytest.raises(ValueError):
+        DetectionPool([FakeDetector()], FRAME_SHAPE, detect_interval=0)
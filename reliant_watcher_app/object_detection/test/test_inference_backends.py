@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from object_detection import create_inference_backend, model_path, MODEL_FILES
+from object_detection.quantization import match_detections, accuracy_check
+
+
+class FakeModel:
+    """Returns the given detections whatever the input, as YoloX.infer returns them."""
+
+    def __init__(self, detections):
+        self.detections = np.asarray(detections, dtype=np.float32)
+
+    def infer(self, img):
+        assert img.shape == (1, 3, 320, 320)
+        return self.detections
+
+
+def test_unknown_inference_backend_raises():
+    with pytest.raises(ValueError):
+        create_inference_backend("tensorrt", model_path())
+
+def test_model_path_of_each_precision():
+    assert model_path("fp32").name == MODEL_FILES["fp32"]
+    assert model_path("int8").name == MODEL_FILES["int8"]
+    with pytest.raises(ValueError):
+        model_path("fp16")
+
+def test_match_detections_requires_same_class_and_overlap():
+    reference = [[0, 0, 100, 100, 0.9, 0], [200, 200, 300, 300, 0.8, 2]]
+    # Same box, other class: no match; shifted by a third of its width: IoU 0.5 -> match at 0.5 only
+    assert match_detections(reference, [[0, 0, 100, 100, 0.9, 1]]) == []
+    shifted = [[200, 200, 300, 300, 0.9, 2], [0, 0, 50, 100, 0.7, 0]]
+    assert match_detections(reference, shifted, iou_threshold=0.5) == pytest.approx([1.0, 0.5])
+    assert match_detections(reference, shifted, iou_threshold=0.6) == pytest.approx([1.0])
+
+def test_match_detections_matches_each_reference_once():
+    reference = [[0, 0, 100, 100, 0.9, 0]]
+    candidate = [[0, 0, 100, 100, 0.6, 0], [0, 0, 100, 90, 0.9, 0]]
+    # The highest score is matched first and takes the only reference detection
+    assert match_detections(reference, candidate) == pytest.approx([0.9])
+
+def test_accuracy_check_counts_recall_and_precision():
+    frames = [np.zeros((240, 320, 3), dtype=np.uint8)] * 2
+    reference = FakeModel([[0, 0, 100, 100, 0.9, 0], [200, 0, 300, 100, 0.9, 0]])
+    candidate = FakeModel([[0, 0, 100, 100, 0.8, 0]])
+    result = accuracy_check(reference, candidate, frames)
+    assert (result["reference_detections"], result["candidate_detections"], result["matches"]) == (4, 2, 2)
+    assert result["recall"] == 0.5 and result["precision"] == 1.0 and result["mean_iou"] == pytest.approx(1.0)
+
+def test_accuracy_check_without_detections_agrees():
+    frames = [np.zeros((240, 320, 3), dtype=np.uint8)]
+    result = accuracy_check(FakeModel([]), FakeModel([]), frames)
+    assert result["recall"] == 1.0 and result["precision"] == 1.0
@@ -0,0 +1,52 @@
+import pytest
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from object_detection.motion_regions import merge_motion_regions
+
+FRAME_SHAPE = (1080, 1920, 3)
+
+
+def test_no_motion_falls_back_to_whole_frame():
+    assert merge_motion_regions([], FRAME_SHAPE) is None
+
+def test_small_box_is_padded_and_grown_to_min_size():
+    regions = merge_motion_regions([(1000, 500, 1020, 540)], FRAME_SHAPE, min_size=(320, 320))
+    assert len(regions) == 1
+    x0, y0, x1, y1 = regions[0]
+    assert (x1 - x0, y1 - y0) == (320, 320)
+    assert x0 <= 1000 - 16 and x1 >= 1020 + 16 and y0 <= 500 - 16 and y1 >= 540 + 16
+
+def test_region_is_kept_inside_frame():
+    (region,) = merge_motion_regions([(0, 1070, 10, 1080)], FRAME_SHAPE, min_size=(320, 320))
+    assert region == (0, 760, 320, 1080)
+
+def test_overlapping_boxes_are_merged():
+    boxes = [(100, 100, 200, 200), (150, 150, 260, 240)]
+    regions = merge_motion_regions(boxes, FRAME_SHAPE, max_regions=4)
+    assert len(regions) == 1
+
+def test_distant_boxes_are_kept_apart_up_to_max_regions():
+    boxes = [(100, 100, 150, 150), (1700, 900, 1750, 950)]
+    assert len(merge_motion_regions(boxes, FRAME_SHAPE, max_regions=2)) == 2
+    # Merged into one region covering most of the frame: the whole frame is used instead.
+    assert merge_motion_regions(boxes, FRAME_SHAPE, max_regions=1) is None
+
+def test_large_motion_falls_back_to_whole_frame():
+    assert merge_motion_regions([(100, 100, 1800, 1000)], FRAME_SHAPE) is None
+
+def test_regions_cover_motion_boxes():
+    boxes = [(300, 200, 340, 300), (360, 210, 400, 310), (1200, 600, 1260, 700)]
+    regions = merge_motion_regions(boxes, FRAME_SHAPE, max_regions=3)
+    for x0, y0, x1, y1 in boxes:
+        assert any(r[0] <= x0 and r[1] <= y0 and r[2] >= x1 and r[3] >= y1 for r in regions)
+
+def test_invalid_max_regions_raise_err():
+    with pytest.raises(ValueError):
+        merge_motion_regions([(0, 0, 10, 10)], FRAME_SHAPE, max_regions=0)
@@ -90,6 +90,18 @@ def test_detected_objects_so_far(detection_instance):
     expected_diff = Counter({'car': 1})
     assert detected_diff == expected_diff, f"Expected detected objects so far {expected_diff}, got {detected_diff}"
 
+def test_prediction_in_regions_maps_boxes_to_frame(detection_instance):
+    """
+    Predictions made on regions of the frame are returned in frame coordinates, one per region.
+    """
+    frame = dummy_frame()
+    # 320x320 regions are not scaled: the dummy box (0, 0, 100, 100) is shifted by the region origin.
+    predictions, scale = detection_instance.prediction(frame, regions=[(100, 50, 420, 370), (0, 0, 320, 320)])
+    assert scale == 1.0
+    assert sorted(map(tuple, predictions[:, :4].tolist())) == [(0, 0, 100, 100), (100, 50, 200, 150)]
+    detection_instance.detecting_objects(frame, visualize=False, regions=[(100, 50, 420, 370)])
+    assert detection_instance.curr_objs == Counter({'person': 1})
+
 
 
 def test_non_counter_both():
@@ -155,3 +167,32 @@ def test_multiple_keys():
     c1 = Counter({'a': 1, 'b': 2})
     c2 = Counter({'a': 1})
     assert counter_greater_than_comparison(c1, c2) is True
+
+def test_background_object_picked_up_again_is_not_a_new_object(detection_instance):
+    """
+    A background object whose track is lost during an incident (no detection for more than max_misses
+    frames) gets a new track when it is detected again: it must not be reported as a new object, while
+    another object of its class is.
+    """
+    frame = dummy_frame()
+    detection_instance.compute_background_objects(frame, seconds=3, visualize=False)
+    assert detection_instance.get_background_objects() == Counter({'person': 1})
+    # Start of an incident: the tracks are forgotten.
+    detection_instance.clear_aggregated_objects(reset_tracks=True)
+    detection_instance.detecting_objects(frame, visualize=False)
+    detection_instance.detecting_objects(frame, visualize=False)
+    # The background person is missed long enough for its track to be dropped, then detected again.
+    detection_instance.model.infer = lambda blob: []
+    for _ in range(detection_instance.tracker.max_misses + 1):
+        detection_instance.detecting_objects(frame, visualize=False)
+    detection_instance.model.infer = dummy_infer_constant
+    detection_instance.detecting_objects(frame, visualize=False)
+    detection_instance.detecting_objects(frame, visualize=False)
+    assert detection_instance.aggregated_objects == Counter({'person': 2})
+    assert detection_instance.detected_objects_so_far() == Counter()
+    # A second person walks in next to the background one.
+    detection_instance.model.infer = lambda blob: [np.array([0, 0, 100, 100, 0.9, 0]),
+                                                   np.array([300, 200, 400, 400, 0.9, 0])]
+    detection_instance.detecting_objects(frame, visualize=False)
+    detection_instance.detecting_objects(frame, visualize=False)
+    assert detection_instance.detected_objects_so_far() == Counter({'person': 1})
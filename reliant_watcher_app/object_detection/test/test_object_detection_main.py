@@ -0,0 +1,55 @@
+from collections import Counter, deque
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from object_detection.object_detection_main import queue_ended_segment, publish_segment_objects
+
+
+class AggregatedObjects:
+    """Aggregates the objects it is given, like ObjectDetection.detected_objects_so_far()."""
+
+    def __init__(self):
+        self.objects = Counter()
+
+    def detected_objects_so_far(self):
+        return Counter(self.objects)
+
+    def clear_aggregated_objects(self):
+        self.objects = Counter()
+
+
+def test_objects_are_queued_for_the_video_file_they_were_detected_in():
+    shared_state = {"MTR_segment_name": "a.mp4"}
+    detector = AggregatedObjects()
+    pending = deque()
+    segment_name = queue_ended_segment(detector, shared_state, None, pending)
+    assert segment_name == "a.mp4" and not pending
+    detector.objects["person"] += 1
+    # The incident goes on in a new video file
+    shared_state["MTR_segment_name"] = "b.mp4"
+    segment_name = queue_ended_segment(detector, shared_state, segment_name, pending)
+    detector.objects["car"] += 1
+    # The incident is over
+    shared_state["MTR_segment_name"] = ""
+    segment_name = queue_ended_segment(detector, shared_state, segment_name, pending)
+    assert segment_name is None
+    assert list(pending) == [("a.mp4", Counter({"person": 1})), ("b.mp4", Counter({"car": 1}))]
+
+def test_objects_are_shared_one_video_file_at_a_time():
+    shared_state = {"OD_db_permission": False, "OD_video_name_to_db": "", "OD_detected_obj_to_db": Counter()}
+    pending = deque([("a.mp4", Counter({"person": 1})), ("b.mp4", Counter({"car": 1}))])
+    publish_segment_objects(shared_state, pending)
+    assert (shared_state["OD_video_name_to_db"], shared_state["OD_db_permission"]) == ("a.mp4", True)
+    # Not taken by the database process yet: the share is not overwritten
+    publish_segment_objects(shared_state, pending)
+    assert shared_state["OD_detected_obj_to_db"] == Counter({"person": 1})
+    shared_state["OD_db_permission"] = False
+    publish_segment_objects(shared_state, pending)
+    assert (shared_state["OD_video_name_to_db"], shared_state["OD_detected_obj_to_db"]) == ("b.mp4", Counter({"car": 1}))
+    assert not pending
@@ -0,0 +1,81 @@
+import numpy as np
+import cv2
+import pytest
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from object_detection.preprocessing import LetterboxPreprocessor, MAX_CACHED_SHAPES
+
+TARGET_SIZE = (320, 320)
+
+
+def random_frame(height, width, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+def scale_to_target_size(frame, target_size):
+    """
+    The former letterbox, which allocated its frames at each call: resizes and pads a frame to a model
+    input size, keeping its aspect ratio (the frame in the top-left corner, the rest padded with 114.0).
+    Returns the padded float32 frame and the scaling ratio.
+    """
+    padded_frame = np.ones((target_size[0], target_size[1], 3), dtype=np.float32) * 114.0
+    ratio = min(target_size[0] / frame.shape[0], target_size[1] / frame.shape[1])
+    resized_img = cv2.resize(
+        frame,
+        (int(frame.shape[1] * ratio), int(frame.shape[0] * ratio)),
+        interpolation=cv2.INTER_AREA
+    ).astype(np.float32)
+    padded_frame[: int(frame.shape[0] * ratio), : int(frame.shape[1] * ratio)] = resized_img
+    return padded_frame, ratio
+
+def reference_blob(frame):
+    # The former preprocessing: RGB conversion of the whole frame, letterbox, then NCHW
+    padded, ratio = scale_to_target_size(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), TARGET_SIZE)
+    return np.transpose(padded, (2, 0, 1))[np.newaxis], ratio
+
+
+def test_letterbox_keeps_aspect_ratio():
+    blob, ratio = LetterboxPreprocessor(TARGET_SIZE)(np.zeros((480, 640, 3), dtype=np.uint8))
+    assert ratio == 0.5
+    assert np.all(blob[0, :, :240] == 0) and np.all(blob[0, :, 240:] == 114.0)
+
+@pytest.mark.parametrize("shape", [(480, 640), (1080, 1920), (640, 480), (320, 320), (100, 150)])
+def test_blob_matches_former_preprocessing(shape):
+    frame = random_frame(*shape)
+    blob, ratio = LetterboxPreprocessor(TARGET_SIZE)(frame)
+    expected, expected_ratio = reference_blob(frame)
+    assert blob.shape == (1, 3, 320, 320) and blob.dtype == np.float32 and blob.flags.c_contiguous
+    assert ratio == expected_ratio
+    np.testing.assert_array_equal(blob, expected)
+
+def test_buffers_are_reused():
+    preprocessor = LetterboxPreprocessor(TARGET_SIZE)
+    frame = random_frame(480, 640)
+    blob, _ = preprocessor(frame)
+    geometry = preprocessor.letterbox_geometry((480, 640))
+    assert preprocessor(random_frame(480, 640, seed=1))[0] is blob
+    assert preprocessor.letterbox_geometry((480, 640)) is geometry
+
+def test_padding_is_restored_when_the_shape_changes():
+    preprocessor = LetterboxPreprocessor(TARGET_SIZE)
+    # A portrait frame fills the blob's height, a landscape one its width: none of the first may be left
+    preprocessor(random_frame(640, 480))
+    frame = random_frame(480, 640, seed=1)
+    np.testing.assert_array_equal(preprocessor(frame)[0], reference_blob(frame)[0])
+
+def test_region_views_are_letterboxed():
+    frame = random_frame(1080, 1920)
+    region = frame[100:500, 300:900]
+    np.testing.assert_array_equal(LetterboxPreprocessor(TARGET_SIZE)(region)[0], reference_blob(region.copy())[0])
+
+def test_geometry_cache_is_bounded():
+    preprocessor = LetterboxPreprocessor(TARGET_SIZE)
+    for height in range(320, 320 + 2 * MAX_CACHED_SHAPES):
+        preprocessor(random_frame(height, 400))
+    assert len(preprocessor._geometry) == MAX_CACHED_SHAPES
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from object_detection.tracker import ObjectTracker, iou_matrix
+
+PERSON, CAR = 0, 2
+
+
+def moving_box(frame_number, start=(100, 200), velocity=(6, 1), size=(60, 150)):
+    x, y = start[0] + velocity[0] * frame_number, start[1] + velocity[1] * frame_number
+    return np.array([x, y, x + size[0], y + size[1]], dtype=np.float64)
+
+def detection(box, class_id=PERSON, score=0.9):
+    return np.array([*box, score, class_id])
+
+def run(tracker, detections_per_frame, detect_interval=1):
+    """Feed the detections of the keyframes and predict on the other frames; returns the tracked objects."""
+    tracked = []
+    for frame_number, detections in enumerate(detections_per_frame):
+        if frame_number % detect_interval == 0:
+            tracked.append(tracker.update(detections))
+        else:
+            tracked.append(tracker.predict())
+    return tracked
+
+
+def test_iou_matrix():
+    ious = iou_matrix([[0, 0, 10, 10], [20, 20, 30, 30]], [[0, 0, 10, 10], [5, 0, 15, 10]])
+    np.testing.assert_allclose(ious, [[1, 1 / 3], [0, 0]])
+
+def test_object_keeps_its_id_between_keyframes():
+    tracker = ObjectTracker()
+    frames = [[detection(moving_box(n))] for n in range(60)]
+    tracked = run(tracker, frames, detect_interval=3)
+    assert {int(row[6]) for objects in tracked for row in objects} == {1}
+    # Once the velocity is learnt, the boxes predicted between keyframes follow the object
+    for n in range(30, 60):
+        assert len(tracked[n]) == 1
+        assert iou_matrix(tracked[n][:, :4], moving_box(n))[0, 0] > 0.8
+    assert tracker.counted_objects() == {PERSON: 1}
+
+def test_distinct_objects_are_counted_once_each():
+    tracker = ObjectTracker()
+    frames = []
+    for n in range(40):
+        detections = [detection(moving_box(n))]
+        if n >= 10:
+            detections.append(detection(moving_box(n, start=(800, 300), velocity=(-4, 0))))
+        if n % 7 != 0:
+            detections.append(detection(moving_box(0, start=(400, 50), velocity=(0, 0), size=(200, 100)), CAR))
+        frames.append(detections)
+    run(tracker, frames, detect_interval=2)
+    assert tracker.counted_objects() == {PERSON: 2, CAR: 1}
+
+def test_isolated_false_detections_are_not_counted():
+    tracker = ObjectTracker()
+    frames = [[detection(moving_box(n, start=(50 + 150 * n % 900, 100)))] if n % 3 == 0 else [] for n in range(30)]
+    run(tracker, frames)
+    assert tracker.counted_objects() == {}
+
+def test_detection_of_another_class_does_not_match():
+    tracker = ObjectTracker()
+    box = moving_box(0, velocity=(0, 0))
+    tracker.update([detection(box, PERSON)])
+    tracked = tracker.update([detection(box, CAR)])
+    assert [int(row[5]) for row in tracked] == [CAR]
+    assert int(tracked[0, 6]) == 2
+
+def test_lost_object_is_dropped_after_max_misses():
+    tracker = ObjectTracker(max_misses=2)
+    for n in range(5):
+        tracker.update([detection(moving_box(n))])
+    tracker.update([])
+    tracker.update([])
+    assert len(tracker.tracks) == 1 and len(tracker.tracked_objects()) == 0
+    tracker.update([])
+    assert tracker.tracks == []
+
+def test_clear_counted_objects_keeps_the_objects_still_tracked():
+    tracker = ObjectTracker()
+    for n in range(5):
+        tracker.update([detection(moving_box(n))])
+    tracker.clear_counted_objects()
+    assert tracker.counted_objects() == {PERSON: 1}
+    tracker.reset()
+    assert tracker.counted_objects() == {} and len(tracker.tracked_objects()) == 0
@@ -0,0 +1,90 @@
+import numpy as np
+import cv2
+import pytest
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from object_detection import yolox
+from object_detection.yolox import YoloX
+
+INPUT_SIZE = (320, 320)
+NUM_ANCHORS = sum((320 // stride) ** 2 for stride in (8, 16, 32))
+
+
+class FakeBackend:
+    """Stands for the model: the postprocessing is tested on synthetic outputs."""
+
+    def __init__(self, model_path, threads=None, backend_id=0, target_id=0):
+        pass
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(yolox, "OpenCVDnnBackend", FakeBackend)
+    return YoloX("no_model.onnx", input_size=INPUT_SIZE)
+
+def synthetic_outputs(seed, objects=40):
+    """Raw YOLOX outputs: low objectness everywhere but on a few anchors, random class scores."""
+    rng = np.random.default_rng(seed)
+    dets = np.empty((NUM_ANCHORS, 85), dtype=np.float32)
+    dets[:, :2] = rng.uniform(0, 1, (NUM_ANCHORS, 2))
+    dets[:, 2:4] = rng.uniform(0, 2, (NUM_ANCHORS, 2))
+    dets[:, 4] = rng.uniform(0, 0.2, NUM_ANCHORS)
+    dets[rng.choice(NUM_ANCHORS, objects, replace=False), 4] = rng.uniform(0.2, 1.0, objects)
+    dets[:, 5:] = rng.uniform(0, 1, (NUM_ANCHORS, 80)) ** 4
+    return [dets]
+
+def former_postprocess(model, outputs):
+    """YoloX.postprocess before the early filtering: every anchor decoded and scored."""
+    dets = outputs[0].copy()
+    dets[:, :2] = (dets[:, :2] + model.grids) * model.expanded_strides
+    dets[:, 2:4] = np.exp(dets[:, 2:4]) * model.expanded_strides
+    boxes = dets[:, :4]
+    boxes_xyxy = np.concatenate([boxes[:, :2] - boxes[:, 2:] / 2., boxes[:, :2] + boxes[:, 2:] / 2.], axis=1)
+    scores = dets[:, 4:5] * dets[:, 5:]
+    max_scores = np.amax(scores, axis=1)
+    max_scores_idx = np.argmax(scores, axis=1)
+    keep = cv2.dnn.NMSBoxesBatched(boxes_xyxy.tolist(), max_scores.tolist(), max_scores_idx.tolist(),
+                                   model.confThreshold, model.nmsThreshold)
+    candidates = np.concatenate([boxes_xyxy, max_scores[:, None], max_scores_idx[:, None]], axis=1)
+    return candidates[np.asarray(keep).reshape(-1)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_same_detections_as_decoding_every_anchor(model, seed):
+    outputs = synthetic_outputs(seed)
+    expected = former_postprocess(model, outputs)
+    assert len(expected) > 0
+    np.testing.assert_allclose(model.postprocess(outputs), expected, rtol=1e-5)
+
+def test_outputs_are_not_modified(model):
+    outputs = synthetic_outputs(0)
+    raw = outputs[0].copy()
+    model.postprocess(outputs)
+    np.testing.assert_array_equal(outputs[0], raw)
+
+def test_no_object_gives_no_detection(model):
+    outputs = synthetic_outputs(0, objects=0)
+    assert len(model.postprocess(outputs)) == 0
+
+def test_class_allowlist_keeps_only_its_classes(model):
+    outputs = synthetic_outputs(1, objects=200)
+    everything = model.postprocess(outputs)
+    model.setClasses(["person", "car", "dog"])
+    allowed = [model.objects.index(name) for name in ("person", "car", "dog")]
+    # NMS is per class: the allowed detections are those found without the allowlist
+    expected = everything[np.isin(everything[:, 5], allowed)]
+    assert len(expected) > 0
+    np.testing.assert_allclose(model.postprocess(outputs), expected)
+    model.setClasses(None)
+    assert len(model.postprocess(outputs)) == len(everything)
+
+def test_unknown_class_raises(model):
+    with pytest.raises(ValueError):
+        model.setClasses(["person", "unicorn"])
@@ -0,0 +1,205 @@
+import numpy as np
+
+# Kalman filter noise, relative to the height of the box (as in DeepSORT): the measurements of a large,
+# close object are less precise in pixels than those of a small, distant one
+POSITION_NOISE = 1. / 20
+VELOCITY_NOISE = 1. / 160
+
+
+def iou_matrix(boxes1, boxes2):
+    """
+    IoU of each pair of (x0, y0, x1, y1) boxes.
+
+    Parameters:
+        boxes1 (np.ndarray): N boxes, one per row.
+        boxes2 (np.ndarray): M boxes, one per row.
+
+    Returns:
+        np.ndarray: N x M IoUs.
+    """
+    boxes1 = np.asarray(boxes1, dtype=np.float64).reshape(-1, 4)[:, None]
+    boxes2 = np.asarray(boxes2, dtype=np.float64).reshape(-1, 4)[None]
+    width = np.clip(np.minimum(boxes1[..., 2], boxes2[..., 2]) - np.maximum(boxes1[..., 0], boxes2[..., 0]), 0, None)
+    height = np.clip(np.minimum(boxes1[..., 3], boxes2[..., 3]) - np.maximum(boxes1[..., 1], boxes2[..., 1]), 0, None)
+    intersection = width * height
+    areas1 = (boxes1[..., 2] - boxes1[..., 0]) * (boxes1[..., 3] - boxes1[..., 1])
+    areas2 = (boxes2[..., 2] - boxes2[..., 0]) * (boxes2[..., 3] - boxes2[..., 1])
+    return intersection / np.maximum(areas1 + areas2 - intersection, 1e-9)
+
+
+class Track:
+    """
+    An object followed across frames: a constant velocity Kalman filter on the center, width and height of
+    its box, corrected by the detections matched to it.
+    """
+
+    # State transition over one frame: the center and the size move by their velocities
+    _transition = np.eye(8)
+    _transition[:4, 4:] = np.eye(4)
+    _observation = np.eye(4, 8)
+
+    def __init__(self, track_id, detection):
+        """
+        Parameters:
+            track_id (int): Identifier of the track, unique for the tracker.
+            detection (np.ndarray): The detection starting the track [x0, y0, x1, y1, score, class_id].
+        """
+        self.track_id = track_id
+        self.class_id = int(detection[5])
+        self.score = float(detection[4])
+        self.hits = 1           # Number of detections matched to the track
+        self.misses = 0         # Number of detection rounds in a row the track was not matched in
+        measurement = self._measurement(detection)
+        self.mean = np.concatenate([measurement, np.zeros(4)])
+        height = measurement[3]
+        std = [2 * POSITION_NOISE * height] * 4 + [10 * VELOCITY_NOISE * height] * 4
+        self.covariance = np.diag(np.square(std))
+
+    @staticmethod
+    def _measurement(detection):
+        x0, y0, x1, y1 = detection[:4]
+        return np.array([(x0 + x1) / 2., (y0 + y1) / 2., x1 - x0, y1 - y0])
+
+    @property
+    def box(self):
+        """The estimated box (x0, y0, x1, y1)."""
+        cx, cy, width, height = self.mean[:4]
+        return np.array([cx - width / 2., cy - height / 2., cx + width / 2., cy + height / 2.])
+
+    def predict(self):
+        """Move the track one frame forward."""
+        height = self.mean[3]
+        std = [POSITION_NOISE * height] * 4 + [VELOCITY_NOISE * height] * 4
+        self.mean = self._transition @ self.mean
+        # A box cannot shrink below one pixel
+        self.mean[2:4] = np.maximum(self.mean[2:4], 1.)
+        self.covariance = self._transition @ self.covariance @ self._transition.T + np.diag(np.square(std))
+
+    def update(self, detection):
+        """Correct the track with a detection matched to it."""
+        std = [POSITION_NOISE * self.mean[3]] * 4
+        innovation_covariance = self._observation @ self.covariance @ self._observation.T + np.diag(np.square(std))
+        gain = self.covariance @ self._observation.T @ np.linalg.inv(innovation_covariance)
+        self.mean = self.mean + gain @ (self._measurement(detection) - self._observation @ self.mean)
+        self.covariance = (np.eye(8) - gain @ self._observation) @ self.covariance
+        self.score = float(detection[4])
+        self.hits += 1
+        self.misses = 0
+
+
+class ObjectTracker:
+    """
+    Follows the detected objects across frames and gives each one a stable identifier, so the detector can
+    run on one frame in a few only (keyframes): the tracks are predicted on the frames in between.
+
+    Detections are matched to the tracks of their class greedily, from the highest IoU with the predicted
+    box. A track is confirmed once matched min_hits times (isolated false detections never are) and dropped
+    after max_misses detection rounds without a match (immediately while it is not confirmed).
+    The confirmed tracks are counted as distinct objects, e.g. the number of persons seen during an incident.
+    """
+
+    def __init__(self, iou_threshold=0.3, min_hits=2, max_misses=2):
+        """
+        Parameters:
+            iou_threshold (float): Minimum IoU between a detection and the predicted box of a track to match.
+            min_hits (int): Number of detections a track needs to be confirmed.
+            max_misses (int): Number of detection rounds in a row a confirmed track survives without a match.
+        """
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.tracks = []
+        self.next_id = 1
+        # Track id -> class id of the confirmed tracks seen since the last clear_counted_objects()
+        self.counted = {}
+
+    def predict(self):
+        """
+        Move the tracks one frame forward, on a frame the detector does not run on.
+
+        Returns:
+            np.ndarray: The tracked objects (see tracked_objects).
+        """
+        for track in self.tracks:
+            track.predict()
+        return self.tracked_objects()
+
+    def update(self, detections):
+        """
+        Move the tracks one frame forward and correct them with the detections of the frame.
+
+        Parameters:
+            detections (np.ndarray): Detections [x0, y0, x1, y1, score, class_id] in frame coordinates.
+
+        Returns:
+            np.ndarray: The tracked objects (see tracked_objects).
+        """
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 6)
+        for track in self.tracks:
+            track.predict()
+
+        unmatched_tracks = set(range(len(self.tracks)))
+        unmatched_detections = set(range(len(detections)))
+        if self.tracks and len(detections):
+            ious = iou_matrix(np.array([track.box for track in self.tracks]), detections[:, :4])
+            # Only a detection of the track's class can match it
+            track_classes = np.array([track.class_id for track in self.tracks])
+            ious[track_classes[:, None] != detections[None, :, 5].astype(int)] = 0.
+            for index in np.argsort(-ious, axis=None):
+                track_index, detection_index = np.unravel_index(index, ious.shape)
+                if ious[track_index, detection_index] < self.iou_threshold:
+                    break
+                if track_index in unmatched_tracks and detection_index in unmatched_detections:
+                    self.tracks[track_index].update(detections[detection_index])
+                    unmatched_tracks.discard(track_index)
+                    unmatched_detections.discard(detection_index)
+
+        for track_index in unmatched_tracks:
+            self.tracks[track_index].misses += 1
+        self.tracks = [track for track in self.tracks
+                       if track.misses == 0 or (track.hits >= self.min_hits and track.misses <= self.max_misses)]
+        for detection_index in sorted(unmatched_detections):
+            self.tracks.append(Track(self.next_id, detections[detection_index]))
+            self.next_id += 1
+
+        for track in self.tracks:
+            if track.hits >= self.min_hits:
+                self.counted[track.track_id] = track.class_id
+        return self.tracked_objects()
+
+    def tracked_objects(self, confirmed_only=False):
+        """
+        Returns the objects matched to a detection in the last detection round.
+
+        Parameters:
+            confirmed_only (bool): Whether to leave out the tracks that are not confirmed yet.
+
+        Returns:
+            np.ndarray: One row [x0, y0, x1, y1, score, class_id, track_id] per object, in frame coordinates.
+        """
+        rows = [[*track.box, track.score, track.class_id, track.track_id] for track in self.tracks
+                if track.misses == 0 and (track.hits >= self.min_hits or not confirmed_only)]
+        return np.array(rows, dtype=np.float64).reshape(-1, 7)
+
+    def counted_objects(self):
+        """
+        Returns the number of distinct objects (confirmed tracks) of each class seen since the last
+        clear_counted_objects().
+
+        Returns:
+            dict: Class id -> number of distinct objects.
+        """
+        counts = {}
+        for class_id in self.counted.values():
+            counts[class_id] = counts.get(class_id, 0) + 1
+        return counts
+
+    def clear_counted_objects(self):
+        """Start counting the distinct objects again: only the confirmed tracks still followed are kept."""
+        self.counted = {track.track_id: track.class_id for track in self.tracks
+                        if track.hits >= self.min_hits and track.misses == 0}
+
+    def reset(self):
+        """Forget all the tracks."""
+        self.tracks = []
+        self.counted = {}
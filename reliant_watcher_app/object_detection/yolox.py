@@ -1,5 +1,7 @@
 import numpy as np
 import cv2
+from .inference_backends import create_inference_backend, OpenCVDnnBackend
+from object_classes import OBJECT_CLASSES
 
 
 # Yolox class is not my code and it was copied from opencv_zoo
@@ -10,24 +12,18 @@ import cv2
 
 class YoloX:
     # read only class variables
-    _objects = ('person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus',
-           'train', 'truck', 'boat', 'traffic light', 'fire hydrant',
-           'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
-           'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe',
-           'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee',
-           'skis', 'snowboard', 'sports ball', 'kite', 'baseball bat',
-           'baseball glove', 'skateboard', 'surfboard', 'tennis racket',
-           'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl',
-           'banana', 'apple', 'sandwich', 'orange', 'broccoli', 'carrot',
-           'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
-           'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop',
-           'mouse', 'remote', 'keyboard', 'cell phone', 'microwave',
-           'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock',
-           'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush')
+    _objects = OBJECT_CLASSES
     
-    def __init__(self, modelPath, input_size=(416, 416), confThreshold=0.3, nmsThreshold=0.3, objThreshold=0.3, backendId=0, targetId=0):
+    def __init__(self, modelPath, input_size=(416, 416), confThreshold=0.3, nmsThreshold=0.3, objThreshold=0.3, backendId=0, targetId=0,
+                 inference_backend="opencv", threads=None, classes=None):
+        # inference_backend: "opencv" (cv2.dnn, with backendId and targetId) or "onnxruntime" (see inference_backends);
+        # threads: number of threads an inference is split across (None: the backend's default);
+        # classes: names of the only objects detected (None: all of them), see setClasses
         self.num_classes = 80
-        self.net = cv2.dnn.readNet(modelPath)
+        if inference_backend == "opencv":
+            self.backend = OpenCVDnnBackend(modelPath, threads, backendId, targetId)
+        else:
+            self.backend = create_inference_backend(inference_backend, modelPath, threads)
         self.input_size = input_size
         self.strides = [8, 16, 32]
         self.confThreshold = confThreshold
@@ -35,8 +31,7 @@ class YoloX:
         self.objThreshold = objThreshold
         self.backendId = backendId
         self.targetId = targetId
-        self.net.setPreferableBackend(self.backendId)
-        self.net.setPreferableTarget(self.targetId)
+        self.setClasses(classes)
 
         self.generateAnchors()
 
@@ -49,50 +44,73 @@ class YoloX:
         return self._objects
 
     def setBackendAndTarget(self, backendId, targetId):
+        if not isinstance(self.backend, OpenCVDnnBackend):
+            raise RuntimeError("Backend and target are OpenCV DNN settings.")
         self.backendId = backendId
         self.targetId = targetId
-        self.net.setPreferableBackend(self.backendId)
-        self.net.setPreferableTarget(self.targetId)
+        self.backend.set_backend_and_target(self.backendId, self.targetId)
+
+    def setClasses(self, classes):
+        # Allowlist of the objects detected: the detections of the other classes are dropped before NMS
+        # (NMS is per class, so the detections kept are those of the allowed classes without the allowlist)
+        if classes is None:
+            self.class_allowed = None
+            return
+        unknown = [name for name in classes if name not in self._objects]
+        if unknown:
+            raise ValueError(f"Unknown object classes: {unknown}")
+        self.class_allowed = np.zeros(self.num_classes, dtype=bool)
+        self.class_allowed[[self._objects.index(name) for name in classes]] = True
 
     def preprocess(self, img):
+        # An NCHW blob (see LetterboxPreprocessor) is already the model input
+        if img.ndim == 4:
+            return img
         blob = np.transpose(img, (2, 0, 1))
         return blob[np.newaxis, :, :, :]
 
     def infer(self, srcimg):
         input_blob = self.preprocess(srcimg)
 
-        self.net.setInput(input_blob)
-        outs = self.net.forward(self.net.getUnconnectedOutLayersNames())
+        outs = self.backend.forward(input_blob)
 
-        predictions = self.postprocess(outs[0])
+        predictions = self.postprocess(outs)
         return predictions
         
 
     def postprocess(self, outputs):
         dets = outputs[0]
 
-        dets[:, :2] = (dets[:, :2] + self.grids) * self.expanded_strides
-        dets[:, 2:4] = np.exp(dets[:, 2:4]) * self.expanded_strides
-
-        # get boxes
-        boxes = dets[:, :4]
-        boxes_xyxy = np.ones_like(boxes)
-        boxes_xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2.
-        boxes_xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2.
-        boxes_xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2.
-        boxes_xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2.
+        # Keep the anchors that may hold an object before decoding anything: a class score is at most the
+        # objectness, so the anchors under the confidence threshold cannot give a detection either
+        objectness = dets[:, 4]
+        candidates = np.flatnonzero((objectness > self.objThreshold) & (objectness > self.confThreshold))
+        if len(candidates) == 0:
+            return np.array([])
 
-        # get scores and class indices
-        scores = dets[:, 4:5] * dets[:, 5:]
-        max_scores = np.amax(scores, axis=1)
+        # get scores and class indices of the candidates
+        scores = dets[candidates, 5:]
         max_scores_idx = np.argmax(scores, axis=1)
+        max_scores = objectness[candidates] * scores[np.arange(len(candidates)), max_scores_idx]
+        keep = max_scores > self.confThreshold
+        if self.class_allowed is not None:
+            keep &= self.class_allowed[max_scores_idx]
+        candidates, max_scores, max_scores_idx = candidates[keep], max_scores[keep], max_scores_idx[keep]
+        if len(candidates) == 0:
+            return np.array([])
+
+        # get boxes of the candidates only
+        strides = self.expanded_strides[0, candidates]
+        centers = (dets[candidates, :2] + self.grids[0, candidates]) * strides
+        half_sizes = np.exp(dets[candidates, 2:4]) * strides / 2.
+        boxes_xyxy = np.concatenate([centers - half_sizes, centers + half_sizes], axis=1)
 
         keep = cv2.dnn.NMSBoxesBatched(boxes_xyxy.tolist(), max_scores.tolist(), max_scores_idx.tolist(), self.confThreshold, self.nmsThreshold)
 
-        candidates = np.concatenate([boxes_xyxy, max_scores[:, None], max_scores_idx[:, None]], axis=1)
         if len(keep) == 0:
             return np.array([])
-        return candidates[keep]
+        detections = np.concatenate([boxes_xyxy, max_scores[:, None], max_scores_idx[:, None]], axis=1)
+        return detections[np.asarray(keep).reshape(-1)]
 
     def generateAnchors(self):
         self.grids = []
@@ -1,7 +1,20 @@
 import asyncio  # Provides asynchronous I/O support
 import json  # For encoding and decoding JSON messages
+import struct  # For packing the offset header of the file chunks
 import database_manager as DBM  # Module for interacting with the database
 import object_detection as OB  # Module for object detection (YOLOX in this case)
+from .mp4_info import mp4_playback_info  # Tells whether a video can be played while it is downloaded
+
+# Size of the file chunks sent over the data channel (64KB).
+CHUNK_SIZE = 64 * 1024
+# Header sent before the data of each file chunk: the offset of the data in the file (uint64, big-endian),
+# so the UI can check that no chunk is missing and resume an interrupted download from the last offset.
+CHUNK_HEADER = struct.Struct(">Q")
+# Sending pauses while more than MAX_BUFFERED_AMOUNT bytes wait in the data channel's send buffer and
+# resumes once it has drained below BUFFERED_AMOUNT_LOW_THRESHOLD, so a large video neither piles up
+# in memory nor starves the live video track.
+MAX_BUFFERED_AMOUNT = 1024 * 1024
+BUFFERED_AMOUNT_LOW_THRESHOLD = 256 * 1024
 
 
 # Asynchronously sends the list of YOLOX objects over the provided channel.
@@ -51,11 +64,67 @@ async def send_searched_intrusion_videos(channel, objects: list, start_date: str
     }))
 
 
-# Asynchronously sends a file in chunks over the provided channel.
-# Retrieves the file path, verifies its existence, then reads and sends the file in binary chunks.
-async def send_file_in_chunks(channel, filename, video_player_id):
+# Asynchronously sends the motion zones of the camera, so the UI can draw and edit them.
+async def send_motion_zones(channel, camera=DBM.DEFAULT_CAMERA):
+    zones = await asyncio.get_event_loop().run_in_executor(
+        None, DBM.get_motion_zones, camera
+    )
+    channel.send(json.dumps({
+        "action": "send_motion_zones",
+        "zones": zones,  # List of {"kind": "include"/"exclude", "points": [[x, y], ...]}, normalized
+    }))
+
+
+# Asynchronously saves the motion zones edited in the UI and tells the motion detection process to use them.
+# Malformed zones are rejected (the stored zones are kept) with an error message.
+async def save_motion_zones(channel, zones, shared_state, camera=DBM.DEFAULT_CAMERA):
+    try:
+        zones = await asyncio.get_event_loop().run_in_executor(
+            None, DBM.set_motion_zones, zones, camera
+        )
+    except ValueError as e:
+        channel.send(json.dumps({
+            "action": "error",
+            "error_message": f"Motion zones not saved: {e}"
+        }))
+        return
+    # The motion detection process reloads the zones and models them from its next frame
+    shared_state["MD_zones_changes"] += 1
+    channel.send(json.dumps({
+        "action": "motion_zones_saved",
+        "zones": zones,
+    }))
+
+
+# Asynchronously waits until the data channel's send buffer has drained (back-pressure).
+# Returns immediately if the buffer is not full; stops waiting if the channel closes.
+async def wait_for_channel_buffer(channel):
+    if channel.bufferedAmount <= MAX_BUFFERED_AMOUNT:
+        return
+    # The channel emits "bufferedamountlow" when its buffered amount drops to the threshold
+    channel.bufferedAmountLowThreshold = BUFFERED_AMOUNT_LOW_THRESHOLD
+    drained = asyncio.Event()
+    channel.on("bufferedamountlow", drained.set)
+    try:
+        while channel.bufferedAmount > BUFFERED_AMOUNT_LOW_THRESHOLD and channel.readyState == "open":
+            try:
+                # Re-check periodically in case the event was missed or the channel closed
+                await asyncio.wait_for(drained.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            drained.clear()
+    finally:
+        channel.remove_listener("bufferedamountlow", drained.set)
+
+
+# Asynchronously sends a file in chunks over the provided channel, starting at the given offset.
+# Retrieves the file path, verifies its existence, then reads the file in a thread and sends binary chunks,
+# each one prefixed with its offset in the file, pausing whenever the channel's send buffer is full.
+# A download interrupted by a closed channel can be resumed by requesting it again from the last offset received.
+async def send_file_in_chunks(channel, filename, video_player_id, offset=0):
+    loop = asyncio.get_event_loop()
     # Retrieve the file path asynchronously using the database manager
-    video_path = await asyncio.get_event_loop().run_in_executor(
+    video_path = await loop.run_in_executor(
         None, DBM.get_video_path, filename
     )
     # Check if the file exists and is indeed a file
@@ -67,16 +136,46 @@ async def send_file_in_chunks(channel, filename, video_player_id):
         channel.send(json.dumps(error_msg))
         return
 
-    chunk_size = 64 * 1024  # Define the chunk size (64KB) for reading the file
+    file_size = video_path.stat().st_size
+    # Check that the requested offset is inside the file
+    if not isinstance(offset, int) or isinstance(offset, bool) or not 0 <= offset <= file_size:
+        channel.send(json.dumps({
+            "action": "download_error",
+            "message": f"Invalid offset {offset} for file '{filename}'."
+        }))
+        return
+
     try:
+        # Tell the UI what is coming, so it can play a fragmented MP4 file as its chunks arrive
+        fragmented, mime_type = await loop.run_in_executor(
+            None, mp4_playback_info, video_path
+        )
+        channel.send(json.dumps({
+            "action": "download_start",
+            "filename": filename,
+            "video_player_id": video_player_id,
+            "size": file_size,
+            "offset": offset,
+            "fragmented": fragmented,
+            "mime_type": mime_type,
+        }))
         # Open the file in binary read mode
         with open(video_path, "rb") as f:
+            f.seek(offset)
             while True:
-                chunk = f.read(chunk_size)  # Read a chunk from the file
+                # Wait until the channel can take more data
+                await wait_for_channel_buffer(channel)
+                if channel.readyState != "open":
+                    # The UI resumes the download from the last offset it received
+                    print(f"Download of '{filename}' interrupted at offset {offset}.")
+                    return
+                # Read a chunk from the file in a thread, so the event loop keeps serving the live video
+                chunk = await loop.run_in_executor(None, f.read, CHUNK_SIZE)
                 if not chunk:
                     break  # Exit loop if end of file is reached
-                # Send the binary chunk over the channel; the channel handles raw binary data
-                channel.send(chunk)
+                # Send the binary chunk, prefixed with its offset in the file
+                channel.send(CHUNK_HEADER.pack(offset) + chunk)
+                offset += len(chunk)
         # Once all chunks have been sent, send a JSON message indicating download completion
         complete_msg = {
             "action": "download_complete",
@@ -90,4 +189,5 @@ async def send_file_in_chunks(channel, filename, video_player_id):
             "action": "download_error",
             "message": str(e)
         }
-        channel.send(json.dumps(error_msg))
+        if channel.readyState == "open":
+            channel.send(json.dumps(error_msg))
@@ -0,0 +1,98 @@
+import struct
+from pathlib import Path
+
+
+# Container boxes walked through to find the H.264 decoder configuration (avcC) of the video track.
+_CONTAINER_BOXES = (b"moov", b"trak", b"mdia", b"minf", b"stbl")
+# Size of the header of an avc1 sample entry, before its child boxes (avcC).
+_AVC1_HEADER_SIZE = 78
+# Size of the header of the stsd box (version, flags, entry count), before its sample entries.
+_STSD_HEADER_SIZE = 8
+
+
+def _boxes(data: bytes, start: int = 0, end: int = None):
+    """Yield (type, payload start, payload end) of the boxes found in data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        header_size = 8
+        if size == 1:
+            # 64-bit box size.
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header_size = 16
+        elif size == 0:
+            # The box extends to the end of its parent.
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, min(offset + size, end)
+        offset += size
+
+
+def _find_avcc(data: bytes, start: int, end: int):
+    """Return the payload of the first avcC box inside data[start:end], or None."""
+    for box_type, payload_start, payload_end in _boxes(data, start, end):
+        if box_type in _CONTAINER_BOXES:
+            avcc = _find_avcc(data, payload_start, payload_end)
+            if avcc is not None:
+                return avcc
+        elif box_type == b"stsd":
+            avcc = _find_avcc(data, payload_start + _STSD_HEADER_SIZE, payload_end)
+            if avcc is not None:
+                return avcc
+        elif box_type in (b"avc1", b"avc3"):
+            avcc = _find_avcc(data, payload_start + _AVC1_HEADER_SIZE, payload_end)
+            if avcc is not None:
+                return avcc
+        elif box_type == b"avcC":
+            return data[payload_start:payload_end]
+    return None
+
+
+def mp4_playback_info(file_path: Path):
+    """
+    Find out whether an MP4 video can be played while it is downloaded, and its MIME type.
+
+    A fragmented MP4 file starts with a header (moov) that declares fragments (mvex), so a browser
+    can play it through Media Source Extensions as its chunks arrive. A plain MP4 file written by
+    libx264/FFmpeg has its header at the end and must be downloaded completely first.
+
+    Parameters:
+        file_path (Path): Path of the MP4 file.
+
+    Returns:
+        tuple: (fragmented, MIME type with the codec string, e.g. 'video/mp4; codecs="avc1.64001e"').
+        The MIME type is "video/mp4" if the codec could not be found in the header.
+    """
+    fragmented = False
+    codec = None
+    with open(file_path, "rb") as f:
+        offset = 0
+        # Only the box headers at the top level are read, except for the header (moov) itself.
+        while True:
+            f.seek(offset)
+            header = f.read(16)
+            if len(header) < 8:
+                break
+            size, box_type = struct.unpack(">I4s", header[:8])
+            if size == 1:
+                size = struct.unpack(">Q", header[8:16])[0]
+            elif size == 0:
+                break
+            if size < 8:
+                break
+            if box_type == b"moov":
+                f.seek(offset)
+                moov = f.read(size)
+                for child_type, _, _ in _boxes(moov, 8):
+                    if child_type == b"mvex":
+                        fragmented = True
+                avcc = _find_avcc(moov, 0, len(moov))
+                if avcc is not None and len(avcc) >= 4:
+                    # Codec string: profile, profile compatibility and level from the avcC box.
+                    codec = f"avc1.{avcc[1]:02x}{avcc[2]:02x}{avcc[3]:02x}"
+                break
+            offset += size
+    mime_type = f'video/mp4; codecs="{codec}"' if codec else "video/mp4"
+    return fragmented, mime_type
@@ -37,8 +37,8 @@ async def on_message(ws, message, cam_track, loop_control):
             # If an existing RTCPeerConnection exists, close it before creating a new one
             if WCM.vss_pc is not None:
                 await WCM.vss_pc.close()
-            # Create a new RTCPeerConnection using the provided camera track
-            WCM.vss_pc = WCM.create_peer_connection(cam_track)
+            # Create a new RTCPeerConnection using the provided camera track (loop_control is the shared state)
+            WCM.vss_pc = WCM.create_peer_connection(cam_track, loop_control)
 
     # Process the offer from the server (step 2)
     elif message["step"] == "2_send_offer":
@@ -93,8 +93,8 @@ async def listen(loop_control, cam_track):
         try:
             # Attempt to connect to the WebSocket server using the specified URI
             async with connect("wss://gjtxmivc5m.execute-api.us-east-1.amazonaws.com/production/") as ws:
-                # Create a new RTCPeerConnection using the provided camera track
-                WCM.vss_pc = WCM.create_peer_connection(cam_track)
+                # Create a new RTCPeerConnection using the provided camera track (loop_control is the shared state)
+                WCM.vss_pc = WCM.create_peer_connection(cam_track, loop_control)
                 # Send the initial connection message
                 await on_open(ws)
 
@@ -3,7 +3,7 @@ import asyncio
 from .shared_video_stream_track import SharedVideoStreamTrack
 from remote_monitoring import listen
 
-def remote_monitoring_main(shm_name, frame_shape, shared_dict):
+def remote_monitoring_main(shm_name, frame_shape, shared_state):
     print("live streaming started...")
     cam_track = SharedVideoStreamTrack(shm_name, frame_shape, fps=30)
-    asyncio.run(listen(shared_dict, cam_track))
\ No newline at end of file
+    asyncio.run(listen(shared_state, cam_track))
\ No newline at end of file
@@ -3,40 +3,47 @@ from aiortc import VideoStreamTrack  # Base class for custom video stream tracks
 from fractions import Fraction  # For setting a fractional time base on video frames
 
 from av import VideoFrame  # For creating video frames from NumPy arrays
-from multiprocessing import shared_memory  # For inter-process shared memory handling
 import numpy as np  # For numerical operations and array manipulations
+from frame_buffer import FrameRingBuffer  # Shared memory ring of captured frames
 
-# Custom VideoStreamTrack that reads video frames from a shared memory buffer.
+# Custom VideoStreamTrack that reads video frames from a shared memory frame ring buffer.
 class SharedVideoStreamTrack(VideoStreamTrack):
     def __init__(self, shm_name, frame_shape, fps=30):
         """
         Initialize the SharedVideoStreamTrack.
 
         Parameters:
-        shm_name (str): The name of the shared memory block.
+        shm_name (str): The name of the shared memory frame ring buffer.
         frame_shape (tuple): The shape (height, width, channels) of the video frame.
         fps (int): The target frames per second.
         """
         super().__init__()  # Initialize the base VideoStreamTrack class.
-        # Connect to an existing shared memory block by name (do not create a new one)
-        self.shm = shared_memory.SharedMemory(name=shm_name, create=False)
-        # Create a NumPy array that maps to the shared memory buffer using the provided frame shape.
-        self.shared_frame = np.ndarray(frame_shape, dtype=np.uint8, buffer=self.shm.buf)
+        # Connect to an existing frame ring buffer by name (do not create a new one)
+        self.frame_ring = FrameRingBuffer(shm_name, frame_shape, create=False)
+        # Private copy of the latest frame; it is only replaced when a new frame has been captured.
+        self.frame = np.zeros(self.frame_ring.frame_shape, dtype=np.uint8)
+        self.last_frame_number = 0  # Frame number of the frame currently held in self.frame.
         self.fps = fps  # Store the target frames per second.
         self.counter = 0  # Initialize a counter to assign presentation timestamps (PTS).
 
     async def recv(self):
         """
-        Asynchronously receive a video frame from the shared memory buffer.
+        Asynchronously receive a video frame from the shared memory frame ring buffer.
 
-        This method waits to maintain the target frame rate, converts the shared memory
-        array to a VideoFrame, sets the presentation timestamp and time base, and then returns the frame.
+        This method waits to maintain the target frame rate, copies the latest captured frame
+        (if a new one is available) out of the ring buffer, converts it to a VideoFrame, sets the
+        presentation timestamp and time base, and then returns the frame.
         """
         # Sleep to maintain the target frame rate.
         await asyncio.sleep(1 / self.fps)
+
+        # Refresh the private frame only if a new frame has been captured since the last call.
+        latest = self.frame_ring.read_latest(self.last_frame_number, out=self.frame)
+        if latest is not None:
+            self.last_frame_number = latest[0]
         
-        # Create a VideoFrame from the shared memory NumPy array using BGR24 format.
-        video_frame = VideoFrame.from_ndarray(self.shared_frame, format="bgr24")
+        # Create a VideoFrame from the latest frame using BGR24 format.
+        video_frame = VideoFrame.from_ndarray(self.frame, format="bgr24")
 
         # Increment the counter to use as the frame's presentation timestamp (PTS).
         self.counter += 1
@@ -49,14 +56,13 @@ class SharedVideoStreamTrack(VideoStreamTrack):
         """
         Reset the video stream track.
 
-        Closes and reopens the shared memory connection, reinitializes the NumPy array,
-        and resets the frame counter.
+        Closes and reopens the frame ring buffer connection and resets the frame counter.
         """
-        self.shm.close()  # Close the current shared memory connection.
-        # Reopen the shared memory with the same name to refresh the connection.
-        self.shm = shared_memory.SharedMemory(name=self.shm.name, create=False)
-        # Recreate the NumPy array mapping to the shared memory buffer using the original shape.
-        self.shared_frame = np.ndarray(self.shared_frame.shape, dtype=np.uint8, buffer=self.shm.buf)
+        shm_name = self.frame_ring.name
+        self.frame_ring.close()  # Close the current shared memory connection.
+        # Reopen the frame ring buffer with the same name to refresh the connection.
+        self.frame_ring = FrameRingBuffer(shm_name, self.frame.shape, create=False)
+        self.last_frame_number = 0  # Force a refresh of the private frame.
         self.counter = 0  # Reset the frame counter.
 
     def stop(self):
@@ -65,5 +71,5 @@ class SharedVideoStreamTrack(VideoStreamTrack):
 
         Closes the shared memory resource and calls the parent stop method to finalize shutdown.
         """
-        self.shm.close()  # Close the shared memory connection to free resources.
+        self.frame_ring.close()  # Close the shared memory connection to free resources.
         super().stop()  # Call the parent class's stop method.
@@ -0,0 +1,144 @@
+import pytest
+import asyncio
+import json
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from remote_monitoring import exchange_with_UI
+from remote_monitoring.exchange_with_UI import (send_file_in_chunks, CHUNK_SIZE, CHUNK_HEADER,
+                                                MAX_BUFFERED_AMOUNT, save_motion_zones)
+
+
+class FakeChannel:
+    """Data channel recording the messages sent, whose send buffer drains only when told to."""
+
+    def __init__(self, close_after=None):
+        self.readyState = "open"
+        self.bufferedAmount = 0
+        self.bufferedAmountLowThreshold = 0
+        self.messages = []
+        self.listeners = {}
+        self.close_after = close_after
+
+    def send(self, message):
+        self.messages.append(message)
+        if isinstance(message, bytes):
+            self.bufferedAmount += len(message)
+            if self.close_after is not None and len(self.chunks()) == self.close_after:
+                self.readyState = "closed"
+
+    def on(self, event, listener):
+        self.listeners.setdefault(event, []).append(listener)
+
+    def remove_listener(self, event, listener):
+        self.listeners[event].remove(listener)
+
+    def drain(self):
+        self.bufferedAmount = 0
+        for listener in list(self.listeners.get("bufferedamountlow", [])):
+            listener()
+
+    def json_messages(self):
+        return [json.loads(message) for message in self.messages if isinstance(message, str)]
+
+    def chunks(self):
+        return [message for message in self.messages if isinstance(message, bytes)]
+
+
+@pytest.fixture
+def video_file(tmp_path, monkeypatch):
+    file_path = tmp_path / "video.mp4"
+    file_path.write_bytes(bytes(range(256)) * (CHUNK_SIZE // 256 * 3 + 10))
+    monkeypatch.setattr(exchange_with_UI.DBM, "get_video_path", lambda filename: file_path)
+    return file_path
+
+def received_data(channel):
+    """Check the offset of each chunk against the data received so far and return the data."""
+    data = b""
+    for chunk in channel.chunks():
+        (offset,) = CHUNK_HEADER.unpack(chunk[:CHUNK_HEADER.size])
+        assert offset == len(data), "Chunks must be sent in order, each one tagged with its offset."
+        data += chunk[CHUNK_HEADER.size:]
+    return data
+
+def test_file_is_sent_in_offset_tagged_chunks(video_file):
+    channel = FakeChannel()
+    channel.bufferedAmount = -10**9  # Never full
+    asyncio.run(send_file_in_chunks(channel, "video.mp4", "player"))
+    assert received_data(channel) == video_file.read_bytes()
+    start, complete = channel.json_messages()
+    assert (start["action"], start["offset"], start["size"]) == ("download_start", 0, video_file.stat().st_size)
+    assert complete["action"] == "download_complete"
+
+def test_download_resumes_from_offset(video_file):
+    offset = CHUNK_SIZE + 123
+    channel = FakeChannel()
+    channel.bufferedAmount = -10**9
+    asyncio.run(send_file_in_chunks(channel, "video.mp4", "player", offset))
+    (first_offset,) = CHUNK_HEADER.unpack(channel.chunks()[0][:CHUNK_HEADER.size])
+    assert first_offset == offset
+    data = b"".join(chunk[CHUNK_HEADER.size:] for chunk in channel.chunks())
+    assert data == video_file.read_bytes()[offset:]
+
+@pytest.mark.parametrize("offset", [-1, 10**12, "0", True])
+def test_invalid_offset_is_reported(video_file, offset):
+    channel = FakeChannel()
+    asyncio.run(send_file_in_chunks(channel, "video.mp4", "player", offset))
+    assert channel.chunks() == []
+    assert [message["action"] for message in channel.json_messages()] == ["download_error"]
+
+def test_closed_channel_interrupts_download(video_file):
+    channel = FakeChannel(close_after=2)
+    channel.bufferedAmount = -10**9
+    asyncio.run(send_file_in_chunks(channel, "video.mp4", "player"))
+    assert len(channel.chunks()) == 2
+    assert [message["action"] for message in channel.json_messages()] == ["download_start"]
+
+def test_sending_waits_for_send_buffer_to_drain(video_file):
+    async def download():
+        channel = FakeChannel()
+        task = asyncio.ensure_future(send_file_in_chunks(channel, "video.mp4", "player"))
+        # Fill the send buffer: sending pauses until it drains.
+        while channel.bufferedAmount <= MAX_BUFFERED_AMOUNT:
+            channel.bufferedAmount += MAX_BUFFERED_AMOUNT
+            await asyncio.sleep(0.01)
+        sent = len(channel.chunks())
+        await asyncio.sleep(0.05)
+        assert len(channel.chunks()) == sent, "No chunk may be sent while the send buffer is full."
+        while not task.done():
+            channel.drain()
+            await asyncio.sleep(0.001)
+        return channel
+
+    channel = asyncio.run(download())
+    assert received_data(channel) == video_file.read_bytes()
+    assert channel.json_messages()[-1]["action"] == "download_complete"
+
+def test_saved_motion_zones_are_reloaded_by_motion_detection(monkeypatch):
+    saved = {}
+    monkeypatch.setattr(exchange_with_UI.DBM, "set_motion_zones",
+                        lambda zones, camera: saved.setdefault(camera, zones))
+    channel = FakeChannel()
+    shared_state = {"MD_zones_changes": 0}
+    zones = [{"kind": "exclude", "points": [[0, 0], [1, 0], [1, 1]]}]
+    asyncio.run(save_motion_zones(channel, zones, shared_state))
+    assert saved == {exchange_with_UI.DBM.DEFAULT_CAMERA: zones}
+    assert shared_state["MD_zones_changes"] == 1
+    (message,) = channel.json_messages()
+    assert (message["action"], message["zones"]) == ("motion_zones_saved", zones)
+
+def test_rejected_motion_zones_are_reported(monkeypatch):
+    def reject(zones, camera):
+        raise ValueError("A motion zone must have at least 3 points.")
+    monkeypatch.setattr(exchange_with_UI.DBM, "set_motion_zones", reject)
+    channel = FakeChannel()
+    shared_state = {"MD_zones_changes": 0}
+    asyncio.run(save_motion_zones(channel, [{"kind": "include", "points": []}], shared_state))
+    assert shared_state["MD_zones_changes"] == 0
+    assert [message["action"] for message in channel.json_messages()] == ["error"]
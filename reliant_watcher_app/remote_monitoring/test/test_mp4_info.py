@@ -0,0 +1,39 @@
+import pytest
+import numpy as np
+from pathlib import Path
+import sys
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from remote_monitoring.mp4_info import mp4_playback_info
+from motion_triggered_recording.recording_engine import RecordingEngine
+
+
+def record(file_path, fragmented):
+    engine = RecordingEngine((160, 120), 20.0, preset="ultrafast", fragmented=fragmented)
+    engine.start_segment(file_path)
+    for i in range(30):
+        engine.encode(np.full((120, 160, 3), i * 8, dtype=np.uint8), i / 20)
+    engine.close()
+    return file_path
+
+@pytest.mark.parametrize("fragmented", [True, False])
+def test_playback_info_of_recordings(tmp_path, fragmented):
+    file_path = record(tmp_path / "video.mp4", fragmented)
+    is_fragmented, mime_type = mp4_playback_info(file_path)
+    assert is_fragmented == fragmented
+    assert mime_type.startswith('video/mp4; codecs="avc1.')
+
+def test_fragmented_header_comes_first(tmp_path):
+    file_path = record(tmp_path / "video.mp4", True)
+    data = file_path.read_bytes()
+    assert data.index(b"moov") < data.index(b"moof") < data.index(b"mdat")
+
+def test_file_without_header(tmp_path):
+    file_path = tmp_path / "not_a_video.mp4"
+    file_path.write_bytes(b"\x00\x00\x00\x10free" + b"\x00" * 8)
+    assert mp4_playback_info(file_path) == (False, "video/mp4")
@@ -3,7 +3,8 @@ import json  # For encoding and decoding JSON messages
 from pathlib import Path  # For manipulating filesystem paths
 from aiortc import RTCPeerConnection, RTCConfiguration, RTCIceServer  # WebRTC classes for peer connection setup
 from .exchange_with_UI import send_latest_intrusion_videos, send_file_in_chunks, \
-                                send_searched_intrusion_videos, send_yolox_objects  # Functions to exchange data with the UI
+                                send_searched_intrusion_videos, send_yolox_objects, \
+                                send_motion_zones, save_motion_zones  # Functions to exchange data with the UI
 
 # Global variable to hold the current RTCPeerConnection instance
 vss_pc = None
@@ -47,12 +48,13 @@ ice_config = RTCConfiguration(
     ]
 )
 
-def create_peer_connection(cam_track):
+def create_peer_connection(cam_track, shared_state):
     """
     Create and return a new RTCPeerConnection instance with the provided camera track.
 
     Parameters:
     - cam_track: A video track (usually representing a camera source) that is to be added to the peer connection.
+    - shared_state: Shared memory block of flags shared across processes (tells motion detection about new zones).
     """
     global ice_config
     # Initialize the RTCPeerConnection with the defined ICE configuration
@@ -88,11 +90,19 @@ def create_peer_connection(cam_track):
                 asyncio.ensure_future(send_searched_intrusion_videos(channel, json_msg["objects"],
                                                                      json_msg["start_date"], json_msg["end_date"]))
             elif json_msg["action"] == "request_download":
-                # Asynchronously send the file in chunks based on the filename and video player ID provided
+                # Asynchronously send the file in chunks based on the filename and video player ID provided,
+                # from the offset the UI already received (0 for a new download)
                 asyncio.ensure_future(send_file_in_chunks(channel, json_msg["filename"],
-                                                          json_msg["video_player_id"]))
+                                                          json_msg["video_player_id"],
+                                                          json_msg.get("offset", 0)))
             elif json_msg["action"] == "request_yolox_objects":
                 # Asynchronously send the list of YOLOX objects back to the requester
                 asyncio.ensure_future(send_yolox_objects(channel))
+            elif json_msg["action"] == "request_motion_zones":
+                # Asynchronously send the motion zones of the camera to draw them over the live video
+                asyncio.ensure_future(send_motion_zones(channel))
+            elif json_msg["action"] == "save_motion_zones":
+                # Asynchronously save the edited motion zones and have motion detection reload them
+                asyncio.ensure_future(save_motion_zones(channel, json_msg["zones"], shared_state))
     # Return the configured RTCPeerConnection
     return pc
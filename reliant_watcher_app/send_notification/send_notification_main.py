@@ -3,13 +3,13 @@ from collections import Counter
 from send_notification import send_email_whatsapp_notification
 
 
-def send_notification_main(shared_dict, phone, email):
-    if shared_dict["permission_to_send_alert"]:
-        msg = f"Motion detected at {shared_dict['time_stamp'].strftime("%d-%b-%Y, %I:%M:%S %p")}."
+def send_notification_main(shared_state, phone, email):
+    if shared_state["permission_to_send_alert"]:
+        msg = f"Motion detected at {shared_state['time_stamp'].strftime("%d-%b-%Y, %I:%M:%S %p")}."
         subject = f"Reliant Watcher Notification - {msg}"
-        if not isinstance(shared_dict["OD_det_obj_info_for_alert"], Counter):
+        if not isinstance(shared_state["OD_det_obj_info_for_alert"], Counter):
             raise ValueError("Object info for alert is not a Counter object.")
-        objs_counter = shared_dict["OD_det_obj_info_for_alert"]
+        objs_counter = shared_state["OD_det_obj_info_for_alert"]
         if not sum(objs_counter.values()) == 0:
             keys = list(objs_counter.keys())
             len_of_keys = len(keys)
@@ -25,5 +25,5 @@ def send_notification_main(shared_dict, phone, email):
                         msg+= f", {objs_counter[keys[i]]} {keys[i]}"
         print(f"Sending notification: {msg}")
         send_email_whatsapp_notification(subject, msg, phone, email)
-        shared_dict["permission_to_send_alert"] = False
-        shared_dict["OD_det_obj_info_for_alert"] = Counter()
\ No newline at end of file
+        shared_state["permission_to_send_alert"] = False
+        shared_state["OD_det_obj_info_for_alert"] = Counter()
\ No newline at end of file
@@ -0,0 +1 @@
+from .shared_state import SharedState, SCHEMA, MAX_MOTION_BOXES
\ No newline at end of file
@@ -0,0 +1,221 @@
+import numpy as np
+from multiprocessing import shared_memory, Lock
+from collections import Counter
+from datetime import datetime
+from object_classes import OBJECT_CLASSES
+
+
+# Field kinds of the shared state block:
+#   "flag"      -> bool stored in one byte
+#   "timestamp" -> datetime stored as seconds since the epoch (float64)
+#   "objects"   -> Counter of detected objects stored as one int32 count per OBJECT_CLASSES entry
+#   "text"      -> short UTF-8 string stored in a fixed number of bytes
+#   "counter"   -> non-negative int stored as a uint64 (written by a single process). An event counter (e.g.
+#                  MTR_incidents) is incremented by its producer and compared by each consumer with the
+#                  last value it saw: unlike a flag, no event is lost when several happen between two reads.
+#   "boxes"     -> list of up to MAX_MOTION_BOXES (x0, y0, x1, y1) boxes stored as int32, after their count
+FLAG, TIMESTAMP, OBJECTS, TEXT, COUNTER, BOXES = "flag", "timestamp", "objects", "text", "counter", "boxes"
+
+TEXT_SIZE = 128
+MAX_MOTION_BOXES = 16
+NUM_OBJECTS = len(OBJECT_CLASSES)  # 80 COCO classes
+
+# Schema of the shared state block: field name -> field kind.
+SCHEMA = {
+    "stop": FLAG,
+    "motion_detected": FLAG,
+    "recording": FLAG,
+    "permission_to_send_alert": FLAG,
+    "OD_db_permission": FLAG,
+    "MTR_db_permission": FLAG,
+    "objects_in_scene": FLAG,
+    "time_stamp": TIMESTAMP,
+    "OD_det_obj_info_for_alert": OBJECTS,
+    "OD_detected_obj_to_db": OBJECTS,
+    "OD_video_name_to_db": TEXT,
+    "MTR_video_name_to_db": TEXT,
+    "MTR_incident_to_db": TEXT,
+    "MTR_segment_name": TEXT,
+    "MTR_dropped_frames": COUNTER,
+    "MTR_late_frames": COUNTER,
+    "MD_suppressed_frames": COUNTER,
+    "MD_illumination_changes": COUNTER,
+    "MTR_incidents": COUNTER,
+    "MD_zones_changes": COUNTER,
+    "MD_motion_boxes": BOXES,
+}
+
+_DTYPES = {FLAG: (np.uint8, 1), TIMESTAMP: (np.float64, 1), OBJECTS: (np.int32, NUM_OBJECTS), TEXT: (np.uint8, TEXT_SIZE),
+           COUNTER: (np.uint64, 1), BOXES: (np.int32, 1 + 4 * MAX_MOTION_BOXES)}
+
+
+def _layout():
+    """Compute the (offset, dtype, length) of every field, each field being 8-byte aligned."""
+    layout = {}
+    offset = 0
+    for field, kind in SCHEMA.items():
+        dtype, length = _DTYPES[kind]
+        layout[field] = (offset, dtype, length)
+        offset += (np.dtype(dtype).itemsize * length + 7) // 8 * 8
+    return layout, offset
+
+
+class SharedState:
+    """
+    Typed block of flags, timestamps, object counts, short strings, counters and boxes shared by all
+    processes through shared memory, replacing a multiprocessing.Manager dict proxy.
+
+    Fields are accessed like a dictionary (shared_state["stop"] = True) without any round trip to
+    a manager process. Single-value fields (flags, timestamps, counters) are read with one aligned load,
+    so they are atomic. Multi-value fields (object counts, text, boxes) are guarded by a lock so readers
+    never see half of an update. Flags are written under the lock too, so a flag set while another process
+    runs test_and_clear() is never lost.
+
+    The object passed to a child process (e.g. as a Process argument) reattaches to the same
+    shared memory block and lock.
+    """
+
+    def __init__(self, name: str = "shared_state", create: bool = False, lock=None):
+        """
+        Create or attach to a shared state block.
+
+        Parameters:
+            name (str): Name of the shared memory block.
+            create (bool): Whether to create the shared memory block or attach to an existing one.
+            lock (multiprocessing.Lock): Lock guarding the multi-value fields (created if None).
+        """
+        layout, size = _layout()
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self._lock = lock if lock is not None else Lock()
+        self._fields = {
+            field: np.ndarray((length,), dtype=dtype, buffer=self.shm.buf, offset=offset)
+            for field, (offset, dtype, length) in layout.items()
+        }
+        if create:
+            for array in self._fields.values():
+                array[:] = 0
+            self["time_stamp"] = datetime.now()
+
+    def __getstate__(self):
+        return {"name": self.shm.name, "lock": self._lock}
+
+    def __setstate__(self, state):
+        self.__init__(state["name"], create=False, lock=state["lock"])
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _field(self, key):
+        """Return the kind and backing array of a field."""
+        if key not in SCHEMA:
+            raise KeyError(f"'{key}' is not a field of the shared state.")
+        return SCHEMA[key], self._fields[key]
+
+    def __getitem__(self, key):
+        kind, array = self._field(key)
+        if kind == FLAG:
+            return bool(array[0])
+        if kind == TIMESTAMP:
+            return datetime.fromtimestamp(float(array[0]))
+        if kind == COUNTER:
+            return int(array[0])
+        with self._lock:
+            data = array.copy()
+        if kind == OBJECTS:
+            return Counter({OBJECT_CLASSES[i]: int(data[i]) for i in np.flatnonzero(data > 0)})
+        if kind == BOXES:
+            return [tuple(int(v) for v in box) for box in data[1:].reshape(-1, 4)[:data[0]]]
+        return bytes(data).rstrip(b"\0").decode("utf-8")
+
+    def __setitem__(self, key, value):
+        kind, array = self._field(key)
+        if kind == FLAG:
+            with self._lock:
+                array[0] = bool(value)
+        elif kind == TIMESTAMP:
+            if not isinstance(value, datetime):
+                raise ValueError(f"'{key}' must be a datetime.")
+            array[0] = value.timestamp()
+        elif kind == COUNTER:
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"'{key}' must be a non-negative int.")
+            array[0] = value
+        elif kind == OBJECTS:
+            array_value = self.objects_to_array(value)
+            with self._lock:
+                array[:] = array_value
+        elif kind == BOXES:
+            array_value = self.boxes_to_array(value)
+            with self._lock:
+                array[:] = array_value
+        else:
+            if not isinstance(value, str):
+                raise ValueError(f"'{key}' must be a string.")
+            encoded = value.encode("utf-8")
+            if len(encoded) >= TEXT_SIZE:
+                raise ValueError(f"'{key}' must be shorter than {TEXT_SIZE} bytes.")
+            with self._lock:
+                array[:] = 0
+                array[:len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+
+    @staticmethod
+    def objects_to_array(objects: Counter) -> np.ndarray:
+        """
+        Convert a Counter of detected objects to a count array aligned with OBJECT_CLASSES.
+
+        Raises:
+            ValueError: If objects is not a Counter or contains an unknown object name.
+        """
+        if not isinstance(objects, Counter):
+            raise ValueError("Object counts must be a Counter object.")
+        counts = np.zeros(NUM_OBJECTS, dtype=np.int32)
+        for obj, count in objects.items():
+            if obj not in OBJECT_CLASSES:
+                raise ValueError(f"Unknown object '{obj}'.")
+            counts[OBJECT_CLASSES.index(obj)] = count
+        return counts
+
+    @staticmethod
+    def boxes_to_array(boxes) -> np.ndarray:
+        """
+        Convert a list of (x0, y0, x1, y1) boxes to a count followed by the box coordinates.
+
+        Raises:
+            ValueError: If there are more than MAX_MOTION_BOXES boxes or a box is not 4 ints.
+        """
+        boxes = list(boxes)
+        if len(boxes) > MAX_MOTION_BOXES:
+            raise ValueError(f"At most {MAX_MOTION_BOXES} boxes can be shared.")
+        array = np.zeros(1 + 4 * MAX_MOTION_BOXES, dtype=np.int32)
+        array[0] = len(boxes)
+        for i, box in enumerate(boxes):
+            if len(box) != 4 or not all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in box):
+                raise ValueError("A box must be 4 int coordinates (x0, y0, x1, y1).")
+            array[1 + 4 * i:5 + 4 * i] = box
+        return array
+
+    def test_and_clear(self, key) -> bool:
+        """
+        Atomically read a flag and reset it to False.
+
+        Returns:
+            bool: The value of the flag before it was cleared.
+        """
+        kind, array = self._field(key)
+        if kind != FLAG:
+            raise ValueError(f"'{key}' is not a flag.")
+        with self._lock:
+            value = bool(array[0])
+            array[0] = False
+        return value
+
+    def close(self):
+        """Close this process's access to the shared memory block."""
+        # Drop the views into the buffer first, otherwise the shared memory cannot be closed.
+        self._fields = {}
+        self.shm.close()
+
+    def unlink(self):
+        """Destroy the shared memory block. Must be called once, by the process that created it."""
+        self.shm.unlink()
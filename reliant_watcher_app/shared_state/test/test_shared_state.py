@@ -0,0 +1,130 @@
+import pytest
+from multiprocessing import Process
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import sys
+import uuid
+
+# # Determine the parent directory
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+
+# # Add the parent directory to sys.path
+sys.path.insert(0, str(PROJECT_DIR))
+
+from shared_state.shared_state import SharedState, NUM_OBJECTS, MAX_MOTION_BOXES
+
+
+@pytest.fixture
+def shared_state():
+    """
+    Creates a shared state block and destroys it after the test.
+    """
+    state = SharedState(f"test_state_{uuid.uuid4().hex[:8]}", create=True)
+    yield state
+    state.close()
+    state.unlink()
+
+def set_flags_in_child(shared_state):
+    shared_state["stop"] = True
+    shared_state["OD_detected_obj_to_db"] = Counter({"person": 2})
+    shared_state["MTR_video_name_to_db"] = "from_child.mp4"
+
+def set_flag_in_child(shared_state, key):
+    shared_state[key] = True
+
+def test_new_state_is_cleared(shared_state):
+    assert shared_state["stop"] is False
+    assert shared_state["motion_detected"] is False
+    assert shared_state["OD_det_obj_info_for_alert"] == Counter()
+    assert shared_state["MTR_video_name_to_db"] == ""
+    assert isinstance(shared_state["time_stamp"], datetime)
+
+def test_object_counts_aligned_with_yolox_objects():
+    assert NUM_OBJECTS == 80
+
+def test_flags_round_trip(shared_state):
+    shared_state["motion_detected"] = True
+    assert shared_state["motion_detected"] is True
+    shared_state["motion_detected"] = False
+    assert shared_state["motion_detected"] is False
+
+def test_objects_round_trip(shared_state):
+    objects = Counter({"person": 2, "dog": 1, "toothbrush": 3})
+    shared_state["OD_detected_obj_to_db"] = objects
+    assert shared_state["OD_detected_obj_to_db"] == objects
+
+def test_timestamp_and_text_round_trip(shared_state):
+    now = datetime(2025, 3, 17, 1, 28, 5, 250000)
+    shared_state["time_stamp"] = now
+    assert shared_state["time_stamp"] == now
+    shared_state["MTR_video_name_to_db"] = "2025-03-17_01-28-05.mp4"
+    assert shared_state["MTR_video_name_to_db"] == "2025-03-17_01-28-05.mp4"
+
+def test_counters_round_trip(shared_state):
+    assert shared_state["MTR_dropped_frames"] == 0
+    shared_state["MTR_dropped_frames"] = 12
+    shared_state["MTR_late_frames"] = 2**40
+    assert shared_state["MTR_dropped_frames"] == 12
+    assert shared_state["MTR_late_frames"] == 2**40
+    shared_state["MD_suppressed_frames"] = 31
+    shared_state["MD_illumination_changes"] = 3
+    assert (shared_state["MD_suppressed_frames"], shared_state["MD_illumination_changes"]) == (31, 3)
+
+def test_boxes_round_trip(shared_state):
+    assert shared_state["MD_motion_boxes"] == []
+    shared_state["MD_motion_boxes"] = [(10, 20, 30, 40), (0, 0, 640, 480)]
+    assert shared_state["MD_motion_boxes"] == [(10, 20, 30, 40), (0, 0, 640, 480)]
+    shared_state["MD_motion_boxes"] = []
+    assert shared_state["MD_motion_boxes"] == []
+
+@pytest.mark.parametrize("key, value", [
+    ("OD_detected_obj_to_db", {"person": 1}),
+    ("OD_detected_obj_to_db", Counter({"unicorn": 1})),
+    ("time_stamp", 12.0),
+    ("MTR_video_name_to_db", "x" * 200),
+    ("MTR_dropped_frames", -1),
+    ("MTR_late_frames", 1.5),
+    ("MD_motion_boxes", [(1, 2, 3)]),
+    ("MD_motion_boxes", [(1, 2, 3, 4.5)]),
+    ("MD_motion_boxes", [(0, 0, 1, 1)] * (MAX_MOTION_BOXES + 1)),
+])
+def test_invalid_values_raise_err(shared_state, key, value):
+    with pytest.raises(ValueError):
+        shared_state[key] = value
+
+def test_unknown_field_raises_err(shared_state):
+    with pytest.raises(KeyError):
+        shared_state["unknown"]
+
+def test_test_and_clear(shared_state):
+    shared_state["permission_to_send_alert"] = True
+    assert shared_state.test_and_clear("permission_to_send_alert") is True
+    assert shared_state["permission_to_send_alert"] is False
+    assert shared_state.test_and_clear("permission_to_send_alert") is False
+
+def test_updates_from_child_process_are_visible(shared_state):
+    p = Process(target=set_flags_in_child, args=(shared_state,))
+    p.start()
+    p.join()
+    assert shared_state["stop"] is True
+    assert shared_state["OD_detected_obj_to_db"] == Counter({"person": 2})
+    assert shared_state["MTR_video_name_to_db"] == "from_child.mp4"
+
+def test_event_counters_lose_no_event(shared_state):
+    # The consumer compares the counter with the last value it saw: two events between reads are both seen
+    last_seen = shared_state["MTR_incidents"]
+    shared_state["MTR_incidents"] += 1
+    shared_state["MTR_incidents"] += 1
+    assert shared_state["MTR_incidents"] - last_seen == 2
+
+def test_flag_set_during_test_and_clear_is_not_lost(shared_state):
+    # A flag is set under the lock: while test_and_clear holds it, the writer waits and its value survives
+    shared_state._lock.acquire()
+    writer = Process(target=set_flag_in_child, args=(shared_state, "permission_to_send_alert"))
+    writer.start()
+    writer.join(timeout=0.5)
+    assert writer.is_alive() and shared_state["permission_to_send_alert"] is False
+    shared_state._lock.release()
+    writer.join()
+    assert shared_state.test_and_clear("permission_to_send_alert") is True
@@ -0,0 +1,162 @@
+// Motion zones drawn over the livestream: motion is only looked for inside the include zones
+// (the whole frame if there are none), and never inside the exclude zones.
+// Each zone is { kind: 'include' | 'exclude', points: [[x, y], ...] }, with x and y normalized to 0..1.
+let motion_zones = [];
+// Zone being drawn (null when not drawing)
+let drawn_zone = null;
+// Distance (in pixels) from the first point within which a click closes the zone being drawn
+const CLOSE_ZONE_DISTANCE = 10;
+// Fill colors of the zones by kind
+const ZONE_COLORS = { include: 'rgba(0, 200, 0, 0.3)', exclude: 'rgba(220, 0, 0, 0.4)' };
+
+// Request the motion zones stored for the camera
+function request_motion_zones(data_channel) {
+	data_channel.send(
+		JSON.stringify({
+			action: 'request_motion_zones',
+		})
+	);
+}
+
+// Show the motion zones received from the server
+function handle_motion_zones_response(zones) {
+	motion_zones = zones;
+	drawn_zone = null;
+	document.getElementById('motion_zones_editor').classList.remove('drawing');
+	set_motion_zones_status(`${zones.length} zone(s) in use.`);
+	draw_motion_zones();
+}
+
+// Show a message about the motion zones under the livestream
+function set_motion_zones_status(message) {
+	document.getElementById('motion_zones_status').textContent = message;
+}
+
+// Start drawing a new zone of the given kind: each click on the livestream adds a point
+function start_motion_zone(kind) {
+	drawn_zone = { kind: kind, points: [] };
+	// The canvas only takes the clicks while a zone is drawn, so the video controls stay usable
+	document.getElementById('motion_zones_editor').classList.add('drawing');
+	set_motion_zones_status('Click to add points; click the first point (or double-click) to close the zone.');
+	draw_motion_zones();
+}
+
+// Add the clicked point to the zone being drawn, or close the zone when the first point is clicked
+function add_motion_zone_point(event) {
+	if (drawn_zone === null) {
+		return;
+	}
+	const canvas = document.getElementById('motion_zones_canvas');
+	const rect = canvas.getBoundingClientRect();
+	const x = (event.clientX - rect.left) / rect.width;
+	const y = (event.clientY - rect.top) / rect.height;
+	if (drawn_zone.points.length >= 3) {
+		const [first_x, first_y] = drawn_zone.points[0];
+		if (Math.hypot((x - first_x) * rect.width, (y - first_y) * rect.height) <= CLOSE_ZONE_DISTANCE) {
+			close_motion_zone();
+			return;
+		}
+	}
+	drawn_zone.points.push([Math.min(Math.max(x, 0), 1), Math.min(Math.max(y, 0), 1)]);
+	draw_motion_zones();
+}
+
+// Finish the zone being drawn (it needs at least 3 points)
+function close_motion_zone() {
+	if (drawn_zone === null) {
+		return;
+	}
+	if (drawn_zone.points.length >= 3) {
+		motion_zones.push(drawn_zone);
+		set_motion_zones_status('Zone added. Save the zones to use them.');
+	} else {
+		set_motion_zones_status('A zone needs at least 3 points.');
+	}
+	drawn_zone = null;
+	document.getElementById('motion_zones_editor').classList.remove('drawing');
+	draw_motion_zones();
+}
+
+// Remove the zone being drawn, or else the last zone added
+function undo_motion_zone() {
+	if (drawn_zone !== null) {
+		drawn_zone = null;
+		document.getElementById('motion_zones_editor').classList.remove('drawing');
+	} else {
+		motion_zones.pop();
+	}
+	set_motion_zones_status('Save the zones to use them.');
+	draw_motion_zones();
+}
+
+// Remove all the zones (motion is then looked for in the whole frame once saved)
+function clear_motion_zones() {
+	motion_zones = [];
+	drawn_zone = null;
+	document.getElementById('motion_zones_editor').classList.remove('drawing');
+	set_motion_zones_status('All zones removed. Save the zones to use the whole frame.');
+	draw_motion_zones();
+}
+
+// Send the zones to the server, which stores them and has motion detection use them
+function save_motion_zones() {
+	if (!data_channel || data_channel.readyState !== 'open') {
+		alert('Not connected to the camera.');
+		return;
+	}
+	data_channel.send(
+		JSON.stringify({
+			action: 'save_motion_zones',
+			zones: motion_zones,
+		})
+	);
+}
+
+// Draw the zones (and the zone being drawn) over the livestream
+function draw_motion_zones() {
+	const canvas = document.getElementById('motion_zones_canvas');
+	// Match the canvas resolution to its displayed size
+	canvas.width = canvas.clientWidth;
+	canvas.height = canvas.clientHeight;
+	const ctx = canvas.getContext('2d');
+	ctx.clearRect(0, 0, canvas.width, canvas.height);
+	const zones = drawn_zone === null ? motion_zones : motion_zones.concat([drawn_zone]);
+	zones.forEach((zone) => {
+		if (zone.points.length === 0) {
+			return;
+		}
+		ctx.beginPath();
+		zone.points.forEach(([x, y], i) => {
+			if (i === 0) {
+				ctx.moveTo(x * canvas.width, y * canvas.height);
+			} else {
+				ctx.lineTo(x * canvas.width, y * canvas.height);
+			}
+		});
+		ctx.strokeStyle = ZONE_COLORS[zone.kind].replace(/[\d.]+\)$/, '1)');
+		ctx.lineWidth = 2;
+		if (zone === drawn_zone) {
+			// Open polygon, with its points marked
+			ctx.stroke();
+			zone.points.forEach(([x, y]) => {
+				ctx.fillStyle = ctx.strokeStyle;
+				ctx.fillRect(x * canvas.width - 3, y * canvas.height - 3, 6, 6);
+			});
+		} else {
+			ctx.closePath();
+			ctx.fillStyle = ZONE_COLORS[zone.kind];
+			ctx.fill();
+			ctx.stroke();
+		}
+	});
+}
+
+// Set up the zone editor once the page is loaded
+document.addEventListener('DOMContentLoaded', () => {
+	const canvas = document.getElementById('motion_zones_canvas');
+	canvas.addEventListener('click', add_motion_zone_point);
+	canvas.addEventListener('dblclick', close_motion_zone);
+	// Redraw the zones when the livestream is resized
+	window.addEventListener('resize', draw_motion_zones);
+	draw_motion_zones();
+});
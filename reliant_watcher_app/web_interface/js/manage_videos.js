@@ -82,6 +82,16 @@ let downloaded_videos = {};
 let fileChunks = [];
 // Flag to indicate if a download is currently in progress
 let isDownloading = false;
+// File being downloaded (kept after an interruption, so the download can be resumed), its video player ID
+// and the offset in the file of the next chunk expected (i.e. the number of bytes received so far)
+let download_filename = null;
+let download_video_player_id = null;
+let download_offset = 0;
+// Size of the header before the data of each chunk: the chunk's offset in the file (uint64, big-endian)
+const CHUNK_HEADER_SIZE = 8;
+// Video played while it is downloaded (fragmented MP4 through Media Source Extensions), or null.
+// Holds the filename, the MediaSource, its SourceBuffer, the chunks waiting to be appended and a completion flag.
+let streaming = null;
 
 // Play a video by either loading a downloaded Blob or requesting a download if not available
 function play_video(filename, video_player_id) {
@@ -140,6 +150,20 @@ function save_video(filename) {
 	}
 }
 
+// Mark the current download as interrupted (e.g. the data channel closed or the server reported an error).
+// The chunks received so far are kept: requesting the same file again resumes from the last offset.
+function handle_download_interrupted() {
+	isDownloading = false;
+}
+
+// Resume an interrupted download, e.g. once the data channel is open again
+function resume_interrupted_download() {
+	if (!isDownloading && download_filename !== null) {
+		console.log(`Resuming the download of ${download_filename} from offset ${download_offset}.`);
+		request_download(download_filename, download_video_player_id);
+	}
+}
+
 // Refresh the intrusion video list by requesting the latest videos
 function refresh_list() {
 	// Get the number of videos requested from the input field
@@ -225,29 +249,124 @@ document.getElementById('search_intrusion_form').addEventListener('submit', func
 	// this.reset();
 });
 
-// Request the download of a video file, optionally providing a video player ID
+// Request the download of a video file, optionally providing a video player ID.
+// An interrupted download of the same file is resumed from the last offset received.
 function request_download(filename, video_player_id = null) {
-	// Clear previous file chunks and set downloading flag to true
-	fileChunks = [];
+	if (download_filename !== filename) {
+		// New download: clear previous file chunks
+		fileChunks = [];
+		download_offset = 0;
+		streaming = null;
+	}
+	download_filename = filename;
+	download_video_player_id = video_player_id;
+	// Not connected (e.g. reconnecting): the download is requested once the data channel is open
+	if (data_channel === null || data_channel.readyState !== 'open') {
+		isDownloading = false;
+		return;
+	}
 	isDownloading = true;
 	// Build the download request message payload
 	const message = {
 		action: 'request_download',
 		video_player_id: video_player_id,
 		filename: filename,
+		offset: download_offset,
 	};
 	// Send the download request over the data channel
 	data_channel.send(JSON.stringify(message));
 }
 
+// Start playing a video as soon as its first chunks arrive, instead of waiting for the whole file.
+// Only fragmented MP4 files (header first, one fragment per keyframe) can be played this way; other
+// files are played from a Blob once the download is complete.
+function handle_download_started(filename, video_player_id, fragmented, mime_type, offset) {
+	// A resumed download keeps being appended to the player it was already playing in
+	if (offset > 0) {
+		return;
+	}
+	streaming = null;
+	// Only when playing (not only saving) the video was requested
+	if (!fragmented || video_player_id === null || !(filename in downloaded_videos) || !downloaded_videos[filename].play_requested) {
+		return;
+	}
+	// Fall back to the Blob if the browser cannot play this video through Media Source Extensions
+	if (!('MediaSource' in window) || !MediaSource.isTypeSupported(mime_type)) {
+		return;
+	}
+	const media_source = new MediaSource();
+	streaming = { filename: filename, media_source: media_source, source_buffer: null, pending: [], complete: false };
+	// Update the video player's title with the filename
+	const title = document.getElementById(`${video_player_id}_content_title`);
+	title.innerHTML = filename;
+	const video_player = document.getElementById(video_player_id);
+	video_player.src = URL.createObjectURL(media_source);
+	media_source.addEventListener(
+		'sourceopen',
+		() => {
+			URL.revokeObjectURL(video_player.src);
+			streaming.source_buffer = media_source.addSourceBuffer(mime_type);
+			// Append the next chunk each time the previous one has been processed
+			streaming.source_buffer.addEventListener('updateend', append_next_chunk);
+			append_next_chunk();
+		},
+		{ once: true }
+	);
+	// Playback starts as soon as the first fragment has been appended
+	video_player.play().catch((error) => console.warn('Playback not started:', error));
+	// The video is already being played, it must not be played again from the Blob
+	downloaded_videos[filename].play_requested = false;
+}
+
+// Handle a binary message: a chunk of the video being downloaded, prefixed with its offset in the file.
+// Keep the chunk and, if the video is being played, queue it for the player.
+function handle_download_chunk(data) {
+	const header = new DataView(data, 0, CHUNK_HEADER_SIZE);
+	const offset = header.getUint32(0) * 2 ** 32 + header.getUint32(4);
+	// Ignore a chunk that does not follow the data received so far (e.g. a late chunk of an earlier request)
+	if (offset !== download_offset) {
+		console.warn(`Ignoring chunk at offset ${offset}, expected offset ${download_offset}.`);
+		return;
+	}
+	const chunk = data.slice(CHUNK_HEADER_SIZE);
+	download_offset += chunk.byteLength;
+	fileChunks.push(chunk);
+	if (streaming !== null) {
+		streaming.pending.push(chunk);
+		append_next_chunk();
+	}
+}
+
+// Append the next queued chunk to the player (a SourceBuffer accepts one chunk at a time)
+function append_next_chunk() {
+	if (streaming === null || streaming.source_buffer === null || streaming.source_buffer.updating) {
+		return;
+	}
+	if (streaming.pending.length > 0) {
+		streaming.source_buffer.appendBuffer(streaming.pending.shift());
+	} else if (streaming.complete) {
+		// Every chunk has been appended: let the player know the video ends here
+		streaming.media_source.endOfStream();
+		streaming = null;
+	}
+}
+
 // Handle the completion of a video download by combining chunks and processing playback or saving
 function handle_download_completed(filename, video_player_id = null) {
+	// The video being played while downloaded ends once its last chunks are appended
+	if (streaming !== null && streaming.filename === filename) {
+		streaming.complete = true;
+		append_next_chunk();
+	}
 	console.log('Download complete, building Blob...');
 	// Combine the accumulated file chunks into a Blob representing an MP4 video
 	const blob = new Blob(fileChunks, { type: 'video/mp4' });
 	// Reset the file chunks and downloading flag
 	fileChunks = [];
 	isDownloading = false;
+	download_filename = null;
+	download_video_player_id = null;
+	download_offset = 0;
 	// Initialize the downloaded video entry if it doesn't exist
 	if (!(filename in downloaded_videos)) {
 		downloaded_videos[filename] = { blob: null, play_requested: false, save_requested: false };
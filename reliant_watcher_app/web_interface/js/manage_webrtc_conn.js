@@ -1,19 +1,15 @@
-// Establish a WebSocket connection to the specified URL
-const ws = new WebSocket('wss://gjtxmivc5m.execute-api.us-east-1.amazonaws.com/production/');
+// URL of the signaling server
+const SIGNALING_URL = 'wss://gjtxmivc5m.execute-api.us-east-1.amazonaws.com/production/';
+// Delay (in milliseconds) before reconnecting once the data channel has closed
+const RECONNECT_DELAY_MS = 3000;
 
-// WebSocket Event: Connection Opened
-ws.onopen = function () {
-	// Prepare connection message to send once WebSocket is open
-	const message = {
-		step: '1_connect',
-		id: 'web_interface',
-	};
-	// Send connection message in JSON format
-	ws.send(JSON.stringify(message));
-
-	// After establishing connection, initiate sending a WebRTC offer
-	send_offer();
-};
+// Signaling WebSocket, current RTCPeerConnection and its Data Channel (replaced at each reconnection)
+let ws = null;
+let web_interface_pc = null;
+let data_channel = null;
+// Pending reconnection timer, and whether the user closed the connection on purpose (no reconnection then)
+let reconnect_timer = null;
+let disconnected = false;
 
 // ICE Server configuration for establishing WebRTC connection
 const iceConfig = {
@@ -60,17 +56,30 @@ function create_peer_connection() {
 
 	// Create a Data Channel named 'data_channel' for sending/receiving non-media data
 	let dc = pc.createDataChannel('data_channel');
+	// Receive binary messages (video chunks) as ArrayBuffers, which Media Source Extensions can append directly
+	dc.binaryType = 'arraybuffer';
 
 	// Event handler: Data Channel opened successfully
 	dc.onopen = () => {
 		// When data channel is open, request YOLOX object detection results and intrusion videos
 		request_yolox_objects(dc);
 		request_latest_intrusion_videos(dc);
+		// Show the motion zones over the livestream
+		request_motion_zones(dc);
+		// Resume a download interrupted by a previous connection
+		resume_interrupted_download();
 	};
 
 	// Event handler: Data Channel closed
 	dc.onclose = () => {
 		console.log('Data Channel Closed!');
+		// The channel of a connection already replaced closes once its connection is closed
+		if (dc !== data_channel) {
+			return;
+		}
+		// The chunks received so far are kept, the download resumes from the last offset once reconnected
+		handle_download_interrupted();
+		schedule_reconnect();
 	};
 
 	// Event handler: Data Channel encountered an error
@@ -98,17 +107,23 @@ function create_peer_connection() {
 					'search_intrusion_list',
 					'searched_intrusion_video_player'
 				);
+			} else if (data.action === 'download_start') {
+				// Start playing a fragmented MP4 video while it is downloaded, if possible
+				handle_download_started(data.filename, data.video_player_id, data.fragmented, data.mime_type, data.offset);
 			} else if (data.action === 'download_complete') {
 				// Handle successful file download completion
 				handle_download_completed(data.filename, data.video_player_id);
 			} else if (data.action === 'download_error') {
 				// Alert user if there was an error during file transfer
 				alert('File transfer error: ' + data.message);
-				isDownloading = false;
-				fileChunks = [];
+				// Keep the chunks received so far: requesting the video again resumes the download
+				handle_download_interrupted();
 			} else if (data.action === 'send_yolox_objects') {
 				// Process YOLOX object detection results
 				handle_yolox_objects_response(data.yolox_objects);
+			} else if (data.action === 'send_motion_zones' || data.action === 'motion_zones_saved') {
+				// Show the zones motion detection uses
+				handle_motion_zones_response(data.zones);
 			} else if (data.action === 'error') {
 				// Alert user if any error message is received
 				alert('Error: ' + data.error_message);
@@ -116,8 +131,8 @@ function create_peer_connection() {
 		} else {
 			// Likely received binary data (ArrayBuffer or Blob)
 			if (isDownloading) {
-				// Append binary data to fileChunks array if a download is in progress
-				fileChunks.push(event.data);
+				// Keep the chunk and, if the video is being played while downloaded, append it to the player
+				handle_download_chunk(event.data);
 			} else {
 				console.warn("Received binary data, but not in 'isDownloading' state.");
 			}
@@ -169,11 +184,53 @@ function create_peer_connection() {
 	return { pc, dc };
 }
 
-// Create a new peer connection and data channel; destructure results into variables
-let { pc: web_interface_pc, dc: data_channel } = create_peer_connection();
+// Open the signaling WebSocket; once it is open, connect to the camera
+function open_signaling() {
+	ws = new WebSocket(SIGNALING_URL);
+	// WebSocket Event: Connection Opened
+	ws.onopen = connect;
+	// WebSocket Event: Message Received from the server
+	ws.onmessage = handle_signaling_message;
+}
+
+// Connect to the camera through the signaling server with a new peer connection and data channel.
+// The camera replaces its own peer connection when it receives the connection message.
+function connect() {
+	if (web_interface_pc !== null) {
+		web_interface_pc.close();
+	}
+	// Create a new peer connection and data channel; destructure results into variables
+	({ pc: web_interface_pc, dc: data_channel } = create_peer_connection());
+	// Prepare connection message to send once WebSocket is open
+	const message = {
+		step: '1_connect',
+		id: 'web_interface',
+	};
+	// Send connection message in JSON format
+	ws.send(JSON.stringify(message));
+
+	// After establishing connection, initiate sending a WebRTC offer
+	send_offer();
+}
+
+// Reconnect after a delay, reopening the signaling WebSocket if it was closed too (e.g. idle timeout)
+function schedule_reconnect() {
+	if (disconnected || reconnect_timer !== null) {
+		return;
+	}
+	reconnect_timer = setTimeout(() => {
+		reconnect_timer = null;
+		console.log('Reconnecting...');
+		if (ws.readyState === WebSocket.OPEN) {
+			connect();
+		} else {
+			open_signaling();
+		}
+	}, RECONNECT_DELAY_MS);
+}
 
 // WebSocket Event: Message Received from the server
-ws.onmessage = function (event) {
+function handle_signaling_message(event) {
 	try {
 		const data = JSON.parse(event.data);
 		// Process the message based on its "step" field
@@ -196,10 +253,11 @@ ws.onmessage = function (event) {
 		// Log any errors that occur while processing the incoming message
 		console.error('Error processing WebSocket message:', error);
 	}
-};
+}
 
 // Function to close the WebSocket connection
 function disconnect() {
+	disconnected = true;
 	ws.close();
 }
 
@@ -226,3 +284,5 @@ async function send_offer() {
 		console.error('Error creating or sending offer:', error);
 	}
 }
+
+open_signaling();
@@ -0,0 +1,149 @@
+// Runs the dashboard scripts with stand-ins for the browser APIs and checks that a download interrupted by the
+// data channel closing is resumed, from the offset reached, on the data channel of the new connection.
+// Run by test_resume_download.py: node resume_download.js <web_interface directory>
+const assert = require('node:assert');
+const fs = require('node:fs');
+const path = require('node:path');
+const vm = require('node:vm');
+
+const web_interface_dir = process.argv[2];
+
+// Data Channel: records the messages sent, opened and closed by the test
+class FakeDataChannel {
+	constructor() {
+		this.readyState = 'connecting';
+		this.sent = [];
+	}
+	send(message) {
+		assert.strictEqual(this.readyState, 'open', 'message sent on a data channel that is not open');
+		this.sent.push(JSON.parse(message));
+	}
+	open() {
+		this.readyState = 'open';
+		this.onopen();
+	}
+	close() {
+		if (this.readyState !== 'closed') {
+			this.readyState = 'closed';
+			this.onclose();
+		}
+	}
+	receive(data) {
+		this.onmessage({ data: data });
+	}
+}
+
+const peer_connections = [];
+class FakePeerConnection {
+	constructor() {
+		peer_connections.push(this);
+	}
+	createDataChannel() {
+		this.dc = new FakeDataChannel();
+		return this.dc;
+	}
+	async createOffer() {
+		return { type: 'offer', sdp: '' };
+	}
+	async setLocalDescription() {}
+	close() {
+		this.dc.close();
+	}
+}
+
+const websockets = [];
+class FakeWebSocket {
+	constructor() {
+		this.readyState = FakeWebSocket.OPEN;
+		this.sent = [];
+		websockets.push(this);
+	}
+	send(message) {
+		this.sent.push(JSON.parse(message));
+	}
+	close() {
+		this.readyState = FakeWebSocket.CLOSED;
+	}
+}
+FakeWebSocket.OPEN = 1;
+FakeWebSocket.CLOSED = 3;
+
+const element = () => ({ value: '5', innerHTML: '', addEventListener() {}, play: () => Promise.resolve(), load() {} });
+const timers = [];
+const context = vm.createContext({
+	console: { log() {}, warn() {}, error: console.error },
+	document: {
+		getElementById: element,
+		addEventListener() {},
+		createElement: () => ({ style: {}, click() {} }),
+		body: { appendChild() {}, removeChild() {} },
+	},
+	URL: { createObjectURL: () => 'blob:video', revokeObjectURL() {} },
+	Blob: Blob,
+	window: {},
+	alert: (message) => assert.fail(message),
+	Choices: class {
+		setChoices() {}
+	},
+	WebSocket: FakeWebSocket,
+	RTCPeerConnection: FakePeerConnection,
+	RTCSessionDescription: class {},
+	// The reconnection delay is run by the test
+	setTimeout: (callback) => timers.push(callback),
+	DataView: DataView,
+	ArrayBuffer: ArrayBuffer,
+	Uint8Array: Uint8Array,
+	JSON: JSON,
+	Object: Object,
+	Promise: Promise,
+});
+for (const script of ['manage_videos.js', 'manage_motion_zones.js', 'ice_server_auth.js', 'manage_webrtc_conn.js']) {
+	vm.runInContext(fs.readFileSync(path.join(web_interface_dir, 'js', script), 'utf8'), context, { filename: script });
+}
+
+// A chunk of the video: its offset in the file (uint64, big-endian) then its data
+function chunk(offset, size) {
+	const data = new Uint8Array(8 + size);
+	new DataView(data.buffer).setUint32(4, offset);
+	return data.buffer;
+}
+const downloads = (dc) => dc.sent.filter((message) => message.action === 'request_download');
+
+websockets[0].onopen();
+const first = peer_connections[0].dc;
+first.open();
+vm.runInContext("save_video('2025-03-17_01-28-05_120.mp4')", context);
+assert.deepStrictEqual(downloads(first).map((message) => message.offset), [0]);
+first.receive(JSON.stringify({ action: 'download_start', filename: '2025-03-17_01-28-05_120.mp4', offset: 0 }));
+first.receive(chunk(0, 100));
+first.receive(chunk(100, 50));
+
+// The connection drops: a new peer connection and data channel are created after the delay
+first.close();
+assert.strictEqual(timers.length, 1);
+timers.shift()();
+assert.strictEqual(peer_connections.length, 2);
+assert.deepStrictEqual(websockets[0].sent.filter((message) => message.step === '1_connect').length, 2);
+const second = peer_connections[1].dc;
+assert.strictEqual(vm.runInContext('data_channel', context), second);
+// Closing the replaced connection does not schedule another reconnection
+assert.strictEqual(timers.length, 0);
+
+// The download resumes from the 150 bytes received, on the new data channel
+second.open();
+assert.deepStrictEqual(downloads(second).map((message) => [message.filename, message.offset]), [
+	['2025-03-17_01-28-05_120.mp4', 150],
+]);
+second.receive(chunk(150, 10));
+second.receive(JSON.stringify({ action: 'download_complete', filename: '2025-03-17_01-28-05_120.mp4' }));
+assert.strictEqual(vm.runInContext("downloaded_videos['2025-03-17_01-28-05_120.mp4'].blob.size", context), 160);
+// Saving the video only leaves the revocation of its object URL to run
+timers.length = 0;
+
+// The signaling WebSocket closed too (e.g. idle timeout): it is reopened before reconnecting
+websockets[0].close();
+second.close();
+timers.shift()();
+assert.strictEqual(websockets.length, 2);
+websockets[1].onopen();
+assert.strictEqual(vm.runInContext('data_channel', context), peer_connections[2].dc);
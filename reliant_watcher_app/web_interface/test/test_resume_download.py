@@ -0,0 +1,21 @@
+import pytest
+import shutil
+import subprocess
+from pathlib import Path
+
+# # Directory of the dashboard
+WEB_INTERFACE_DIR = Path(__file__).resolve().parent.parent
+
+# The dashboard scripts are run by Node.js, with stand-ins for the browser APIs
+NODE = shutil.which("node")
+
+
+@pytest.mark.skipif(NODE is None, reason="Node.js is not installed")
+def test_interrupted_download_resumes_on_the_new_data_channel():
+    """
+    Test that when the data channel closes during a download, the dashboard reconnects with a new peer
+    connection and data channel, and requests the rest of the video from the offset reached.
+    """
+    result = subprocess.run([NODE, str(Path(__file__).parent / "resume_download.js"), str(WEB_INTERFACE_DIR)],
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr